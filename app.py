@@ -1,11 +1,23 @@
+from __future__ import annotations
+
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from functools import partial
+from typing import Optional
 
 import streamlit as st
 from dotenv import load_dotenv
-from langchain_community.callbacks import get_openai_callback
-from langchain_openai import ChatOpenAI
 
+from pipelines.jobs import Job, JobStore, Work
+from pipelines.ledger import PROCESS_LEDGER, Ledger
+from pipelines.models import ModelRegistry
+from pipelines.cache import ResponseCache, cache_from_env, format_cache_caption
+from pipelines.prefetch import Prefetcher, PrefetchPolicy, PrefetchStats, format_prefetch_caption, prefetch_from_env
+from pipelines.preprocess import format_savings_caption, prepare_mail
+from pipelines.resilience import DeadlineExceeded, format_resilience_caption
+from pipelines.revision import EditPolicy
 from pipelines.monolith import (
     summarize_text,
     write_reply_mail,
@@ -23,6 +35,8 @@ STATE_KEYS = [
     "brief",
     "draft",
     "metrics",
+    "jobs",
+    "pending",
 ]
 
 
@@ -36,26 +50,204 @@ def init_state() -> None:
     s.setdefault("brief", "")
     s.setdefault("draft", "")
     s.setdefault("metrics", None)
+    # Bleibt über "Neu starten" hinweg erhalten (Verbrauch der ganzen Sitzung).
+    s.setdefault("ledger", Ledger())
+    # Modellarbeit je (Phase, Eingaben); ``pending`` ist der per Button gestartete Job (op, Eingaben).
+    if "jobs" not in s:
+        s.jobs = JobStore(init_executor(), sinks=(s.ledger, PROCESS_LEDGER))
+    s.setdefault("pending", None)
+    # Vorabberechnung (PREFETCH=1); das Token-Budget gilt für die ganze Sitzung.
+    s.setdefault("prefetch", None)
 
 
 def reset_state() -> None:
+    if st.session_state.get("prefetch") is not None:
+        st.session_state.prefetch.cancel()
     for k in STATE_KEYS:
         st.session_state.pop(k, None)
     init_state()
 
 
 @st.cache_resource
-def init_llm() -> ChatOpenAI:
+def init_cache() -> Optional[ResponseCache]:
+    load_dotenv()
+    return cache_from_env()
+
+
+def require_api_key() -> str:
     load_dotenv()
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         st.error("OPENAI_API_KEY fehlt in .env")
         st.stop()
-    return ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key=api_key)
+    return api_key
 
 
-def main() -> None:
+@st.cache_resource
+def init_llm() -> ModelRegistry:
+    # Erst beim ersten Modellaufruf: langchain_openai/openai kosten beim Kaltstart ~0,5 s,
+    # die Startseite und die Mail-Eingabe brauchen das Modell nicht.
+    # Modell je Aufgabe über MODEL_DEFAULT / MODEL_<ROLLE> (siehe pipelines/models.py).
+    return ModelRegistry.from_env(
+        api_key=require_api_key(),
+        cache=init_cache() or False,
+        stream_usage=True,
+    )
+
+
+@st.cache_resource
+def init_edits() -> Optional[EditPolicy]:
+    # REVISION_EDITS=1: Überarbeitungen als Edit-Skript statt kompletter Neufassung.
+    load_dotenv()
+    return EditPolicy() if os.getenv("REVISION_EDITS", "0").strip().lower() in ("1", "true", "on", "yes") else None
+
+
+@st.cache_resource
+def init_prefetch() -> Optional[PrefetchPolicy]:
+    # PREFETCH=1: Zusammenfassung und Antwortentwurf im Hintergrund, sobald die Mail feststeht.
+    load_dotenv()
+    return prefetch_from_env()
+
+
+def start_prefetch(mail: str) -> None:
+    policy = init_prefetch()
+    if policy is None:
+        return
+    if st.session_state.prefetch is None:
+        # Eigene Zähler je Sitzung: die gecachte Policy teilen sich alle Sitzungen des Prozesses.
+        policy = replace(policy, stats=PrefetchStats())
+        st.session_state.prefetch = Prefetcher(init_llm(), policy, sinks=(st.session_state.ledger, PROCESS_LEDGER))
+    st.session_state.prefetch.start(mail)
+
+
+# Abfrageintervall für den Fortschritt laufender Jobs (Sekunden).
+POLL_S = 0.1
+
+
+@st.cache_resource
+def init_executor() -> ThreadPoolExecutor:
+    # Modellarbeit läuft außerhalb des Skript-Threads; ein Pool je Prozess für alle Sitzungen.
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="phase-job")
+
+
+def phase_work(op: str, inputs: tuple) -> Work:
+    """Modellarbeit einer Phase. Läuft im Job-Thread, daher ohne Streamlit-Aufrufe."""
     llm = init_llm()
+    cache = init_cache()
+    prefetch = st.session_state.prefetch
+    fn = {
+        "summary": summarize_text,
+        "reply": write_reply_mail,
+        "new": write_new_mail,
+        "revise": partial(revise_mail, edits=init_edits()),
+    }[op]
+
+    def work(job: Job) -> str:
+        before = cache.stats.snapshot() if cache else {}
+        out = None
+        if prefetch is not None and op in ("summary", "reply"):
+            # Vorab berechnet (pipelines.prefetch); der Entwurf passt nur ohne Zusatzinfos und mit
+            # derselben Zusammenfassung im Prompt. Die Tokens stehen schon im Ledger.
+            out = prefetch.take(op, *inputs) if op == "reply" else prefetch.take(op, inputs[0])
+            job.info["prefetched"] = out is not None
+        if out is None:
+            out = fn(llm, *inputs, on_token=job.on_token)
+        job.info["cache"] = cache.stats.delta(before) if cache else {}
+        return out
+
+    return work
+
+
+def phase_job(op: str, *inputs) -> Job:
+    """Job für ``op`` mit diesen Eingaben – beim ersten Abruf gestartet, bei jedem Rerun derselbe."""
+    return st.session_state.jobs.submit(op, inputs, phase_work(op, inputs))
+
+
+def await_job(op: str, job: Job) -> str:
+    """Zeigt die gestreamte Antwort, bis der Job fertig ist, und übernimmt seine Metriken.
+
+    Eine Interaktion währenddessen unterbricht nur die Anzeige; der Job läuft weiter und
+    wird beim nächsten Rerun mit denselben Eingaben wiedergefunden. Ein fehlgeschlagener Job
+    bleibt ebenfalls stehen (kein neuer Aufruf je Rerun), bis „Erneut versuchen“ ihn verwirft.
+    """
+    placeholder = st.empty()
+    while not job.done:
+        placeholder.markdown(job.text or "⏳ …")
+        time.sleep(POLL_S)
+    placeholder.empty()
+    try:
+        out = job.result()
+    except Exception as exc:
+        if isinstance(exc, DeadlineExceeded):
+            # Deadline, Retries und Fallback (pipelines/resilience.py) sind ausgeschöpft.
+            st.error("⏳ Das Modell hat nicht rechtzeitig geantwortet.")
+        else:
+            st.exception(exc)
+        # ``pending`` bleibt gesetzt: nach dem Verwerfen startet derselbe Abruf einen neuen Job.
+        if st.button("🔁 Erneut versuchen", key=f"retry-{job.key}"):
+            st.session_state.jobs.discard(job)
+            st.rerun()
+        st.stop()
+
+    st.session_state.metrics = {
+        "op": op,
+        "latency": job.latency,
+        "ttft": job.ttft,
+        "tokens": job.total_tokens,
+        **job.info,
+    }
+    if op in ("summary", "reply"):
+        st.session_state.metrics["prep"] = prepare_mail(st.session_state.original_letter).stats
+    return out
+
+
+def pending_result(op: str) -> Optional[str]:
+    """Ergebnis des per Button gestarteten Jobs (``pending``) für ``op``, sonst ``None``."""
+    pending = st.session_state.pending
+    if not pending or pending[0] != op:
+        return None
+    out = await_job(op, phase_job(op, *pending[1]))
+    st.session_state.pending = None
+    return out
+
+
+def render_metrics(m: dict) -> None:
+    parts = [
+        f"⏱️ {m['latency']:.2f}s",
+        f"⚡ {m['ttft']:.2f}s TTFT" if "ttft" in m else "",
+        f"🔤 {m['tokens']} Tokens",
+        "🔮 vorab berechnet" if m.get("prefetched") else "",
+        format_cache_caption(m.get("cache", {})),
+        format_savings_caption(m["prep"]) if m.get("prep") else "",
+    ]
+    st.caption(" · ".join(x for x in parts if x))
+
+
+def render_usage(ledger: Ledger) -> None:
+    """Seitenleiste: Tokens, Kosten und Latenz dieser Sitzung je Knoten/Tool/Operation."""
+    rows = ledger.summary()
+    if not rows:
+        return
+    with st.sidebar.expander("📊 Verbrauch je Knoten"):
+        totals = ledger.totals()
+        st.caption(f"🔤 {totals['total_tokens']} Tokens · 💲 {totals['cost_usd']:.4f} USD · {totals['calls']} Aufrufe")
+        resilience = format_resilience_caption(init_llm().resilience_stats())
+        if resilience:
+            st.caption(resilience)
+        prefetch = st.session_state.get("prefetch")
+        if prefetch is not None and format_prefetch_caption(prefetch):
+            st.caption(format_prefetch_caption(prefetch))
+        st.dataframe(
+            [{k: r[k] for k in ("label", "model", "calls", "total_tokens", "cost_usd", "p50_s", "p95_s")} for r in rows],
+            hide_index=True,
+        )
+        c1, c2 = st.columns(2)
+        c1.download_button("JSONL", ledger.to_jsonl(), "ledger.jsonl", "application/x-ndjson")
+        c2.download_button("Prometheus", PROCESS_LEDGER.to_prometheus(), "metrics.prom", "text/plain")
+
+
+def main() -> None:
+    require_api_key()
     init_state()
     p = st.session_state
 
@@ -89,6 +281,8 @@ def main() -> None:
             if not p.original_letter.strip():
                 st.warning("Bitte zuerst die Mail einfügen.")
             else:
+                # Während der Auswahl und der Zusatzinfos rechnet das Modell schon vor.
+                start_prefetch(p.original_letter)
                 p.phase = "summary_choice"
                 st.rerun()
 
@@ -112,24 +306,27 @@ def main() -> None:
 
     elif p.phase == "summary_view":
         st.subheader("📝 Zusammenfassung")
-        with st.spinner("Erzeuge Zusammenfassung …"):
-            t0 = time.perf_counter()
-            with get_openai_callback() as cb:
-                p.summary = summarize_text(llm, p.original_letter)
-            latency = time.perf_counter() - t0
-            p.metrics = {"op": "summary", "latency": latency, "tokens": cb.total_tokens}
-
-        st.text_area("Kurzfassung", p.summary, height=160, disabled=True)
-        st.caption(f"⏱️ {p.metrics['latency']:.2f}s · 🔤 {p.metrics['tokens']} Tokens")
+        # Einmal je Mail: Reruns (jede Interaktion) finden den fertigen Job wieder.
+        job = phase_job("summary", p.original_letter)
+        ready = job.done
+        body = st.container()
 
+        # Buttons vor dem Warten, damit „Zurück“ auch während der Generierung sofort greift.
         c1, c2 = st.columns(2)
         if c1.button("⬅️ Zurück", use_container_width=True):
             p.phase = "summary_choice"
             st.rerun()
-        if c2.button("➡️ Weiter", type="primary", use_container_width=True):
+        if c2.button("➡️ Weiter", type="primary", use_container_width=True, disabled=not ready):
             p.phase = "context_input"
             st.rerun()
 
+        with body:
+            p.summary = await_job("summary", job)
+            st.text_area("Kurzfassung", p.summary, height=160, disabled=True)
+            render_metrics(p.metrics)
+        if not ready:
+            st.rerun()  # „Weiter“ freigeben
+
     elif p.phase == "context_input":
         if p.summary:
             st.subheader("📝 Zusammenfassung")
@@ -145,15 +342,15 @@ def main() -> None:
 
         c1, c2 = st.columns(2)
         if c1.button("⬅️ Zurück", use_container_width=True):
+            p.pending = None
             p.phase = "summary_choice"
             st.rerun()
         if c2.button("✍️ Entwurf generieren", type="primary", use_container_width=True):
-            t0 = time.perf_counter()
-            with get_openai_callback() as cb:
-                p.draft = write_reply_mail(llm, p.original_letter, p.extra, p.summary or None)
-            latency = time.perf_counter() - t0
-            p.metrics = {"op": "reply", "latency": latency, "tokens": cb.total_tokens}
+            p.pending = ("reply", (p.original_letter, p.extra, p.summary or None))
 
+        draft = pending_result("reply")
+        if draft is not None:
+            p.draft = draft
             p.phase = "edit_draft"
             st.rerun()
 
@@ -168,27 +365,27 @@ def main() -> None:
 
         c1, c2 = st.columns(2)
         if c1.button("⬅️ Zurück", use_container_width=True):
+            p.pending = None
             p.phase = "start"
             st.rerun()
         if c2.button("✍️ Entwurf erstellen", type="primary", use_container_width=True):
             if not p.brief.strip():
                 st.warning("Bitte eine kurze Beschreibung eingeben.")
             else:
-                t0 = time.perf_counter()
-                with get_openai_callback() as cb:
-                    p.draft = write_new_mail(llm, p.brief)
-                latency = time.perf_counter() - t0
-                p.metrics = {"op": "new", "latency": latency, "tokens": cb.total_tokens}
+                p.pending = ("new", (p.brief,))
 
-                p.phase = "edit_draft"
-                st.rerun()
+        draft = pending_result("new")
+        if draft is not None:
+            p.draft = draft
+            p.phase = "edit_draft"
+            st.rerun()
 
     elif p.phase == "edit_draft":
         st.subheader("✉️ Entwurf")
         st.code(p.draft, language="markdown")
 
         if p.metrics:
-            st.caption(f"⏱️ {p.metrics['latency']:.2f}s · 🔤 {p.metrics['tokens']} Tokens")
+            render_metrics(p.metrics)
 
         fb = st.text_area(
             "Anpassungswünsche (optional)",
@@ -198,14 +395,10 @@ def main() -> None:
 
         c1, c2, c3 = st.columns(3)
         if c1.button("🔄 Überarbeiten", use_container_width=True):
-            t0 = time.perf_counter()
-            with get_openai_callback() as cb:
-                p.draft = revise_mail(llm, p.draft, fb or "")
-            latency = time.perf_counter() - t0
-            p.metrics = {"op": "revise", "latency": latency, "tokens": cb.total_tokens}
-            st.rerun()
+            p.pending = ("revise", (p.draft, fb or ""))
 
         if c2.button("✅ Final", type="primary", use_container_width=True):
+            p.pending = None
             p.phase = "finished"
             st.rerun()
 
@@ -213,13 +406,18 @@ def main() -> None:
             reset_state()
             st.rerun()
 
+        draft = pending_result("revise")
+        if draft is not None:
+            p.draft = draft
+            st.rerun()
+
     elif p.phase == "finished":
         st.subheader("✅ Fertig")
         st.success("Der Entwurf ist final. Du kannst ihn jetzt kopieren und versenden.")
         st.code(p.draft, language="markdown")
 
         if p.metrics:
-            st.caption(f"⏱️ {p.metrics['latency']:.2f}s · 🔤 {p.metrics['tokens']} Tokens")
+            render_metrics(p.metrics)
 
         if st.button("🔄 Neu starten"):
             reset_state()
@@ -227,4 +425,5 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
+    render_usage(st.session_state.ledger)
\ No newline at end of file
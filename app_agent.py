@@ -1,30 +1,116 @@
 import os
 import time
+from dataclasses import replace
+from typing import Optional
 
 import streamlit as st
 from dotenv import load_dotenv
-from langchain_community.callbacks import get_openai_callback
-from langchain_core.messages import AIMessage, HumanMessage
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from pipelines.cache import ResponseCache, cache_from_env, format_cache_caption
+from pipelines import graph_routing
+from pipelines.graph_routing import SPECULATIVE_TAG, AgentState, SpeculationPolicy, predict_intent
+from pipelines.ledger import PROCESS_LEDGER, Ledger, track
+from pipelines.memo import LANGUAGE_NAMES
+from pipelines.models import ModelRegistry
+from pipelines.prefetch import Prefetcher, PrefetchPolicy, PrefetchStats, format_prefetch_caption, prefetch_from_env
+from pipelines.preprocess import format_savings_caption, prepare_mail
+from pipelines.resilience import DeadlineExceeded, format_resilience_caption
+from pipelines.revision import EditPolicy
+from pipelines.sessions import (
+    chat_transcript,
+    load_state,
+    mail_update,
+    new_thread_id,
+    sqlite_checkpointer,
+    thread_config,
+    turn_input,
+)
+
+# Architektur der UI. Für den Single-Agent: ``from pipelines import graph_agent`` und ``GRAPH = graph_agent``;
+# Spekulation und Single-Call gibt es nur im Routing-Graphen und werden dann ignoriert.
+GRAPH = graph_routing
 
-from pipelines.graph_routing import build_app
-# from pipelines.graph_agent import build_app
+
+@st.cache_resource
+def init_cache() -> Optional[ResponseCache]:
+    load_dotenv()
+    return cache_from_env()
 
 
 @st.cache_resource
-def init_llm() -> ChatOpenAI:
+def init_llm() -> ModelRegistry:
     load_dotenv()
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         st.error("OPENAI_API_KEY fehlt in .env")
         st.stop()
-    return ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key=api_key)
+    # Modell je Rolle (Router, Entwürfe, Agent …) über MODEL_DEFAULT / MODEL_<ROLLE>.
+    return ModelRegistry.from_env(
+        api_key=api_key,
+        cache=init_cache() or False,
+        stream_usage=True,
+    )
+
+
+@st.cache_resource
+def init_checkpointer() -> SqliteSaver:
+    load_dotenv()
+    return sqlite_checkpointer()  # SESSION_DB_PATH, Default .sessions.sqlite
+
+
+def env_flag(name: str) -> bool:
+    return os.getenv(name, "0").strip().lower() in ("1", "true", "on", "yes")
+
+
+@st.cache_resource
+def init_speculation() -> Optional[SpeculationPolicy]:
+    # SPECULATIVE_ROUTING=1: Router und vorhergesagter Knoten laufen parallel (nur Routing-Graph).
+    load_dotenv()
+    return SpeculationPolicy() if env_flag("SPECULATIVE_ROUTING") else None
+
+
+@st.cache_resource
+def init_prefetch() -> Optional[PrefetchPolicy]:
+    # PREFETCH=1: Zusammenfassung und Antwortentwurf im Hintergrund, sobald die Mail gesetzt ist.
+    load_dotenv()
+    return prefetch_from_env()
+
+
+@st.cache_resource
+def init_intent():
+    # INTENT_MODEL_PATH: lokaler Klassifikator vor dem Router (nur Routing-Graph), Schwelle INTENT_THRESHOLD;
+    # ROUTER_LOG_PATH: Router-Entscheidungen als Trainingsdaten mitschreiben. NumPy erst bei Bedarf laden.
+    load_dotenv()
+    if not (os.getenv("INTENT_MODEL_PATH") or os.getenv("ROUTER_LOG_PATH")):
+        return None
+    from pipelines.intent import intent_from_env
+
+    return intent_from_env()
 
 
 @st.cache_resource
-def init_app(llm: ChatOpenAI):
-    # App einmal bauen (Graph/Agent), nicht bei jedem Rerun neu
-    return build_app(llm)
+def init_app(_models: ModelRegistry):
+    # App einmal bauen (Graph/Agent), nicht bei jedem Rerun neu.
+    # Führender Unterstrich: Streamlit hasht das Register nicht (es ist selbst gecacht).
+    # Der State jeder Sitzung liegt im Checkpointer, nicht in st.session_state.
+    extra = {}
+    if GRAPH is graph_routing:
+        speculation = init_speculation()
+        if speculation:
+            extra["speculation"] = speculation
+        if env_flag("SINGLE_CALL_ROUTING"):
+            # summary/general in einem Aufruf (nicht zusammen mit Spekulation)
+            extra["single_call"] = True
+        intent = init_intent()
+        if intent is not None:
+            # lokaler Klassifikator vor dem LLM-Router (nur der Routing-Graph hat einen Router)
+            extra["intent"] = intent
+    if env_flag("REVISION_EDITS"):
+        # Überarbeitungen als Edit-Skript statt kompletter Neufassung (Routing- und Agent-Graph)
+        extra["edits"] = EditPolicy()
+    return GRAPH.build_app(_models, checkpointer=init_checkpointer(), **extra)
 
 
 def init_state() -> None:
@@ -32,26 +118,92 @@ def init_state() -> None:
 
     s.setdefault("llm", init_llm())
     s.setdefault("app", init_app(s["llm"]))
-
-    s.setdefault(
-        "state",
-        {
-            "messages": [],
-            "uploaded_mail": "",
-            "draft": "",
-            "router": {"type": "general", "logic": ""},
-        },
-    )
-    s.setdefault("chat", [])
-    s.setdefault("mail_text", "")
-    s.setdefault("started", False)
-    s.setdefault("mail_set", False)
+    s.setdefault("ledger", Ledger())
+    policy = init_prefetch()
+    if "prefetch" not in s:
+        # Eigene Zähler je Sitzung: die gecachte Policy teilen sich alle Sitzungen des Prozesses.
+        s.prefetch = (
+            Prefetcher(s["llm"], replace(policy, stats=PrefetchStats()), sinks=(s["ledger"], PROCESS_LEDGER))
+            if policy
+            else None
+        )
+
+    if "thread_id" not in s:
+        # Thread-ID in der URL: Nach Reload oder auf einem anderen Worker geht die Sitzung weiter.
+        open_session(st.query_params.get("thread") or new_thread_id())
+
+
+def open_session(thread_id: str) -> None:
+    s = st.session_state
+    s.thread_id = thread_id
+    st.query_params["thread"] = thread_id
+    saved = load_state(s.app, thread_id)
+    s.chat = chat_transcript(saved)
+    s.mail_text = saved.get("uploaded_mail", "")
+    s.mail_set = bool(s.mail_text)
+    s.started = bool(saved)
+
+
+def session_config() -> dict:
+    return thread_config(st.session_state.thread_id)
+
+
+def set_mail(mail: str) -> None:
+    # Neue Mail: abgeleitete Artefakte (Zusammenfassung, Entwurf) der alten verwerfen.
+    st.session_state.app.update_state(session_config(), mail_update(mail))
+    st.session_state.mail_set = bool(mail)
+    st.session_state.started = True
+    if st.session_state.prefetch is not None:
+        # Bis zur ersten Anfrage rechnet das Modell schon Zusammenfassung und Antwortentwurf vor.
+        st.session_state.prefetch.start(mail)
+
+
+def prefetched_memo(prompt: str) -> Optional[dict]:
+    """Fertige Vorab-Ergebnisse als Memo-Update für diesen Turn; auf den vorhergesagten Intent wird gewartet."""
+    prefetch = st.session_state.prefetch
+    mail = st.session_state.mail_text.strip() if st.session_state.mail_set else ""
+    if prefetch is None or not mail:
+        return None
+    intent = predict_intent(AgentState(messages=[HumanMessage(content=prompt)], uploaded_mail=mail))
+    return prefetch.memo_update(mail, wait=[intent] if intent else [])
+
+
+def render_usage(ledger: Ledger) -> None:
+    """Seitenleiste: Tokens, Kosten und Latenz dieser Sitzung je Knoten/Tool/Operation."""
+    rows = ledger.summary()
+    if not rows:
+        return
+    with st.sidebar.expander("📊 Verbrauch je Knoten"):
+        totals = ledger.totals()
+        st.caption(f"🔤 {totals['total_tokens']} Tokens · 💲 {totals['cost_usd']:.4f} USD · {totals['calls']} Aufrufe")
+        resilience = format_resilience_caption(init_llm().resilience_stats())
+        if resilience:
+            st.caption(resilience)
+        st.dataframe(
+            [{k: r[k] for k in ("label", "model", "calls", "total_tokens", "cost_usd", "p50_s", "p95_s")} for r in rows],
+            hide_index=True,
+        )
+        c1, c2 = st.columns(2)
+        c1.download_button("JSONL", ledger.to_jsonl(), "ledger.jsonl", "application/x-ndjson")
+        c2.download_button("Prometheus", PROCESS_LEDGER.to_prometheus(), "metrics.prom", "text/plain")
+
+
+def render_memo() -> None:
+    """Seitenleiste: lokal aus der Mail abgeleitete Angaben (Sprache, Personen, Termine, offene Fragen)."""
+    memo = load_state(st.session_state.app, st.session_state.thread_id).get("memo") or {}
+    if "language" not in memo:
+        return
+    with st.sidebar.expander("🧾 Zur Mail"):
+        st.caption(f"🌐 Sprache: {LANGUAGE_NAMES.get(memo['language'], 'unbekannt')}")
+        for title, key in (("Personen/Adressen", "entities"), ("Termine", "dates"), ("Offene Fragen", "open_questions")):
+            if memo.get(key):
+                st.markdown(f"**{title}**\n" + "\n".join(f"- {item}" for item in memo[key]))
 
 
 def reset_start_flow() -> None:
     st.session_state.started = False
     st.session_state.mail_set = False
-    st.session_state.mail_text = st.session_state.state.get("uploaded_mail", "")
+    st.session_state.mail_text = load_state(st.session_state.app, st.session_state.thread_id).get("uploaded_mail", "")
 
 
 def main() -> None:
@@ -79,20 +231,20 @@ def main() -> None:
                 start_without_mail = st.button("▶️ Ohne Mail starten", use_container_width=True)
 
             if start_with_mail:
-                st.session_state.state["uploaded_mail"] = st.session_state.mail_text.strip()
-                st.session_state.mail_set = True
-                st.session_state.started = True
+                set_mail(st.session_state.mail_text.strip())
                 st.rerun()
 
             if start_without_mail:
-                st.session_state.state["uploaded_mail"] = ""
-                st.session_state.mail_set = False
-                st.session_state.started = True
+                set_mail("")
                 st.rerun()
 
         st.stop()
 
-    st.caption("✅ Mail im Kontext" if st.session_state.mail_set else "ℹ️ Chat ohne Mail.")
+    if st.session_state.mail_set:
+        savings = format_savings_caption(prepare_mail(st.session_state.mail_text.strip()).stats)
+        st.caption("✅ Mail im Kontext" + (f" · {savings} durch Vorverarbeitung" if savings else ""))
+    else:
+        st.caption("ℹ️ Chat ohne Mail.")
 
     # Chat-Historie rendern
     for m in st.session_state.chat:
@@ -111,6 +263,23 @@ def main() -> None:
         if st.button("✏️ Mail ändern / neu setzen"):
             reset_start_flow()
             st.rerun()
+        if st.button("🆕 Neue Sitzung"):
+            if st.session_state.prefetch is not None:
+                st.session_state.prefetch.cancel()
+            open_session(new_thread_id())
+            st.rerun()
+        speculation = init_speculation()
+        if speculation and speculation.stats.started:
+            spec = speculation.stats.snapshot()
+            st.caption(
+                f"🔮 Spekulation: {spec['hits']}/{spec['started']} Treffer · {spec['wasted_tokens']} verworfene Tokens"
+            )
+        intent = init_intent() if GRAPH is graph_routing else None
+        if intent is not None and intent.classifier is not None:
+            stats = intent.stats.snapshot()
+            st.caption(f"🧭 Lokal geroutet: {stats['local']}/{stats['local'] + stats['llm']} Turns")
+        if st.session_state.prefetch is not None and format_prefetch_caption(st.session_state.prefetch):
+            st.caption(format_prefetch_caption(st.session_state.prefetch))
 
     # User input
     prompt = st.chat_input("Schreib hier … z. B. „Fass die Mail zusammen“ oder „Schreib eine Antwort“.")
@@ -121,9 +290,12 @@ def main() -> None:
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    state = st.session_state.state
-    prev_len = len(state["messages"])
-    state["messages"].append(HumanMessage(content=prompt))
+    # Nur die neue Nachricht senden; Verlauf, Mail und Entwurf kommen aus dem Checkpoint.
+    config = session_config()
+    prev_len = len(load_state(st.session_state.app, st.session_state.thread_id).get("messages", [])) + 1
+    # Vorab berechnete Zusammenfassung/Entwurf (PREFETCH=1) gehen als Memo mit in den Turn.
+    memo = prefetched_memo(prompt)
+    fields = {"memo": memo} if memo else {}
 
     # Assistant streaming
     with st.chat_message("assistant"):
@@ -132,29 +304,75 @@ def main() -> None:
 
         streamed_text = ""
         last_values = None
-
+        # "messages" liefert Tokens der laufenden LLM-Aufrufe (je Aufruf eine Message-ID),
+        # "values" den fertigen State nach jedem Knoten (inkl. formatierter Endausgabe).
+        tokens: dict[str, str] = {}
+        first_token = None
+        # Spekulativ gestreamte Tokens verschwinden wieder, wenn der Router anders entscheidet.
+        speculative_ids: set[str] = set()
+        speculation_missed = False
+        input_values = True
+
+        cache = init_cache()
+        cache_before = cache.stats.snapshot() if cache else {}
         t0 = time.perf_counter()
-        with get_openai_callback() as cb:
-            for values in st.session_state.app.stream(state, stream_mode="values"):
-                last_values = values
-                msgs = values.get("messages", [])
-                new_ai = [m for m in msgs[prev_len:] if isinstance(m, AIMessage)]
-                if new_ai:
-                    streamed_text = "\n\n".join(m.content for m in new_ai)
-                    text_placeholder.markdown(streamed_text)
+        with track(st.session_state.ledger, PROCESS_LEDGER) as run:
+            try:
+                stream = st.session_state.app.stream(turn_input(prompt, **fields), config, stream_mode=["messages", "values"])
+                for mode, payload in stream:
+                    if mode == "messages":
+                        chunk, meta = payload
+                        if not isinstance(chunk, AIMessageChunk) or not isinstance(chunk.content, str) or not chunk.content:
+                            continue
+                        if SPECULATIVE_TAG in (meta.get("tags") or []):
+                            if speculation_missed:
+                                continue
+                            speculative_ids.add(chunk.id)
+                        tokens[chunk.id] = tokens.get(chunk.id, "") + chunk.content
+                        text = "\n\n".join(tokens.values())
+                    else:
+                        last_values = payload
+                        # Der erste "values"-Eintrag ist die Eingabe (inkl. Router des Vor-Turns).
+                        router = {} if input_values else payload.get("router") or {}
+                        input_values = False
+                        if router.get("speculation") == "miss" and not speculation_missed:
+                            speculation_missed = True
+                            for chunk_id in speculative_ids:
+                                tokens.pop(chunk_id, None)
+                            streamed_text = "\n\n".join(tokens.values())
+                            text_placeholder.markdown(streamed_text)
+                        msgs = payload.get("messages", [])
+                        new_ai = [m for m in msgs[prev_len:] if isinstance(m, AIMessage)]
+                        text = "\n\n".join(m.content for m in new_ai if m.content)
+                        if text:
+                            tokens.clear()
+
+                    if text:
+                        if first_token is None:
+                            first_token = time.perf_counter() - t0
+                        streamed_text = text
+                        text_placeholder.markdown(streamed_text)
+            except DeadlineExceeded:
+                # Deadline, Retries und Fallback (pipelines/resilience.py) sind ausgeschöpft.
+                text_placeholder.error("⏳ Das Modell hat nicht rechtzeitig geantwortet. Bitte erneut versuchen.")
+                return
 
         latency = time.perf_counter() - t0
-        meta_placeholder.caption(f"⏱️ {latency:.2f}s · 🔤 {cb.total_tokens} Tokens")
+        ttft = first_token if first_token is not None else latency
+        cache_info = format_cache_caption(cache.stats.delta(cache_before)) if cache else ""
+        caption = f"⏱️ {latency:.2f}s · ⚡ {ttft:.2f}s TTFT · 🔤 {run.totals()['total_tokens']} Tokens" + (
+            f" · {cache_info}" if cache_info else ""
+        )
+        meta_placeholder.caption(caption)
 
     if last_values is None:
         return
 
-    st.session_state.state = dict(last_values)
-
     if streamed_text:
         st.session_state.chat.append({"role": "assistant", "content": streamed_text})
-        st.session_state.chat.append({"role": "assistant", "content": f"⏱️ {latency:.2f}s · 🔤 {cb.total_tokens}"})
+        st.session_state.chat.append({"role": "assistant", "content": caption})
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
+    render_usage(st.session_state.ledger)
\ No newline at end of file
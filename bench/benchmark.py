@@ -0,0 +1,272 @@
+"""Offline-Benchmark: Monolith vs. Routing-Graph vs. Single-Agent.
+
+Alle drei Architekturen laufen dieselben Aufgaben (``bench.scenarios.TASKS``)
+gegen ``FakeChatOpenAI``; der Routing-Graph zusätzlich im spekulativen und im
+Single-Call-Modus, mit kleinerem Router-Modell (``tiered``, ``ModelRegistry``) sowie
+mit Überarbeitungen per Edit-Skript (``edits``, ``pipelines.revision``).
+Gemessen werden Wall-Time, LLM-Round-Trips, Prompt-/Completion-Tokens, Kosten
+(Preise aus ``pipelines.ledger``) und Orchestrierungs-Overhead (Wall-Time abzüglich
+der Zeit, in der mindestens ein Modellaufruf lief).
+
+Aufruf:
+    python -m bench.benchmark --out bench/results.json
+    python -m bench.benchmark --compare bench/baseline.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Any, Callable, Optional
+
+from langchain_core.messages import HumanMessage
+
+from pipelines import monolith
+from pipelines import graph_agent, graph_routing
+from pipelines.cache import ResponseCache
+from pipelines.ledger import token_cost
+from pipelines.models import ModelRegistry
+from pipelines.revision import EditPolicy
+from pipelines.summarize import CHUNK_MEMO
+
+from .fake_llm import NANO_PROFILE, CallRecord, FakeChatOpenAI
+from .scenarios import TASKS, Task
+
+ARCHITECTURES = ("monolith", "routing", "speculative", "single-call", "tiered", "edits", "agent")
+
+# Deterministische Metriken müssen exakt übereinstimmen, Zeiten nur innerhalb der Toleranz.
+EXACT_METRICS = ("llm_calls", "prompt_tokens", "completion_tokens")
+TIMED_METRICS = ("latency_s",)
+
+
+def _union(intervals: list[tuple[float, float]]) -> float:
+    """Länge der Vereinigung von Intervallen (parallele Aufrufe zählen einmal)."""
+    total, cur_start, cur_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if cur_end is None or start > cur_end:
+            if cur_end is not None:
+                total += cur_end - cur_start
+            cur_start, cur_end = start, end
+        else:
+            cur_end = max(cur_end, end)
+    if cur_end is not None:
+        total += cur_end - cur_start
+    return total
+
+
+def _busy_time(calls: list[CallRecord]) -> float:
+    """Gemessene Zeit, in der mindestens ein Modellaufruf lief."""
+    return _union([(c.start, c.end) for c in calls])
+
+
+def _model_time(calls: list[CallRecord], time_scale: float) -> float:
+    """Simulierte Modellzeit auf dem kritischen Pfad, unskaliert.
+
+    Nutzt die nominelle statt der gemessenen Schlafdauer, damit Scheduler-Jitter
+    nicht mit ``1 / time_scale`` verstärkt wird.
+    """
+    if time_scale <= 0:
+        return sum(c.latency for c in calls)
+    return _union([(c.start, c.start + c.latency * time_scale) for c in calls]) / time_scale
+
+
+def _cost(calls: list[CallRecord]) -> float:
+    return sum(token_cost(c.model.removeprefix("fake-"), c.prompt_tokens, c.completion_tokens) for c in calls)
+
+
+# -------------------- Runner je Architektur
+def run_monolith(llm: FakeChatOpenAI, task: Task) -> Optional[str]:
+    if task.monolith is None:
+        return None
+    fn = getattr(monolith, task.monolith)
+    if task.monolith == "summarize_text":
+        return fn(llm, task.mail)
+    if task.monolith == "write_reply_mail":
+        return fn(llm, task.mail, task.extra)
+    if task.monolith == "write_new_mail":
+        return fn(llm, task.prompt)
+    if task.monolith == "revise_mail":
+        return fn(llm, task.draft, task.prompt)
+    raise ValueError(task.monolith)
+
+
+def _graph_state(task: Task) -> dict:
+    return {
+        "messages": [*task.history, HumanMessage(content=task.prompt)],
+        "uploaded_mail": task.mail,
+        "draft": task.draft,
+    }
+
+
+def _graph_runner(app: Any, speculation: Optional[graph_routing.SpeculationPolicy] = None) -> Callable[[Task], str]:
+    def run(task: Task) -> str:
+        out = app.invoke(_graph_state(task))
+        if speculation is not None:
+            speculation.drain()  # verworfene Aufrufe gehören noch zu diesem Task
+        return out["messages"][-1].content
+
+    return run
+
+
+def make_runner(arch: str, llm: FakeChatOpenAI) -> Callable[[Task], Optional[str]]:
+    """Baut die Architektur einmal (außerhalb der Messung) und liefert einen Task-Runner."""
+    if arch == "monolith":
+        return lambda task: run_monolith(llm, task)
+    if arch == "routing":
+        return _graph_runner(graph_routing.build_app(llm))
+    if arch == "speculative":
+        speculation = graph_routing.SpeculationPolicy()
+        return _graph_runner(graph_routing.build_app(llm, speculation=speculation), speculation)
+    if arch == "single-call":
+        return _graph_runner(graph_routing.build_app(llm, single_call=True))
+    if arch == "tiered":
+        models = ModelRegistry({"router": llm.tier("fake-gpt-4.1-nano", NANO_PROFILE)}, llm)
+        return _graph_runner(graph_routing.build_app(models))
+    if arch == "edits":
+        return _graph_runner(graph_routing.build_app(llm, edits=EditPolicy()))
+    if arch == "agent":
+        return _graph_runner(graph_agent.build_app(llm))
+    raise ValueError(arch)
+
+
+# -------------------- Messung
+def measure(
+    arch: str,
+    runner: Callable[[Task], Optional[str]],
+    task: Task,
+    llm: FakeChatOpenAI,
+    repeat: int,
+    cold: bool = True,
+) -> Optional[dict]:
+    """``cold``: Teilzusammenfassungen vor jedem Lauf verwerfen (sonst zählen Wiederholungen als Treffer)."""
+    runs = []
+    for _ in range(repeat):
+        if cold:
+            CHUNK_MEMO.clear()
+        llm.stats.reset()
+        t0 = time.perf_counter()
+        out = runner(task)
+        wall = time.perf_counter() - t0
+        if out is None:
+            return None
+        calls = llm.stats.snapshot()
+        busy = _busy_time(calls)
+        overhead = max(0.0, wall - busy)
+        runs.append(
+            {
+                "wall_s": wall,
+                "overhead_s": overhead,
+                # Hochgerechnete Latenz bei time_scale=1: Modellzeit unskaliert + Overhead
+                "latency_s": _model_time(calls, llm.time_scale) + overhead,
+                "llm_calls": len(calls),
+                "prompt_tokens": sum(c.prompt_tokens for c in calls),
+                "completion_tokens": sum(c.completion_tokens for c in calls),
+                "cost_usd": _cost(calls),
+            }
+        )
+
+    result: dict[str, Any] = {"arch": arch, "task": task.name}
+    for key in runs[0]:
+        vals = [r[key] for r in runs]
+        digits = 8 if key == "cost_usd" else 4
+        result[key] = round(statistics.median(vals), digits) if isinstance(vals[0], float) else vals[0]
+    result["total_tokens"] = result["prompt_tokens"] + result["completion_tokens"]
+    return result
+
+
+def run_suite(
+    archs: tuple[str, ...] = ARCHITECTURES,
+    repeat: int = 3,
+    time_scale: float = 0.05,
+    seed: int = 0,
+    cache: Optional[ResponseCache] = None,
+) -> dict:
+    llm = FakeChatOpenAI(time_scale=time_scale, seed=seed, cache=cache or False)
+    results = []
+    for arch in archs:
+        runner = make_runner(arch, llm)
+        for task in TASKS:
+            r = measure(arch, runner, task, llm, repeat, cold=cache is None)
+            if r is not None:
+                results.append(r)
+    return {
+        "meta": {
+            "repeat": repeat,
+            "time_scale": time_scale,
+            "seed": seed,
+            "model": llm.model_name,
+            "cache": cache.stats.snapshot() if cache else None,
+        },
+        "results": results,
+    }
+
+
+# -------------------- Ausgabe / Vergleich
+def format_table(report: dict) -> str:
+    header = (
+        f"{'arch':<11} {'task':<8} {'latency':>8} {'overhead':>9} {'calls':>5} "
+        f"{'prompt':>7} {'compl.':>7} {'total':>7} {'µUSD':>7}"
+    )
+    lines = [header, "-" * len(header)]
+    for r in report["results"]:
+        lines.append(
+            f"{r['arch']:<11} {r['task']:<8} {r['latency_s']:>7.2f}s {r['overhead_s'] * 1000:>7.1f}ms "
+            f"{r['llm_calls']:>5} {r['prompt_tokens']:>7} {r['completion_tokens']:>7} {r['total_tokens']:>7} "
+            f"{r['cost_usd'] * 1e6:>7.1f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.25) -> list[str]:
+    """Liefert eine Liste von Regressionen gegenüber der Baseline (leer = ok)."""
+    base = {(r["arch"], r["task"]): r for r in baseline["results"]}
+    problems = []
+    for r in report["results"]:
+        b = base.get((r["arch"], r["task"]))
+        if b is None:
+            continue
+        for key in EXACT_METRICS:
+            if r[key] > b[key]:
+                problems.append(f"{r['arch']}/{r['task']}: {key} {b[key]} -> {r[key]}")
+        for key in TIMED_METRICS:
+            if r[key] > b[key] * (1 + tolerance):
+                problems.append(f"{r['arch']}/{r['task']}: {key} {b[key]:.2f} -> {r[key]:.2f}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--arch", action="append", choices=ARCHITECTURES, help="nur diese Architektur(en)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Faktor für tatsächlich geschlafene Latenz")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="Antwort-Cache aktivieren (Wiederholungen = Treffer)")
+    parser.add_argument("--out", help="Ergebnis als JSON schreiben")
+    parser.add_argument("--compare", help="Baseline-JSON, gegen die verglichen wird")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="erlaubte relative Latenzabweichung")
+    args = parser.parse_args(argv)
+
+    cache = ResponseCache() if args.cache else None
+    report = run_suite(tuple(args.arch or ARCHITECTURES), args.repeat, args.time_scale, args.seed, cache)
+    print(format_table(report))
+    if cache is not None:
+        print(f"cache: {cache.stats.snapshot()}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for p in problems:
+            print(f"REGRESSION {p}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Prüft den Batchlauf (``pipelines.bulk``, ``pipelines.mailsource``) offline mit dem Fake-Modell.
+
+- source:  mbox, ``.eml`` und Verzeichnisse werden gelesen; HTML wird Text, Mails ohne Message-ID
+           bekommen eine stabile Ersatz-ID,
+- run:     jede Mail wird eine JSONL-Zeile mit Ergebnissen, Tokens und ``usage`` je Operation; Duplikate
+           im Export laufen einmal; nie mehr als ``concurrency`` Mails gleichzeitig, und die Quelle wird
+           erst bei Bedarf weitergelesen,
+- resume:  ein zweiter Lauf auf dieselbe Ausgabe überspringt erfolgreiche Mails, wiederholt fehlgeschlagene
+           und kommt mit einer beim Absturz halb geschriebenen letzten Zeile zurecht.
+
+Aufruf:
+    python -m bench.check_bulk
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import mailbox
+import os
+import sys
+import tempfile
+from email.message import EmailMessage
+from typing import Iterator, Optional
+
+from pipelines.bulk import load_done, monolith_processor, run_bulk
+from pipelines.ledger import Ledger
+from pipelines.mailsource import MailItem, iter_mails
+
+from .fake_llm import FakeChatOpenAI
+from .scenarios import MAIL
+
+MAILS = 12
+
+
+def message(i: int, html: bool = False, message_id: bool = True) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = f"Abstimmungstermin {i}"
+    msg["From"] = f"absender{i}@example.com"
+    if message_id:
+        msg["Message-ID"] = f"<mail-{i}@example.com>"
+    body = MAIL.replace("Dienstag", f"Dienstag (Termin {i})")
+    msg.set_content(body)
+    if html:
+        paragraphs = "".join(f"<p>{p}</p>" for p in body.split("\n\n"))
+        msg.add_alternative(f"<html><body>{paragraphs}</body></html>", subtype="html")
+    return msg
+
+
+def write_export(tmp: str) -> list[str]:
+    """mbox mit ``MAILS`` Mails (eine als Duplikat, eine ohne Message-ID) plus ein Verzeichnis mit ``.eml``."""
+    path = os.path.join(tmp, "export.mbox")
+    box = mailbox.mbox(path)
+    for i in range(MAILS - 2):
+        box.add(message(i, html=i % 3 == 0))
+    box.add(message(0))  # Duplikat
+    box.add(message(MAILS - 2, message_id=False))
+    box.close()
+    eml_dir = os.path.join(tmp, "eml")
+    os.makedirs(eml_dir)
+    html_only = EmailMessage()
+    html_only["Subject"], html_only["Message-ID"] = "Nur HTML", "<html-only@example.com>"
+    html_only.set_content("<p>Hallo Ben,</p><p>passt <b>Dienstag</b>?</p>", subtype="html")
+    with open(os.path.join(eml_dir, "html.eml"), "wb") as f:
+        f.write(bytes(html_only))
+    return [path, eml_dir]
+
+
+def check_source(paths: list[str]) -> list[str]:
+    problems: list[str] = []
+    items = list(iter_mails(paths))
+    ids = [item.message_id for item in items]
+    if len(items) != MAILS + 1 or len(set(ids)) != MAILS:
+        problems.append(f"source: {len(items)} Mails, {len(set(ids))} verschiedene IDs")
+    fallback = [i for i in ids if i.startswith("sha1:")]
+    again = [item.message_id for item in iter_mails(paths) if item.message_id.startswith("sha1:")]
+    if len(fallback) != 1 or fallback != again:
+        problems.append(f"source: Ersatz-ID fehlt oder ist nicht stabil ({fallback})")
+    html = next((item for item in items if item.subject == "Nur HTML"), None)
+    if html is None or "<p>" in html.text or "passt Dienstag?" not in html.text:
+        problems.append(f"source: HTML nicht als Text gelesen ({html.text if html else None!r})")
+    print(f"source   {len(items)} Mails, {len(set(ids))} IDs: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def counted(items: Iterator[MailItem], consumed: list[int]) -> Iterator[MailItem]:
+    for item in items:
+        consumed[0] += 1
+        yield item
+
+
+def check_run(paths: list[str], tmp: str, concurrency: int = 3) -> list[str]:
+    problems: list[str] = []
+    out = os.path.join(tmp, "run.jsonl")
+    llm = FakeChatOpenAI(time_scale=0.02)
+    summarize = monolith_processor(llm, ("summary", "reply"))
+    consumed, active, peak, lead = [0], [0], [0], [0]
+    finished = [0]
+
+    async def process(item: MailItem) -> dict:
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        lead[0] = max(lead[0], consumed[0] - finished[0])
+        try:
+            return await summarize(item)
+        finally:
+            active[0] -= 1
+            finished[0] += 1
+
+    ledger = Ledger()
+    stats = asyncio.run(
+        run_bulk(
+            process,
+            counted(iter_mails(paths), consumed),
+            out,
+            concurrency,
+            progress_every=0,
+            on_progress=lambda line: None,
+            ledger=ledger,
+        )
+    )
+    with open(out, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    if len(records) != MAILS or stats.mails != MAILS or stats.skipped != 1:
+        problems.append(f"run: {len(records)} Zeilen, {stats.mails} Mails, {stats.skipped} übersprungen")
+    incomplete = [r["message_id"] for r in records if r["error"] or set(r["results"]) != {"summary", "reply"}]
+    if incomplete:
+        problems.append(f"run: Ergebnisse fehlen für {incomplete[:3]}")
+    if any(r["tokens"] <= 0 or set(r["usage"]) != {"op:summary", "op:reply"} for r in records):
+        problems.append(f"run: Tokens/usage je Mail fehlen ({records[0]['tokens']}, {records[0]['usage']})")
+    if sum(r["tokens"] for r in records) != ledger.totals()["total_tokens"]:
+        problems.append("run: Summe der Tokens je Mail passt nicht zum Ledger")
+    # Übersprungene Duplikate sind gelesen, laufen aber nie; darüber hinaus liest die Quelle nicht vor.
+    if peak[0] > concurrency or lead[0] > concurrency + stats.skipped:
+        problems.append(f"run: {peak[0]} Mails gleichzeitig, Quelle {lead[0]} Mails voraus (concurrency={concurrency})")
+    print(f"run      {len(records)} Zeilen, höchstens {peak[0]} gleichzeitig: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_resume(paths: list[str], tmp: str) -> list[str]:
+    problems: list[str] = []
+    out = os.path.join(tmp, "resume.jsonl")
+    failing = {"<mail-2@example.com>", "<mail-5@example.com>"}
+    calls: list[str] = []
+
+    async def flaky(item: MailItem) -> dict:
+        calls.append(item.message_id)
+        if item.message_id in failing:
+            raise RuntimeError("Modell nicht erreichbar")
+        return {"summary": f"Kurzfassung {item.subject}"}
+
+    def run() -> None:
+        quiet = dict(progress_every=0, on_progress=lambda line: None, ledger=Ledger())
+        asyncio.run(run_bulk(flaky, iter_mails(paths), out, concurrency=4, **quiet))
+
+    run()
+    first = len(calls)
+    if first != MAILS or len(load_done(out)) != MAILS - len(failing):
+        problems.append(f"resume: erster Lauf {first} Aufrufe, {len(load_done(out))} erledigt")
+    with open(out, "a", encoding="utf-8") as f:
+        f.write('{"message_id": "<abgebrochen@example.com>", "resu')  # Absturz mitten in der Zeile
+
+    failing.clear()
+    run()
+    retried = sorted(calls[first:])
+    if retried != ["<mail-2@example.com>", "<mail-5@example.com>"]:
+        problems.append(f"resume: zweiter Lauf verarbeitet {retried}")
+    broken = []
+    with open(out, encoding="utf-8") as f:
+        for line in f:
+            try:
+                json.loads(line)
+            except ValueError:
+                broken.append(line)
+    if len(broken) != 1 or len(load_done(out)) != MAILS:  # nur die abgebrochene Zeile selbst
+        problems.append(f"resume: {len(load_done(out))} erledigt, kaputte Zeilen {broken}")
+
+    calls.clear()
+    run()
+    if calls:
+        problems.append(f"resume: dritter Lauf verarbeitet {len(calls)} Mails erneut")
+    print(f"resume   {first} + {len(retried)} Aufrufe, dritter Lauf {len(calls)}: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--concurrency", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_export(tmp)
+        problems = check_source(paths) + check_run(paths, tmp, args.concurrency) + check_resume(paths, tmp)
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
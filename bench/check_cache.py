@@ -0,0 +1,163 @@
+"""Prüft den Antwort-Cache (``pipelines.cache``) offline mit dem Fake-Modell.
+
+- key:    derselbe Prompt trifft denselben Eintrag, auch mit anderen Message-IDs; anderer Prompt oder
+          andere Modellparameter (Temperatur) ergeben einen neuen Schlüssel; Treffer melden 0 Tokens,
+- stream: ``('stream', True)`` im ``llm_string`` ändert den Schlüssel nicht (am Anfang, in der Mitte,
+          am Ende); ein gestreamter Aufruf (``on_token``) trifft die nicht gestreamte Antwort,
+- lru:    über ``max_entries`` fällt der am längsten ungenutzte Eintrag heraus,
+- sqlite: zwei Caches auf derselben Datei (zwei Worker) teilen sich die Einträge; TTL und
+          ``disk_max_entries`` verdrängen alte Einträge, ``clear`` leert beide Stufen.
+
+Aufruf:
+    python -m bench.check_cache
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from pipelines.cache import ResponseCache, cache_key
+from pipelines.monolith import summarize_text
+from pipelines.prompts import SYSTEM_SUMMARIZER
+
+from .fake_llm import FakeChatOpenAI
+from .scenarios import MAIL
+
+
+def prompt(text: str, ids: bool = False) -> list:
+    return [
+        SystemMessage(content=SYSTEM_SUMMARIZER, id="sys-1" if ids else None),
+        HumanMessage(content=f"ORIGINALMAIL:\n{text}", id="msg-1" if ids else None),
+    ]
+
+
+def check_key() -> list[str]:
+    problems: list[str] = []
+    cache = ResponseCache()
+    llm = FakeChatOpenAI(time_scale=0.0, cache=cache)
+    first = llm.invoke(prompt(MAIL))
+    again = llm.invoke(prompt(MAIL, ids=True))
+    if len(llm.stats.snapshot()) != 1 or again.content != first.content:
+        problems.append(f"key: Wiederholung mit anderen IDs ruft das Modell ({len(llm.stats.snapshot())} Aufrufe)")
+    if (again.usage_metadata or {}).get("total_tokens"):
+        problems.append(f"key: Treffer meldet Tokens ({again.usage_metadata})")
+
+    llm.invoke(prompt(MAIL + "\nPS: Danke!"))
+    llm.invoke(prompt(MAIL), temperature=0.7)  # Aufrufparameter landen im ``llm_string``
+    stats = cache.stats.snapshot()
+    if (stats["hits"], stats["misses"], stats["writes"]) != (1, 3, 3):
+        problems.append(f"key: anderer Prompt/Temperatur ohne eigenen Eintrag ({stats})")
+    print(f"key      {stats['hits']} Treffer, {stats['misses']} Fehlschläge: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_stream() -> list[str]:
+    problems: list[str] = []
+    llm = FakeChatOpenAI(time_scale=0.0)
+    plain = llm._get_llm_string()
+    variants = {
+        "allein": llm._get_llm_string(stream=True),
+        "Mitte": llm._get_llm_string(stream=True, temperature=0.5),
+        "Ende": llm._get_llm_string(max_tokens=10, stream=True),
+    }
+    expected = {
+        "allein": plain,
+        "Mitte": llm._get_llm_string(temperature=0.5),
+        "Ende": llm._get_llm_string(max_tokens=10),
+    }
+    for name, llm_string in variants.items():
+        if cache_key("p", llm_string) != cache_key("p", expected[name]):
+            problems.append(f"stream: Schlüssel ändert sich mit stream=True ({name}: {llm_string})")
+    if cache_key("p", llm._get_llm_string(stream_usage=True)) == cache_key("p", plain):
+        problems.append("stream: andere Parameter mit „stream“ im Namen werden ignoriert")
+
+    cache = ResponseCache()
+    llm = FakeChatOpenAI(time_scale=0.0, cache=cache)
+    text = summarize_text(llm, MAIL)
+    streamed = summarize_text(llm, MAIL, on_token=lambda token: None)
+    if streamed != text or len(llm.stats.snapshot()) != 1 or cache.stats.snapshot()["hits"] != 1:
+        problems.append(f"stream: gestreamter Aufruf verfehlt den Cache ({len(llm.stats.snapshot())} Aufrufe)")
+    print(f"stream   {len(variants)} Positionen + on_token: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_lru() -> list[str]:
+    problems: list[str] = []
+    cache = ResponseCache(max_entries=2)
+    llm = FakeChatOpenAI(time_scale=0.0, cache=cache)
+    for text in ("A", "B", "A", "C"):  # A wird vor C wieder benutzt, also fällt B heraus
+        llm.invoke(prompt(text))
+    before = len(llm.stats.snapshot())
+    llm.invoke(prompt("A"))
+    llm.invoke(prompt("B"))
+    calls = len(llm.stats.snapshot()) - before
+    if cache.stats.snapshot()["evictions"] < 1 or calls != 1:
+        problems.append(f"lru: falscher Eintrag verdrängt ({calls} neue Aufrufe für A und B)")
+    evicted = cache.stats.snapshot()["evictions"]
+    print(f"lru      max_entries=2, {evicted} verdrängt: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_sqlite(tmp: str) -> list[str]:
+    problems: list[str] = []
+    path = os.path.join(tmp, "cache.sqlite")
+    worker_a, worker_b = ResponseCache(path=path), ResponseCache(path=path)
+    llm_a = FakeChatOpenAI(time_scale=0.0, cache=worker_a)
+    llm_b = FakeChatOpenAI(time_scale=0.0, cache=worker_b)
+    text = llm_a.invoke(prompt(MAIL)).content
+    shared = llm_b.invoke(prompt(MAIL)).content
+    llm_b.invoke(prompt(MAIL))
+    stats = worker_b.stats.snapshot()
+    if shared != text or len(llm_b.stats.snapshot()) or (stats["disk_hits"], stats["memory_hits"]) != (1, 1):
+        problems.append(f"sqlite: zweiter Worker ohne Plattentreffer ({stats})")
+
+    worker_b.clear()
+    after = FakeChatOpenAI(time_scale=0.0, cache=ResponseCache(path=path))
+    after.invoke(prompt(MAIL))
+    if len(after.stats.snapshot()) != 1:
+        problems.append("sqlite: clear lässt Einträge auf der Platte stehen")
+
+    small_path = os.path.join(tmp, "small.sqlite")
+    llm = FakeChatOpenAI(time_scale=0.0, cache=ResponseCache(max_entries=1, path=small_path, disk_max_entries=2))
+    for text in ("A", "B", "C"):
+        llm.invoke(prompt(text))
+        time.sleep(0.01)  # eindeutige Zugriffszeiten
+    kept = []
+    for text in ("A", "B", "C"):
+        fresh = ResponseCache(path=small_path)
+        FakeChatOpenAI(time_scale=0.0, cache=fresh).invoke(prompt(text))
+        if fresh.stats.snapshot()["disk_hits"]:
+            kept.append(text)
+    if kept != ["B", "C"]:
+        problems.append(f"sqlite: disk_max_entries=2 behält {kept}")
+
+    expiring = ResponseCache(ttl=0.05, path=os.path.join(tmp, "ttl.sqlite"))
+    llm = FakeChatOpenAI(time_scale=0.0, cache=expiring)
+    llm.invoke(prompt(MAIL))
+    time.sleep(0.1)
+    llm.invoke(prompt(MAIL))
+    if len(llm.stats.snapshot()) != 2 or expiring.stats.snapshot()["hits"]:
+        problems.append(f"sqlite: abgelaufener Eintrag getroffen ({expiring.stats.snapshot()})")
+    print(f"sqlite   2 Worker, TTL, disk_max_entries=2: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        problems = check_key() + check_stream() + check_lru() + check_sqlite(tmp)
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Prüft die Map-Reduce-Zusammenfassung (``pipelines.summarize``) offline mit dem Fake-Modell.
+
+- split:       Abschnitte bleiben unter ``chunk_tokens``, verlieren und vertauschen keine Zeile und
+               beginnen bevorzugt an Mailgrenzen; überlange Absätze und Zeilen werden hart geteilt,
+- threshold:   erst oberhalb von ``threshold_tokens`` (und nur mit ``enabled``) wird zerlegt; die
+               Monolith-Zusammenfassung nimmt dann den Map-Reduce-Weg,
+- map-reduce:  ein Aufruf je Abschnitt, Reduce in Gruppen von ``fan_in`` bis zur finalen Stufe; sync und
+               async liefern dasselbe, alle Aufrufe stehen im Ledger unter ``op:summary``,
+- incremental: ein unveränderter Text ruft nur die finale Stufe erneut, eine Änderung am Ende nur die
+               hinteren Abschnitte.
+
+Aufruf:
+    python -m bench.check_chunking
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import sys
+from typing import Any, Optional
+
+from pipelines.history import estimate_tokens
+from pipelines.ledger import Ledger, track
+from pipelines.monolith import summarize_text
+from pipelines.summarize import (
+    CHUNK_MEMO,
+    ChunkPolicy,
+    asummarize_chunked,
+    needs_chunking,
+    split_blocks,
+    split_chunks,
+    summarize_chunked,
+)
+
+from .fake_llm import FakeChatOpenAI
+from .scenarios import LONG_THREAD, MAIL
+
+POLICY = ChunkPolicy(chunk_tokens=300, fan_in=3)
+
+
+def lines(text: str) -> list[str]:
+    return [line for line in text.split("\n") if line.strip()]
+
+
+def role_counts(llm: FakeChatOpenAI, before: int = 0) -> dict[str, int]:
+    counts: dict[str, int] = {}
+    for call in llm.stats.snapshot()[before:]:
+        counts[call.role] = counts.get(call.role, 0) + 1
+    return counts
+
+
+def check_split() -> list[str]:
+    problems: list[str] = []
+    chunks = split_chunks(LONG_THREAD, POLICY.chunk_tokens)
+    too_big = [estimate_tokens(c) for c in chunks if estimate_tokens(c) > POLICY.chunk_tokens]
+    if too_big:
+        problems.append(f"split: Abschnitte über {POLICY.chunk_tokens} Tokens ({too_big})")
+    if [line for c in chunks for line in lines(c)] != lines(LONG_THREAD):
+        problems.append("split: Zeilen verloren oder vertauscht")
+    mails = sum(new_mail for new_mail, _ in split_blocks(LONG_THREAD))
+    at_boundary = sum(c.startswith("-----Ursprüngliche Nachricht-----") for c in chunks)
+    if at_boundary < min(mails, len(chunks) - 1) // 2:
+        problems.append(f"split: nur {at_boundary}/{len(chunks)} Abschnitte beginnen an einer Mailgrenze")
+
+    paragraph = " ".join(f"Wort{i}" for i in range(2000))  # ein Absatz, eine Zeile
+    pieces = split_chunks(paragraph, 200)
+    if len(pieces) < 2 or "".join(pieces) != paragraph or max(estimate_tokens(p) for p in pieces) > 200:
+        problems.append(f"split: überlange Zeile nicht hart geteilt ({[estimate_tokens(p) for p in pieces]})")
+    print(f"split       {len(chunks)} Abschnitte, {at_boundary} an Mailgrenzen: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_threshold() -> list[str]:
+    problems: list[str] = []
+    if needs_chunking(MAIL) or not needs_chunking(LONG_THREAD):
+        problems.append("threshold: Schwelle falsch angewendet")
+    if needs_chunking(LONG_THREAD, ChunkPolicy(enabled=False)):
+        problems.append("threshold: enabled=False zerlegt trotzdem")
+    if needs_chunking(LONG_THREAD, ChunkPolicy(threshold_tokens=estimate_tokens(LONG_THREAD))):
+        problems.append("threshold: Text genau an der Schwelle wird zerlegt")
+
+    llm = FakeChatOpenAI(time_scale=0.0)
+    summarize_text(llm, MAIL)
+    short = role_counts(llm)
+    CHUNK_MEMO.clear()
+    summarize_text(llm, LONG_THREAD)
+    long = role_counts(llm, sum(short.values()))
+    if short != {"summary": 1} or not long.get("summary_chunk") or "summary" in long:
+        problems.append(f"threshold: Monolith kurz {short}, lang {long}")
+    print(f"threshold   kurz {short} · lang {long}: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def expected_reduce_calls(chunks: int, fan_in: int) -> int:
+    calls, n = 1, chunks  # finale Stufe
+    while n > fan_in:
+        n = math.ceil(n / fan_in)
+        calls += n
+    return calls
+
+
+def check_map_reduce() -> list[str]:
+    problems: list[str] = []
+    chunks = len(split_chunks(LONG_THREAD, POLICY.chunk_tokens))
+    CHUNK_MEMO.clear()
+    llm = FakeChatOpenAI(time_scale=0.0)
+    ledger = Ledger()
+    with track(ledger):
+        sync = summarize_chunked(llm, LONG_THREAD, POLICY)
+    counts = role_counts(llm)
+    expected = {"summary_chunk": chunks, "summary_reduce": expected_reduce_calls(chunks, POLICY.fan_in)}
+    if counts != expected:
+        problems.append(f"map-reduce: Aufrufe {counts}, erwartet {expected}")
+    labels = {row["label"]: row["calls"] for row in ledger.summary()}
+    if labels != {"op:summary": sum(expected.values())}:
+        problems.append(f"map-reduce: Ledger {labels}")
+
+    CHUNK_MEMO.clear()
+    async_result = asyncio.run(asummarize_chunked(FakeChatOpenAI(time_scale=0.0), LONG_THREAD, POLICY))
+    if not sync or async_result != sync:
+        problems.append("map-reduce: sync und async liefern Verschiedenes")
+    print(f"map-reduce  {chunks} Abschnitte, fan_in={POLICY.fan_in} → {counts}: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_incremental() -> list[str]:
+    problems: list[str] = []
+    CHUNK_MEMO.clear()
+    llm = FakeChatOpenAI(time_scale=0.0)
+    summarize_chunked(llm, LONG_THREAD, POLICY)
+
+    def rerun(text: str) -> dict[str, Any]:
+        before = len(llm.stats.snapshot())
+        summarize_chunked(llm, text, POLICY)
+        return role_counts(llm, before)
+
+    same = rerun(LONG_THREAD)
+    if same != {"summary_reduce": 1}:
+        problems.append(f"incremental: unveränderter Text ruft {same}")
+    edited = LONG_THREAD + "\n\nNachtrag: Raum B2 ist belegt, wir weichen auf B3 aus."
+    changed = rerun(edited)
+    if not 1 <= changed.get("summary_chunk", 0) <= 2:
+        problems.append(f"incremental: Änderung am Ende ruft {changed}")
+    print(f"incremental gleich {same} · Nachtrag {changed}: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    problems = check_split() + check_threshold() + check_map_reduce() + check_incremental()
+    CHUNK_MEMO.clear()
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Prüft das Token-Budget für den Chatverlauf (``pipelines.history``) offline.
+
+- drafts:  nur der jüngste Entwurf bleibt wörtlich – deutsche („Betreff:“), englische („Subject:“)
+           und markierte Entwürfe (``draft_message``) werden erkannt, andere Nachrichten nicht,
+- summary: ältere Turns landen unter ``SUMMARY_HEADER`` als eine Zeile je Turn, Entwürfe darin als
+           „[Entwurf erstellt]“; fallen Zeilen weg, steht „- …“ davor,
+- budget:  der kompaktierte Verlauf bleibt unter ``max_tokens`` und wächst nicht mit der
+           Sitzungslänge; der aktuelle Turn bleibt vollständig, Tool-Calls und ToolMessages
+           werden nie getrennt; ``enabled=False`` ändert nichts.
+
+Aufruf:
+    python -m bench.check_history
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Optional
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage, ToolMessage
+
+from pipelines.history import (
+    DRAFT_PLACEHOLDER,
+    SUMMARY_HEADER,
+    HistoryPolicy,
+    compact_history,
+    draft_message,
+    drop_superseded_drafts,
+    message_tokens,
+)
+
+from .scenarios import DRAFT
+
+ENGLISH_DRAFT = "Subject: Re: Project status meeting\nDear Ms Keller,\n\nTuesday at 10:00 works for me.\n\nBest regards"
+
+
+def session(rounds: int) -> list[AnyMessage]:
+    """Überarbeitungs-Sitzung mit wechselnden Entwurfsformen und einem Tool-Aufruf je Runde."""
+    drafts = (
+        lambda i: AIMessage(content=f"Entwurf (Antwort):\n\n{DRAFT}\n(Variante {i})"),
+        lambda i: AIMessage(content=f"{ENGLISH_DRAFT}\n(Variante {i})"),
+        lambda i: draft_message(f"Hier ist die Überarbeitung (Variante {i}):\n\n{DRAFT}"),
+    )
+    msgs: list[AnyMessage] = []
+    for i in range(rounds):
+        call = {"name": "summary", "args": {"mail": "$MAIL"}, "id": f"call-{i}"}
+        msgs += [
+            HumanMessage(content=f"Bitte überarbeiten: Variante {i}, etwas förmlicher."),
+            AIMessage(content="", tool_calls=[call]),
+            ToolMessage(content=f"Kurzfassung {i}: Termin Dienstag 10:00.", name="summary", tool_call_id=f"call-{i}"),
+            drafts[i % len(drafts)](i),
+        ]
+    return msgs
+
+
+def check_drafts() -> list[str]:
+    problems: list[str] = []
+    msgs = session(6)
+    before = [m.content for m in msgs]
+    out = drop_superseded_drafts(msgs)
+    drafts = list(range(3, len(msgs), 4))
+    dropped = [i for i, m in enumerate(out) if m.content == DRAFT_PLACEHOLDER]
+    if dropped != drafts[:-1]:
+        problems.append(f"drafts: ersetzt {dropped}, erwartet {drafts[:-1]}")
+    if out[drafts[-1]].content != msgs[drafts[-1]].content:
+        problems.append("drafts: jüngster Entwurf verändert")
+    if [m.content for m in msgs] != before:
+        problems.append("drafts: Eingabe verändert")
+    kinds = {"Entwurf (Antwort)": 0, "Subject:": 0, "draft_message": 0}
+    for i in dropped:
+        if msgs[i].additional_kwargs:
+            kinds["draft_message"] += 1
+        else:
+            kinds["Subject:" if msgs[i].content.startswith("Subject:") else "Entwurf (Antwort)"] += 1
+    if not all(kinds.values()):
+        problems.append(f"drafts: nicht alle Formen erkannt ({kinds})")
+    print(f"drafts   {len(dropped)}/{len(drafts)} ersetzt {kinds}: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_summary() -> list[str]:
+    problems: list[str] = []
+    policy = HistoryPolicy(max_tokens=100_000, keep_turns=2)
+    out = compact_history(session(5), policy)
+    head = out[0]
+    lines = head.content.split("\n")[1:] if isinstance(head, SystemMessage) else []
+    if not isinstance(head, SystemMessage) or not head.content.startswith(SUMMARY_HEADER):
+        problems.append("summary: keine Kurzfassung vor den letzten Turns")
+    elif len(lines) != 3 or not all(line.startswith("- Nutzer: ") for line in lines):
+        problems.append(f"summary: {len(lines)} Zeilen für 3 ältere Turns: {lines}")
+    elif not all(line.endswith("[Entwurf erstellt]") for line in lines):
+        problems.append(f"summary: Entwürfe nicht als „[Entwurf erstellt]“: {lines}")
+
+    tight = compact_history(session(40), HistoryPolicy(max_tokens=600, keep_turns=2))
+    tight_lines = tight[0].content.split("\n")[1:] if isinstance(tight[0], SystemMessage) else []
+    if not tight_lines or tight_lines[0] != "- …" or len(tight_lines) > 40:
+        problems.append(f"summary: gekürzte Kurzfassung ohne „- …“ ({tight_lines[:2]})")
+    print(f"summary  {len(lines)} Zeilen, knapp {len(tight_lines)} Zeilen: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_budget(max_tokens: int = 1500) -> list[str]:
+    problems: list[str] = []
+    policy = HistoryPolicy(max_tokens=max_tokens)
+    sizes = {}
+    for rounds in (4, 16, 64, 256):
+        msgs = session(rounds)
+        out = compact_history(msgs, policy)
+        size = sum(message_tokens(m) for m in out)
+        sizes[rounds] = size
+        if size > max_tokens:
+            problems.append(f"budget: {rounds} Runden → {size} > {max_tokens} Tokens")
+        if out[-4:] != drop_superseded_drafts(msgs)[-4:]:
+            problems.append(f"budget: {rounds} Runden – aktueller Turn nicht vollständig")
+        calls = {tc["id"] for m in out if isinstance(m, AIMessage) for tc in m.tool_calls}
+        orphans = [m.tool_call_id for m in out if isinstance(m, ToolMessage) and m.tool_call_id not in calls]
+        if orphans:
+            problems.append(f"budget: {rounds} Runden – ToolMessages ohne Tool-Call {orphans[:3]}")
+    if sizes[256] > sizes[64] * 1.1:  # bis zum Budget wächst der Verlauf, danach nicht mehr
+        problems.append(f"budget: Prompt wächst mit der Sitzung {sizes}")
+    msgs = session(8)
+    if compact_history(msgs, HistoryPolicy(enabled=False)) != msgs:
+        problems.append("budget: enabled=False verändert den Verlauf")
+    print(f"budget   Tokens je Runden {sizes} (max {max_tokens}): {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-tokens", type=int, default=1500)
+    args = parser.parse_args(argv)
+
+    problems = check_drafts() + check_summary() + check_budget(args.max_tokens)
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
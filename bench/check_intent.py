@@ -0,0 +1,172 @@
+"""Prüft den lokalen Intent-Klassifikator (``pipelines.intent``) offline auf einem synthetischen Log.
+
+- log:       ``IntentPolicy.record`` schreibt die Router-Entscheidungen als JSONL, ``load_examples``
+             liest sie unverändert zurück (unbekannte Labels werden übersprungen),
+- mask:      ``admissible_mask`` sperrt summary/reply ohne Mail und revise ohne Entwurf; gesperrte
+             Labels haben Wahrscheinlichkeit 0 und werden nie vorhergesagt,
+- threshold: ``classify`` entscheidet genau dann lokal, wenn die Wahrscheinlichkeit die Schwelle
+             erreicht (Schwelle 0 → immer, über 1 → nie, ohne Klassifikator → nie); die Zähler stimmen,
+- npz:       ``save``/``load`` ergeben dieselben Vorhersagen; eine Datei mit anderen Labels wird abgelehnt.
+
+Aufruf:
+    python -m bench.check_intent
+    python -m bench.check_intent --examples 400 --threshold 0.8
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from pipelines.intent import (
+    LABELS,
+    Example,
+    IntentClassifier,
+    IntentPolicy,
+    admissible_mask,
+    evaluate,
+    load_examples,
+    split,
+)
+
+from .intent_router import FOLLOW_UP, TEMPLATES, prompt_for
+
+# Labels, die eine Mail bzw. einen Entwurf voraussetzen.
+NEEDS_MAIL = {"summary", "reply"}
+NEEDS_DRAFT = {"revise"}
+
+
+def make_examples(n: int, seed: int) -> list[Example]:
+    """``n`` gelabelte Turns aus den Vorlagen; Mail/Entwurf passend zum Label, sonst zufällig."""
+    rng = random.Random(seed)
+    examples = []
+    for _ in range(n):
+        label = rng.choice(tuple(TEMPLATES))
+        has_mail = label in NEEDS_MAIL or rng.random() < 0.5
+        has_draft = label in NEEDS_DRAFT or rng.random() < 0.3
+        previous = rng.choice(("", *FOLLOW_UP))
+        examples.append(Example(prompt_for(label, rng), has_mail, has_draft, label, previous))
+    return examples
+
+
+def check_log(examples: list[Example], path: str) -> list[str]:
+    problems: list[str] = []
+    policy = IntentPolicy(log_path=path)
+    for e in examples:
+        policy.record(e.text, e.has_mail, e.has_draft, e.previous, e.label)
+    policy.record("", True, False, "", "reply")  # leere Anfrage: kein Eintrag
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"text": "x", "has_mail": true, "has_draft": false, "label": "unbekannt"}\n\n')
+    loaded = load_examples(path)
+    if loaded != examples:
+        problems.append(f"log: {len(loaded)} von {len(examples)} Beispielen unverändert zurückgelesen")
+    if policy.stats.snapshot()["logged"] != len(examples):
+        problems.append(f"log: Zähler logged={policy.stats.snapshot()['logged']}")
+    print(f"log       {len(loaded)} Turns geschrieben und gelesen: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_mask(classifier: IntentClassifier, examples: list[Example]) -> list[str]:
+    problems: list[str] = []
+    for has_mail in (False, True):
+        for has_draft in (False, True):
+            mask = admissible_mask(has_mail, has_draft)
+            expected = [
+                (label not in NEEDS_MAIL or has_mail) and (label not in NEEDS_DRAFT or has_draft) for label in LABELS
+            ]
+            if mask.tolist() != expected:
+                problems.append(f"mask: Mail={has_mail} Entwurf={has_draft} → {mask.tolist()}")
+                continue
+            for e in examples[:50]:
+                p = classifier.proba(e.text, has_mail, has_draft, e.previous)
+                label, _ = classifier.predict(e.text, has_mail, has_draft, e.previous)
+                if p[~mask].any() or not mask[LABELS.index(label)] or not np.isclose(p.sum(), 1.0):
+                    problems.append(f"mask: {e.text!r} Mail={has_mail} Entwurf={has_draft} → {label}")
+                    break
+    print(f"mask      4 Kombinationen Mail/Entwurf: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_threshold(classifier: IntentClassifier, examples: list[Example], threshold: float) -> list[str]:
+    problems: list[str] = []
+    for t in (0.0, threshold, 1.01):
+        policy = IntentPolicy(classifier, threshold=t)
+        local = 0
+        for e in examples:
+            label, p = classifier.predict(e.text, e.has_mail, e.has_draft, e.previous)
+            decision = policy.classify(e.text, e.has_mail, e.has_draft, e.previous)
+            if (decision is not None) != (p >= t) or (decision is not None and decision["type"] != label):
+                problems.append(f"threshold {t:.2f}: {e.text!r} p={p:.3f} → {decision}")
+                break
+            local += decision is not None
+        stats = policy.stats.snapshot()
+        if (stats["local"], stats["llm"]) != (local, len(examples) - local):
+            problems.append(f"threshold {t:.2f}: Zähler {stats}")
+        if (t == 0.0 and local != len(examples)) or (t > 1.0 and local):
+            problems.append(f"threshold {t:.2f}: {local}/{len(examples)} lokal")
+    if IntentPolicy(threshold=0.0).classify(examples[0].text, True, True) is not None:
+        problems.append("threshold: ohne Klassifikator lokal entschieden")
+    shares = {row["threshold"]: row["saved_share"] for row in evaluate(classifier, examples, (0.0, threshold, 1.01))}
+    print(f"threshold lokal je Schwelle {shares}: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_npz(classifier: IntentClassifier, examples: list[Example], tmp: str) -> list[str]:
+    problems: list[str] = []
+    path = os.path.join(tmp, "intent.npz")
+    classifier.save(path)
+    loaded = IntentClassifier.load(path)
+    if not (np.array_equal(loaded.weights, classifier.weights) and np.array_equal(loaded.bias, classifier.bias)):
+        problems.append("npz: Gewichte nach dem Laden verändert")
+    for e in examples:
+        if loaded.predict(e.text, e.has_mail, e.has_draft, e.previous) != classifier.predict(
+            e.text, e.has_mail, e.has_draft, e.previous
+        ):
+            problems.append(f"npz: andere Vorhersage für {e.text!r}")
+            break
+
+    wrong = os.path.join(tmp, "wrong.npz")
+    np.savez_compressed(wrong, weights=classifier.weights, bias=classifier.bias, labels=np.array(LABELS[::-1]))
+    try:
+        IntentClassifier.load(wrong)
+        problems.append("npz: Datei mit anderen Labels geladen")
+    except ValueError:
+        pass
+    print(f"npz       {os.path.getsize(path) // 1024} KiB, Vorhersagen gleich: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples", type=int, default=300)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--min-agreement", type=float, default=0.9, help="Mindest-Übereinstimmung auf dem Holdout")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        examples = make_examples(args.examples, args.seed)
+        problems = check_log(examples, os.path.join(tmp, "router_log.jsonl"))
+        train, test = split(examples, holdout=0.25, seed=args.seed)
+        classifier = IntentClassifier.fit(train, epochs=args.epochs)
+        agreement = evaluate(classifier, test, (0.0,))[0]["overall_agreement"]
+        print(f"fit       {len(train)} Turns trainiert, Holdout-Übereinstimmung {agreement:.1%}")
+        if agreement < args.min_agreement:
+            problems.append(f"fit: Übereinstimmung {agreement:.1%} < {args.min_agreement:.0%}")
+        problems += check_mask(classifier, test)
+        problems += check_threshold(classifier, test, args.threshold)
+        problems += check_npz(classifier, test, tmp)
+
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
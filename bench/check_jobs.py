@@ -0,0 +1,138 @@
+"""Prüft den ``JobStore`` der Streamlit-UI (``pipelines.jobs``) offline mit dem Fake-Modell.
+
+- dedup:    Reruns mit denselben Eingaben bekommen denselben Job (auch während er läuft) und
+            rufen das Modell nicht erneut; andere Eingaben starten einen neuen Job,
+- failure:  ein fehlgeschlagener Job bleibt stehen – weitere Reruns starten keinen neuen Aufruf;
+            erst nach ``discard`` („Erneut versuchen“) läuft die Arbeit wieder,
+- eviction: über ``max_jobs`` fallen die ältesten fertigen Jobs heraus, laufende bleiben.
+
+Aufruf:
+    python -m bench.check_jobs
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Optional
+
+from pipelines.jobs import Job, JobStore
+from pipelines.ledger import Ledger
+from pipelines.monolith import summarize_text
+
+from .fake_llm import FakeChatOpenAI
+from .scenarios import MAIL
+
+TIMEOUT_S = 10.0
+
+
+class Counter:
+    """Arbeit für den Store, die ihre Starts zählt."""
+
+    def __init__(self, fn) -> None:
+        self.fn = fn
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, job: Job) -> Any:
+        with self._lock:
+            self.calls += 1
+        return self.fn(job)
+
+
+def finish(*jobs: Job) -> None:
+    wait([job.future for job in jobs], timeout=TIMEOUT_S)
+
+
+def check_dedup(executor: ThreadPoolExecutor) -> list[str]:
+    problems: list[str] = []
+    llm = FakeChatOpenAI(time_scale=0.05)
+    ledger = Ledger()
+    store = JobStore(executor, sinks=(ledger,))
+    work = Counter(lambda job: summarize_text(llm, MAIL, on_token=job.on_token))
+
+    first = store.submit("summary", (MAIL,), work)
+    running = store.submit("summary", (MAIL,), work)  # Rerun, während der Job noch läuft
+    finish(first)
+    again = store.submit("summary", (MAIL,), work)  # Rerun nach dem Ende
+    if not (first is running is again):
+        problems.append("dedup: Rerun mit denselben Eingaben liefert einen neuen Job")
+    if work.calls != 1 or sum(c.role == "summary" for c in llm.stats.snapshot()) != 1:
+        problems.append(f"dedup: {work.calls} Starts für dieselben Eingaben")
+    if first.failed or not first.result() or first.total_tokens != ledger.totals()["total_tokens"]:
+        problems.append(f"dedup: Ergebnis/Tokens fehlen ({first.total_tokens} Tokens)")
+
+    other = store.submit("summary", (MAIL + "\nPS: Danke!",), work)
+    finish(other)
+    if other is first or work.calls != 2:
+        problems.append("dedup: andere Eingaben ohne neuen Job")
+    print(f"dedup    {work.calls} Starts für 3 Abrufe + 1 neue Eingabe: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_failure(executor: ThreadPoolExecutor) -> list[str]:
+    problems: list[str] = []
+    store = JobStore(executor)
+    fail = threading.Event()
+    fail.set()
+
+    def flaky(job: Job) -> str:
+        if fail.is_set():
+            raise RuntimeError("Modell nicht erreichbar")
+        return "ok"
+
+    work = Counter(flaky)
+    failed = store.submit("reply", (MAIL, "", None), work)
+    finish(failed)
+    if not failed.failed:
+        problems.append("failure: Job nicht als fehlgeschlagen markiert")
+    reruns = [store.submit("reply", (MAIL, "", None), work) for _ in range(5)]
+    if any(job is not failed for job in reruns) or work.calls != 1:
+        problems.append(f"failure: Reruns starten neu ({work.calls} Starts)")
+
+    fail.clear()
+    store.discard(failed)  # „Erneut versuchen“
+    retry = store.submit("reply", (MAIL, "", None), work)
+    finish(retry)
+    if retry is failed or work.calls != 2 or retry.failed or retry.result() != "ok":
+        problems.append(f"failure: Wiederholung nach discard ohne Erfolg ({work.calls} Starts)")
+    print(f"failure  {work.calls} Starts für 6 Abrufe + 1 Wiederholung: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_eviction(executor: ThreadPoolExecutor, max_jobs: int = 3) -> list[str]:
+    problems: list[str] = []
+    store = JobStore(executor, max_jobs=max_jobs)
+    release = threading.Event()
+    blocked = store.submit("revise", ("läuft",), lambda job: release.wait(TIMEOUT_S))
+
+    done = []
+    for i in range(max_jobs + 2):
+        done.append(store.submit("revise", (f"Entwurf {i}",), lambda job: "ok"))
+        finish(done[-1])
+    # Beim Einfügen des letzten Jobs zählt dieser (noch laufend) mit.
+    kept = [i for i in range(len(done)) if store.get("revise", (f"Entwurf {i}",)) is done[i]]
+    if store.get("revise", ("läuft",)) is not blocked:
+        problems.append("eviction: laufender Job verdrängt")
+    if kept != list(range(len(done) - max_jobs + 1, len(done))):
+        problems.append(f"eviction: behalten {kept}")
+    release.set()
+    finish(blocked)
+    print(f"eviction max_jobs={max_jobs}: behalten {kept} + laufender Job: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix="job") as executor:
+        problems = check_dedup(executor) + check_failure(executor) + check_eviction(executor)
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Prüft den Token- und Kosten-Ledger (``pipelines.ledger``) offline mit dem Fake-Modell.
+
+- labels: Aufrufe landen bei ``node:<name>`` (Routing-Graph), ``tool:<name>`` (Agent-Tools),
+          ``op:<name>`` (Monolith) bzw. ``llm``; die Summen passen zu den Tokens des Fake-Modells,
+- nested: ein ``track`` innerhalb eines laufenden Runnables erbt den äußeren Handler – jeder Aufruf
+          kommt dann zweimal an, zählt im äußeren Ledger aber einmal; der innere Block sieht nur seine
+          Aufrufe; derselbe Ledger in beiden Blöcken zählt ebenfalls einmal,
+- cost:   Preise nach längstem Modellpräfix (``gpt-4o-mini`` nicht als ``gpt-4o``), Datumsuffixe zählen
+          nicht, unbekannte Modelle kosten 0,
+- export: JSONL mit einer Zeile je Aufruf, Prometheus mit Zählern und Latenz je Label/Modell.
+
+Aufruf:
+    python -m bench.check_ledger
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+from typing import Any, Optional
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from pipelines import graph_agent, graph_routing
+from pipelines.graph_routing import request_state
+from pipelines.ledger import PRICES_PER_MTOK, Ledger, LedgerEntry, token_cost, track
+from pipelines.monolith import summarize_text
+
+from .fake_llm import FakeChatOpenAI
+from .scenarios import MAIL
+
+
+def labels(ledger: Ledger) -> dict[str, int]:
+    return {row["label"]: row["calls"] for row in ledger.summary()}
+
+
+def fake_tokens(llm: FakeChatOpenAI, before: int = 0) -> int:
+    return sum(c.prompt_tokens + c.completion_tokens for c in llm.stats.snapshot()[before:])
+
+
+def check_labels() -> list[str]:
+    problems: list[str] = []
+    llm = FakeChatOpenAI(time_scale=0.0)
+    runs: dict[str, Any] = {
+        "routing": lambda: graph_routing.build_app(llm).invoke(request_state("Fass die Mail zusammen", MAIL)),
+        "agent": lambda: graph_agent.build_app(llm).invoke(
+            request_state("Fass die Mail zusammen und schreib eine Antwort", MAIL)
+        ),
+        "monolith": lambda: summarize_text(llm, MAIL),
+        "plain": lambda: llm.invoke([HumanMessage(content="Hallo")]),
+    }
+    expected = {
+        "routing": lambda ls: ls == {"node:agent": 1, "node:summary": 1},  # Router-Knoten heißt "agent"
+        "agent": lambda ls: {"node:agent", "tool:summary", "tool:reply"} <= set(ls) and all(
+            label.startswith(("node:", "tool:")) for label in ls
+        ),
+        "monolith": lambda ls: ls == {"op:summary": 1},
+        "plain": lambda ls: ls == {"llm": 1},
+    }
+    found = {}
+    for name, run in runs.items():
+        before = len(llm.stats.snapshot())
+        with track() as ledger:
+            run()
+        found[name] = labels(ledger)
+        if not expected[name](found[name]):
+            problems.append(f"labels: {name} → {found[name]}")
+        if ledger.totals()["total_tokens"] != fake_tokens(llm, before):
+            counted, expected_tokens = ledger.totals()["total_tokens"], fake_tokens(llm, before)
+            problems.append(f"labels: {name} zählt {counted} statt {expected_tokens} Tokens")
+    print(f"labels  {found}: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+class CountingLedger(Ledger):
+    """Ledger, der mitzählt, wie oft ein Aufruf ankommt (vor der Deduplizierung)."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.deliveries = 0
+
+    def record(self, entry: LedgerEntry) -> None:
+        self.deliveries += 1
+        super().record(entry)
+
+
+def check_nested() -> list[str]:
+    problems: list[str] = []
+    llm = FakeChatOpenAI(time_scale=0.0)
+    outer = CountingLedger()
+    inner_calls: list[int] = []
+
+    def step(n: int) -> int:
+        # Eigener ``track`` in einem Runnable, das selbst schon unter dem äußeren Handler läuft.
+        with track(outer) as inner:
+            for i in range(n):
+                llm.invoke([HumanMessage(content=f"Hallo {i}")])
+        inner_calls.append(inner.totals()["calls"])
+        return n
+
+    with track(outer) as run:
+        llm.invoke([HumanMessage(content="Vorher")])
+        RunnableLambda(step).invoke(2)
+    if outer.deliveries <= run.totals()["calls"]:
+        problems.append(f"nested: Aufrufe kamen nur einmal an ({outer.deliveries}) – Doppelzustellung nicht geprüft")
+    counts = (run.totals()["calls"], outer.totals()["calls"], inner_calls)
+    if counts != (3, 3, [2]):
+        problems.append(f"nested: Block/äußerer Ledger/innerer Block {counts}, erwartet (3, 3, [2])")
+    if outer.totals()["total_tokens"] != fake_tokens(llm):
+        problems.append("nested: Tokens doppelt gezählt")
+    calls = outer.totals()["calls"]
+    print(f"nested  {outer.deliveries} Zustellungen → {calls} Aufrufe: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_cost() -> list[str]:
+    problems: list[str] = []
+    p_in, p_out = PRICES_PER_MTOK["gpt-4o-mini"]
+    cases = {
+        "gpt-4o-mini": (p_in + p_out) / 1000,
+        "gpt-4o-mini-2024-07-18": (p_in + p_out) / 1000,
+        "gpt-4o": sum(PRICES_PER_MTOK["gpt-4o"]) / 1000,
+        "fake-gpt-4o-mini": 0.0,
+        "": 0.0,
+    }
+    for model, cost in cases.items():
+        if not math.isclose(token_cost(model, 1000, 1000), cost):
+            problems.append(f"cost: {model!r} kostet {token_cost(model, 1000, 1000)} statt {cost}")
+    print(f"cost    {len(cases)} Modelle: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_export() -> list[str]:
+    problems: list[str] = []
+    llm = FakeChatOpenAI(time_scale=0.0)
+    with track() as ledger:
+        summarize_text(llm, MAIL)
+        llm.invoke([HumanMessage(content="Hallo")])
+    rows = [json.loads(line) for line in ledger.to_jsonl().splitlines()]
+    if len(rows) != 2 or {r["label"] for r in rows} != {"op:summary", "llm"} or len({r["run_id"] for r in rows}) != 2:
+        problems.append(f"export: JSONL {rows}")
+    prom = ledger.to_prometheus()
+    for needle in (
+        'mail_assistant_llm_calls_total{label="op:summary",model="fake-gpt-4o-mini"} 1',
+        "# TYPE mail_assistant_llm_latency_seconds summary",
+        'mail_assistant_llm_latency_seconds_count{label="llm",model="fake-gpt-4o-mini"} 1',
+    ):
+        if needle not in prom:
+            problems.append(f"export: Prometheus ohne {needle!r}")
+    print(f"export  {len(rows)} JSONL-Zeilen, {prom.count(chr(10))} Prometheus-Zeilen: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    problems = check_labels() + check_nested() + check_cost() + check_export()
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Prüft das Memo je Mail (``pipelines.memo``) in beiden Graphen mit dem Fake-Modell.
+
+- repeat:  eine zweite Zusammenfassung derselben Mail kommt aus dem Memo (kein Summary-Aufruf),
+- reply:   liegt die Zusammenfassung im Memo, bekommt der Reply-Aufruf sie als Kontext mit
+           (größerer Prompt als ohne Memo) und es gibt keinen Summary-Aufruf,
+- set_mail: ``mail_update`` leert das Memo; danach wird wieder zusammengefasst,
+- facts:   Sprache, Personen, Termine und offene Fragen kommen lokal aus der Mail (auch im Graph-State),
+           „Offene Punkte:“ der Zusammenfassung ergänzen die offenen Fragen, und der Reply-Prompt nennt
+           die erkannte Sprache (unbekannte Sprache: Prompt unverändert).
+
+Aufruf:
+    python -m bench.check_memo
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Any, Optional
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from pipelines import graph_agent, graph_routing
+from pipelines.memo import analyze, reply_system, with_summary
+from pipelines.prompts import SYSTEM_MAIL_REPLY
+from pipelines.sessions import load_state, mail_update, thread_config, turn_input
+
+from .fake_llm import CallRecord, FakeChatOpenAI
+from .scenarios import MAIL
+
+ARCHITECTURES = ("routing", "agent")
+ENGLISH_MAIL = (
+    "Subject: Project status\n\nHi Ben,\n\ncould you send me the figures for the report by Friday? "
+    "We also need to confirm the meeting on Monday.\n\nBest regards\nAnna Weber\n"
+)
+SUMMARY = "Kurzfassung aus dem Memo: Termin zur Abstimmung des Projektstands gesucht."
+
+
+def calls_during(llm: FakeChatOpenAI, fn) -> tuple[Any, list[CallRecord]]:
+    before = len(llm.stats.snapshot())
+    out = fn()
+    return out, llm.stats.snapshot()[before:]
+
+
+def roles(calls: list[CallRecord]) -> list[str]:
+    return [c.role for c in calls]
+
+
+def reply_prompt_tokens(app: Any, llm: FakeChatOpenAI, thread_id: str, memo: Optional[dict]) -> tuple[int, list[str]]:
+    config = thread_config(thread_id)
+    app.update_state(config, mail_update(MAIL))
+    if memo:
+        app.update_state(config, {"memo": memo})
+    _, calls = calls_during(llm, lambda: app.invoke(turn_input("Schreib eine Antwort"), config))
+    return sum(c.prompt_tokens for c in calls if c.role == "reply"), roles(calls)
+
+
+def check_graph(arch: str) -> list[str]:
+    problems: list[str] = []
+    llm = FakeChatOpenAI(time_scale=0.0)
+    app = (graph_routing if arch == "routing" else graph_agent).build_app(llm, checkpointer=InMemorySaver())
+    config = thread_config(f"memo-{arch}")
+    app.update_state(config, mail_update(MAIL))
+
+    def turn(prompt: str) -> list[str]:
+        return roles(calls_during(llm, lambda: app.invoke(turn_input(prompt), config))[1])
+
+    first = turn("Fass die Mail zusammen")
+    memo = load_state(app, f"memo-{arch}").get("memo", {})
+    if "summary" not in first or not memo.get("summary"):
+        problems.append(f"{arch}: erste Zusammenfassung nicht im Memo ({first})")
+    if memo.get("language") != "de" or not memo.get("dates") or not memo.get("open_questions"):
+        problems.append(f"{arch}: lokale Angaben fehlen im Memo ({memo})")
+    second = turn("Fass die Mail bitte nochmal zusammen")
+    if "summary" in second:
+        problems.append(f"{arch}: zweite Zusammenfassung mit Modellaufruf ({second})")
+
+    with_memo, memo_roles = reply_prompt_tokens(app, llm, f"memo-{arch}-reply", with_summary(None, MAIL, SUMMARY))
+    without, _ = reply_prompt_tokens(app, llm, f"memo-{arch}-plain", None)
+    if "summary" in memo_roles or "reply" not in memo_roles:
+        problems.append(f"{arch}: Antwort mit Memo ruft {memo_roles}")
+    if with_memo <= without:
+        problems.append(f"{arch}: Zusammenfassung nicht im Reply-Prompt ({with_memo} <= {without} Tokens)")
+
+    # Gleiche Mail neu gesetzt („Mail ändern / neu setzen“): Memo leer, wieder ein Summary-Aufruf.
+    app.update_state(config, mail_update(MAIL))
+    if load_state(app, f"memo-{arch}").get("memo"):
+        problems.append(f"{arch}: mail_update hat das Memo nicht geleert")
+    again = turn("Fass die Mail zusammen")
+    if "summary" not in again:
+        problems.append(f"{arch}: nach neuer Mail keine neue Zusammenfassung ({again})")
+
+    print(f"{arch:<8} Wiederholung {second} · Reply-Prompt {without} -> {with_memo} Tokens mit Memo: "
+          f"{'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_facts() -> list[str]:
+    problems: list[str] = []
+    de, en = analyze(MAIL), analyze(ENGLISH_MAIL)
+    if (de["language"], en["language"]) != ("de", "en"):
+        problems.append(f"facts: Sprache {de['language']}/{en['language']} statt de/en")
+    if "Sandra Keller" not in de["entities"] or "Anna Weber" not in en["entities"]:
+        problems.append(f"facts: Personen {de['entities']} / {en['entities']}")
+    if not any("Dienstag" in d for d in de["dates"]) or not any("Friday" in d for d in en["dates"]):
+        problems.append(f"facts: Termine {de['dates']} / {en['dates']}")
+    if not de["open_questions"] or not any(q.startswith("could you send") for q in en["open_questions"]):
+        problems.append(f"facts: offene Fragen {de['open_questions']} / {en['open_questions']}")
+
+    memo = with_summary(None, MAIL, f"{SUMMARY}\nOffene Punkte: Teilnehmerkreis nicht genannt.")
+    if "Teilnehmerkreis nicht genannt." not in memo["open_questions"]:
+        problems.append(f"facts: „Offene Punkte:“ nicht übernommen ({memo['open_questions']})")
+
+    prompts = {lang: reply_system({"language": lang}) for lang in ("de", "en", "unknown")}
+    if "Sprache: Deutsch" not in prompts["de"] or "Sprache: Englisch" not in prompts["en"]:
+        problems.append("facts: Reply-Prompt nennt die Sprache nicht")
+    if prompts["unknown"] != SYSTEM_MAIL_REPLY or reply_system(None) != SYSTEM_MAIL_REPLY:
+        problems.append("facts: Reply-Prompt bei unbekannter Sprache verändert")
+    print(f"{'facts':<8} de/en · {len(de['dates'])} Termine · {len(memo['open_questions'])} offene Fragen: "
+          f"{'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--arch", action="append", choices=ARCHITECTURES, help="nur diese Architektur(en)")
+    args = parser.parse_args(argv)
+
+    problems = check_facts() + [p for arch in args.arch or ARCHITECTURES for p in check_graph(arch)]
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
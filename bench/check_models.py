@@ -0,0 +1,154 @@
+"""Prüft Modell je Rolle (``pipelines.models``) offline – ohne API-Aufrufe.
+
+- parse:    ``ModelSpec.parse`` liest Modell und ``key=value``-Parameter, fehlende Felder kommen aus der
+            Basis; unbekannte Parameter und ungültige Werte werden abgelehnt,
+- from_env: ``MODEL_<ROLLE>`` erbt von ``MODEL_DEFAULT``; gleiche Specs teilen sich eine Instanz, gleiche
+            Endpoints einen httpx-Client; mit Resilience hat jede Rolle ihre Deadline und
+            ``MODEL_FALLBACK`` als Ersatz, ``LLM_RESILIENCE=0`` liefert die nackten Modelle,
+- routing:  ein Register aus zwei Fake-Modellen schickt den Router-Aufruf an das Router-Modell und den
+            Entwurf an das Reply-Modell (sichtbar im Ledger).
+
+Aufruf:
+    python -m bench.check_models
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Optional
+
+from langchain_core.language_models import BaseChatModel
+
+from pipelines import graph_routing
+from pipelines.graph_routing import request_state
+from pipelines.ledger import track
+from pipelines.models import ROLES, ModelRegistry, ModelSpec, model_for
+from pipelines.resilience import ResilientChatModel
+
+from .fake_llm import FakeChatOpenAI
+from .scenarios import MAIL
+
+BASE = ModelSpec(model="gpt-4o-mini", temperature=0.2)
+
+# (Eingabe, erwartete Spec auf Basis von ``BASE``)
+PARSE_CASES: tuple[tuple[str, ModelSpec], ...] = (
+    ("", BASE),
+    ("gpt-4.1-nano", ModelSpec("gpt-4.1-nano", 0.2)),
+    ("gpt-4.1-nano;max_tokens=150", ModelSpec("gpt-4.1-nano", 0.2, 150)),
+    ("temperature=0.7", ModelSpec("gpt-4o-mini", 0.7)),
+    (
+        " gpt-4.1 ; temperature = 0 ; base_url=http://localhost:8000/v1 ;",
+        ModelSpec("gpt-4.1", 0.0, None, "http://localhost:8000/v1"),
+    ),
+    ("gpt-4.1;max_tokens=", ModelSpec("gpt-4.1", 0.2)),
+)
+PARSE_ERRORS = ("gpt-4.1;top_p=0.9", "gpt-4.1;temperature=warm", "max_tokens=viele", "model=gpt-4.1")
+
+ENV = {
+    "MODEL_DEFAULT": "gpt-4o-mini",
+    "MODEL_ROUTER": "gpt-4.1-nano;max_tokens=150",
+    "MODEL_REPLY": "gpt-4.1;temperature=0.3",
+    "MODEL_REVISE": "gpt-4.1;temperature=0.3",
+    "MODEL_NEW": "gpt-4.1;temperature=0.3;base_url=http://localhost:8000/v1",
+    "MODEL_FALLBACK": "gpt-4o-mini;base_url=https://fallback.example/v1",
+}
+
+
+def check_parse() -> list[str]:
+    problems: list[str] = []
+    for text, expected in PARSE_CASES:
+        spec = ModelSpec.parse(text, BASE)
+        if spec != expected:
+            problems.append(f"parse: {text!r} → {spec}, erwartet {expected}")
+    for text in PARSE_ERRORS:
+        try:
+            ModelSpec.parse(text, BASE)
+            problems.append(f"parse: {text!r} ohne Fehler gelesen")
+        except ValueError:
+            pass
+    if ModelSpec.parse("gpt-4.1") != ModelSpec("gpt-4.1"):
+        problems.append("parse: ohne Basis andere Defaults als ModelSpec()")
+    print(f"parse     {len(PARSE_CASES)} Specs, {len(PARSE_ERRORS)} Fehlerfälle: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def primary(llm: BaseChatModel) -> BaseChatModel:
+    return llm.primary if isinstance(llm, ResilientChatModel) else llm
+
+
+def check_from_env() -> list[str]:
+    problems: list[str] = []
+    registry = ModelRegistry.from_env(ENV, api_key="stub", cache=False)
+    names = registry.model_names()
+    expected = {role: "gpt-4o-mini" for role in ROLES} | {
+        "router": "gpt-4.1-nano",
+        "reply": "gpt-4.1",
+        "revise": "gpt-4.1",
+        "new": "gpt-4.1",
+    }
+    if names != expected:
+        problems.append(f"from_env: Modelle {names}")
+    router, reply, revise, new = (registry.get(role) for role in ("router", "reply", "revise", "new"))
+    summary = primary(registry.get("summary"))
+    if primary(router).max_tokens != 150 or primary(reply).temperature != 0.3 or summary.temperature:
+        problems.append("from_env: Parameter je Rolle nicht übernommen")
+    if primary(reply) is not primary(revise) or primary(reply) is primary(new):
+        problems.append("from_env: gleiche Specs ohne gemeinsame Instanz bzw. andere Endpoints zusammengelegt")
+    clients = [primary(m).http_client for m in (router, reply, new)]
+    if clients[0] is not clients[1] or clients[2] is clients[1]:
+        problems.append("from_env: httpx-Client nicht je Endpoint geteilt")
+
+    wrapped = [registry.get(role) for role in ROLES]
+    if not all(isinstance(m, ResilientChatModel) for m in wrapped):
+        problems.append("from_env: Modelle ohne Resilience-Wrapper")
+    elif router.policy.deadline_s >= reply.policy.deadline_s:
+        deadlines = (router.policy.deadline_s, reply.policy.deadline_s)
+        problems.append(f"from_env: Router-/Reply-Deadline {deadlines}, Router nicht kürzer")
+    elif any(m.fallback is None or m.fallback.openai_api_base != "https://fallback.example/v1" for m in wrapped):
+        problems.append("from_env: MODEL_FALLBACK fehlt")
+
+    plain = ModelRegistry.from_env(
+        {"LLM_RESILIENCE": "0"}, default=ModelSpec("gpt-4.1-mini"), api_key="stub", cache=False
+    )
+    if any(isinstance(plain.get(role), ResilientChatModel) for role in ROLES):
+        problems.append("from_env: LLM_RESILIENCE=0 lässt den Wrapper stehen")
+    if set(plain.model_names().values()) != {"gpt-4.1-mini"} or len({id(plain.get(role)) for role in ROLES}) != 1:
+        problems.append(f"from_env: ohne MODEL_* nicht eine Instanz mit dem Default ({plain.model_names()})")
+    try:
+        ModelRegistry({"summarize": plain.default}, plain.default)
+        problems.append("from_env: unbekannte Rolle akzeptiert")
+    except ValueError:
+        pass
+    instances = len({id(m) for m in wrapped})
+    print(f"from_env  {instances} Modelle für {len(ROLES)} Rollen: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_routing() -> list[str]:
+    problems: list[str] = []
+    small = FakeChatOpenAI(time_scale=0.0, model_name="fake-router")
+    large = FakeChatOpenAI(time_scale=0.0, model_name="fake-reply")
+    registry = ModelRegistry({"router": small, "reply": large}, large)
+    if model_for(small, "router") is not small or model_for(registry, "summary") is not large:
+        problems.append("routing: model_for löst Rollen falsch auf")
+    with track() as ledger:
+        graph_routing.build_app(registry).invoke(request_state("Schreib eine Antwort", MAIL))
+    models = {row["label"]: row["model"] for row in ledger.summary()}
+    if models != {"node:agent": "fake-router", "node:reply": "fake-reply"}:
+        problems.append(f"routing: Modelle je Knoten {models}")
+    print(f"routing   {models}: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    problems = check_parse() + check_from_env() + check_routing()
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
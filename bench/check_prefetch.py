@@ -0,0 +1,177 @@
+"""Prüft die Vorabberechnung (``pipelines.prefetch``) mit dem Fake-Modell.
+
+- monolith: Zusammenfassung und Antwortentwurf liegen nach der „Bedenkzeit“ fertig vor,
+  ``take`` liefert sie ohne Modellaufruf; der Entwurf entsteht mit der Zusammenfassung als
+  Kontext und passt nur zu ihr, mit Zusatzinfos gibt es keinen, und er wird nur einmal ausgegeben,
+- budget:   ein Budget für nur eine Aufgabe startet genau eine, verbraucht wird höchstens das Budget,
+- cancel:   eine neue Mail bricht die laufenden Aufgaben der alten ab,
+- routing/agent: die Ergebnisse gehen als Memo in den Turn; „Fass die Mail zusammen“ und
+  „Schreib eine Antwort“ brauchen keinen Summary-/Reply-Aufruf, eine Anfrage mit eigenen
+  Vorgaben dagegen schon.
+
+Aufruf:
+    python -m bench.check_prefetch
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from typing import Any, Optional
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from pipelines import graph_agent, graph_routing
+from pipelines.ledger import Ledger
+from pipelines.monolith import summarize_text, write_reply_mail
+from pipelines.prefetch import Prefetcher, PrefetchPolicy
+from pipelines.sessions import thread_config, turn_input
+
+from .fake_llm import FakeChatOpenAI
+from .scenarios import MAIL
+
+TIME_SCALE = 0.05
+# Fake-Rollen, die ein vorab berechnetes Ergebnis ersetzt.
+PREFETCHED_ROLES = {"summary", "reply"}
+
+
+def settle(prefetcher: Prefetcher, timeout: float = 10.0) -> None:
+    """Wartet, bis alle Aufgaben fertig sind (die „Bedenkzeit“ der Nutzerin)."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        jobs = list(prefetcher._jobs.values())
+        if all(job.future is not None and job.future.done() for job in jobs):
+            return
+        time.sleep(0.01)
+
+
+def roles_during(llm: FakeChatOpenAI, fn) -> tuple[Any, list[str]]:
+    before = len(llm.stats.snapshot())
+    out = fn()
+    return out, [c.role for c in llm.stats.snapshot()[before:]]
+
+
+def check_monolith() -> list[str]:
+    problems: list[str] = []
+    llm = FakeChatOpenAI(time_scale=TIME_SCALE)
+    ledger = Ledger()
+    prefetcher = Prefetcher(llm, PrefetchPolicy(), sinks=(ledger,))
+    started = prefetcher.start(MAIL)
+    if started != ["summary", "reply"]:
+        problems.append(f"monolith: gestartet {started}")
+    settle(prefetcher)
+
+    t0 = time.perf_counter()
+    summary, roles = roles_during(llm, lambda: prefetcher.take("summary", MAIL))
+    latency = time.perf_counter() - t0
+    if summary != summarize_text(llm, MAIL) or roles:
+        problems.append(f"monolith: Zusammenfassung nicht vorab ({roles})")
+    if prefetcher.take("reply", MAIL) is not None:
+        problems.append("monolith: Entwurf ohne die Zusammenfassung im Prompt ausgegeben")
+    reply, roles = roles_during(llm, lambda: prefetcher.take("reply", MAIL, summary_context=summary))
+    if reply != write_reply_mail(llm, MAIL, summary_context=summary) or roles:
+        problems.append(f"monolith: Entwurf nicht vorab ({roles})")
+    if prefetcher.take("reply", MAIL, summary_context=summary) is not None:
+        problems.append("monolith: Entwurf zweimal ausgegeben")
+    if prefetcher.take("summary", MAIL, extra="") is None:
+        problems.append("monolith: Zusammenfassung nach der ersten Anfrage verloren")
+    if prefetcher.take("reply", MAIL, extra="Termin Dienstag bestätigen") is not None:
+        problems.append("monolith: Entwurf trotz Zusatzinfos")
+    labels = {row["label"] for row in ledger.summary()}
+    if labels != {"op:prefetch_summary", "op:prefetch_reply"}:
+        problems.append(f"monolith: Ledger-Labels {sorted(labels)}")
+    if prefetcher.spent != ledger.totals()["total_tokens"]:
+        problems.append(f"monolith: {prefetcher.spent} Tokens abgerechnet, Ledger {ledger.totals()['total_tokens']}")
+    print(f"{'monolith':<8} take {latency * 1000:.1f} ms · {prefetcher.spent} Tokens vorab: "
+          f"{'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_budget() -> list[str]:
+    problems: list[str] = []
+    llm = FakeChatOpenAI(time_scale=TIME_SCALE)
+    probe = Prefetcher(llm, PrefetchPolicy())
+    budget = probe._estimate("summary", MAIL) + 10
+    policy = PrefetchPolicy(token_budget=budget)
+    prefetcher = Prefetcher(llm, policy)
+    started = prefetcher.start(MAIL)
+    settle(prefetcher)
+    if started != ["summary"] or policy.stats.skipped != 1:
+        problems.append(f"budget: gestartet {started}, übersprungen {policy.stats.skipped}")
+    if prefetcher.spent > budget:
+        problems.append(f"budget: {prefetcher.spent} > {budget} Tokens")
+    # Zweite Mail: Das Budget ist aufgebraucht, nichts startet mehr.
+    if prefetcher.start(MAIL.replace("Projektstand", "Budget")):
+        problems.append("budget: nach aufgebrauchtem Budget erneut gestartet")
+    print(f"{'budget':<8} {prefetcher.spent}/{budget} Tokens, {policy.stats.skipped} übersprungen: "
+          f"{'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_cancel() -> list[str]:
+    problems: list[str] = []
+    llm = FakeChatOpenAI(time_scale=1.0)  # volle Latenz: die Aufgaben laufen noch
+    policy = PrefetchPolicy(token_budget=100_000)
+    prefetcher = Prefetcher(llm, policy)
+    prefetcher.start(MAIL)
+    time.sleep(0.05)
+    other = MAIL.replace("Projektstand", "Budget")
+    t0 = time.perf_counter()
+    prefetcher.start(other)
+    cancelled = policy.stats.cancelled
+    if cancelled != 2:
+        problems.append(f"cancel: {cancelled} statt 2 Aufgaben abgebrochen")
+    if prefetcher.take("summary", MAIL) is not None:
+        problems.append("cancel: Ergebnis der alten Mail ausgegeben")
+    prefetcher.cancel()
+    elapsed = time.perf_counter() - t0
+    if elapsed > 0.5:
+        problems.append(f"cancel: Abbruch dauerte {elapsed:.2f}s")
+    print(f"{'cancel':<8} {cancelled} abgebrochen in {elapsed * 1000:.1f} ms: "
+          f"{'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_graph(arch: str) -> list[str]:
+    problems: list[str] = []
+    llm = FakeChatOpenAI(time_scale=TIME_SCALE)
+    module = graph_routing if arch == "routing" else graph_agent
+    app = module.build_app(llm, checkpointer=InMemorySaver())
+    config = thread_config(f"prefetch-{arch}")
+    app.update_state(config, {"uploaded_mail": MAIL, "memo": {}})
+    # Eigenes Modell für die Vorab-Aufrufe, damit ``roles_during`` nur die Aufrufe des Turns sieht.
+    prefetcher = Prefetcher(FakeChatOpenAI(time_scale=TIME_SCALE), PrefetchPolicy())
+    prefetcher.start(MAIL)
+
+    def turn(prompt: str, wait: list[str]) -> tuple[dict, list[str]]:
+        memo = prefetcher.memo_update(MAIL, wait=wait)
+        return roles_during(llm, lambda: app.invoke(turn_input(prompt, **({"memo": memo} if memo else {})), config))
+
+    out, roles = turn("Fass die Mail zusammen", ["summary"])
+    if PREFETCHED_ROLES & set(roles) or not out["memo"].get("summary"):
+        problems.append(f"{arch}: Zusammenfassung mit Modellaufruf ({roles})")
+    out, roles = turn("Schreib eine Antwort", ["reply"])
+    if PREFETCHED_ROLES & set(roles) or not out.get("draft"):
+        problems.append(f"{arch}: Entwurf mit Modellaufruf ({roles})")
+    if (out.get("memo") or {}).get("reply"):
+        problems.append(f"{arch}: Entwurf nicht verbraucht")
+    # Eigene Vorgaben: Der vorab erzeugte Entwurf passt nicht mehr.
+    out, roles = turn("Schreib eine Antwort und sag für Dienstag zu", ["reply"])
+    if "reply" not in roles:
+        problems.append(f"{arch}: Entwurf trotz eigener Vorgaben aus dem Memo ({roles})")
+    print(f"{arch:<8} summary/reply ohne Modellaufruf, mit Vorgaben neu: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    problems = check_monolith() + check_budget() + check_cancel() + check_graph("routing") + check_graph("agent")
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
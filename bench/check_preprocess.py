@@ -0,0 +1,144 @@
+"""Prüft die Vorverarbeitung eingehender Mails (``pipelines.preprocess``) an festen Beispielen.
+
+- html:       HTML wird Text, ``<blockquote>`` wird ``>``-Zitat, ``<style>``/``<script>`` verschwinden,
+- quotes:     Zitatketten werden auf die ersten Zeilen der obersten Ebene plus Platzhalter gefaltet,
+- signature:  nur der Standard-Trenner ``-- `` vor einem kurzen Schlussblock wird entfernt; ein bloßes
+              „--“ im Text oder ein langer Block danach bleiben stehen,
+- disclaimer: echte Disclaimer am Ende fallen weg, „vertraulich“/„confidential“ im Text nicht,
+- stats:      Bytes/Tokens vorher/nachher passen zum Text, die Ersparnis auf ``NOISY_MAIL`` ist > 0.
+
+Aufruf:
+    python -m bench.check_preprocess
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Optional
+
+from pipelines.history import estimate_tokens
+from pipelines.preprocess import PreprocessPolicy, format_savings_caption, prepare_mail, quote_placeholder
+
+from .scenarios import MAIL, NOISY_MAIL
+
+# (Name, Mail, muss enthalten, darf nicht enthalten)
+CASES: tuple[tuple[str, str, tuple[str, ...], tuple[str, ...]], ...] = (
+    (
+        "html",
+        "<html><head><style>p { color: red }</style></head><body><p>Hallo Anna,</p>"
+        "<p>der Termin am <b>Dienstag</b> passt.<br>Raum B2.</p><script>track()</script>"
+        "<blockquote><p>Passt Dienstag?</p></blockquote></body></html>",
+        ("Hallo Anna,", "der Termin am Dienstag passt.\nRaum B2.", "> Passt Dienstag?"),
+        ("color: red", "track()", "<p>", "<b>"),
+    ),
+    (
+        "quotes",
+        "Danke, passt.\n\nAm 02.05. schrieb Anna:\n> Zeile 1\n> Zeile 2\n>\n> Zeile 3\n> Zeile 4\n> Zeile 5\n"
+        ">> Alt 1\n>> Alt 2",
+        ("Danke, passt.", "Am 02.05. schrieb Anna:", "> Zeile 1\n> Zeile 2", quote_placeholder(5)),
+        ("Zeile 4", "Alt 1"),
+    ),
+    (
+        "signature",
+        "Hallo Anna,\n\nDienstag passt.\n\nGruß\nBen\n\n-- \nBen Wolf | Muster GmbH\nTel. +49 123 456",
+        ("Dienstag passt.", "Gruß\nBen"),
+        ("Muster GmbH", "Tel."),
+    ),
+    (
+        "signature before quote",
+        "Passt.\n-- \nBen Wolf\nMuster GmbH\n\nVon: Anna <anna@example.com>\nBetreff: Termin\n\nHallo Ben",
+        ("Passt.", "Von: Anna", "Hallo Ben"),
+        ("Ben Wolf", "Muster GmbH"),
+    ),
+    (
+        "bare dashes",
+        "Hi,\n\nplease reply to this -- it matters.\n--\nThanks for the quick answer, here are the dates:\nMonday 9am",
+        ("please reply to this -- it matters.", "here are the dates:", "Monday 9am"),
+        (),
+    ),
+    (
+        "long block after delimiter",
+        "Hallo,\n\nhier die Punkte:\n-- \n" + "\n".join(f"Punkt {i}: offen" for i in range(1, 13)),
+        ("Punkt 1: offen", "Punkt 12: offen"),
+        (),
+    ),
+    (
+        "confidential in body",
+        "Hi Bob,\n\nThe attached contract is confidential and must be signed by Friday.\n"
+        "Please also confirm the meeting on Monday at 9am.\n\nThanks",
+        ("must be signed by Friday", "Monday at 9am", "Thanks"),
+        (),
+    ),
+    (
+        "vertraulich im Text",
+        "Hallo Ben,\n\nanbei vertrauliche Informationen zum Budget; bitte nicht weiterleiten.\n"
+        "Rückmeldung bis Freitag.",
+        ("vertrauliche Informationen zum Budget", "Rückmeldung bis Freitag."),
+        (),
+    ),
+    (
+        "disclaimer de",
+        "Hallo Ben,\n\nRückmeldung bis Freitag.\n\nViele Grüße\nAnna\n\n"
+        "Muster GmbH\nDiese E-Mail enthält vertrauliche Informationen. Wenn Sie nicht der richtige Adressat sind,\n"
+        "informieren Sie bitte sofort den Absender.\n\nBitte denken Sie an die Umwelt, bevor Sie diese E-Mail ausdrucken.",
+        ("Rückmeldung bis Freitag.", "Viele Grüße\nAnna", "Muster GmbH"),
+        ("vertrauliche", "Adressat", "Umwelt"),
+    ),
+    (
+        "disclaimer en",
+        "Hi Anna,\n\nMonday works.\n\nBest\nBen\n-- \nBen Wolf\n\n"
+        "This message is confidential and may contain confidential information. If you are not the intended\n"
+        "recipient, please delete it.\n\nSent from my iPhone",
+        ("Monday works.", "Best\nBen"),
+        ("Ben Wolf", "intended", "iPhone"),
+    ),
+)
+
+
+def check_cases() -> list[str]:
+    problems: list[str] = []
+    for name, mail, present, absent in CASES:
+        text = prepare_mail(mail).text
+        missing = [s for s in present if s not in text]
+        leaked = [s for s in absent if s in text]
+        if missing or leaked:
+            problems.append(f"{name}: fehlt {missing}, übrig {leaked}:\n{text}")
+        print(f"{name:<27} {'ok' if not (missing or leaked) else 'FEHLER'}")
+    return problems
+
+
+def check_stats() -> list[str]:
+    problems: list[str] = []
+    prepared = prepare_mail(NOISY_MAIL)
+    stats, text = prepared.stats, prepared.text
+    expected = (len(NOISY_MAIL.encode("utf-8")), len(text.encode("utf-8")), estimate_tokens(NOISY_MAIL), estimate_tokens(text))
+    if (stats.bytes_before, stats.bytes_after, stats.tokens_before, stats.tokens_after) != expected:
+        problems.append(f"stats: {stats.as_dict()} passt nicht zu {expected}")
+    if stats.saved_tokens <= 0 or stats.saved_bytes <= 0 or not stats.html:
+        problems.append(f"stats: keine Ersparnis auf NOISY_MAIL ({stats.as_dict()})")
+    if not (stats.quote_lines and stats.signature_lines and stats.disclaimer_lines):
+        problems.append(f"stats: Zähler fehlen ({stats.as_dict()})")
+    if not format_savings_caption(stats) or format_savings_caption(prepare_mail(MAIL).stats):
+        problems.append("stats: Caption nur bei Ersparnis erwartet")
+    off = prepare_mail(NOISY_MAIL, PreprocessPolicy(enabled=False))
+    if off.text != NOISY_MAIL.strip() or off.stats.saved_tokens:
+        problems.append("stats: enabled=False verändert die Mail")
+    print(
+        f"{'stats':<27} NOISY_MAIL {stats.tokens_before} -> {stats.tokens_after} Tokens "
+        f"({stats.saved_bytes} Bytes): {'ok' if not problems else 'FEHLER'}"
+    )
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    problems = check_cases() + check_stats()
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
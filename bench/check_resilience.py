@@ -0,0 +1,193 @@
+"""Prüft Deadlines, Retries, Hedging und Fallback gegen lokale Stub-Server mit Fehlerinjektion.
+
+Alle Aufrufe laufen über echtes HTTP (``ChatOpenAI`` → ``bench.stub_server``), die
+Stubs werfen gezielt Fehler bzw. Latenzspitzen ein:
+
+- retry:    30 % HTTP 503 – ohne Wrapper scheitern Aufrufe, mit Retries keiner,
+- deadline: jede Antwort hängt – ``DeadlineExceeded`` kommt pünktlich nach der Deadline,
+- hedge:    10 % Latenzspitzen – Hedging senkt p95 deutlich (p99 trifft noch, wenn beide Kopien hängen),
+- fallback: primärer Endpoint liefert nur 503 – alle Aufrufe (async) über den Ersatz,
+- stream:   erstes Token bleibt aus – Stream kommt vom Ersatz, ohne doppelten Text,
+- graph:    Routing-Graph über ``ModelRegistry.from_specs`` bei 20 % Fehlern, alle Turns ok.
+
+Aufruf:
+    python -m bench.check_resilience
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from langchain_core.messages import HumanMessage
+
+from pipelines import graph_routing
+from pipelines.ledger import percentile
+from pipelines.models import ModelRegistry, ModelSpec, tiers_from_env
+from pipelines.resilience import DeadlineExceeded, ResiliencePolicy, ResilientChatModel, policies_from_env
+
+from .scenarios import MAIL
+from .stub_server import Faults, StubServer
+
+# Skaliert die simulierten Modell-Latenzen; Spitzen (``spike_s``) werden ebenfalls skaliert.
+TIME_SCALE = 0.05
+FAST = dict(backoff_s=0.01, backoff_max_s=0.05)
+
+
+def chat(server: StubServer, **kwargs):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model="gpt-4o-mini", base_url=server.url, api_key="stub", max_retries=0, **kwargs)
+
+
+def timed(fn: Callable[[int], object], n: int, workers: int = 8) -> tuple[list[float], int]:
+    """Latenzen der erfolgreichen Aufrufe und Zahl der Fehlschläge."""
+    def one(i: int) -> Optional[float]:
+        start = time.perf_counter()
+        try:
+            fn(i)
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(one, range(n)))
+    return [r for r in results if r is not None], sum(r is None for r in results)
+
+
+def check_retry(seed: int) -> list[str]:
+    with StubServer(time_scale=TIME_SCALE, faults=Faults(error_rate=0.3, seed=seed)) as srv:
+        plain = chat(srv)
+        _, plain_failed = timed(lambda i: plain.invoke(f"Frage {i}"), 30)
+        model = ResilientChatModel(primary=chat(srv), policy=ResiliencePolicy(retries=5, **FAST), seed=seed)
+        _, failed = timed(lambda i: model.invoke(f"Frage {i}"), 30)
+        stats = model.stats.snapshot()
+    print(f"retry     ohne Wrapper {plain_failed}/30 fehlgeschlagen, mit Retries {failed}/30 "
+          f"({stats['retries']} Retries)")
+    problems = [f"retry: {failed} Aufrufe trotz Retries fehlgeschlagen"] if failed else []
+    if not plain_failed or not stats["retries"]:
+        problems.append("retry: keine Fehler injiziert – Szenario prüft nichts")
+    return problems
+
+
+def check_deadline(seed: int) -> list[str]:
+    deadline = 0.5
+    with StubServer(time_scale=TIME_SCALE, faults=Faults(spike_rate=1.0, spike_s=200, seed=seed)) as srv:
+        model = ResilientChatModel(primary=chat(srv), policy=ResiliencePolicy(deadline_s=deadline, **FAST), seed=seed)
+        start = time.perf_counter()
+        try:
+            model.invoke("Hallo")
+            outcome = "Antwort"
+        except DeadlineExceeded:
+            outcome = "DeadlineExceeded"
+        elapsed = time.perf_counter() - start
+    print(f"deadline  {outcome} nach {elapsed:.2f}s (Deadline {deadline:.1f}s, Spitze {200 * TIME_SCALE:.0f}s)")
+    if outcome != "DeadlineExceeded":
+        return ["deadline: keine DeadlineExceeded trotz hängender Antwort"]
+    return [f"deadline: Abbruch erst nach {elapsed:.2f}s"] if elapsed > deadline + 0.3 else []
+
+
+def check_hedge(seed: int) -> list[str]:
+    faults = Faults(spike_rate=0.1, spike_s=40, seed=seed)
+    rows = {}
+    for hedge in (False, True):
+        with StubServer(time_scale=TIME_SCALE, faults=faults) as srv:
+            policy = ResiliencePolicy(retries=0, hedge=hedge, hedge_after_s=0.3, hedge_min_samples=10)
+            model = ResilientChatModel(primary=chat(srv), policy=policy, seed=seed)
+            latencies, failed = timed(lambda i: model.invoke(f"Frage {i}"), 60)
+            rows[hedge] = ([percentile(latencies, q) for q in (50, 95, 99)], failed, model.stats.snapshot())
+    for hedge, ((p50, p95, p99), failed, stats) in rows.items():
+        extra = f", {stats['hedges']} Hedges, {stats['hedge_wins']} gewonnen" if hedge else ""
+        print(f"hedge     {'mit ' if hedge else 'ohne'} Hedging: p50 {p50:.2f}s p95 {p95:.2f}s p99 {p99:.2f}s{extra}")
+    ((_, p95_plain, _), _, _), ((_, p95_hedged, _), failed, stats) = rows[False], rows[True]
+    problems = [f"hedge: {failed} Aufrufe fehlgeschlagen"] if failed else []
+    if not stats["hedge_wins"]:
+        problems.append("hedge: kein Hedge hat gewonnen")
+    if p95_hedged > 0.6 * p95_plain:
+        problems.append(f"hedge: p95 {p95_hedged:.2f}s nicht deutlich unter {p95_plain:.2f}s")
+    return problems
+
+
+def check_fallback(seed: int) -> list[str]:
+    with StubServer(time_scale=TIME_SCALE, faults=Faults(error_rate=1.0, seed=seed)) as down, \
+            StubServer(time_scale=TIME_SCALE) as spare:
+        model = ResilientChatModel(primary=chat(down), fallback=chat(spare), policy=ResiliencePolicy(**FAST), seed=seed)
+
+        async def run() -> list:
+            return await asyncio.gather(*(model.ainvoke(f"Frage {i}") for i in range(10)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        failed = sum(isinstance(r, BaseException) for r in results)
+        stats = model.stats.snapshot()
+        served = spare.stats.snapshot()["requests"]
+    print(f"fallback  {10 - failed}/10 async-Aufrufe ok, {stats['fallbacks']} Fallbacks, Ersatz bediente {served}")
+    problems = [f"fallback: {failed} Aufrufe fehlgeschlagen"] if failed else []
+    return problems + (["fallback: Ersatz-Endpoint nicht benutzt"] if stats["fallbacks"] != 10 else [])
+
+
+def check_stream(seed: int) -> list[str]:
+    with StubServer(time_scale=TIME_SCALE, faults=Faults(spike_rate=1.0, spike_s=200, seed=seed)) as stuck, \
+            StubServer(time_scale=TIME_SCALE) as spare:
+        model = ResilientChatModel(
+            primary=chat(stuck), fallback=chat(spare), policy=ResiliencePolicy(deadline_s=0.5, retries=0), seed=seed
+        )
+        expected = chat(spare).invoke("Hallo").content
+        start = time.perf_counter()
+        text = "".join(chunk.content for chunk in model.stream("Hallo"))
+        elapsed = time.perf_counter() - start
+    print(f"stream    {len(text)} Zeichen vom Ersatz nach {elapsed:.2f}s")
+    return [] if text == expected else ["stream: gestreamter Text weicht von der Antwort des Ersatzes ab"]
+
+
+def check_graph(seed: int) -> list[str]:
+    with StubServer(time_scale=TIME_SCALE, faults=Faults(error_rate=0.2, seed=seed)) as flaky, \
+            StubServer(time_scale=TIME_SCALE) as spare:
+        policies = {role: ResiliencePolicy(deadline_s=p.deadline_s, **FAST) for role, p in policies_from_env({}).items()}
+        primary = ModelSpec(base_url=flaky.url)
+        models = ModelRegistry.from_specs(
+            tiers_from_env({}, primary), primary, resilience=policies, fallback=ModelSpec(base_url=spare.url), api_key="stub"
+        )
+        app = graph_routing.build_app(models)
+        prompts = ("Fass die Mail zusammen", "Schreib eine Antwort und sag zu", "Was kannst du?")
+        failed = 0
+        for i in range(12):
+            state = {"messages": [HumanMessage(content=prompts[i % len(prompts)])], "uploaded_mail": MAIL, "draft": ""}
+            try:
+                out = app.invoke(state)
+                failed += not out["messages"][-1].content
+            except Exception:
+                failed += 1
+        stats = models.resilience_stats()
+    print(f"graph     {12 - failed}/12 Turns ok, {stats['retries']} Retries, {stats['fallbacks']} Fallbacks")
+    return [f"graph: {failed} Turns fehlgeschlagen"] if failed else []
+
+
+CHECKS = {
+    "retry": check_retry,
+    "deadline": check_deadline,
+    "hedge": check_hedge,
+    "fallback": check_fallback,
+    "stream": check_stream,
+    "graph": check_graph,
+}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="append", choices=tuple(CHECKS), help="nur diese Prüfung(en)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    problems: list[str] = []
+    for name in args.check or CHECKS:
+        problems += CHECKS[name](args.seed)
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
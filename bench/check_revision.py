@@ -0,0 +1,143 @@
+"""Prüft Überarbeitungen per Edit-Skript (``pipelines.revision``) offline.
+
+- apply:    ``apply_edits`` wendet replace/insert/delete nacheinander an (spätere Anker sehen den schon
+            geänderten Text); fehlende, mehrdeutige und leere Anker sind ein ``EditError``,
+- fallback: nur ein anwendbares Skript ersetzt die Neufassung; ``rewrite``, leeres oder zu langes Skript,
+            Anker ohne Treffer, unveränderter Text und nicht lesbare Antworten führen zur Neufassung,
+            kurze Entwürfe werden ohne Skript neu geschrieben; die Zähler stimmen,
+- fake:     mit dem Fake-Modell kommt „Termin explizit 10:00 Uhr“ mit einem Edit-Skript und weniger
+            Completion-Tokens aus als die Neufassung; sync und async liefern dasselbe.
+
+Aufruf:
+    python -m bench.check_revision
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from typing import Any, Optional
+
+from langchain_core.messages import AIMessage
+
+from pipelines.revision import Edit, EditError, EditPolicy, EditScript, apply_edits, arevise, revise, revise_steps
+
+from .fake_llm import FakeChatOpenAI
+from .scenarios import DRAFT
+
+FEEDBACK = "Bitte überarbeiten: Termin explizit 10:00 Uhr."
+
+
+def check_apply() -> list[str]:
+    problems: list[str] = []
+    draft = "Hallo Anna,\n\nDienstag passt.\nBis dann\nBen"
+    edits = [
+        Edit(op="replace", anchor="Dienstag passt.", text="Dienstag um 10:00 Uhr passt."),
+        Edit(op="insert", anchor="10:00 Uhr passt.", text="\nRaum B2 ist reserviert."),
+        Edit(op="delete", anchor="Bis dann\n"),
+    ]
+    expected = "Hallo Anna,\n\nDienstag um 10:00 Uhr passt.\nRaum B2 ist reserviert.\nBen"
+    if apply_edits(draft, edits) != expected:
+        problems.append(f"apply: {apply_edits(draft, edits)!r}")
+    for name, edit in (
+        ("fehlt", Edit(op="replace", anchor="Mittwoch", text="Donnerstag")),
+        ("mehrdeutig", Edit(op="delete", anchor="a")),
+        ("leer", Edit(op="insert", anchor="  ", text="x")),
+    ):
+        try:
+            apply_edits(draft, [edits[0], edit])
+            problems.append(f"apply: Anker {name} ohne EditError")
+        except EditError:
+            pass
+    print(f"apply    3 Edits, 3 Fehlerfälle: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def drive(script: Any, draft: str = DRAFT, policy: Optional[EditPolicy] = None) -> tuple[str, list[str]]:
+    """Spielt ``revise_steps`` mit fester Skript-Antwort durch; liefert Ergebnis und Art der Aufrufe."""
+    llm = FakeChatOpenAI(time_scale=0.0)
+    steps = revise_steps(llm, draft, FEEDBACK, policy or EditPolicy())
+    calls: list[str] = []
+    try:
+        runnable, _ = next(steps)
+        while True:
+            if runnable is llm:
+                calls.append("full")
+                out: Any = AIMessage(content="NEUFASSUNG")
+            else:
+                calls.append("script")
+                out = script
+            runnable, _ = steps.send(out)
+    except StopIteration as stop:
+        return stop.value, calls
+
+
+def check_fallback() -> list[str]:
+    problems: list[str] = []
+    policy = EditPolicy(max_edits=2)
+    ok = Edit(op="replace", anchor="gerne wahr", text="gerne wahr (10:00 Uhr)")
+    cases = {
+        "passt": ({"parsed": EditScript(edits=[ok])}, ["script"]),
+        "rewrite": ({"parsed": EditScript(edits=[ok], rewrite=True)}, ["script", "full"]),
+        "leer": ({"parsed": EditScript()}, ["script", "full"]),
+        "zu lang": ({"parsed": EditScript(edits=[ok] * 3)}, ["script", "full"]),
+        "Anker fehlt": ({"parsed": EditScript(edits=[Edit(op="delete", anchor="Mittwoch")])}, ["script", "full"]),
+        "unverändert": ({"parsed": EditScript(edits=[ok.model_copy(update={"text": ok.anchor})])}, ["script", "full"]),
+        "nicht lesbar": ({"parsed": None, "parsing_error": ValueError("kein JSON")}, ["script", "full"]),
+    }
+    for name, (script, expected) in cases.items():
+        text, calls = drive(script, policy=policy)
+        if calls != expected:
+            problems.append(f"fallback: {name} → {calls}, erwartet {expected}")
+        elif (text == "NEUFASSUNG") != ("full" in calls):
+            problems.append(f"fallback: {name} liefert {text[:40]!r}")
+    text, calls = drive({"parsed": EditScript(edits=[ok])}, draft="Passt, danke!", policy=policy)
+    if calls != ["full"]:
+        problems.append(f"fallback: kurzer Entwurf → {calls}")
+    stats = policy.stats.snapshot()
+    if stats != {"edits": 1, "fallbacks": len(cases) - 1, "full": 1}:
+        problems.append(f"fallback: Zähler {stats}")
+    print(f"fallback {len(cases) + 1} Fälle, Zähler {stats}: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def check_fake() -> list[str]:
+    problems: list[str] = []
+    llm = FakeChatOpenAI(time_scale=0.0)
+    policy = EditPolicy()
+    edited = revise(llm, DRAFT, FEEDBACK, policy)
+    full = revise(llm, DRAFT, FEEDBACK)
+    calls = llm.stats.snapshot()
+    if [c.role for c in calls] != ["revise_edits", "revise"] or "gerne wahr (10:00 Uhr)" not in edited:
+        problems.append(f"fake: Rollen {[c.role for c in calls]}, Ergebnis {edited[:60]!r}")
+    elif calls[0].completion_tokens >= calls[1].completion_tokens:
+        tokens = (calls[0].completion_tokens, calls[1].completion_tokens)
+        problems.append(f"fake: Completion Edit-Skript/Neufassung {tokens}, Skript nicht kürzer")
+    if edited.strip() != full.strip():
+        problems.append("fake: Edit-Skript und Neufassung ergeben verschiedene Entwürfe")
+
+    twice = DRAFT.replace("Mit freundlichen Grüßen", "Ich nehme den Termin gerne wahr.\n\nMit freundlichen Grüßen")
+    before = len(llm.stats.snapshot())
+    revise(llm, twice, FEEDBACK, policy)
+    roles = [c.role for c in llm.stats.snapshot()[before:]]
+    if roles != ["revise_edits", "revise"] or policy.stats.snapshot()["fallbacks"] != 1:
+        problems.append(f"fake: mehrdeutiger Anker → {roles}, {policy.stats.snapshot()}")
+    if asyncio.run(arevise(FakeChatOpenAI(time_scale=0.0), DRAFT, FEEDBACK, EditPolicy())) != edited:
+        problems.append("fake: async liefert etwas anderes")
+    tokens = f"{calls[0].completion_tokens} statt {calls[1].completion_tokens}"
+    print(f"fake     Completion {tokens} Tokens, Rückfall bei Mehrdeutigkeit: {'ok' if not problems else 'FEHLER'}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+
+    problems = check_apply() + check_fallback() + check_fake()
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
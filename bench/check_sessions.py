@@ -0,0 +1,90 @@
+"""Prüft persistente Sitzungen (SQLite-Checkpointer) über Prozessgrenzen hinweg.
+
+Turn 1 läuft im Hauptprozess, Turn 2 in einem frisch gestarteten Prozess mit
+eigener Datenbankverbindung (wie nach einem Neustart oder auf einem anderen
+Streamlit-Worker). Beide Turns schicken nur die neue Nachricht; Mail, Entwurf
+und Verlauf müssen aus dem Checkpoint kommen. Über die Marker aus
+``stress_sessions`` fällt auf, wenn eine Sitzung fremden State sieht.
+
+Aufruf:
+    python -m bench.check_sessions --sessions 16
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+from typing import Any, Optional
+
+from pipelines import graph_agent, graph_routing
+from pipelines.sessions import load_state, sqlite_checkpointer, thread_config, turn_input
+
+from .fake_llm import FakeChatOpenAI
+from .scenarios import MAIL
+from .stress_sessions import check_output
+
+ARCHITECTURES = ("routing", "agent")
+
+FIRST = "Schreib eine Antwort und sag zu [[ask-{i}]]"
+SECOND = "Bitte den Entwurf förmlicher überarbeiten"
+
+
+def build(arch: str, path: str) -> Any:
+    llm = FakeChatOpenAI(time_scale=0.0, echo_markers=True)
+    return (graph_routing if arch == "routing" else graph_agent).build_app(llm, checkpointer=sqlite_checkpointer(path))
+
+
+def first_turn(app: Any, arch: str, i: int) -> None:
+    config = thread_config(f"{arch}-{i}")
+    app.update_state(config, {"uploaded_mail": f"{MAIL}\n[[mail-{i}]]"})
+    app.invoke(turn_input(FIRST.format(i=i)), config)
+
+
+def second_turn(job: tuple[str, str, int]) -> tuple[int, dict, int]:
+    """Läuft im Kindprozess: neuer Graph, neue Verbindung, nur die neue Nachricht."""
+    arch, path, i = job
+    app = build(arch, path)
+    before = len(load_state(app, f"{arch}-{i}").get("messages", []))
+    out = app.invoke(turn_input(SECOND), thread_config(f"{arch}-{i}"))
+    return i, out, before
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--arch", action="append", choices=ARCHITECTURES, help="nur diese Architektur(en)")
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    problems: list[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.sqlite")
+        ctx = multiprocessing.get_context("spawn")
+        for arch in args.arch or ARCHITECTURES:
+            app = build(arch, path)
+            for i in range(args.sessions):
+                first_turn(app, arch, i)
+
+            with ctx.Pool(args.processes) as pool:
+                results = pool.map(second_turn, [(arch, path, i) for i in range(args.sessions)])
+
+            found: list[str] = []
+            for i, out, before in results:
+                if before < 2:
+                    found.append(f"session {i}: Verlauf fehlt im Kindprozess ({before} Nachrichten)")
+                if not out.get("draft"):
+                    found.append(f"session {i}: kein Entwurf nach der Überarbeitung")
+                found += check_output(i, out)
+            print(f"{arch:<8} {args.sessions} Sitzungen, Turn 2 in {args.processes} Prozessen: "
+                  f"{'ok' if not found else f'{len(found)} Fehler'}")
+            problems += found
+
+    for p in problems[:20]:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
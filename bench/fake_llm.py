@@ -0,0 +1,399 @@
+"""Deterministischer, lokaler Ersatz für ChatOpenAI (ohne Netzwerk/API-Key).
+
+Simuliert Latenzen, Token-Zählungen, Tool-Calls und strukturierte Ausgaben,
+damit die drei Architekturen offline reproduzierbar verglichen werden können.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+from pipelines.prompts import (
+    GENERAL_SYSTEM_PROMPT,
+    SYSTEM_CHUNK_SUMMARY,
+    SYSTEM_MAIL_REPLY,
+    SYSTEM_NEW_MAIL,
+    SYSTEM_REDUCE_SUMMARY,
+    SYSTEM_REVISE,
+    SYSTEM_SUMMARIZER,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Grobe Token-Schätzung (~4 Zeichen pro Token), deterministisch."""
+    return max(1, math.ceil(len(text or "") / 4))
+
+
+def _content(m: BaseMessage) -> str:
+    return m.content if isinstance(m.content, str) else json.dumps(m.content, ensure_ascii=False)
+
+
+# -------------------- Latenzmodell
+@dataclass(frozen=True)
+class LatencyProfile:
+    """Lognormal verteilte Time-to-first-token plus Kosten pro Token (Sekunden)."""
+    ttft_median: float = 0.35
+    ttft_sigma: float = 0.25
+    per_prompt_token: float = 0.00005
+    per_completion_token: float = 0.012
+
+    def sample(self, rng: random.Random, prompt_tokens: int, completion_tokens: int) -> tuple[float, float]:
+        """Liefert (Time-to-first-token, Gesamtlatenz)."""
+        ttft = self.ttft_median * math.exp(rng.gauss(0.0, self.ttft_sigma)) + prompt_tokens * self.per_prompt_token
+        return ttft, ttft + completion_tokens * self.per_completion_token
+
+
+# Kleineres, schnelleres Modell (z. B. für den Router in ``ModelRegistry``-Benchmarks).
+NANO_PROFILE = LatencyProfile(ttft_median=0.25, per_completion_token=0.006)
+
+
+@dataclass
+class CallRecord:
+    role: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency: float
+    start: float = 0.0
+    end: float = 0.0
+    model: str = ""
+
+
+@dataclass
+class FakeStats:
+    """Gesammelte Aufrufe; thread-safe, damit parallele Knoten/Tools mitgezählt werden."""
+    calls: list[CallRecord] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, rec: CallRecord) -> None:
+        with self._lock:
+            self.calls.append(rec)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls = []
+
+    def snapshot(self) -> list[CallRecord]:
+        with self._lock:
+            return list(self.calls)
+
+
+# -------------------- Intent-Heuristik (ersetzt das echte Modell)
+_INTENT_PATTERNS = [
+    ("revise", re.compile(r"überarbeit|kürzer|länger|förmlicher|ändere|englisch|revise", re.I)),
+    ("new", re.compile(r"neue (e-)?mail|schreib(e)? eine (e-)?mail an|verfasse", re.I)),
+    ("summary", re.compile(r"zusammen|kurzfassung|summary", re.I)),
+    ("reply", re.compile(r"antwort|reply|beantworte", re.I)),
+]
+
+
+def guess_intents(text: str, has_mail: bool = True, has_draft: bool = True) -> list[str]:
+    """Alle erkannten, zulässigen Intents in Reihenfolge ihres Auftretens im Text."""
+    found = []
+    for intent, pat in _INTENT_PATTERNS:
+        hit = pat.search(text or "")
+        if not hit:
+            continue
+        if intent in ("summary", "reply") and not has_mail:
+            continue
+        if intent == "revise" and not has_draft:
+            continue
+        found.append((hit.start(), intent))
+    return [intent for _, intent in sorted(found)] or ["general"]
+
+
+def guess_intent(text: str, has_mail: bool = True, has_draft: bool = True) -> str:
+    for intent, pat in _INTENT_PATTERNS:
+        if pat.search(text or ""):
+            if intent in ("summary", "reply") and not has_mail:
+                return "general"
+            if intent == "revise" and not has_draft:
+                return "general"
+            return intent
+    return "general"
+
+
+def _last_human(messages: Sequence[BaseMessage]) -> str:
+    for m in reversed(messages):
+        if isinstance(m, HumanMessage):
+            return _content(m)
+    return ""
+
+
+def _context_block(messages: Sequence[BaseMessage], label: str) -> str:
+    """Liest 'MAIL:'/'DRAFT:'-Blöcke aus dem Agent-System-Prompt."""
+    for m in messages:
+        if isinstance(m, SystemMessage):
+            hit = re.search(rf"(?:^|\n){label}:\n(.*?)(?=\n\n[A-Z]+:\n|\Z)", _content(m), flags=re.S)
+            if hit:
+                return hit.group(1)
+    return ""
+
+
+# -------------------- Vorgefertigte Antworten
+_SUMMARY = (
+    "– Anfrage: Abstimmungstermin zum Projektstand\n"
+    "– Vorschlag: Dienstag, 10:00 Uhr, Raum B2\n"
+    "– Bitte um Rückmeldung bis Freitag\n"
+    "Offene Punkte: Teilnehmerkreis nicht genannt."
+)
+_MAIL = (
+    "Betreff: {subject}\n"
+    "Guten Tag Frau Keller,\n\n"
+    "vielen Dank für Ihre Nachricht. Den vorgeschlagenen Termin am Dienstag um 10:00 Uhr "
+    "nehme ich gerne wahr. Zur Vorbereitung sende ich Ihnen bis Montag eine kurze Übersicht "
+    "zum aktuellen Projektstand. Falls sich an Raum oder Uhrzeit etwas ändert, geben Sie mir "
+    "bitte kurz Bescheid.\n\n"
+    "Mit freundlichen Grüßen\n"
+    "<Name>"
+)
+_GENERAL = (
+    "Gerne! Ich kann E-Mails zusammenfassen, Antworten entwerfen, neue Mails schreiben "
+    "und Entwürfe überarbeiten. Soll ich eine Mail für dich entwerfen?"
+)
+
+
+# Die Sprachzeile im Reply-Prompt setzt ``pipelines.memo.reply_system`` je Mail ein.
+_REPLY_ROLE = SYSTEM_MAIL_REPLY.split("\n", 1)[0]
+
+_MARKER_RE = re.compile(r"\[\[[^\[\]]+\]\]")
+
+
+class FakeChatOpenAI(BaseChatModel):
+    """In-Process-Stand-in für ``ChatOpenAI``.
+
+    Erkennt die Rolle eines Aufrufs an den System-Prompts aus ``pipelines.prompts``
+    und liefert passende, deterministische Antworten. ``time_scale`` skaliert die
+    tatsächlich geschlafene Zeit; die simulierte Latenz wird unskaliert protokolliert.
+    """
+
+    model_name: str = "fake-gpt-4o-mini"
+    temperature: float = 0.0
+    seed: int = 0
+    time_scale: float = 1.0
+    profile: LatencyProfile = LatencyProfile()
+    # Hängt alle ``[[...]]``-Marker aus dem Prompt an Textantworten an (Session-Stresstest).
+    echo_markers: bool = False
+
+    _stats: FakeStats = PrivateAttr(default_factory=FakeStats)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-openai"
+
+    @property
+    def stats(self) -> FakeStats:
+        return self._stats
+
+    def tier(self, model_name: str, profile: LatencyProfile) -> FakeChatOpenAI:
+        """Weiteres Modell mit eigenem Namen/Latenzprofil, aber gemeinsamer Statistik."""
+        return self.model_copy(update={"model_name": model_name, "profile": profile})
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[str] = None, **kwargs: Any):
+        formatted = [convert_to_openai_tool(t) for t in tools]
+        return self.bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    # ---------------- Antwortlogik
+    def _respond(self, messages: Sequence[BaseMessage], tools: Optional[list[dict]]) -> tuple[str, AIMessage]:
+        role, message = self._respond_plain(messages, tools)
+        if self.echo_markers and not message.tool_calls:
+            markers = sorted(set(_MARKER_RE.findall("\n".join(_content(m) for m in messages))))
+            if markers:
+                message = AIMessage(content=f"{message.content}\n{' '.join(markers)}")
+        return role, message
+
+    def _respond_plain(self, messages: Sequence[BaseMessage], tools: Optional[list[dict]]) -> tuple[str, AIMessage]:
+        system = "\n".join(_content(m) for m in messages if isinstance(m, SystemMessage))
+        tool_names = [t["function"]["name"] for t in (tools or [])]
+
+        if tool_names == ["Router"]:
+            has_mail = "has_mail=True" in system
+            has_draft = "has_draft=True" in system
+            intent = guess_intent(_last_human(messages), has_mail, has_draft)
+            args = {"type": intent, "logic": f"Heuristik: {intent}"}
+            return "router", self._tool_message(("Router", args))
+
+        if tool_names == ["RouterAnswer"]:
+            has_mail = "has_mail=True" in system
+            has_draft = "has_draft=True" in system
+            intent = guess_intent(_last_human(messages), has_mail, has_draft)
+            answer = {"summary": _SUMMARY, "general": _GENERAL}.get(intent, "")
+            args = {"type": intent, "logic": f"Heuristik: {intent}", "answer": answer}
+            return "router_answer", self._tool_message(("RouterAnswer", args))
+
+        if tool_names == ["EditScript"]:
+            # Dieselbe Änderung wie die Neufassung (siehe SYSTEM_REVISE unten), nur als Edit-Skript.
+            draft = re.search(r"ENTWURF:\n(.*?)\n\nFEEDBACK:", _content(messages[-1]), flags=re.S)
+            if draft and draft.group(1).count("gerne wahr") == 1:
+                args = {"edits": [{"op": "replace", "anchor": "gerne wahr", "text": "gerne wahr (10:00 Uhr)"}], "rewrite": False}
+            else:
+                args = {"edits": [], "rewrite": True}
+            return "revise_edits", self._tool_message(("EditScript", args))
+
+        if tool_names:
+            if messages and isinstance(messages[-1], ToolMessage):
+                results = []
+                for m in reversed(messages):
+                    if not isinstance(m, ToolMessage):
+                        break
+                    results.append(_content(m))
+                return "agent_final", AIMessage(content="\n\n".join(reversed(results)))
+            mail = _context_block(messages, "MAIL")
+            draft = _context_block(messages, "DRAFT")
+            question = _last_human(messages)
+            intents = guess_intents(question, bool(mail.strip()), bool(draft.strip()))
+            # Bieten die Tool-Schemas Referenzen an, nutzt das "Modell" sie statt des Volltexts.
+            by_ref = "$MAIL" in json.dumps(tools)
+            mail_arg = "$MAIL" if by_ref else mail
+            draft_arg = "$DRAFT" if by_ref else draft
+            args = {
+                "summary": {"mail": mail_arg},
+                "reply": {"mail": mail_arg, "extra": question},
+                "new": {"brief": question},
+                "revise": {"draft": draft_arg, "feedback": question},
+                "general": {"question": question},
+            }
+            return "agent_plan", self._tool_message(*[(i, args[i]) for i in intents])
+
+        if SYSTEM_CHUNK_SUMMARY in system:
+            # Map- bzw. Zwischen-Reduce-Stufe: eine Stichpunktzeile pro Abschnitt.
+            role = "summary_reduce" if SYSTEM_REDUCE_SUMMARY in system else "summary_chunk"
+            body = _content(messages[-1]).split("\n", 1)[-1]
+            first = next((line.strip() for line in body.split("\n") if line.strip()), "")
+            return role, AIMessage(content=f"– {first[:80]}")
+        if SYSTEM_REDUCE_SUMMARY in system:
+            return "summary_reduce", AIMessage(content=_SUMMARY)
+        if SYSTEM_SUMMARIZER in system:
+            return "summary", AIMessage(content=_SUMMARY)
+        if _REPLY_ROLE in system:
+            return "reply", AIMessage(content=_MAIL.format(subject="Re: Abstimmungstermin Projektstand"))
+        if SYSTEM_NEW_MAIL in system:
+            return "new", AIMessage(content=_MAIL.format(subject="Abstimmungstermin Projektstand"))
+        if SYSTEM_REVISE in system:
+            draft = re.search(r"ENTWURF:\n(.*?)\n\nFEEDBACK:", _content(messages[-1]), flags=re.S)
+            text = draft.group(1) if draft else _MAIL.format(subject="Abstimmungstermin")
+            return "revise", AIMessage(content=text.replace("gerne wahr", "gerne wahr (10:00 Uhr)", 1))
+        if GENERAL_SYSTEM_PROMPT in system:
+            return "general", AIMessage(content=_GENERAL)
+        return "other", AIMessage(content=_GENERAL)
+
+    def _tool_message(self, *calls: tuple[str, dict]) -> AIMessage:
+        tool_calls = []
+        for name, args in calls:
+            call_id = "call_" + hashlib.sha1(json.dumps([name, args], sort_keys=True).encode()).hexdigest()[:12]
+            tool_calls.append({"name": name, "args": args, "id": call_id, "type": "tool_call"})
+        return AIMessage(content="", tool_calls=tool_calls)
+
+    def _rng(self, messages: Sequence[BaseMessage]) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}|".encode() + "\x1e".join(_content(m) for m in messages).encode())
+        return random.Random(int.from_bytes(digest.digest()[:8], "big"))
+
+    def _plan(self, messages: list[BaseMessage], **kwargs: Any) -> tuple[str, AIMessage, int, int, float, float]:
+        role, message = self._respond(messages, kwargs.get("tools"))
+
+        prompt_tokens = sum(estimate_tokens(_content(m)) for m in messages)
+        prompt_tokens += sum(estimate_tokens(json.dumps(t)) for t in kwargs.get("tools") or [])
+        completion_tokens = estimate_tokens(message.content) if message.content else 0
+        completion_tokens += sum(estimate_tokens(json.dumps(tc["args"], ensure_ascii=False)) for tc in message.tool_calls)
+
+        ttft, latency = self.profile.sample(self._rng(messages), prompt_tokens, completion_tokens)
+        return role, message, prompt_tokens, completion_tokens, ttft, latency
+
+    def _result(self, message: AIMessage, prompt_tokens: int, completion_tokens: int) -> ChatResult:
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        message.response_metadata = {"model_name": self.model_name}
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"model_name": self.model_name},
+        )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        role, message, prompt_tokens, completion_tokens, _, latency = self._plan(messages, **kwargs)
+        start = time.perf_counter()
+        time.sleep(latency * self.time_scale)
+        end = time.perf_counter()
+        self._stats.add(CallRecord(role, prompt_tokens, completion_tokens, latency, start, end, self.model_name))
+        return self._result(message, prompt_tokens, completion_tokens)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Echte asyncio-Wartezeit statt Thread-Executor, damit Event-Loop-Nebenläufigkeit messbar ist.
+        role, message, prompt_tokens, completion_tokens, _, latency = self._plan(messages, **kwargs)
+        start = time.perf_counter()
+        await asyncio.sleep(latency * self.time_scale)
+        end = time.perf_counter()
+        self._stats.add(CallRecord(role, prompt_tokens, completion_tokens, latency, start, end, self.model_name))
+        return self._result(message, prompt_tokens, completion_tokens)
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        """Liefert Text wortweise: erst nach ``ttft``, danach im Takt der Completion-Tokens."""
+        role, message, prompt_tokens, completion_tokens, ttft, latency = self._plan(messages, **kwargs)
+        start = time.perf_counter()
+        time.sleep(ttft * self.time_scale)
+
+        if message.tool_calls:
+            time.sleep((latency - ttft) * self.time_scale)
+            chunks = [
+                AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {"name": tc["name"], "args": json.dumps(tc["args"], ensure_ascii=False), "id": tc["id"], "index": i}
+                        for i, tc in enumerate(message.tool_calls)
+                    ],
+                )
+            ]
+        else:
+            pieces = re.findall(r"\S+\s*|\s+", message.content) or [""]
+            per_piece = (latency - ttft) / len(pieces)
+            chunks = []
+            for i, piece in enumerate(pieces):
+                if i:
+                    time.sleep(per_piece * self.time_scale)
+                chunks.append(AIMessageChunk(content=piece))
+                if i < len(pieces) - 1:
+                    yield ChatGenerationChunk(message=chunks[-1])
+            time.sleep(per_piece * self.time_scale)
+
+        last = chunks[-1]
+        last.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        last.response_metadata = {"model_name": self.model_name}
+        self._stats.add(CallRecord(role, prompt_tokens, completion_tokens, latency, start, time.perf_counter(), self.model_name))
+        yield ChatGenerationChunk(message=last)
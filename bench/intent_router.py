@@ -0,0 +1,188 @@
+"""Lokaler Intent-Klassifikator gegen den LLM-Router (``pipelines.intent``), offline mit dem Fake-Modell.
+
+1. Labeln: Mehrturn-Sitzungen aus Vorlagen laufen durch den Routing-Graphen; die
+   Entscheidungen des (Fake-)Routers werden wie im Betrieb über ``ROUTER_LOG_PATH``
+   mitgeschrieben – Trainingssitzungen und zurückgehaltene Sitzungen getrennt.
+2. Trainieren auf den Trainingssitzungen, auswerten auf den zurückgehaltenen:
+   Übereinstimmung mit dem Router und Anteil lokal entschiedener Turns je Schwelle.
+3. Wiederholen der zurückgehaltenen Sitzungen mit Klassifikator vor dem Router: gezählt
+   werden die tatsächlich eingesparten Router-Aufrufe und abweichende Routen.
+4. Latenz einer lokalen Entscheidung (Median, Mikrosekunden).
+
+Aufruf:
+    python -m bench.intent_router
+    python -m bench.intent_router --sessions 400 --threshold 0.9 --log router_log.jsonl
+
+Mit ``--log`` bleiben die Trainingsdaten liegen, z. B. für
+``python -m pipelines.intent train router_log.jsonl --out intent.npz``.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from pipelines import graph_routing
+from pipelines.intent import IntentClassifier, IntentPolicy, evaluate, format_evaluation, load_examples
+from pipelines.sessions import thread_config, turn_input
+
+from .fake_llm import FakeChatOpenAI
+from .scenarios import MAIL
+
+NAMES = ("Frau Berger", "Herrn Wolf", "das Team", "Jonas", "die Buchhaltung", "Prof. Keller")
+TOPICS = ("das Budget", "den Projektstand", "die Raumbuchung", "den Workshop", "die Urlaubsplanung")
+DAYS = ("Dienstag", "Donnerstag", "den 14.", "nächste Woche")
+
+TEMPLATES = {
+    "summary": (
+        "Fass die Mail zusammen",
+        "Kannst du mir eine Kurzfassung geben",
+        "Gib mir eine Zusammenfassung der Nachricht",
+        "Worum geht es? Bitte kurz zusammenfassen",
+        "summary please",
+        "Fasse das Wichtigste in drei Punkten zusammen",
+    ),
+    "reply": (
+        "Schreib eine Antwort",
+        "Beantworte die Mail",
+        "Formuliere eine Antwort an {name}",
+        "Antworte bitte höflich und sag für {day} zu",
+        "Entwirf eine kurze Antwort",
+        "Wir brauchen eine Antwort auf die Anfrage",
+    ),
+    "new": (
+        "Schreib eine Mail an {name} wegen {topic}",
+        "Verfasse eine Einladung an {name}",
+        "Neue Mail an {name}: {topic}",
+        "Schreibe eine E-Mail an {name} zu {topic}",
+        "Verfasse eine Erinnerung für {topic}",
+    ),
+    "revise": (
+        "Mach den Entwurf kürzer",
+        "Bitte förmlicher",
+        "Überarbeite den Entwurf",
+        "Ändere den Termin auf {day}",
+        "Bitte auf Englisch",
+        "Etwas länger bitte",
+        "Ändere die Anrede",
+    ),
+    "general": (
+        "Was bedeutet Projektstand?",
+        "Danke!",
+        "Wie spät ist es in Tokio?",
+        "Welche Grußformel passt zu {name}?",
+        "Wie sage ich höflich ab?",
+        "Was hältst du von {topic}?",
+        "Wer ist {name}?",
+    ),
+}
+PREFIXES = ("", "", "Bitte ", "Hey, ", "Okay. ", "Kurze Frage: ")
+SUFFIXES = ("", "", ".", "!", " danke", " bitte")
+# Wahrscheinlichster nächster Wunsch je vorherigem Intent (Rest gleichverteilt).
+FOLLOW_UP = {"reply": "revise", "new": "revise", "revise": "revise", "summary": "reply"}
+
+
+def prompt_for(intent: str, rng: random.Random) -> str:
+    text = rng.choice(TEMPLATES[intent]).format(name=rng.choice(NAMES), topic=rng.choice(TOPICS), day=rng.choice(DAYS))
+    return f"{rng.choice(PREFIXES)}{text}{rng.choice(SUFFIXES)}"
+
+
+def make_sessions(n: int, turns: int, seed: int) -> list[tuple[bool, list[str]]]:
+    """``n`` Sitzungen (mit Mail?, Prompts); Folge-Wünsche hängen am vorherigen Wunsch."""
+    rng = random.Random(seed)
+    sessions = []
+    for _ in range(n):
+        previous, prompts = "", []
+        for _ in range(turns):
+            intent = FOLLOW_UP.get(previous) if rng.random() < 0.5 else None
+            intent = intent or rng.choice(tuple(TEMPLATES))
+            prompts.append(prompt_for(intent, rng))
+            previous = intent
+        sessions.append((rng.random() < 0.7, prompts))
+    return sessions
+
+
+def run_sessions(sessions: list[tuple[bool, list[str]]], policy: IntentPolicy, tag: str) -> tuple[list[str], int]:
+    """Routen aller Turns und Zahl der Router-Aufrufe."""
+    llm = FakeChatOpenAI(time_scale=0.0)
+    app = graph_routing.build_app(llm, checkpointer=InMemorySaver(), intent=policy)
+    routes = []
+    for i, (has_mail, prompts) in enumerate(sessions):
+        config = thread_config(f"{tag}-{i}")
+        if has_mail:
+            app.update_state(config, {"uploaded_mail": MAIL})
+        for prompt in prompts:
+            routes.append(app.invoke(turn_input(prompt), config)["router"]["type"])
+    return routes, sum(c.role == "router" for c in llm.stats.snapshot())
+
+
+def local_latency_us(classifier: IntentClassifier, prompts: list[str], repeat: int = 2000) -> float:
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        classifier.predict(prompts[i % len(prompts)], True, True, "reply")
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1e6
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--holdout", type=float, default=0.25, help="Anteil zurückgehaltener Sitzungen")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log", help="Trainings-Log hier ablegen (Default: temporär)")
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="Mindest-Übereinstimmung im Replay")
+    parser.add_argument("--min-saved", type=float, default=0.8, help="Mindestanteil eingesparter Router-Aufrufe")
+    parser.add_argument("--max-latency-us", type=float, default=1000.0)
+    args = parser.parse_args(argv)
+
+    sessions = make_sessions(args.sessions, args.turns, args.seed)
+    cut = int(len(sessions) * (1 - args.holdout))
+    with tempfile.TemporaryDirectory() as tmp:
+        train_log = args.log or os.path.join(tmp, "train.jsonl")
+        test_log = os.path.join(tmp, "test.jsonl")
+        if os.path.exists(train_log):
+            os.remove(train_log)
+        run_sessions(sessions[:cut], IntentPolicy(log_path=train_log), "train")
+        baseline, router_calls = run_sessions(sessions[cut:], IntentPolicy(log_path=test_log), "test")
+        train, test = load_examples(train_log), load_examples(test_log)
+
+    t0 = time.perf_counter()
+    classifier = IntentClassifier.fit(train)
+    fit_s = time.perf_counter() - t0
+    print(f"Training: {len(train)} Turns in {fit_s:.2f}s · Auswertung: {len(test)} Turns zurückgehalten")
+    print(format_evaluation(evaluate(classifier, test, sorted({0.0, 0.7, 0.8, 0.9, 0.95, args.threshold}))))
+
+    policy = IntentPolicy(classifier, threshold=args.threshold)
+    routes, calls = run_sessions(sessions[cut:], policy, "replay")
+    agreement = sum(a == b for a, b in zip(routes, baseline)) / len(baseline)
+    saved = 1 - calls / router_calls if router_calls else 0.0
+    latency = local_latency_us(classifier, [e.text for e in test])
+    print(
+        f"Replay (Schwelle {args.threshold:.2f}): {router_calls - calls}/{router_calls} Router-Aufrufe gespart "
+        f"({saved:.1%}), Übereinstimmung {agreement:.1%}, lokal {latency:.0f} µs/Entscheidung"
+    )
+
+    problems = []
+    if agreement < args.min_agreement:
+        problems.append(f"Übereinstimmung {agreement:.1%} < {args.min_agreement:.0%}")
+    if saved < args.min_saved:
+        problems.append(f"nur {saved:.1%} Router-Aufrufe gespart")
+    if latency > args.max_latency_us:
+        problems.append(f"lokale Entscheidung {latency:.0f} µs")
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""Lasttest: wie viele gleichzeitige Nutzer:innen verkraftet *ein* Worker je Architektur?
+
+Simuliert N gleichzeitige Sitzungen, die realistische Mehr-Turn-Skripte (``SCRIPTS``)
+durch ``monolith``, ``graph_routing`` und ``graph_agent`` schicken – über echtes HTTP
+gegen den lokalen OpenAI-kompatiblen Stub (``bench.stub_server``: Streaming, Tools,
+strukturierte Ausgabe, einstellbare Latenz, Kapazitätsgrenze mit HTTP 429). Die
+Modelle kommen wie in den Apps aus ``ModelRegistry.from_specs`` (gemeinsamer
+httpx-Pool, Deadlines und Retries je Rolle).
+
+Die Nebenläufigkeit steigt stufenweise (``--levels``). Je Stufe laufen frischer
+Stub, frisches Register und frisch gebaute Graphen (ein neuer Worker); jede Sitzung
+arbeitet ihre Skripte nacheinander ab (geschlossene Last, optional mit Denkpause).
+Berichtet werden je Architektur und Stufe:
+
+- Durchsatz (Turns/s) und Turn-Latenz p50/p95/p99,
+- Fehler (Turns mit Exception) sowie Retries und 429-Ablehnungen des Stubs,
+- Warteschlange: mit ``--slots`` bearbeitet der Worker höchstens so viele Turns
+  gleichzeitig (wie ein Thread-Pool); ``queue p95`` ist die Wartezeit auf einen
+  Slot, ``inflight`` die höchste Zahl gleichzeitiger Anfragen am Stub.
+
+Zeiten sind gemessene Wall-Zeiten bei ``--time-scale`` (simulierte Modell-Latenzen
+werden damit skaliert, Orchestrierungs-Overhead nicht). Am Ende steht je Architektur
+die höchste Stufe, die ``--slo-p95`` und ``--max-error-rate`` einhält.
+
+Aufruf:
+    python -m bench.loadtest
+    python -m bench.loadtest --arch routing --levels 1,8,32,64 --slots 16 --capacity 24
+    python -m bench.loadtest --mode async --out bench/load.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from langchain_core.messages import HumanMessage
+
+from pipelines import graph_agent, graph_routing, monolith
+from pipelines.ledger import percentile
+from pipelines.models import ModelRegistry, ModelSpec, tiers_from_env
+from pipelines.resilience import policies_from_env
+
+from .scenarios import DRAFT, MAIL
+from .stub_server import Faults, StubServer
+
+ARCHITECTURES = ("monolith", "routing", "agent")
+MODES = ("threads", "async")
+
+
+@dataclass(frozen=True)
+class Turn:
+    """Ein Schritt im Skript: Chat-Eingabe für die Graphen, Operation für den Monolithen.
+
+    ``op`` ``None``: im Monolithen nicht vorhanden (dort übersprungen).
+    ``extra``: Zusatzinfos (reply) bzw. Feedback (revise) im Monolithen.
+    """
+    prompt: str
+    op: Optional[str] = None
+    extra: str = ""
+
+
+@dataclass(frozen=True)
+class Script:
+    name: str
+    turns: tuple[Turn, ...]
+    mail: str = ""
+    draft: str = ""
+
+
+SCRIPTS: tuple[Script, ...] = (
+    Script("triage", (
+        Turn("Fass die Mail bitte kurz zusammen.", "summarize_text"),
+        Turn("Schreib eine Antwort: Termin zusagen, Übersicht bis Montag.", "write_reply_mail",
+             "Termin zusagen, Übersicht bis Montag."),
+        Turn("Bitte überarbeiten: Termin explizit 10:00 Uhr.", "revise_mail", "Termin explizit 10:00 Uhr."),
+    ), mail=MAIL),
+    Script("compose", (
+        Turn("Schreibe eine Mail an Frau Keller: Terminvorschlag Dienstag 10:00 Uhr, förmlich.", "write_new_mail"),
+        Turn("Bitte etwas kürzer und freundlicher.", "revise_mail", "Bitte etwas kürzer und freundlicher."),
+    )),
+    Script("followup", (
+        Turn("Wobei kannst du mir helfen?"),
+        Turn("Bitte den Entwurf förmlicher überarbeiten.", "revise_mail", "Bitte förmlicher."),
+    ), mail=MAIL, draft=DRAFT),
+)
+
+
+# -------------------- Sitzungen
+class Session:
+    """Zustand einer simulierten Sitzung (Verlauf, Entwurf) über ihre Turns hinweg."""
+
+    def __init__(self, arch: str, script: Script):
+        self.arch = arch
+        self.script = script
+        self.reset()
+
+    def reset(self) -> None:
+        """Neuer Skript-Durchlauf: leerer Verlauf, Mail und Entwurf wie im Skript."""
+        self.state: dict = {"messages": [], "uploaded_mail": self.script.mail, "draft": self.script.draft}
+
+    def skip(self, turn: Turn) -> bool:
+        return self.arch == "monolith" and turn.op is None
+
+    def _graph_input(self, turn: Turn) -> dict:
+        return {**self.state, "messages": [*self.state["messages"], HumanMessage(content=turn.prompt)]}
+
+    def _take(self, out: dict) -> None:
+        self.state = {"messages": out["messages"], "uploaded_mail": self.state["uploaded_mail"],
+                      "draft": out.get("draft", ""), "memo": out.get("memo", {})}
+
+    def _monolith_args(self, turn: Turn) -> tuple:
+        if turn.op == "summarize_text":
+            return (self.state["uploaded_mail"],)
+        if turn.op == "write_reply_mail":
+            return (self.state["uploaded_mail"], turn.extra)
+        if turn.op == "write_new_mail":
+            return (turn.prompt,)
+        return (self.state["draft"], turn.extra)
+
+    def _monolith_take(self, turn: Turn, text: str) -> None:
+        if turn.op != "summarize_text":
+            self.state["draft"] = text
+
+    def run(self, worker: Worker, turn: Turn) -> None:
+        if self.arch == "monolith":
+            self._monolith_take(turn, getattr(monolith, turn.op)(worker.models, *self._monolith_args(turn)))
+        else:
+            self._take(worker.app.invoke(self._graph_input(turn)))
+
+    async def arun(self, worker: Worker, turn: Turn) -> None:
+        if self.arch == "monolith":
+            fn = getattr(monolith, f"a{turn.op}")
+            self._monolith_take(turn, await fn(worker.models, *self._monolith_args(turn)))
+        else:
+            self._take(await worker.app.ainvoke(self._graph_input(turn)))
+
+
+# -------------------- Worker je Stufe
+@dataclass
+class TurnRecord:
+    script: str
+    latency_s: float
+    queue_s: float
+    error: Optional[str] = None
+
+
+class Worker:
+    """Ein Worker-Prozess im Kleinen: Register, Graph und (optional) begrenzte Slots."""
+
+    def __init__(self, arch: str, server: StubServer, slots: Optional[int]):
+        primary = ModelSpec(base_url=server.url)
+        self.models = ModelRegistry.from_specs(
+            tiers_from_env({}, primary), primary, resilience=policies_from_env({}), api_key="stub", cache=False
+        )
+        self.app = None if arch == "monolith" else (graph_routing if arch == "routing" else graph_agent).build_app(self.models)
+        self.slots = slots
+        self.records: list[TurnRecord] = []
+        self._lock = threading.Lock()
+
+    def record(self, rec: TurnRecord) -> None:
+        with self._lock:
+            self.records.append(rec)
+
+
+def _error(exc: BaseException) -> str:
+    return type(exc).__name__
+
+
+def run_threads(worker: Worker, sessions: list[Session], rounds: int, think_s: float) -> None:
+    gate = threading.BoundedSemaphore(worker.slots) if worker.slots else None
+
+    def user(session: Session) -> None:
+        for _ in range(rounds):
+            for turn in session.script.turns:
+                if session.skip(turn):
+                    continue
+                start = time.perf_counter()
+                if gate:
+                    gate.acquire()
+                queued = time.perf_counter() - start
+                error = None
+                try:
+                    session.run(worker, turn)
+                except Exception as e:
+                    error = _error(e)
+                finally:
+                    if gate:
+                        gate.release()
+                worker.record(TurnRecord(session.script.name, time.perf_counter() - start, queued, error))
+                time.sleep(think_s)
+            session.reset()
+
+    with ThreadPoolExecutor(max_workers=len(sessions)) as pool:
+        list(pool.map(user, sessions))
+
+
+def run_async(worker: Worker, sessions: list[Session], rounds: int, think_s: float) -> None:
+    async def main() -> None:
+        gate = asyncio.Semaphore(worker.slots) if worker.slots else None
+
+        async def user(session: Session) -> None:
+            for _ in range(rounds):
+                for turn in session.script.turns:
+                    if session.skip(turn):
+                        continue
+                    start = time.perf_counter()
+                    if gate:
+                        await gate.acquire()
+                    queued = time.perf_counter() - start
+                    error = None
+                    try:
+                        await session.arun(worker, turn)
+                    except Exception as e:
+                        error = _error(e)
+                    finally:
+                        if gate:
+                            gate.release()
+                    worker.record(TurnRecord(session.script.name, time.perf_counter() - start, queued, error))
+                    await asyncio.sleep(think_s)
+                session.reset()
+
+        await asyncio.gather(*(user(s) for s in sessions))
+
+    asyncio.run(main())
+
+
+# -------------------- Auswertung
+@dataclass
+class LevelResult:
+    arch: str
+    users: int
+    turns: int
+    wall_s: float
+    throughput: float  # Turns pro Sekunde
+    p50_s: float
+    p95_s: float
+    p99_s: float
+    queue_p95_s: float
+    errors: int
+    error_rate: float
+    error_types: dict[str, int] = field(default_factory=dict)
+    requests: int = 0
+    rejected: int = 0
+    retries: int = 0
+    max_in_flight: int = 0
+
+
+def run_level(arch: str, users: int, args: argparse.Namespace) -> LevelResult:
+    faults = Faults(spike_rate=args.spike_rate, spike_s=args.spike_s, error_rate=args.error_rate, seed=args.seed)
+    with StubServer(time_scale=args.time_scale, faults=faults, latency_s=args.latency_s, capacity=args.capacity) as srv:
+        worker = Worker(arch, srv, args.slots)
+        sessions = [Session(arch, SCRIPTS[i % len(SCRIPTS)]) for i in range(users)]
+        run = run_async if args.mode == "async" else run_threads
+        start = time.perf_counter()
+        run(worker, sessions, args.rounds, args.think_s)
+        wall = time.perf_counter() - start
+        stub = srv.stats.snapshot()
+    ok = [r.latency_s for r in worker.records if r.error is None]
+    errors = Counter(r.error for r in worker.records if r.error is not None)
+    turns = len(worker.records)
+    return LevelResult(
+        arch=arch,
+        users=users,
+        turns=turns,
+        wall_s=wall,
+        throughput=len(ok) / wall if wall else 0.0,
+        p50_s=percentile(ok, 50),
+        p95_s=percentile(ok, 95),
+        p99_s=percentile(ok, 99),
+        queue_p95_s=percentile([r.queue_s for r in worker.records], 95),
+        errors=sum(errors.values()),
+        error_rate=sum(errors.values()) / turns if turns else 0.0,
+        error_types=dict(errors),
+        requests=stub["requests"],
+        rejected=stub["rejected"],
+        retries=worker.models.resilience_stats().get("retries", 0),
+        max_in_flight=stub["max_in_flight"],
+    )
+
+
+def within_slo(row: LevelResult, slo_p95: float, max_error_rate: float) -> bool:
+    return row.p95_s <= slo_p95 and row.error_rate <= max_error_rate
+
+
+def format_row(r: LevelResult) -> str:
+    return (f"{r.arch:<9} {r.users:>5} {r.turns:>6} {r.throughput:>8.1f} {r.p50_s:>7.2f}s {r.p95_s:>7.2f}s "
+            f"{r.p99_s:>7.2f}s {r.queue_p95_s:>8.2f}s {r.error_rate:>6.1%} {r.retries:>7} {r.rejected:>6} {r.max_in_flight:>8}")
+
+
+HEADER = (f"{'arch':<9} {'users':>5} {'turns':>6} {'turns/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'queue p95':>9} {'errors':>6} {'retries':>7} {'429':>6} {'inflight':>8}")
+
+
+def _levels(text: str) -> list[int]:
+    return sorted({int(x) for x in text.split(",") if x.strip()})
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--arch", action="append", choices=ARCHITECTURES, help="nur diese Architektur(en)")
+    parser.add_argument("--levels", type=_levels, default=_levels("1,4,16,32"), help="Nutzerzahlen, z. B. 1,8,32")
+    parser.add_argument("--mode", choices=MODES, default="threads",
+                        help="threads: ein Thread je Sitzung (wie Streamlit); async: ein Event-Loop")
+    parser.add_argument("--rounds", type=int, default=2, help="Skript-Durchläufe je Sitzung")
+    parser.add_argument("--think-s", type=float, default=0.0, help="Denkpause nach jedem Turn")
+    parser.add_argument("--slots", type=int, help="max. gleichzeitig bearbeitete Turns im Worker (sonst unbegrenzt)")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Faktor für simulierte Latenzen")
+    parser.add_argument("--latency-s", type=float, default=0.0, help="feste Zusatzlatenz je Anfrage am Stub")
+    parser.add_argument("--capacity", type=int, help="max. gleichzeitige Anfragen am Stub, darüber HTTP 429")
+    parser.add_argument("--spike-rate", type=float, default=0.0)
+    parser.add_argument("--spike-s", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slo-p95", type=float, default=2.0, help="p95-Grenze (Sekunden, gemessen)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--out", help="Ergebnisse als JSON schreiben")
+    args = parser.parse_args(argv)
+
+    print(f"Modus {args.mode}, time_scale {args.time_scale}, Slots {args.slots or 'unbegrenzt'}, "
+          f"Stub-Kapazität {args.capacity or 'unbegrenzt'}")
+    print(HEADER)
+    rows: list[LevelResult] = []
+    for arch in args.arch or ARCHITECTURES:
+        for users in args.levels:
+            row = run_level(arch, users, args)
+            rows.append(row)
+            print(format_row(row), flush=True)
+
+    print()
+    for arch in args.arch or ARCHITECTURES:
+        ok = [r.users for r in rows if r.arch == arch and within_slo(r, args.slo_p95, args.max_error_rate)]
+        limit = f"{max(ok)} Nutzer:innen" if ok else "keine Stufe"
+        print(f"{arch:<9} innerhalb SLO (p95 ≤ {args.slo_p95:.2f}s, Fehler ≤ {args.max_error_rate:.0%}): {limit}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k != "out"}, "results": [asdict(r) for r in rows]},
+                      f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""Skriptierte Aufgaben, die alle drei Architekturen identisch durchlaufen."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+
+MAIL = """Betreff: Abstimmungstermin Projektstand
+
+Hallo zusammen,
+
+ich würde gerne den aktuellen Projektstand mit euch abstimmen. Vorschlag: Dienstag um 10:00 Uhr
+in Raum B2. Bitte gebt mir bis Freitag Bescheid, ob der Termin passt, und bringt, falls möglich,
+eine kurze Übersicht zu offenen Punkten aus euren Teilbereichen mit.
+
+Außerdem: Die Abrechnung für das zweite Quartal muss bis Monatsende bei der Buchhaltung sein.
+Falls es noch Rückfragen zu einzelnen Positionen gibt, meldet euch gerne direkt bei mir.
+
+Viele Grüße
+Sandra Keller
+"""
+
+DRAFT = """Betreff: Re: Abstimmungstermin Projektstand
+Guten Tag Frau Keller,
+
+vielen Dank für Ihre Nachricht. Den vorgeschlagenen Termin am Dienstag nehme ich gerne wahr.
+Eine Übersicht zu den offenen Punkten bringe ich mit.
+
+Mit freundlichen Grüßen
+<Name>
+"""
+
+
+def _long_thread(mails: int = 14) -> str:
+    """Weitergeleiteter Verlauf mit Log-Auszügen – deutlich über der Chunking-Schwelle."""
+    parts = [MAIL]
+    for i in range(mails):
+        log = "\n".join(f"2024-05-{i + 1:02d} 10:{m:02d}:00 WARN sync job {i}-{m} retry after timeout" for m in range(12))
+        parts.append(
+            f"-----Ursprüngliche Nachricht-----\n"
+            f"Von: Team {i} <team{i}@example.com>\n"
+            f"Betreff: AW: Abstimmungstermin Projektstand ({i + 1})\n\n"
+            f"Hallo Sandra,\n\nhier unser Stand aus Teilbereich {i}. Offen ist noch die Migration des Sync-Jobs;\n"
+            f"Liefertermin für die Übersicht ist der {i + 10}. Juni. Auszug aus dem Log:\n\n{log}\n\n"
+            f"> Bitte gebt mir bis Freitag Bescheid, ob der Termin passt.\n\nGruß\nTeam {i}"
+        )
+    return "\n\n".join(parts)
+
+
+LONG_THREAD = _long_thread()
+
+
+def _noisy_mail() -> str:
+    """MAIL als HTML mit Zitatkette, Signatur und Disclaimer (Vorverarbeitung soll das entfernen)."""
+    body = "".join(f"<p>{p.replace(chr(10), '<br>')}</p>" for p in MAIL.strip().split("\n\n"))
+    quoted = "".join(f"<p>{line}</p>" for line in MAIL.strip().split("\n") if line.strip())
+    return (
+        "<html><head><style>p { margin: 0 }</style></head><body>"
+        f"{body}<p>-- <br>Sandra Keller | Projektleitung<br>Muster GmbH · Tel. +49 123 456</p>"
+        "<p>Diese E-Mail enthält vertrauliche Informationen. Wenn Sie nicht der richtige Adressat sind, "
+        "informieren Sie bitte sofort den Absender und vernichten Sie diese E-Mail.</p>"
+        f"<p>Am 02.05. schrieb Team:</p><blockquote>{quoted}<blockquote>{quoted}</blockquote></blockquote>"
+        "</body></html>"
+    )
+
+
+NOISY_MAIL = _noisy_mail()
+
+
+def _session_history(rounds: int = 8) -> tuple[AnyMessage, ...]:
+    """Lange Überarbeitungs-Sitzung: jede Runde erzeugt einen vollständigen Entwurf."""
+    msgs: list[AnyMessage] = [
+        HumanMessage(content="Schreib eine Antwort: Termin zusagen."),
+        AIMessage(content=f"Entwurf (Antwort):\n\n{DRAFT}"),
+    ]
+    for i in range(rounds):
+        msgs.append(HumanMessage(content=f"Bitte überarbeiten: Variante {i + 1}, etwas förmlicher."))
+        msgs.append(AIMessage(content=f"Überarbeiteter Entwurf:\n\n{DRAFT}\n(Variante {i + 1})"))
+    return tuple(msgs)
+
+
+@dataclass(frozen=True)
+class Task:
+    """Eine Aufgabe: Chat-Eingabe für die Graphen, Argumente für den Monolithen."""
+    name: str
+    prompt: str
+    mail: str = ""
+    draft: str = ""
+    extra: str = ""
+    monolith: Optional[str] = None
+    history: tuple[AnyMessage, ...] = field(default_factory=tuple)
+
+
+TASKS: list[Task] = [
+    Task(
+        name="summary",
+        prompt="Fass die Mail bitte kurz zusammen.",
+        mail=MAIL,
+        monolith="summarize_text",
+    ),
+    Task(
+        name="reply",
+        prompt="Schreib eine Antwort: Termin zusagen, Übersicht bis Montag.",
+        mail=MAIL,
+        extra="Termin zusagen, Übersicht bis Montag.",
+        monolith="write_reply_mail",
+    ),
+    Task(
+        name="new",
+        prompt="Schreibe eine Mail an Frau Keller: Terminvorschlag Dienstag 10:00 Uhr, förmlich.",
+        monolith="write_new_mail",
+    ),
+    Task(
+        name="revise",
+        prompt="Bitte überarbeiten: Termin explizit 10:00 Uhr.",
+        mail=MAIL,
+        draft=DRAFT,
+        monolith="revise_mail",
+    ),
+    Task(
+        name="general",
+        prompt="Wobei kannst du mir helfen?",
+    ),
+    # Lange Sitzung: Promptgröße soll durch die Verlaufskompaktierung beschränkt bleiben.
+    Task(
+        name="session",
+        prompt="Schreib eine Antwort, diesmal mit Terminbestätigung.",
+        mail=MAIL,
+        draft=DRAFT,
+        extra="Terminbestätigung",
+        monolith="write_reply_mail",
+        history=_session_history(),
+    ),
+    # HTML-Mail mit Zitaten/Signatur: Vorverarbeitung spart Prompt-Tokens in allen Pipelines.
+    Task(
+        name="noisy",
+        prompt="Fass die Mail bitte kurz zusammen.",
+        mail=NOISY_MAIL,
+        monolith="summarize_text",
+    ),
+    # Langer Verlauf: Zusammenfassung per Map-Reduce statt eines Riesenprompts.
+    Task(
+        name="thread",
+        prompt="Fass den Verlauf bitte kurz zusammen.",
+        mail=LONG_THREAD,
+        monolith="summarize_text",
+    ),
+    # Mehrere Tool-Calls in einem Agent-Turn (summary + reply); nur für die Graphen.
+    Task(
+        name="multi",
+        prompt="Fass die Mail zusammen und schreib eine Antwort: Termin zusagen.",
+        mail=MAIL,
+    ),
+]
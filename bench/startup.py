@@ -0,0 +1,123 @@
+"""Startzeit: Import der Pipeline-Module und Aufbau der Graphen, jeweils im frischen Prozess.
+
+Gemessen wird, was ein Kaltstart von UI, Bulk-CLI oder Benchmark bezahlt, bevor die
+erste Anfrage läuft. Jede Messung startet einen neuen Interpreter, damit keine
+bereits geladenen Module das Ergebnis schönen; berichtet wird der Median.
+
+Zusätzlich wird geprüft, dass der Start offline bleibt:
+
+- die Pipeline-Module laden ``langchain_openai``/``openai`` nicht (nur zur Typprüfung nötig),
+- ``build_app`` öffnet keine Netzwerkverbindung (kein Rendern über mermaid.ink).
+
+Aufruf:
+    python -m bench.startup
+    python -m bench.startup --repeat 5 --out bench/startup.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Optional
+
+# Module, die beim bloßen Import der Pipelines nicht geladen werden dürfen.
+HEAVY_MODULES = ("langchain_openai", "openai")
+
+# Name -> (Import, Aufbau); der Aufbau läuft nach dem Import und wird separat gemessen.
+TARGETS: dict[str, tuple[str, str]] = {
+    "preprocess": ("import pipelines.preprocess", ""),
+    "monolith": ("import pipelines.monolith", ""),
+    "bulk": ("import pipelines.bulk", ""),
+    "routing": (
+        "from pipelines.graph_routing import build_app",
+        "build_app(FakeChatOpenAI(time_scale=0.0))",
+    ),
+    "agent": (
+        "from pipelines.graph_agent import build_app",
+        "build_app(FakeChatOpenAI(time_scale=0.0))",
+    ),
+}
+
+# Läuft im Kindprozess; gibt eine JSON-Zeile aus.
+_PROBE = """
+import json, socket, sys, time
+t0 = time.perf_counter()
+{import_stmt}
+t1 = time.perf_counter()
+heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+connects = []
+def _no_network(*args, **kw):
+    connects.append(str(args[1] if isinstance(args[0], socket.socket) else args[0]))
+    raise OSError("startup probe: network disabled")
+socket.socket.connect = socket.getaddrinfo = _no_network
+build_s = None
+if {has_build}:
+    from bench.fake_llm import FakeChatOpenAI
+    t2 = time.perf_counter()
+    {build_stmt}
+    build_s = time.perf_counter() - t2
+print(json.dumps({{"import_s": t1 - t0, "build_s": build_s, "heavy": heavy, "connects": connects}}))
+"""
+
+
+def probe(import_stmt: str, build_stmt: str) -> dict:
+    code = _PROBE.format(
+        import_stmt=import_stmt, build_stmt=build_stmt or "pass", has_build=bool(build_stmt), heavy=HEAVY_MODULES
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure(name: str, repeat: int) -> dict:
+    import_stmt, build_stmt = TARGETS[name]
+    runs = [probe(import_stmt, build_stmt) for _ in range(repeat)]
+    builds = [r["build_s"] for r in runs if r["build_s"] is not None]
+    return {
+        "name": name,
+        "import_s": statistics.median(r["import_s"] for r in runs),
+        "build_s": statistics.median(builds) if builds else None,
+        "heavy": runs[0]["heavy"],
+        "connects": sorted({c for r in runs for c in r["connects"]}),
+    }
+
+
+def format_table(rows: list[dict]) -> str:
+    lines = [f"{'target':<11} {'import':>8} {'build':>8}  heavy modules / network"]
+    for r in rows:
+        build = f"{r['build_s']:.3f}s" if r["build_s"] is not None else "-"
+        notes = ", ".join(r["heavy"] + [f"connect {c}" for c in r["connects"]]) or "-"
+        lines.append(f"{r['name']:<11} {r['import_s']:>7.3f}s {build:>8}  {notes}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", choices=tuple(TARGETS), help="nur diese Messung(en)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="Ergebnis als JSON schreiben")
+    args = parser.parse_args(argv)
+
+    rows = [measure(name, args.repeat) for name in args.target or TARGETS]
+    print(format_table(rows))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+            f.write("\n")
+
+    problems = [f"{r['name']}: lädt {', '.join(r['heavy'])}" for r in rows if r["heavy"]]
+    problems += [f"{r['name']}: Netzwerkzugriff beim Aufbau ({', '.join(r['connects'])})" for r in rows if r["connects"]]
+    for p in problems:
+        print(f"FAIL {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
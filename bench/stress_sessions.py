@@ -0,0 +1,128 @@
+"""Stresstest: viele Sitzungen gleichzeitig auf *einem* kompilierten Graphen.
+
+Jede Sitzung bekommt eigene Marker (``[[mail-7]]``, ``[[ask-7]]``) in Mail und
+Anfrage. ``FakeChatOpenAI(echo_markers=True)`` hängt alle Marker aus dem Prompt an
+seine Antworten an – taucht in einer Antwort ein fremder Marker auf, hat eine
+Sitzung den State einer anderen gesehen.
+
+Zusätzlich laufen zwei Agent-Graphen mit verschiedenen Modellen parallel; jeder
+Aufruf muss beim eigenen Modell landen.
+
+Aufruf:
+    python -m bench.stress_sessions --sessions 64 --workers 16
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from langchain_core.messages import HumanMessage
+
+from pipelines import graph_agent, graph_routing
+
+from .fake_llm import FakeChatOpenAI
+from .scenarios import DRAFT, MAIL
+
+ARCHITECTURES = ("routing", "speculative", "agent")
+
+# Anfragen, die Mail bzw. Entwurf aus dem State lesen müssen.
+PROMPTS = (
+    "Fasse die Mail zusammen",
+    "Schreib eine Antwort und sag zu",
+    "Bitte den Entwurf förmlicher überarbeiten",
+)
+
+_MARKER_RE = re.compile(r"\[\[([a-z]+)-(\d+)\]\]")
+
+
+def session_state(i: int) -> dict:
+    return {
+        "messages": [HumanMessage(content=f"{PROMPTS[i % len(PROMPTS)]} [[ask-{i}]]")],
+        "uploaded_mail": f"{MAIL}\n[[mail-{i}]]",
+        "draft": f"{DRAFT}\n[[draft-{i}]]",
+    }
+
+
+def check_output(i: int, out: dict) -> list[str]:
+    """Fehlerliste für Sitzung ``i`` (leer = keine fremden Daten in der Antwort)."""
+    markers = _MARKER_RE.findall(out["messages"][-1].content)
+    foreign = sorted({f"{kind}-{n}" for kind, n in markers if int(n) != i})
+    problems = [f"session {i}: fremde Marker {foreign}"] if foreign else []
+    if len(foreign) == len(markers):
+        problems.append(f"session {i}: kein eigener Marker in der Antwort")
+    return problems
+
+
+def build(arch: str, llm: FakeChatOpenAI) -> Any:
+    if arch == "speculative":
+        return graph_routing.build_app(llm, speculation=graph_routing.SpeculationPolicy())
+    return (graph_routing if arch == "routing" else graph_agent).build_app(llm)
+
+
+def run_threads(app: Any, sessions: int, workers: int) -> list[str]:
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outs = list(pool.map(lambda i: app.invoke(session_state(i)), range(sessions)))
+    return [p for i, out in enumerate(outs) for p in check_output(i, out)]
+
+
+def run_async(app: Any, sessions: int, workers: int) -> list[str]:
+    async def main() -> list[dict]:
+        sem = asyncio.Semaphore(workers)
+
+        async def one(i: int) -> dict:
+            async with sem:
+                return await app.ainvoke(session_state(i))
+
+        return await asyncio.gather(*(one(i) for i in range(sessions)))
+
+    outs = asyncio.run(main())
+    return [p for i, out in enumerate(outs) for p in check_output(i, out)]
+
+
+def run_two_models(sessions: int, workers: int, time_scale: float) -> list[str]:
+    """Zwei Graphen, zwei Modelle: jeder Graph darf nur sein eigenes Modell aufrufen."""
+    llms = [FakeChatOpenAI(time_scale=time_scale, echo_markers=True, model_name=f"fake-{k}") for k in "ab"]
+    apps = [graph_agent.build_app(llm) for llm in llms]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda i: apps[i % 2].invoke(session_state(i)), range(sessions)))
+
+    problems = []
+    expected = [len(range(k, sessions, 2)) for k in range(2)]
+    for k, llm in enumerate(llms):
+        plans = sum(1 for c in llm.stats.snapshot() if c.role == "agent_plan")
+        if plans != expected[k]:
+            problems.append(f"model {llm.model_name}: {plans} Agent-Aufrufe, erwartet {expected[k]}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--arch", action="append", choices=ARCHITECTURES, help="nur diese Architektur(en)")
+    parser.add_argument("--sessions", type=int, default=48)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    problems: list[str] = []
+    for arch in args.arch or ARCHITECTURES:
+        app = build(arch, FakeChatOpenAI(time_scale=args.time_scale, echo_markers=True))
+        for mode, run in (("threads", run_threads), ("asyncio", run_async)):
+            found = run(app, args.sessions, args.workers)
+            print(f"{arch:<11} {mode:<8} {args.sessions} Sitzungen: {'ok' if not found else f'{len(found)} Fehler'}")
+            problems += found
+
+    found = run_two_models(args.sessions, args.workers, args.time_scale)
+    print(f"{'agent':<11} {'2 models':<8} {args.sessions} Sitzungen: {'ok' if not found else f'{len(found)} Fehler'}")
+    problems += found
+
+    for p in problems[:20]:
+        print(f"BLEED {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
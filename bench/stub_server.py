@@ -0,0 +1,289 @@
+"""Lokaler OpenAI-kompatibler Stub-Server (``POST /v1/chat/completions``) mit Fehlerinjektion.
+
+Antwortet mit der Logik von ``FakeChatOpenAI`` (gleiche Rollen-Erkennung, Token-
+Zählung und Latenzen), aber über echtes HTTP – so laufen ``ChatOpenAI``, das
+OpenAI-SDK, httpx-Pools, Timeouts und Retries wie gegen die echte API:
+
+- normale und gestreamte Antworten (SSE inkl. ``stream_options.include_usage``),
+- Tool-Calls (``tools``) und strukturierte Ausgabe (``response_format`` mit JSON-Schema),
+- ``Faults``: zufällige Latenzspitzen und HTTP-Fehler (reproduzierbar über ``seed``),
+- ``latency_s``: feste Zusatzlatenz je Anfrage (Netz/Warteschlange beim Anbieter),
+- ``capacity``: höchstens so viele Anfragen gleichzeitig, darüber HTTP 429 (Rate-Limit).
+
+Aufruf (z. B. für die UI mit ``MODEL_DEFAULT=gpt-4o-mini;base_url=http://127.0.0.1:8099/v1``):
+    python -m bench.stub_server --port 8099
+    python -m bench.stub_server --port 8099 --spike-rate 0.05 --spike-s 10 --error-rate 0.05
+    python -m bench.stub_server --port 8099 --latency-s 0.2 --capacity 32
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+from langchain_core.messages import AIMessage, convert_to_messages
+
+from bench.fake_llm import FakeChatOpenAI
+
+
+@dataclass(frozen=True)
+class Faults:
+    spike_rate: float = 0.0  # Anteil der Anfragen mit zusätzlicher Wartezeit vor der Antwort
+    spike_s: float = 5.0
+    error_rate: float = 0.0  # Anteil der Anfragen, die mit ``error_status`` scheitern
+    error_status: int = 503
+    seed: int = 0
+
+
+@dataclass
+class StubStats:
+    requests: int = 0
+    streamed: int = 0
+    errors: int = 0
+    spikes: int = 0
+    rejected: int = 0  # 429 wegen ``capacity``
+    disconnects: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def enter(self, stream: bool, capacity: Optional[int] = None) -> bool:
+        """Zählt die Anfrage; ``False``, wenn schon ``capacity`` Anfragen laufen (nicht angenommen)."""
+        with self._lock:
+            self.requests += 1
+            if capacity is not None and self.in_flight >= capacity:
+                self.rejected += 1
+                return False
+            self.streamed += stream
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return True
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def incr(self, key: str) -> None:
+        with self._lock:
+            setattr(self, key, getattr(self, key) + 1)
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+
+class StubServer:
+    """Startet den Server in einem Hintergrund-Thread; ``url`` ist die ``base_url`` für ``ChatOpenAI``."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        model: Optional[FakeChatOpenAI] = None,
+        faults: Faults = Faults(),
+        time_scale: float = 1.0,
+        latency_s: float = 0.0,
+        capacity: Optional[int] = None,
+    ):
+        """``latency_s`` wird wie die Modell-Latenzen mit ``time_scale`` skaliert."""
+        self.model = model or FakeChatOpenAI(time_scale=time_scale)
+        self.time_scale = self.model.time_scale
+        self.faults = faults
+        self.latency_s = latency_s
+        self.capacity = capacity
+        self.stats = StubStats()
+        self._rng = random.Random(faults.seed)
+        self._rng_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> StubServer:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Blockierend im aktuellen Thread (CLI)."""
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> StubServer:
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def draw_fault(self) -> tuple[Optional[int], float]:
+        """(HTTP-Fehlerstatus oder None, zusätzliche Wartezeit) für die nächste Anfrage."""
+        with self._rng_lock:
+            error = self._rng.random() < self.faults.error_rate
+            spike = self._rng.random() < self.faults.spike_rate
+        if error:
+            return self.faults.error_status, 0.0
+        return None, self.faults.spike_s if spike else 0.0
+
+
+def _structured_tool(response_format: Optional[dict]) -> Optional[dict]:
+    """``response_format`` mit JSON-Schema → gleichnamiges Tool, damit ``FakeChatOpenAI`` es erkennt."""
+    if not response_format or response_format.get("type") != "json_schema":
+        return None
+    schema = response_format["json_schema"]
+    return {"type": "function", "function": {"name": schema["name"], "parameters": schema.get("schema", {})}}
+
+
+def _tool_calls(message: AIMessage) -> list[dict]:
+    return [
+        {"id": tc["id"], "type": "function", "function": {"name": tc["name"], "arguments": json.dumps(tc["args"], ensure_ascii=False)}}
+        for tc in message.tool_calls
+    ]
+
+
+def _handler_for(server: StubServer) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:  # keine Zeile pro Anfrage
+            pass
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": f"unknown path {self.path}", "type": "invalid_request_error"}})
+                return
+            stream = bool(body.get("stream"))
+            if not server.stats.enter(stream, server.capacity):
+                self._send_json(429, {"error": {"message": "capacity exceeded", "type": "rate_limit_error", "code": 429}})
+                return
+            try:
+                self._complete(body, stream)
+            except (BrokenPipeError, ConnectionResetError):
+                # Client hat abgebrochen (Timeout, verlorener Hedge, abgebrochener Task).
+                server.stats.incr("disconnects")
+                self.close_connection = True
+            finally:
+                server.stats.leave()
+
+        def _complete(self, body: dict, stream: bool) -> None:
+            status, spike = server.draw_fault()
+            if status is not None:
+                server.stats.incr("errors")
+                self._send_json(status, {"error": {"message": "injected failure", "type": "server_error", "code": status}})
+                return
+            if spike:
+                server.stats.incr("spikes")
+            if spike or server.latency_s:
+                time.sleep((spike + server.latency_s) * server.time_scale)
+
+            structured = _structured_tool(body.get("response_format"))
+            tools = [structured] if structured else body.get("tools")
+            messages = convert_to_messages(body.get("messages") or [])
+            _, message, prompt_tokens, completion_tokens, ttft, latency = server.model._plan(messages, tools=tools)
+            if structured and message.tool_calls:
+                message = AIMessage(content=json.dumps(message.tool_calls[0]["args"], ensure_ascii=False))
+
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                     "total_tokens": prompt_tokens + completion_tokens}
+            meta = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()),
+                    "model": body.get("model") or server.model.model_name}
+            finish = "tool_calls" if message.tool_calls else "stop"
+            if not stream:
+                time.sleep(latency * server.time_scale)
+                msg: dict[str, Any] = {"role": "assistant", "content": message.content or None}
+                if message.tool_calls:
+                    msg["tool_calls"] = _tool_calls(message)
+                self._send_json(200, {**meta, "object": "chat.completion", "usage": usage,
+                                      "choices": [{"index": 0, "message": msg, "finish_reason": finish}]})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def event(choices: list[dict], **extra: Any) -> None:
+                payload = {**meta, "object": "chat.completion.chunk", "choices": choices, **extra}
+                self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode())
+                self.wfile.flush()
+
+            time.sleep(ttft * server.time_scale)
+            if message.tool_calls:
+                time.sleep((latency - ttft) * server.time_scale)
+                deltas = [{**tc, "index": i} for i, tc in enumerate(_tool_calls(message))]
+                event([{"index": 0, "delta": {"role": "assistant", "content": None, "tool_calls": deltas}}])
+            else:
+                pieces = re.findall(r"\S+\s*|\s+", message.content) or [""]
+                per_piece = (latency - ttft) / len(pieces)
+                for i, piece in enumerate(pieces):
+                    if i:
+                        time.sleep(per_piece * server.time_scale)
+                    event([{"index": 0, "delta": {"role": "assistant", "content": piece} if not i else {"content": piece}}])
+            event([{"index": 0, "delta": {}, "finish_reason": finish}])
+            if (body.get("stream_options") or {}).get("include_usage"):
+                event([], usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Faktor für simulierte Latenzen")
+    parser.add_argument("--spike-rate", type=float, default=0.0)
+    parser.add_argument("--spike-s", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-s", type=float, default=0.0, help="feste Zusatzlatenz je Anfrage")
+    parser.add_argument("--capacity", type=int, help="max. gleichzeitige Anfragen, darüber HTTP 429")
+    args = parser.parse_args(argv)
+
+    faults = Faults(args.spike_rate, args.spike_s, args.error_rate, args.error_status, args.seed)
+    server = StubServer(
+        args.host, args.port, faults=faults, time_scale=args.time_scale, latency_s=args.latency_s, capacity=args.capacity
+    )
+    print(f"Stub-Server auf {server.url} (Strg+C beendet)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats.snapshot()), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""Headless-Batchlauf über ganze Mail-Exporte (mbox / Verzeichnisse mit ``.eml``).
+
+Die Mails werden lazy gelesen und mit begrenzter Nebenläufigkeit verarbeitet;
+jedes Ergebnis landet sofort als Zeile in einer JSONL-Datei. Bei einem erneuten
+Start mit derselben Ausgabedatei werden bereits erfolgreich verarbeitete
+Message-IDs übersprungen (Resume nach Absturz). Tokens und Kosten werden pro Mail
+und über den ganzen Lauf je Knoten/Operation erfasst (``--ledger``).
+
+Aufruf:
+    python -m pipelines.bulk export.mbox mails/ --out results.jsonl
+    python -m pipelines.bulk export.mbox --out results.jsonl --arch routing --task summary -c 16
+    python -m pipelines.bulk export.mbox --out results.jsonl --ledger usage.jsonl --metrics usage.prom
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from . import monolith
+from .ledger import PROCESS_LEDGER, Ledger, track
+from .mailsource import MailItem, iter_mails
+from .preprocess import prepare_mail
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+    from .models import ModelRegistry
+
+ARCHITECTURES = ("monolith", "routing")
+BULK_TASKS = ("summary", "reply")
+
+# Anfragen an den Routing-Graphen (der Router wählt daraus den Knoten).
+ROUTING_PROMPTS = {
+    "summary": "Fasse die Mail zusammen.",
+    "reply": "Schreibe eine Antwort auf die Mail.",
+}
+
+
+@dataclass
+class Throughput:
+    """Laufende Zähler für die Fortschrittsanzeige."""
+    skipped: int = 0
+    mails: int = 0
+    errors: int = 0
+    tokens: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    def line(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        per_min = 60.0 / elapsed
+        return (
+            f"[{elapsed:7.1f}s] {self.mails} Mails ({self.errors} Fehler, {self.skipped} übersprungen) · "
+            f"{self.mails * per_min:.1f} Mails/min · {self.tokens * per_min:,.0f} Tokens/min"
+        )
+
+
+def load_done(path: str) -> set[str]:
+    """Message-IDs, die in ``path`` bereits ohne Fehler stehen (kaputte Zeilen werden ignoriert)."""
+    done: set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(rec, dict) and rec.get("message_id") and not rec.get("error"):
+                done.add(rec["message_id"])
+    return done
+
+
+def _open_output(path: str):
+    """Öffnet zum Anhängen; eine beim Absturz halb geschriebene letzte Zeile wird abgeschlossen."""
+    needs_newline = False
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    f = open(path, "a", encoding="utf-8")
+    if needs_newline:
+        f.write("\n")
+    return f
+
+
+# -------------------------------- Verarbeitung je Architektur
+Processor = Callable[[MailItem], Any]
+
+
+def monolith_processor(llm: ChatOpenAI | ModelRegistry, tasks: Sequence[str], extra: str = "") -> Processor:
+    async def process(item: MailItem) -> dict[str, str]:
+        out: dict[str, str] = {}
+        for task in tasks:
+            if task == "summary":
+                out[task] = await monolith.asummarize_text(llm, item.text)
+            else:
+                out[task] = await monolith.awrite_reply_mail(llm, item.text, extra)
+        return out
+
+    return process
+
+
+def routing_processor(app: Any, tasks: Sequence[str], extra: str = "") -> Processor:
+    from . import graph_routing  # LangGraph nur laden, wenn die Routing-Architektur gewählt ist
+
+    async def process(item: MailItem) -> dict[str, str]:
+        out: dict[str, str] = {}
+        for task in tasks:
+            prompt = ROUTING_PROMPTS[task] + (f"\n{extra}" if extra and task == "reply" else "")
+            state = await app.ainvoke(graph_routing.request_state(prompt, item.text))
+            out[task] = state.get("draft") or state["messages"][-1].content
+        return out
+
+    return process
+
+
+# -------------------------------- Batchlauf
+async def run_bulk(
+    process: Processor,
+    items: Iterable[MailItem],
+    out_path: str,
+    concurrency: int = 8,
+    progress_every: float = 10.0,
+    on_progress: Callable[[str], None] = print,
+    ledger: Ledger = PROCESS_LEDGER,
+) -> Throughput:
+    """Verarbeitet ``items`` mit höchstens ``concurrency`` Mails gleichzeitig.
+
+    ``items`` wird erst bei Bedarf weitergelesen; jede fertige Mail wird sofort
+    geschrieben und geflusht. Die Reihenfolge der Zeilen folgt der Fertigstellung.
+    Jeder LLM-Aufruf landet zusätzlich in ``ledger``; ``usage`` im Datensatz
+    schlüsselt die Tokens der Mail nach Knoten/Operation auf.
+    """
+    done = load_done(out_path)
+    stats = Throughput()
+    source: Iterator[MailItem] = iter(items)
+
+    def next_item() -> Optional[MailItem]:
+        for item in source:
+            if item.message_id in done:
+                stats.skipped += 1
+                continue
+            done.add(item.message_id)  # Duplikate im Export nur einmal verarbeiten
+            return item
+        return None
+
+    with _open_output(out_path) as out:
+
+        def write(rec: dict) -> None:
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            out.flush()
+
+        async def worker() -> None:
+            while (item := next_item()) is not None:
+                t0 = time.perf_counter()
+                rec: dict[str, Any] = {
+                    "message_id": item.message_id,
+                    "subject": item.subject,
+                    "sender": item.sender,
+                    "source": item.source,
+                    "preprocess": prepare_mail(item.text).stats.as_dict(),
+                }
+                with track(ledger) as run:
+                    try:
+                        rec["results"] = await process(item)
+                        rec["error"] = None
+                    except Exception as e:  # eine kaputte Mail darf den Lauf nicht abbrechen
+                        rec["results"] = {}
+                        rec["error"] = f"{type(e).__name__}: {e}"
+                        stats.errors += 1
+                totals = run.totals()
+                rec["tokens"] = totals["total_tokens"]
+                rec["cost_usd"] = totals["cost_usd"]
+                rec["usage"] = {r["label"]: r["total_tokens"] for r in run.summary()}
+                rec["latency_s"] = round(time.perf_counter() - t0, 3)
+                write(rec)
+                stats.mails += 1
+                stats.tokens += totals["total_tokens"]
+
+        async def report() -> None:
+            while True:
+                await asyncio.sleep(progress_every)
+                on_progress(stats.line())
+
+        reporter = asyncio.create_task(report()) if progress_every > 0 else None
+        try:
+            await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+
+    on_progress(stats.line())
+    return stats
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="mbox-Dateien, .eml-Dateien oder Verzeichnisse")
+    parser.add_argument("--out", required=True, help="JSONL-Ausgabe (wird fortgesetzt, falls vorhanden)")
+    parser.add_argument("--arch", choices=ARCHITECTURES, default="monolith")
+    parser.add_argument("--task", action="append", choices=BULK_TASKS, help="Default: summary und reply")
+    parser.add_argument("--extra", default="", help="Zusatzinfos/Stilwünsche für Antworten")
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--limit", type=int, help="höchstens so viele Mails lesen")
+    parser.add_argument("--model", help="Default-Modell (sonst MODEL_DEFAULT bzw. gpt-4o-mini)")
+    parser.add_argument("--progress-every", type=float, default=10.0, help="Sekunden zwischen Statuszeilen")
+    parser.add_argument("--ledger", help="Einzelaufrufe (Label, Modell, Tokens, Kosten, Latenz) als JSONL")
+    parser.add_argument("--metrics", help="Aggregat im Prometheus-Textformat")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+
+    from .cache import cache_from_env
+    from .models import ModelRegistry
+
+    load_dotenv()
+    if not os.getenv("OPENAI_API_KEY"):
+        print("OPENAI_API_KEY fehlt in .env", file=sys.stderr)
+        return 2
+    # --model ersetzt MODEL_DEFAULT; MODEL_<ROLLE> gilt weiterhin je Rolle.
+    environ = {**os.environ, "MODEL_DEFAULT": args.model} if args.model else None
+    llm = ModelRegistry.from_env(environ, cache=cache_from_env() or False)
+
+    tasks = tuple(args.task or BULK_TASKS)
+    if args.arch == "routing":
+        from .graph_routing import build_app
+
+        process = routing_processor(build_app(llm), tasks, args.extra)
+    else:
+        process = monolith_processor(llm, tasks, args.extra)
+
+    items: Iterable[MailItem] = iter_mails(args.paths)
+    if args.limit is not None:
+        items = itertools.islice(items, args.limit)
+
+    stats = asyncio.run(
+        run_bulk(
+            process,
+            items,
+            args.out,
+            concurrency=args.concurrency,
+            progress_every=args.progress_every,
+            on_progress=lambda line: print(line, file=sys.stderr, flush=True),
+        )
+    )
+    for row in PROCESS_LEDGER.summary():
+        print(
+            f"{row['label']:<16} {row['calls']:>6} Aufrufe {row['total_tokens']:>10,} Tokens "
+            f"{row['cost_usd']:>9.4f} USD  p50 {row['p50_s']:.2f}s  p95 {row['p95_s']:.2f}s",
+            file=sys.stderr,
+        )
+    if args.ledger:
+        with open(args.ledger, "w", encoding="utf-8") as f:
+            f.write(PROCESS_LEDGER.to_jsonl())
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(PROCESS_LEDGER.to_prometheus())
+    return 1 if stats.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""Inhaltsadressierter Antwort-Cache für alle drei Pipelines.
+
+Wird als ``cache=`` am Chat-Modell gesetzt und greift damit für jeden
+``llm.invoke(...)`` – Monolith, Routing-Knoten und Agent-Tools gleichermaßen.
+LangChain normalisiert die Nachrichtenliste (ohne Message-IDs) und liefert die
+Modellkonfiguration (Modellname, Temperatur, gebundene Tools, ...) als
+``llm_string``; beides zusammen ergibt den Schlüssel.
+
+Zwei Stufen:
+    - In-Memory-LRU (pro Prozess)
+    - optional SQLite auf Platte (von mehreren Streamlit-Workern gemeinsam nutzbar)
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage
+
+
+# ``stream=True`` ändert nur die Übertragung, nicht die Antwort – gestreamte und
+# nicht gestreamte Aufrufe sollen denselben Eintrag treffen.
+_STREAM_PARAM = re.compile(r"(, )?\('stream', True\)(, )?")
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    llm_string = _STREAM_PARAM.sub(lambda m: ", " if m.group(1) and m.group(2) else "", llm_string)
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Zähler für Treffer/Fehlschläge (thread-safe)."""
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "hits": self.memory_hits + self.disk_hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
+
+    def delta(self, before: dict[str, int]) -> dict[str, int]:
+        """Differenz zum früheren ``snapshot()`` (z. B. für eine einzelne Operation)."""
+        now = self.snapshot()
+        return {k: now[k] - before.get(k, 0) for k in now}
+
+
+def _without_usage(value: RETURN_VAL_TYPE) -> RETURN_VAL_TYPE:
+    """Cache-Treffer verbrauchen keine Tokens – Usage auf 0 setzen, damit Callbacks korrekt zählen."""
+    out = []
+    for gen in value:
+        msg = getattr(gen, "message", None)
+        if isinstance(msg, AIMessage) and msg.usage_metadata:
+            gen = gen.model_copy(
+                update={
+                    "message": msg.model_copy(
+                        update={"usage_metadata": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}}
+                    )
+                }
+            )
+        out.append(gen)
+    return out
+
+
+class _SQLiteTier:
+    """Persistente Stufe; WAL-Modus, damit mehrere Prozesse gleichzeitig lesen/schreiben können."""
+
+    def __init__(self, path: str, max_entries: int, ttl: Optional[float]):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache(accessed)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl is not None and now - created > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            return value
+
+    def put(self, key: str, value: str) -> int:
+        """Speichert und gibt die Zahl verdrängter Einträge zurück."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            evicted = 0
+            if self.ttl is not None:
+                evicted += self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl,)).rowcount
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            if count > self.max_entries:
+                evicted += self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,),
+                ).rowcount
+            return evicted
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache")
+
+
+class ResponseCache(BaseCache):
+    """LRU-Speicher im Prozess plus optionale SQLite-Stufe, beide mit TTL und Größenlimit."""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+        disk_max_entries: int = 10_000,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._mem: OrderedDict[str, tuple[float, RETURN_VAL_TYPE]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _SQLiteTier(path, disk_max_entries, ttl) if path else None
+
+    # ---------------- In-Memory-Stufe
+    def _mem_get(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        with self._lock:
+            item = self._mem.get(key)
+            if item is None:
+                return None
+            created, value = item
+            if self.ttl is not None and time.time() - created > self.ttl:
+                del self._mem[key]
+                return None
+            self._mem.move_to_end(key)
+            return value
+
+    def _mem_put(self, key: str, value: RETURN_VAL_TYPE, created: Optional[float] = None) -> int:
+        with self._lock:
+            self._mem[key] = (created or time.time(), value)
+            self._mem.move_to_end(key)
+            evicted = 0
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    # ---------------- BaseCache
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = cache_key(prompt, llm_string)
+
+        value = self._mem_get(key)
+        if value is not None:
+            self.stats.incr("memory_hits")
+            return _without_usage(value)
+
+        if self._disk is not None:
+            raw = self._disk.get(key)
+            if raw is not None:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    value = loads(raw, allowed_objects="core")
+                self.stats.incr("evictions", self._mem_put(key, value))
+                self.stats.incr("disk_hits")
+                return _without_usage(value)
+
+        self.stats.incr("misses")
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = cache_key(prompt, llm_string)
+        evicted = self._mem_put(key, return_val)
+        if self._disk is not None:
+            evicted += self._disk.put(key, dumps(return_val))
+        self.stats.incr("writes")
+        self.stats.incr("evictions", evicted)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._mem.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    """Erzeugt den Cache aus Umgebungsvariablen (``LLM_CACHE=0`` schaltet ihn ab).
+
+    ``LLM_CACHE_PATH``         SQLite-Datei für die gemeinsame Plattenstufe (optional)
+    ``LLM_CACHE_TTL``          Lebensdauer in Sekunden (optional)
+    ``LLM_CACHE_MAX_ENTRIES``  Größe der In-Memory-LRU (Default 512)
+    """
+    if os.getenv("LLM_CACHE", "1").strip().lower() in ("0", "false", "off", "no"):
+        return None
+    ttl = os.getenv("LLM_CACHE_TTL")
+    return ResponseCache(
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+        ttl=float(ttl) if ttl else None,
+        path=os.getenv("LLM_CACHE_PATH") or None,
+    )
+
+
+def format_cache_caption(delta: dict[str, int]) -> str:
+    """Kurztext für die Metrik-Zeile, z. B. ``♻️ 1/2 Cache``."""
+    total = delta.get("hits", 0) + delta.get("misses", 0)
+    return f"♻️ {delta.get('hits', 0)}/{total} Cache" if total else ""
@@ -1,23 +1,40 @@
-from dataclasses import dataclass
-from typing import Annotated, Optional
+from __future__ import annotations
 
-from langchain_core.messages import AnyMessage, HumanMessage, SystemMessage
+import asyncio
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as ToolTimeout
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Annotated, Any, Literal, Optional
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
-from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
+from langchain_core.tools import InjectedToolCallId, tool
 
-from langgraph.graph import StateGraph, START
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, StateGraph, START
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
-
+from langgraph.prebuilt import InjectedState, ToolNode, tools_condition
+from langgraph.prebuilt.tool_node import ToolCallRequest
+from langgraph.types import Command
+
+from .graph_render import try_render
+from .history import DEFAULT_HISTORY, HistoryPolicy, compact_history, draft_message, drop_superseded_drafts
+from .memo import cached_summary, current, merge_memo, prefetched_reply, reply_system, with_summary
+from .models import ModelRegistry, model_for
+from .preprocess import clean_mail
+from .revision import EditPolicy, revise
 from .prompts import (
     GENERAL_SYSTEM_PROMPT,
     SYSTEM_NEW_MAIL,
     REPLY_DECISION_PROMPT,
-    SYSTEM_REVISE,
-    SYSTEM_MAIL_REPLY,
     SYSTEM_SUMMARIZER,
 )
+from .summarize import needs_chunking, summarize_chunked
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
 
 
 # -------------------- State
@@ -26,56 +43,144 @@ class AgentState:
     messages: Annotated[list[AnyMessage], add_messages]
     uploaded_mail: str = ""
     draft: str = ""
+    # Abgeleitete Artefakte der aktuellen Mail (Zusammenfassung, vorab erzeugter Entwurf), siehe ``pipelines.memo``.
+    memo: Annotated[dict[str, Any], merge_memo] = field(default_factory=dict)
+
 
+# Modell bzw. Register wird pro Graph über die RunnableConfig an die Tools gereicht (kein Modul-Global),
+# damit ein kompilierter Graph und ein Client viele Sitzungen parallel bedienen können.
+LLM_CONFIG_KEY = "llm"
+# Optionale ``EditPolicy`` für das revise-Tool (Edit-Skript statt Neufassung).
+EDITS_CONFIG_KEY = "edits"
 
-llm: Optional[ChatOpenAI] = None
-_CURRENT_STATE: Optional[AgentState] = None
 
+NO_MAIL = "Bitte lade zuerst eine Mail hoch."
+NO_DRAFT = "Kein Entwurf vorhanden. Soll ich zuerst einen erstellen?"
 
-def _require_llm() -> ChatOpenAI:
-    if llm is None:
+
+def _require_llm(config: Optional[RunnableConfig], role: str) -> ChatOpenAI:
+    model = ((config or {}).get("configurable") or {}).get(LLM_CONFIG_KEY)
+    if model is None:
         raise RuntimeError("LLM nicht initialisiert")
-    return llm
+    return model_for(model, role)
+
+
+def _before_tool_call(messages: list[AnyMessage]) -> list[AnyMessage]:
+    """Verlauf ohne den laufenden Tool-Call (eine offene tool_call-Nachricht wäre für die API ungültig)."""
+    if messages and isinstance(messages[-1], AIMessage) and messages[-1].tool_calls:
+        return messages[:-1]
+    return messages
+
+
+# -------------------- Referenzen
+# Mail und Entwurf stehen bereits im System-Prompt. Statt sie als Tool-Argument
+# erneut (als Completion-Tokens) zu erzeugen, übergibt das Modell nur diese
+# Platzhalter; aufgelöst wird serverseitig aus dem injizierten Graph-State.
+MAIL_REF = "$MAIL"
+DRAFT_REF = "$DRAFT"
+
+
+def _resolve_ref(value: Optional[str], state: Any) -> str:
+    """Ersetzt "$MAIL"/"$DRAFT" durch den Text aus dem State; Volltext bleibt unverändert."""
+    ref = (value or "").strip()
+    if ref == MAIL_REF:
+        return clean_mail(getattr(state, "uploaded_mail", ""))
+    if ref == DRAFT_REF:
+        return getattr(state, "draft", "") or ""
+    return value or ""
 
 
 # -------------------- Tools
 class SummaryArgs(BaseModel):
-    mail: str = Field(..., description="Voller Mailtext")
+    mail: str = Field(MAIL_REF, description='Referenz auf die hochgeladene Mail: immer "$MAIL"')
+    state: Annotated[Any, InjectedState]
+    tool_call_id: Annotated[str, InjectedToolCallId]
 
 
 @tool("summary", args_schema=SummaryArgs)
-def tool_summary(mail: str) -> str:
+def tool_summary(
+    mail: str = MAIL_REF,
+    state: Annotated[Any, InjectedState] = None,
+    tool_call_id: Annotated[str, InjectedToolCallId] = "",
+    config: RunnableConfig = None,
+) -> str | Command:
     """Erzeugt eine prägnante Zusammenfassung der übergebenen E-Mail."""
-    _llm = _require_llm()
+    _llm = _require_llm(config, "summary")
+    by_ref = (mail or "").strip() == MAIL_REF
+    mail = _resolve_ref(mail, state)
     if not (mail or "").strip():
-        return "Bitte lade zuerst eine Mail hoch."
-
-    msgs = [
-        SystemMessage(content=SYSTEM_SUMMARIZER),
-        HumanMessage(content=f"Originalmail:\n{mail}"),
-    ]
-    return _llm.invoke(msgs).content.strip()
+        return NO_MAIL
+    # Nur die hochgeladene Mail ($MAIL) hat ein Memo; Volltext-Argumente werden normal zusammengefasst.
+    uploaded = getattr(state, "uploaded_mail", "") if by_ref else ""
+    memo = getattr(state, "memo", None)
+    cached = cached_summary(memo, uploaded) if uploaded else None
+    if cached:
+        return cached
+
+    if needs_chunking(mail):
+        res = summarize_chunked(_llm, mail)
+    else:
+        msgs = [
+            SystemMessage(content=SYSTEM_SUMMARIZER),
+            HumanMessage(content=f"Originalmail:\n{mail}"),
+        ]
+        res = _llm.invoke(msgs).content.strip()
+    if not uploaded or not tool_call_id:
+        return res
+    return Command(update={
+        "memo": with_summary(memo, uploaded, res),
+        "messages": [ToolMessage(content=res, name="summary", tool_call_id=tool_call_id)],
+    })
 
 
 class ReplyArgs(BaseModel):
-    mail: str = Field(..., description="Originalmail")
+    mail: str = Field(MAIL_REF, description='Referenz auf die Originalmail: immer "$MAIL"')
     extra: Optional[str] = Field("", description="Zusatzinfos (Ton, Termine, Punkte)")
     summary: Optional[str] = Field(None, description="Optionale Kurzfassung")
-
-
-@tool("reply", args_schema=ReplyArgs)
-def tool_reply(mail: str, extra: Optional[str] = "", summary: Optional[str] = None) -> str:
+    state: Annotated[Any, InjectedState]
+    tool_call_id: Annotated[str, InjectedToolCallId]
+
+
+@tool("reply", args_schema=ReplyArgs, return_direct=True)
+def tool_reply(
+    mail: str = MAIL_REF,
+    extra: Optional[str] = "",
+    summary: Optional[str] = None,
+    state: Annotated[Any, InjectedState] = None,
+    tool_call_id: Annotated[str, InjectedToolCallId] = "",
+    config: RunnableConfig = None,
+) -> str | Command:
     """Erstellt eine Antwortmail auf die Originalmail; optional mit Zusatzinfos und/oder Kurzfassung."""
-    _llm = _require_llm()
+    _llm = _require_llm(config, "reply")
+    by_ref = (mail or "").strip() == MAIL_REF
+    mail = _resolve_ref(mail, state)
     if not (mail or "").strip():
-        return "Bitte lade zuerst eine Mail hoch."
-
+        return NO_MAIL
+
+    # Vorab erzeugter Entwurf (``pipelines.prefetch``): nur für $MAIL und ohne eigene Vorgaben in extra/Verlauf.
+    uploaded = getattr(state, "uploaded_mail", "") if by_ref else ""
+    memo = getattr(state, "memo", None)
+    if uploaded and tool_call_id:
+        requests = [m.content for m in state.messages if isinstance(m, HumanMessage) and isinstance(m.content, str)]
+        if (extra or "").strip():
+            requests.append(extra)
+        prefetched = prefetched_reply(memo, uploaded, requests)
+        if prefetched:
+            return Command(update={
+                "memo": {**current(memo, uploaded), "reply": ""},
+                "messages": [ToolMessage(content=prefetched, name="reply", tool_call_id=tool_call_id)],
+            })
+
+    # Lokale Analyse (Sprache …) einmal je Mail; ein neu aufgebautes Memo geht mit dem Ergebnis in den State.
+    facts = current(memo, uploaded) if uploaded else {}
     msgs: list[AnyMessage] = [
-        SystemMessage(content=SYSTEM_MAIL_REPLY),
+        SystemMessage(content=reply_system(facts)),
         SystemMessage(content=REPLY_DECISION_PROMPT),
         SystemMessage(content=f"MAIL (Kontext für Antwort):\n{mail}"),
     ]
 
+    # Ohne explizite Kurzfassung die aus dem Memo (kein erneuter summary-Aufruf nötig).
+    summary = summary or (cached_summary(memo, uploaded) if uploaded else None)
     if summary:
         msgs.append(SystemMessage(content=f"SUMMARY:\n{summary}"))
 
@@ -85,20 +190,26 @@ def tool_reply(mail: str, extra: Optional[str] = "", summary: Optional[str] = No
             SystemMessage(content="HINWEIS: Wenn USER_INPUT gesetzt ist, KEINE weitere 'ASK:'-Rückfrage ausgeben.")
         )
 
-    if _CURRENT_STATE is not None and _CURRENT_STATE.messages:
-        msgs += _CURRENT_STATE.messages[-6:]
+    if state is not None and state.messages:
+        msgs += drop_superseded_drafts(_before_tool_call(state.messages))[-6:]
 
-    return _llm.invoke(msgs).content.strip()
+    res = _llm.invoke(msgs).content.strip()
+    if facts and facts is not memo and tool_call_id:
+        return Command(update={
+            "memo": facts,
+            "messages": [ToolMessage(content=res, name="reply", tool_call_id=tool_call_id)],
+        })
+    return res
 
 
 class NewArgs(BaseModel):
     brief: str = Field(..., description="Kurzbriefing (Empfänger/Zweck/Ton/Punkte)")
 
 
-@tool("new", args_schema=NewArgs)
-def tool_new(brief: str) -> str:
+@tool("new", args_schema=NewArgs, return_direct=True)
+def tool_new(brief: str, config: RunnableConfig = None) -> str:
     """Verfasst eine neue E-Mail auf Basis eines Kurzbriefings."""
-    _llm = _require_llm()
+    _llm = _require_llm(config, "new")
     msgs = [
         SystemMessage(content=SYSTEM_NEW_MAIL),
         HumanMessage(content=f"USER_INPUT:\n{brief}"),
@@ -107,33 +218,44 @@ def tool_new(brief: str) -> str:
 
 
 class ReviseArgs(BaseModel):
-    draft: str = Field(..., description="Bestehender E-Mail-Entwurf")
+    draft: str = Field(DRAFT_REF, description='Referenz auf den bestehenden Entwurf: immer "$DRAFT"')
     feedback: Optional[str] = Field("", description="Konkrete Änderungswünsche")
+    state: Annotated[Any, InjectedState]
 
 
-@tool("revise", args_schema=ReviseArgs)
-def tool_revise(draft: str, feedback: Optional[str] = "") -> str:
+@tool("revise", args_schema=ReviseArgs, return_direct=True)
+def tool_revise(
+    draft: str = DRAFT_REF,
+    feedback: Optional[str] = "",
+    state: Annotated[Any, InjectedState] = None,
+    config: RunnableConfig = None,
+) -> str:
     """Überarbeitet einen vorhandenen Entwurf anhand von Feedback."""
-    _llm = _require_llm()
+    _llm = _require_llm(config, "revise")
+    draft = _resolve_ref(draft, state)
     if not (draft or "").strip():
-        return "Kein Entwurf vorhanden. Soll ich zuerst einen erstellen?"
+        return NO_DRAFT
 
-    msgs = [
-        SystemMessage(content=SYSTEM_REVISE),
-        HumanMessage(content=f"ENTWURF:\n{draft}\n\nFEEDBACK:\n{feedback or '–'}"),
-    ]
-    return _llm.invoke(msgs).content.strip()
+    edits: Optional[EditPolicy] = ((config or {}).get("configurable") or {}).get(EDITS_CONFIG_KEY)
+    return revise(_llm, draft, feedback or "", edits)
 
 
 class GeneralArgs(BaseModel):
     question: str = Field(..., description="Freitext-Frage")
-    mail: Optional[str] = Field(None, description="E-Mail-Text, falls relevant")
+    mail: Optional[str] = Field(None, description='"$MAIL", falls sich die Frage auf die hochgeladene Mail bezieht')
+    state: Annotated[Any, InjectedState]
 
 
 @tool("general", args_schema=GeneralArgs)
-def tool_general(question: str, mail: Optional[str] = None) -> str:
+def tool_general(
+    question: str,
+    mail: Optional[str] = None,
+    state: Annotated[Any, InjectedState] = None,
+    config: RunnableConfig = None,
+) -> str:
     """Beantwortet allgemeine Fragen; optional unter Bezug auf eine E-Mail."""
-    _llm = _require_llm()
+    _llm = _require_llm(config, "general")
+    mail = _resolve_ref(mail, state)
     sys = SystemMessage(content=GENERAL_SYSTEM_PROMPT)
 
     if (mail or "").strip():
@@ -146,6 +268,64 @@ def tool_general(question: str, mail: Optional[str] = None) -> str:
 
 TOOLS = [tool_summary, tool_reply, tool_new, tool_revise, tool_general]
 
+# Tools, deren Ergebnis bereits die fertige Antwort ist (return_direct): danach kein weiterer Agent-Turn.
+TERMINAL_TOOLS = {t.name for t in TOOLS if t.return_direct}
+
+# Zeitlimits je Tool in Sekunden (None = unbegrenzt).
+TOOL_TIMEOUTS: dict[str, Optional[float]] = {
+    "summary": 30.0,
+    "reply": 60.0,
+    "new": 60.0,
+    "revise": 60.0,
+    "general": 30.0,
+}
+
+
+# Gemeinsamer, begrenzter Pool für Tool-Aufrufe mit Zeitlimit (sync). Ein abgelaufener Aufruf
+# belegt seinen Thread, bis er von selbst endet; mehr als ``TOOL_WORKERS`` Threads entstehen nie.
+TOOL_WORKERS = 32
+_TOOL_POOL = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+
+def _timeout_message(request: ToolCallRequest, limit: float) -> ToolMessage:
+    name = request.tool_call["name"]
+    return ToolMessage(
+        content=f"Zeitüberschreitung: '{name}' hat nach {limit:g}s nicht geantwortet.",
+        name=name,
+        tool_call_id=request.tool_call["id"],
+        status="error",
+    )
+
+
+def _with_timeouts(timeouts: dict[str, Optional[float]]):
+    """Tool-Call-Wrapper (sync, async) für den ToolNode: bricht das Warten nach dem Limit ab.
+
+    Sync kann der laufende Aufruf nicht abgebrochen werden; sein Ergebnis wird verworfen und
+    stattdessen eine Fehler-ToolMessage zurückgegeben, damit der Turn nicht blockiert.
+    Async wird der Aufruf per ``asyncio.wait_for`` abgebrochen.
+    """
+
+    def wrap(request: ToolCallRequest, execute):
+        limit = timeouts.get(request.tool_call["name"])
+        if not limit:
+            return execute(request)
+        future = _TOOL_POOL.submit(contextvars.copy_context().run, execute, request)
+        try:
+            return future.result(timeout=limit)
+        except ToolTimeout:
+            return _timeout_message(request, limit)
+
+    async def awrap(request: ToolCallRequest, execute):
+        limit = timeouts.get(request.tool_call["name"])
+        if not limit:
+            return await execute(request)
+        try:
+            return await asyncio.wait_for(execute(request), limit)
+        except asyncio.TimeoutError:
+            return _timeout_message(request, limit)
+
+    return wrap, awrap
+
 
 # -------------------- System
 AGENT_SYSTEM = """Rolle: Intent-Agent für einen E-Mail-Assistenten mit Tool-Aufrufen.
@@ -155,6 +335,9 @@ Aufgabe:
     - Wähle passende Tool-Aufrufe:
       summary(mail) | reply(mail, extra?, summary?) | new(brief) | revise(draft, feedback?) | general(question, mail?).
       Mehrere Aufrufe sind erlaubt, wenn nötig.
+    - Mail und Entwurf NIE als Volltext in Tool-Argumente kopieren: übergib für mail immer "$MAIL"
+      und für draft immer "$DRAFT" (werden serverseitig aufgelöst).
+{results}
     - Für reply gelten strikt die Regeln aus REPLY_DECISION_PROMPT: genau eine 'ASK:'-Rückfrage nur bei kritischen Lücken;
     - liegt danach eine Nutzerantwort vor, erzeuge die finale Antwortmail.
 
@@ -177,13 +360,21 @@ Ausgabe:
 """
 
 
-def _make_llm_with_tools(model: ChatOpenAI, state: AgentState):
-    has_mail = bool(state.uploaded_mail.strip())
+# Was nach terminalen Tools passiert, hängt vom Modus ab (``build_app(return_direct=...)``).
+RESULTS_DIRECT = """    - Ergebnisse von reply/new/revise gehen direkt an die Nutzer:in. Für weitere Schritte danach
+      im selben Turn zusätzlich summary/general aufrufen."""
+RESULTS_REACT = """    - Alle Tool-Ergebnisse kommen zu dir zurück. Gib danach die finale Antwort aus; Ergebnisse von
+      reply/new/revise (Entwürfe, 'ASK:'-Rückfragen) unverändert übernehmen."""
+
+
+def _make_llm_with_tools(model: ChatOpenAI, state: AgentState, return_direct: bool = True):
+    mail = clean_mail(state.uploaded_mail)
+    has_mail = bool(mail)
     has_draft = bool(state.draft.strip())
 
     context_lines = []
     if has_mail:
-        context_lines.append(f"MAIL:\n{state.uploaded_mail}")
+        context_lines.append(f"MAIL:\n{mail}")
     if has_draft:
         context_lines.append(f"DRAFT:\n{state.draft}")
 
@@ -193,40 +384,120 @@ def _make_llm_with_tools(model: ChatOpenAI, state: AgentState):
     else:
         context_block = ""
 
-    sys = SystemMessage(content=AGENT_SYSTEM.format(has_mail=has_mail, has_draft=has_draft) + context_block)
+    results = RESULTS_DIRECT if return_direct else RESULTS_REACT
+    sys = SystemMessage(
+        content=AGENT_SYSTEM.format(has_mail=has_mail, has_draft=has_draft, results=results) + context_block
+    )
     return model.bind_tools(TOOLS), sys
 
 
-def agent(state: AgentState, model: ChatOpenAI):
-    global _CURRENT_STATE
-    _CURRENT_STATE = state
-
-    llm_with_tools, sys = _make_llm_with_tools(model, state)
-    response = llm_with_tools.invoke([sys] + state.messages)
-    return {"messages": [response]}
+def agent(state: AgentState, model: ChatOpenAI, history: HistoryPolicy = DEFAULT_HISTORY, return_direct: bool = True):
+    # Geht ein gemischter Batch (z. B. summary + reply) zurück an den Agenten, wird der Entwurf
+    # trotzdem für spätere $DRAFT-Überarbeitungen übernommen (im Prompt steht er schon als ToolMessage).
+    draft = _batch_draft(_last_tool_batch(state.messages))
+    llm_with_tools, sys = _make_llm_with_tools(model, state, return_direct)
+    response = llm_with_tools.invoke([sys] + compact_history(state.messages, history))
+    return {"messages": [response], **({"draft": draft} if draft is not None else {})}
+
+
+def _last_tool_batch(messages: list[AnyMessage]) -> list[ToolMessage]:
+    """ToolMessages des letzten Tool-Schritts (in Aufrufreihenfolge)."""
+    batch: list[ToolMessage] = []
+    for m in reversed(messages):
+        if not isinstance(m, ToolMessage):
+            break
+        batch.append(m)
+    return batch[::-1]
+
+
+def _is_ask(text: str) -> bool:
+    return bool(re.match(r"^\s*ASK\s*:", text, flags=re.IGNORECASE))
+
+
+def _batch_draft(batch: list[ToolMessage]) -> Optional[str]:
+    """Letzter Entwurf aus terminalen Tools des Batches (ohne Rückfragen, Hinweise und Fehler)."""
+    draft = None
+    for m in batch:
+        res = (m.content or "").strip() if isinstance(m.content, str) else ""
+        if m.name not in TERMINAL_TOOLS or m.status == "error" or _is_ask(res):
+            continue
+        if res and res not in (NO_MAIL, NO_DRAFT):
+            draft = res
+    return draft
+
+
+def route_after_tools(state: AgentState) -> Literal["agent", "finalize"]:
+    """Nur terminale Tools aufgerufen → direkt beenden; sonst zurück zum Agenten."""
+    batch = _last_tool_batch(state.messages)
+    if batch and all(m.name in TERMINAL_TOOLS for m in batch):
+        return "finalize"
+    return "agent"
+
+
+def finalize(state: AgentState) -> dict:
+    """Übernimmt die Ausgabe terminaler Tools als finale Antwort und aktualisiert den Entwurf."""
+    batch = _last_tool_batch(state.messages)
+    out: dict = {}
+    texts = []
+    for m in batch:
+        res = (m.content or "").strip() if isinstance(m.content, str) else ""
+        texts.append(res.split(":", 1)[1].strip() if _is_ask(res) else res)
+    draft = _batch_draft(batch)
+    if draft is not None:
+        out["draft"] = draft
+    content = "\n\n".join(texts)
+    out["messages"] = [draft_message(content) if draft is not None else AIMessage(content=content)]
+    return out
 
 
 # -------------------------------- GRAPH
-def build_app(model: ChatOpenAI):
-    global llm
-    llm = model
+def build_app(
+    model: ChatOpenAI | ModelRegistry,
+    return_direct: bool = True,
+    max_parallel_tools: int = 4,
+    tool_timeouts: Optional[dict[str, Optional[float]]] = None,
+    history: HistoryPolicy = DEFAULT_HISTORY,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+    edits: Optional[EditPolicy] = None,
+    render_to: Optional[str] = None,
+):
+    """Baut den Single-Agent-Graphen.
+
+    ``model``: ein Modell für alles oder ein ``ModelRegistry`` (Rolle ``agent`` für die
+    Tool-Auswahl, die Tools nutzen ihre eigene Rolle).
+    ``return_direct``: Nach terminalen Tools (reply/new/revise) ohne weiteren
+    LLM-Round-Trip beenden. ``False`` entspricht dem ursprünglichen ReAct-Loop.
+    ``max_parallel_tools``: Mehrere Tool-Calls eines Turns laufen parallel in einem
+    begrenzten Thread-Pool; die ToolMessages bleiben in der Reihenfolge der Aufrufe.
+    ``tool_timeouts``: überschreibt einzelne Werte aus ``TOOL_TIMEOUTS``.
+    ``history``: Token-Budget für den Verlauf in Agent-Turns.
+    ``checkpointer``: speichert den State je ``thread_id`` (siehe ``pipelines.sessions``).
+    ``edits``: revise-Tool liefert ein Edit-Skript statt einer Neufassung (siehe ``pipelines.revision``).
+    ``render_to``: Graph nach dem Kompilieren als ``.mmd``/``.png`` speichern (siehe
+    ``pipelines.graph_render``); ohne Angabe wird nichts gerendert.
+    """
+    timeouts = {**TOOL_TIMEOUTS, **(tool_timeouts or {})}
+    wrap, awrap = _with_timeouts(timeouts)
+    tool_node = ToolNode(TOOLS, wrap_tool_call=wrap, awrap_tool_call=awrap)
 
     g = StateGraph(AgentState)
-    g.add_node("agent", lambda s: agent(s, model))
-    g.add_node("tools", ToolNode(TOOLS))
+    g.add_node("agent", lambda s: agent(s, model_for(model, "agent"), history, return_direct))
+    g.add_node(
+        "tools",
+        tool_node.with_config(
+            max_concurrency=max_parallel_tools, configurable={LLM_CONFIG_KEY: model, EDITS_CONFIG_KEY: edits}
+        ),
+    )
 
     g.add_edge(START, "agent")
     g.add_conditional_edges("agent", tools_condition)
-    g.add_edge("tools", "agent")
-
-    app = g.compile()
-
-    try:
-        png = app.get_graph().draw_mermaid_png()
-        with open("stategraph_agent.png", "wb") as f:
-            f.write(png)
-        print("Graph als stategraph_agent.png gespeichert")
-    except Exception as e:
-        print(e)
+    if return_direct:
+        g.add_node("finalize", finalize)
+        g.add_conditional_edges("tools", route_after_tools)
+        g.add_edge("finalize", END)
+    else:
+        g.add_edge("tools", "agent")
 
+    app = g.compile(checkpointer=checkpointer)
+    try_render(app, render_to)
     return app
\ No newline at end of file
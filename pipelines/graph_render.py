@@ -0,0 +1,87 @@
+"""Optionale Darstellung der Graphen als Mermaid-Text oder PNG.
+
+``build_app`` rendert nicht mehr selbst: ``draw_mermaid_png()`` ruft standardmäßig
+mermaid.ink auf und hat damit jeden Start (UI, Bulk-CLI, Benchmark) um einen
+Netzwerk-Roundtrip verlängert bzw. ohne Netz mit Wartezeit und Fehlermeldung
+versehen. Gerendert wird jetzt nur auf Wunsch:
+
+    python -m pipelines.graph_render routing                      # stategraph_routing.mmd (offline)
+    python -m pipelines.graph_render agent --out graph.png        # PNG über mermaid.ink
+    python -m pipelines.graph_render agent --out graph.png --method pyppeteer   # PNG lokal
+
+oder im Code ``render_graph(app, "graph.mmd")`` bzw. ``build_app(..., render_to="graph.mmd")``.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from typing import Any, Optional
+
+METHODS = ("api", "pyppeteer", "graphviz")
+
+
+def render_graph(app: Any, path: str, method: str = "api") -> str:
+    """Schreibt den kompilierten Graphen nach ``path`` und gibt den Pfad zurück.
+
+    ``.mmd``/``.md`` erzeugt Mermaid-Text ohne Netz und ohne Zusatzpakete. ``.png``
+    nutzt ``method``: ``api`` (mermaid.ink, Netzwerk), ``pyppeteer`` (lokaler
+    Headless-Browser) oder ``graphviz`` (``pygraphviz``).
+    """
+    graph = app.get_graph()
+    if not path.lower().endswith(".png"):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(graph.draw_mermaid())
+        return path
+
+    if method not in METHODS:
+        raise ValueError(f"Unbekannte Render-Methode {method!r}, erlaubt: {', '.join(METHODS)}")
+    if method == "graphviz":
+        graph.draw_png(output_file_path=path)
+        return path
+
+    from langchain_core.runnables.graph import MermaidDrawMethod
+
+    data = graph.draw_mermaid_png(draw_method=MermaidDrawMethod(method))
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def try_render(app: Any, path: Optional[str], method: str = "api") -> None:
+    """Wie früher in ``build_app``: Fehler beim Rendern brechen den Aufbau nicht ab."""
+    if not path:
+        return
+    try:
+        print(f"Graph als {render_graph(app, path, method)} gespeichert")
+    except Exception as e:
+        print(e)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("arch", choices=("routing", "agent"))
+    parser.add_argument("--out", help="Zieldatei (.mmd oder .png, Default: stategraph_<arch>.mmd)")
+    parser.add_argument("--method", choices=METHODS, default="api", help="nur für .png")
+    args = parser.parse_args(argv)
+
+    # Zum Zeichnen wird das Modell nie aufgerufen; ein Platzhalter-Key genügt.
+    from langchain_openai import ChatOpenAI
+
+    llm = ChatOpenAI(model="gpt-4o-mini", api_key=os.getenv("OPENAI_API_KEY") or "offline")
+    if args.arch == "routing":
+        from .graph_routing import build_app
+    else:
+        from .graph_agent import build_app
+    app = build_app(llm)
+
+    try:
+        print(render_graph(app, args.out or f"stategraph_{args.arch}.mmd", args.method))
+    except Exception as e:
+        print(f"Rendern fehlgeschlagen: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,42 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
-from typing import Annotated, Any, Dict, Literal
+from typing import TYPE_CHECKING, Annotated, Any, Callable, Dict, Generator, Iterable, Literal, Optional, Tuple
 
 from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import Runnable, RunnableLambda
 from pydantic import BaseModel
-from langchain_openai import ChatOpenAI
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, StateGraph
 from langgraph.graph.message import add_messages
 
+from .history import DEFAULT_HISTORY, HistoryPolicy, compact_history, draft_message, estimate_tokens
+from .graph_render import try_render
+from .ledger import Ledger, track
+from .models import ModelRegistry, as_registry
+from .memo import cached_summary, current, merge_memo, prefetched_reply, reply_system, with_summary
+from .preprocess import clean_mail
+from .revision import EditPolicy, revise_steps
+from .summarize import DEFAULT_CHUNKING, ChunkPolicy, chunked_summary_steps, needs_chunking
 from .prompts import (
     ROUTER_SYSTEM_PROMPT,
     SYSTEM_SUMMARIZER,
-    SYSTEM_MAIL_REPLY,
     GENERAL_SYSTEM_PROMPT,
-    SYSTEM_REVISE,
     REPLY_DECISION_PROMPT,
     SYSTEM_NEW_MAIL,
+    SINGLE_CALL_ROUTER_PROMPT,
 )
 
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+    from .intent import IntentPolicy
+
 
 class Router(BaseModel):
     """Klassifiziert die Nutzeranfrage."""
@@ -27,12 +44,25 @@ class Router(BaseModel):
     logic: str = ""
 
 
+class RouterAnswer(BaseModel):
+    """Klassifiziert die Nutzeranfrage und beantwortet summary/general direkt."""
+    type: Literal["general", "summary", "reply", "new", "revise"]
+    logic: str = ""
+    answer: str = ""
+
+
+# Intents, die der Single-Call-Modus ohne eigenen Knoten beantwortet.
+SINGLE_CALL_INTENTS = ("summary", "general")
+
+
 @dataclass(kw_only=True)
 class AgentState:
     messages: Annotated[list[AnyMessage], add_messages]
     uploaded_mail: str = ""
     draft: str = ""
     router: Dict[str, Any] = field(default_factory=lambda: {"type": "general", "logic": ""})
+    # Abgeleitete Artefakte der aktuellen Mail (Zusammenfassung, vorab erzeugter Entwurf), siehe ``pipelines.memo``.
+    memo: Annotated[Dict[str, Any], merge_memo] = field(default_factory=dict)
 
 
 def last_user_message(messages: list[AnyMessage]) -> str:
@@ -43,11 +73,54 @@ def last_user_message(messages: list[AnyMessage]) -> str:
     return ""
 
 
+# -------------------------------- NODE-AUSFÜHRUNG
+# Jeder Knoten ist als Generator geschrieben: Er liefert per ``yield`` das Runnable
+# und dessen Eingabe und bekommt die Antwort zurück. So teilen sich die synchrone
+# (``invoke``) und die asynchrone Variante (``ainvoke``) dieselbe Logik.
+NodeSteps = Generator[Tuple[Runnable, Any], Any, dict]
+
+
+def _run_steps(steps: NodeSteps) -> dict:
+    try:
+        runnable, inp = next(steps)
+        while True:
+            try:
+                out = runnable.invoke(inp)
+            except Exception as e:
+                runnable, inp = steps.throw(e)
+            else:
+                runnable, inp = steps.send(out)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def _arun_steps(steps: NodeSteps) -> dict:
+    try:
+        runnable, inp = next(steps)
+        while True:
+            try:
+                out = await runnable.ainvoke(inp)
+            except Exception as e:
+                runnable, inp = steps.throw(e)
+            else:
+                runnable, inp = steps.send(out)
+    except StopIteration as stop:
+        return stop.value
+
+
 # -------------------------------- NODES
-def agent(state: AgentState, llm: ChatOpenAI) -> dict:
-    """Analysiert die Nutzeranfrage und bestimmt das Routing."""
-    has_mail = bool((state.uploaded_mail or "").strip())
+def _agent_steps(
+    state: AgentState, llm: ChatOpenAI, history: HistoryPolicy, intent: Optional[IntentPolicy] = None
+) -> NodeSteps:
+    has_mail = bool(clean_mail(state.uploaded_mail))
     has_draft = bool((state.draft or "").strip())
+    text = last_user_message(state.messages)
+    previous = state.router.get("type", "") if isinstance(state.router, dict) else ""
+    if intent is not None:
+        # Eindeutige Fälle entscheidet der lokale Klassifikator, ohne Round-Trip zum Router.
+        local = intent.classify(text, has_mail, has_draft, previous)
+        if local is not None:
+            return {"router": local}
 
     sys = SystemMessage(
         content=ROUTER_SYSTEM_PROMPT.format(
@@ -55,111 +128,478 @@ def agent(state: AgentState, llm: ChatOpenAI) -> dict:
             has_draft=has_draft,
         )
     )
-    messages = [sys] + state.messages
+    messages = [sys] + compact_history(state.messages, history)
 
     try:
-        decision: Router = llm.with_structured_output(Router).invoke(messages)
-        router_dict = decision.dict()
-
-        rtype = router_dict.get("type", "general")
-        if rtype in ("summary", "reply") and not has_mail:
-            router_dict = {"type": "general", "logic": f"{rtype} unzulässig ohne Mail"}
-        elif rtype == "revise" and not has_draft:
-            router_dict = {"type": "general", "logic": "revise unzulässig ohne Entwurf"}
+        decision: Router = yield llm.with_structured_output(Router), messages
+        router_dict = _admissible(decision.model_dump(), has_mail, has_draft)
     except Exception:
-        router_dict = {"type": "general", "logic": "fallback"}
+        return {"router": {"type": "general", "logic": "fallback"}}
 
+    if intent is not None:
+        intent.record(text, has_mail, has_draft, previous, router_dict["type"])
     return {"router": router_dict}
 
 
+def _admissible(router_dict: dict, has_mail: bool, has_draft: bool) -> dict:
+    rtype = router_dict.get("type", "general")
+    if rtype in ("summary", "reply") and not has_mail:
+        return {"type": "general", "logic": f"{rtype} unzulässig ohne Mail"}
+    if rtype == "revise" and not has_draft:
+        return {"type": "general", "logic": "revise unzulässig ohne Entwurf"}
+    return router_dict
+
+
+def agent(
+    state: AgentState,
+    llm: ChatOpenAI,
+    history: HistoryPolicy = DEFAULT_HISTORY,
+    intent: Optional[IntentPolicy] = None,
+) -> dict:
+    """Analysiert die Nutzeranfrage und bestimmt das Routing."""
+    return _run_steps(_agent_steps(state, llm, history, intent))
+
+
+async def aagent(
+    state: AgentState,
+    llm: ChatOpenAI,
+    history: HistoryPolicy = DEFAULT_HISTORY,
+    intent: Optional[IntentPolicy] = None,
+) -> dict:
+    """Async-Variante von ``agent``."""
+    return await _arun_steps(_agent_steps(state, llm, history, intent))
+
+
+def _single_call_steps(
+    state: AgentState,
+    llm: ChatOpenAI,
+    history: HistoryPolicy,
+    chunking: ChunkPolicy,
+    intent: Optional[IntentPolicy] = None,
+) -> NodeSteps:
+    mail = clean_mail(state.uploaded_mail)
+    # Wird reply/new/revise erwartet, bräuchte die Zusammenfassung Map-Reduce oder liegt sie schon
+    # im Memo, bleibt es beim schlanken Router ohne Mail im Prompt.
+    predicted = predict_intent(state)
+    if (
+        predicted in ("reply", "new", "revise")
+        or (mail and needs_chunking(mail, chunking))
+        or (predicted == "summary" and cached_summary(state.memo, state.uploaded_mail))
+    ):
+        return (yield from _agent_steps(state, llm, history, intent))
+
+    has_mail = bool(mail)
+    has_draft = bool((state.draft or "").strip())
+    sys = SystemMessage(content=SINGLE_CALL_ROUTER_PROMPT.format(has_mail=has_mail, has_draft=has_draft))
+    context = [SystemMessage(content=f"MAIL:\n{mail}")] if mail else []
+    messages = [sys, *context] + compact_history(state.messages, history)
+
+    try:
+        decision: RouterAnswer = yield llm.with_structured_output(RouterAnswer), messages
+    except Exception:
+        return {"router": {"type": "general", "logic": "fallback"}}
+
+    router_dict = _admissible({"type": decision.type, "logic": decision.logic}, has_mail, has_draft)
+    answer = (decision.answer or "").strip()
+    if router_dict["type"] != decision.type or decision.type not in SINGLE_CALL_INTENTS or not answer:
+        # Kein (gültiges) Direktergebnis: der gewählte Knoten läuft wie im Zwei-Schritt-Pfad.
+        return {"router": router_dict}
+
+    if decision.type == "summary":
+        return {
+            "router": {**router_dict, "answered": True},
+            "messages": [AIMessage(content=f"Zusammenfassung:\n\n{answer}")],
+            "memo": with_summary(state.memo, state.uploaded_mail, answer),
+        }
+    return {"router": {**router_dict, "answered": True}, "messages": [AIMessage(content=answer)]}
+
+
+def single_call_agent(
+    state: AgentState,
+    llm: ChatOpenAI,
+    history: HistoryPolicy = DEFAULT_HISTORY,
+    chunking: ChunkPolicy = DEFAULT_CHUNKING,
+    intent: Optional[IntentPolicy] = None,
+) -> dict:
+    """Router, der summary/general im selben Aufruf beantwortet."""
+    return _run_steps(_single_call_steps(state, llm, history, chunking, intent))
+
+
+async def asingle_call_agent(
+    state: AgentState,
+    llm: ChatOpenAI,
+    history: HistoryPolicy = DEFAULT_HISTORY,
+    chunking: ChunkPolicy = DEFAULT_CHUNKING,
+    intent: Optional[IntentPolicy] = None,
+) -> dict:
+    """Async-Variante von ``single_call_agent``."""
+    return await _arun_steps(_single_call_steps(state, llm, history, chunking, intent))
+
+
 def route_query(state: AgentState) -> Literal["summary", "reply", "new", "revise", "general"]:
     """Leitet zum passenden Knoten weiter."""
     if isinstance(state.router, dict):
         rtype = state.router.get("type", "general")
         if rtype in ("summary", "reply", "new", "revise", "general"):
-            return rtype 
+            return rtype
     return "general"
 
 
-def node_summary(state: AgentState, llm: ChatOpenAI) -> dict:
-    """Fasst die hochgeladene Mail kurz zusammen."""
-    mail = (state.uploaded_mail or "").strip()
+# -------------------------------- SPEKULATION
+# Router und vorhergesagter Knoten starten gleichzeitig. Stimmt der Router zu, wird das
+# Ergebnis des Knotens übernommen und der Graph endet ohne zweiten Round-Trip; sonst wird
+# es verworfen (async: Task abgebrochen) und der vom Router gewählte Knoten läuft normal.
+SPECULATIVE_TAG = "speculative"
+
+_INTENT_HINTS = (
+    (
+        "revise",
+        re.compile(r"überarbeit|kürzer|länger|förmlicher|lockerer|freundlicher|umformulier|änder|revise|rewrite", re.I),
+    ),
+    ("summary", re.compile(r"zusammenfass|fass\w*\b.*\bzusammen|kurzfassung|worum geht|tl;?dr|summar", re.I)),
+    ("reply", re.compile(r"antwort|antworte|reply|respond", re.I)),
+    ("new", re.compile(r"neue (?:e-?)?mail|schreib\w* (?:eine )?(?:e-?)?mail an|new (?:e-?)?mail", re.I)),
+)
+# Folge-Intent, wenn die Nachricht keinen Hinweis enthält (z. B. "noch etwas wärmer bitte").
+_NEXT_INTENT = {"reply": "revise", "new": "revise", "revise": "revise", "summary": "reply"}
+
+
+def predict_intent(state: AgentState) -> Optional[str]:
+    """Billige Vorhersage des Routers aus Schlüsselwörtern, vorherigem Intent und Mail/Entwurf-Flags.
+
+    ``None``, wenn nichts zuverlässig passt – dann wird nicht spekuliert.
+    """
+    has_mail = bool(clean_mail(state.uploaded_mail))
+    has_draft = bool((state.draft or "").strip())
+    allowed = {"summary": has_mail, "reply": has_mail, "revise": has_draft, "new": True}
+
+    text = last_user_message(state.messages)
+    for intent, pattern in _INTENT_HINTS:
+        if pattern.search(text):
+            return intent if allowed[intent] else None
+
+    previous = state.router.get("type") if isinstance(state.router, dict) else None
+    guess = _NEXT_INTENT.get(previous or "")
+    return guess if guess and allowed[guess] else None
+
+
+@dataclass
+class SpeculationStats:
+    """Zähler für das Tuning (thread-safe)."""
+    started: int = 0
+    hits: int = 0
+    misses: int = 0
+    errors: int = 0
+    skipped: int = 0
+    saturated: int = 0  # Pool voll: Turn ohne Spekulation
+    wasted_tokens: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "started": self.started,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "skipped": self.skipped,
+                "saturated": self.saturated,
+                "hit_rate": round(self.hits / self.started, 3) if self.started else 0.0,
+                "wasted_tokens": self.wasted_tokens,
+            }
+
+
+@dataclass
+class SpeculationPolicy:
+    """Spekulativer Modus für ``build_app(..., speculation=...)``.
+
+    ``intents``: Knoten, die spekulativ starten dürfen.
+    ``max_mail_tokens``: keine Spekulation auf Mails, deren Zusammenfassung Map-Reduce bräuchte.
+    """
+    intents: Tuple[str, ...] = ("summary", "reply", "new", "revise")
+    max_mail_tokens: int = DEFAULT_CHUNKING.threshold_tokens
+    stats: SpeculationStats = field(default_factory=SpeculationStats)
+    _pending: set = field(default_factory=set, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def predict(self, state: AgentState) -> Optional[str]:
+        guess = predict_intent(state)
+        if guess not in self.intents:
+            return None
+        if guess == "summary" and estimate_tokens(clean_mail(state.uploaded_mail)) > self.max_mail_tokens:
+            return None
+        return guess
+
+    def track_pending(self, future: Future, on_done: Callable[[], None]) -> None:
+        """Merkt sich einen verworfenen, noch laufenden Aufruf; ``on_done`` läuft nach seinem Ende."""
+
+        def done(f: Future) -> None:
+            on_done()
+            with self._lock:
+                self._pending.discard(f)
+
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(done)
+
+    def drain(self, timeout: Optional[float] = None) -> None:
+        """Wartet auf verworfene, noch laufende Aufrufe (sync), damit ``wasted_tokens`` vollständig ist."""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+
+# Gemeinsamer, begrenzter Pool für spekulative Knoten (sync). Sind alle Plätze belegt, läuft der
+# Turn ohne Spekulation (Zähler ``saturated``), statt auf einen freien Thread zu warten.
+SPECULATION_WORKERS = 16
+_SPECULATION_POOL = ThreadPoolExecutor(max_workers=SPECULATION_WORKERS, thread_name_prefix="speculation")
+_SPECULATION_SLOTS = threading.BoundedSemaphore(SPECULATION_WORKERS)
+
+
+def _speculation_config(intent: str) -> dict:
+    # Im Ledger und im Token-Stream zählen die Aufrufe zum vorhergesagten Knoten.
+    return {"tags": [SPECULATIVE_TAG], "metadata": {"langgraph_node": intent}}
+
+
+def _commit(routed: dict, guess: str, result: Optional[dict], policy: SpeculationPolicy) -> dict:
+    router = routed["router"]
+    if router.get("type") != guess:
+        policy.stats.incr("misses")
+        return {"router": {**router, "speculation": "miss"}}
+    if result is None:
+        policy.stats.incr("errors")
+        return {"router": {**router, "speculation": "error"}}
+    policy.stats.incr("hits")
+    return {**result, "router": {**router, "speculation": "hit"}}
+
+
+def speculative_agent(
+    state: AgentState,
+    llm: ChatOpenAI,
+    nodes: Dict[str, Runnable],
+    policy: SpeculationPolicy,
+    history: HistoryPolicy = DEFAULT_HISTORY,
+    intent: Optional[IntentPolicy] = None,
+) -> dict:
+    """Router plus vorhergesagter Knoten parallel (Knoten im Hintergrund-Thread)."""
+    guess = policy.predict(state)
+    if guess is None:
+        policy.stats.incr("skipped")
+        return agent(state, llm, history, intent)
+
+    if not _SPECULATION_SLOTS.acquire(blocking=False):
+        policy.stats.incr("saturated")
+        return agent(state, llm, history, intent)
+
+    policy.stats.incr("started")
+    spent = Ledger()
+
+    def work() -> dict:
+        try:
+            with track(spent):
+                return nodes[guess].invoke(state, config=_speculation_config(guess))
+        finally:
+            _SPECULATION_SLOTS.release()
+
+    try:
+        future = _SPECULATION_POOL.submit(contextvars.copy_context().run, work)
+    except BaseException:
+        _SPECULATION_SLOTS.release()
+        raise
+
+    routed = agent(state, llm, history, intent)
+    if routed["router"].get("type") != guess:
+        # Ein laufender HTTP-Aufruf lässt sich nicht abbrechen; verworfene Tokens zählen nach Abschluss.
+        policy.track_pending(future, lambda: policy.stats.incr("wasted_tokens", spent.totals()["total_tokens"]))
+        return _commit(routed, guess, None, policy)
+    try:
+        result = future.result()
+    except Exception:
+        result = None
+    return _commit(routed, guess, result, policy)
+
+
+async def aspeculative_agent(
+    state: AgentState,
+    llm: ChatOpenAI,
+    nodes: Dict[str, Runnable],
+    policy: SpeculationPolicy,
+    history: HistoryPolicy = DEFAULT_HISTORY,
+    intent: Optional[IntentPolicy] = None,
+) -> dict:
+    """Async-Variante von ``speculative_agent``; bei Fehlvorhersage wird der Knoten abgebrochen."""
+    guess = policy.predict(state)
+    if guess is None:
+        policy.stats.incr("skipped")
+        return await aagent(state, llm, history, intent)
+
+    policy.stats.incr("started")
+    spent = Ledger()
+
+    async def work() -> dict:
+        with track(spent):
+            return await nodes[guess].ainvoke(state, config=_speculation_config(guess))
+
+    task = asyncio.create_task(work())
+    routed = await aagent(state, llm, history, intent)
+    if routed["router"].get("type") != guess:
+        task.cancel()
+        # Abgebrochene Aufrufe liefern keine Usage; gezählt wird, was schon abgeschlossen war.
+        policy.stats.incr("wasted_tokens", spent.totals()["total_tokens"])
+        return _commit(routed, guess, None, policy)
+    try:
+        result = await task
+    except Exception:
+        result = None
+    return _commit(routed, guess, result, policy)
+
+
+def route_after_agent(state: AgentState) -> Literal["summary", "reply", "new", "revise", "general", "__end__"]:
+    """Wie ``route_query``; hat die Spekulation getroffen oder der Router direkt geantwortet,
+    ist die Antwort schon da."""
+    if isinstance(state.router, dict) and (state.router.get("speculation") == "hit" or state.router.get("answered")):
+        return END
+    return route_query(state)
+
+
+def _summary_steps(state: AgentState, llm: ChatOpenAI, chunking: ChunkPolicy) -> NodeSteps:
+    mail = clean_mail(state.uploaded_mail)
     if not mail:
         return {"messages": [AIMessage(content="Bitte lade zuerst eine Mail hoch.")]}
 
-    sys_summarizer = SystemMessage(content=SYSTEM_SUMMARIZER)
-    res = llm.invoke(
-        [sys_summarizer, HumanMessage(content=f"Originalmail:\n{mail}")]
-    ).content.strip()
+    cached = cached_summary(state.memo, state.uploaded_mail)
+    if cached:
+        return {"messages": [AIMessage(content=f"Zusammenfassung:\n\n{cached}")]}
 
-    return {"messages": [AIMessage(content=f"Zusammenfassung:\n\n{res}")]}
-    
+    if needs_chunking(mail, chunking):
+        res = yield from chunked_summary_steps(llm, mail, chunking)
+    else:
+        sys_summarizer = SystemMessage(content=SYSTEM_SUMMARIZER)
+        res = (yield llm, [sys_summarizer, HumanMessage(content=f"Originalmail:\n{mail}")]).content.strip()
 
-def node_reply(state: AgentState, llm: ChatOpenAI) -> dict:
-    """Antwortet auf die hochgeladene Mail (ggf. mit GENAU einer Rückfrage, falls nötig)."""
-    mail = (state.uploaded_mail or "").strip()
+    return {
+        "messages": [AIMessage(content=f"Zusammenfassung:\n\n{res}")],
+        "memo": with_summary(state.memo, state.uploaded_mail, res),
+    }
+
+
+def node_summary(state: AgentState, llm: ChatOpenAI, chunking: ChunkPolicy = DEFAULT_CHUNKING) -> dict:
+    """Fasst die hochgeladene Mail kurz zusammen (lange Mails per Map-Reduce; vorhandene aus dem Memo)."""
+    return _run_steps(_summary_steps(state, llm, chunking))
+
+
+async def anode_summary(state: AgentState, llm: ChatOpenAI, chunking: ChunkPolicy = DEFAULT_CHUNKING) -> dict:
+    """Async-Variante von ``node_summary``."""
+    return await _arun_steps(_summary_steps(state, llm, chunking))
+
+
+def _reply_steps(state: AgentState, llm: ChatOpenAI, history: HistoryPolicy) -> NodeSteps:
+    mail = clean_mail(state.uploaded_mail)
     if not mail:
         return {"messages": [AIMessage(content="Bitte lade zuerst eine Mail hoch.")]}
 
-    sys_reply = SystemMessage(content=SYSTEM_MAIL_REPLY)
+    # Vorab erzeugter Entwurf (``pipelines.prefetch``), solange der Verlauf keine eigenen Vorgaben enthält.
+    requests = [m.content for m in state.messages if isinstance(m, HumanMessage) and isinstance(m.content, str)]
+    prefetched = prefetched_reply(state.memo, state.uploaded_mail, requests)
+    if prefetched:
+        return {
+            "messages": [draft_message(f"Entwurf (Antwort):\n\n{prefetched}")],
+            "draft": prefetched,
+            "memo": {**current(state.memo, state.uploaded_mail), "reply": ""},
+        }
+
+    # Sprache (und übrige lokale Analyse) einmal je Mail; danach aus dem Memo.
+    memo = current(state.memo, state.uploaded_mail)
+    memo_update = {"memo": memo} if memo is not state.memo else {}
+    sys_reply = SystemMessage(content=reply_system(memo))
     sys_decide = SystemMessage(content=REPLY_DECISION_PROMPT)
     sys_mail = SystemMessage(content=f"MAIL (Kontext für Antwort):\n{mail}")
+    # Liegt die Zusammenfassung schon im Memo, geht sie als Kontext mit (kein zusätzlicher Aufruf).
+    summary = cached_summary(state.memo, state.uploaded_mail)
+    context = [SystemMessage(content=f"SUMMARY:\n{summary}")] if summary else []
 
-    messages = [sys_reply, sys_decide, sys_mail] + state.messages
-    res = llm.invoke(messages).content.strip()
+    messages = [sys_reply, sys_decide, sys_mail, *context] + compact_history(state.messages, history)
+    res = (yield llm, messages).content.strip()
 
     if re.match(r"^\s*ASK\s*:", res, flags=re.IGNORECASE):
         question = res.split(":", 1)[1].strip()
-        return {"messages": [AIMessage(content=question)]}
+        return {"messages": [AIMessage(content=question)], **memo_update}
 
     reply_draft = res
     return {
-        "messages": [AIMessage(content=f"Entwurf (Antwort):\n\n{reply_draft}")],
+        "messages": [draft_message(f"Entwurf (Antwort):\n\n{reply_draft}")],
         "draft": reply_draft,
+        **memo_update,
     }
 
 
-def node_new(state: AgentState, llm: ChatOpenAI) -> dict:
-    """Verfasst eine neue Mail anhand des letzten Nutzer-Inputs."""
+def node_reply(state: AgentState, llm: ChatOpenAI, history: HistoryPolicy = DEFAULT_HISTORY) -> dict:
+    """Antwortet auf die hochgeladene Mail (ggf. mit GENAU einer Rückfrage, falls nötig)."""
+    return _run_steps(_reply_steps(state, llm, history))
+
+
+async def anode_reply(state: AgentState, llm: ChatOpenAI, history: HistoryPolicy = DEFAULT_HISTORY) -> dict:
+    """Async-Variante von ``node_reply``."""
+    return await _arun_steps(_reply_steps(state, llm, history))
+
+
+def _new_steps(state: AgentState, llm: ChatOpenAI) -> NodeSteps:
     user_input = last_user_message(state.messages)
     if not user_input:
         return {"messages": [AIMessage(content="Worum geht es in der neuen Mail? Empfänger, Zweck, Ton?")]}
 
     sys_new = SystemMessage(content=SYSTEM_NEW_MAIL)
-    res = llm.invoke(
-        [sys_new, HumanMessage(content=f"USER_INPUT:\n{user_input}")]
-    ).content.strip()
+    res = (yield llm, [sys_new, HumanMessage(content=f"USER_INPUT:\n{user_input}")]).content.strip()
 
     return {
-        "messages": [AIMessage(content=f"Entwurf (neu):\n\n{res}")],
+        "messages": [draft_message(f"Entwurf (neu):\n\n{res}")],
         "draft": res,
     }
 
 
-def node_revise(state: AgentState, llm: ChatOpenAI) -> dict:
-    """Überarbeitet den vorhandenen Entwurf strikt nach Nutzer-Feedback."""
+def node_new(state: AgentState, llm: ChatOpenAI) -> dict:
+    """Verfasst eine neue Mail anhand des letzten Nutzer-Inputs."""
+    return _run_steps(_new_steps(state, llm))
+
+
+async def anode_new(state: AgentState, llm: ChatOpenAI) -> dict:
+    """Async-Variante von ``node_new``."""
+    return await _arun_steps(_new_steps(state, llm))
+
+
+def _revise_steps(state: AgentState, llm: ChatOpenAI, edits: Optional[EditPolicy] = None) -> NodeSteps:
     draft = (state.draft or "").strip()
     if not draft:
         return {"messages": [AIMessage(content="Kein Entwurf vorhanden. Soll ich zuerst einen erstellen?")]}
 
     user_input = last_user_message(state.messages)
-    sys_revise = SystemMessage(content=SYSTEM_REVISE)
-    res = llm.invoke(
-        [sys_revise, HumanMessage(content=f"ENTWURF:\n{draft}\n\nFEEDBACK:\n{user_input or '–'}")]
-    ).content.strip()
+    res = yield from revise_steps(llm, draft, user_input, edits)
 
     return {
-        "messages": [AIMessage(content=f"Überarbeiteter Entwurf:\n\n{res}")],
+        "messages": [draft_message(f"Überarbeiteter Entwurf:\n\n{res}")],
         "draft": res,
     }
 
 
-def node_general(state: AgentState, llm: ChatOpenAI) -> dict:
-    """Allgemeiner Assistent (Mailkontext nur nutzen, wenn relevant)."""
+def node_revise(state: AgentState, llm: ChatOpenAI, edits: Optional[EditPolicy] = None) -> dict:
+    """Überarbeitet den vorhandenen Entwurf strikt nach Nutzer-Feedback (mit ``edits`` per Edit-Skript)."""
+    return _run_steps(_revise_steps(state, llm, edits))
+
+
+async def anode_revise(state: AgentState, llm: ChatOpenAI, edits: Optional[EditPolicy] = None) -> dict:
+    """Async-Variante von ``node_revise``."""
+    return await _arun_steps(_revise_steps(state, llm, edits))
+
+
+def _general_steps(state: AgentState, llm: ChatOpenAI) -> NodeSteps:
     user_input = last_user_message(state.messages)
     sys_general = SystemMessage(content=GENERAL_SYSTEM_PROMPT)
 
-    mail = (state.uploaded_mail or "").strip()
+    mail = clean_mail(state.uploaded_mail)
     if mail:
         human = HumanMessage(
             content=(
@@ -170,36 +610,132 @@ def node_general(state: AgentState, llm: ChatOpenAI) -> dict:
     else:
         human = HumanMessage(content=user_input or "–")
 
-    res = llm.invoke([sys_general, human]).content.strip()
+    res = (yield llm, [sys_general, human]).content.strip()
     return {"messages": [AIMessage(content=res)]}
 
 
+def node_general(state: AgentState, llm: ChatOpenAI) -> dict:
+    """Allgemeiner Assistent (Mailkontext nur nutzen, wenn relevant)."""
+    return _run_steps(_general_steps(state, llm))
+
+
+async def anode_general(state: AgentState, llm: ChatOpenAI) -> dict:
+    """Async-Variante von ``node_general``."""
+    return await _arun_steps(_general_steps(state, llm))
+
+
 # -------------------------------- GRAPH
-def build_app(llm: ChatOpenAI):
-    """Erstellt und kompiliert den Graphen."""
+def _node(func, afunc, llm: ChatOpenAI, **kwargs) -> RunnableLambda:
+    """Knoten mit sync- und async-Implementierung: ``app.invoke`` und ``app.ainvoke`` laufen nativ."""
+
+    async def arun(s):
+        return await afunc(s, llm, **kwargs)
+
+    return RunnableLambda(lambda s: func(s, llm, **kwargs), afunc=arun, name=func.__name__)
+
+
+def build_app(
+    llm: ChatOpenAI | ModelRegistry,
+    history: HistoryPolicy = DEFAULT_HISTORY,
+    chunking: ChunkPolicy = DEFAULT_CHUNKING,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+    speculation: Optional[SpeculationPolicy] = None,
+    single_call: bool = False,
+    edits: Optional[EditPolicy] = None,
+    intent: Optional[IntentPolicy] = None,
+    render_to: Optional[str] = None,
+):
+    """Erstellt und kompiliert den Graphen.
+
+    ``llm``: ein Modell für alles oder ein ``ModelRegistry`` (Rolle ``router`` für den
+    Router-Knoten inkl. Single-Call-Antworten, sonst die Rolle des jeweiligen Knotens).
+    ``history`` begrenzt den Verlauf, den Router und Reply-Knoten mitschicken.
+    ``chunking`` legt fest, ab wann der Summary-Knoten lange Mails per Map-Reduce zusammenfasst.
+    ``checkpointer``: speichert den State je ``thread_id`` (siehe ``pipelines.sessions``);
+    ein Turn braucht dann nur noch die neue Nachricht.
+    ``speculation``: Router und vorhergesagten Knoten parallel starten; Trefferquote und
+    verworfene Tokens stehen in ``speculation.stats``.
+    ``single_call``: Router beantwortet summary/general im selben Aufruf (ein Round-Trip);
+    reply/new/revise laufen weiter über ihre Knoten. Nicht mit ``speculation`` kombinierbar.
+    ``edits``: Überarbeitungen als Edit-Skript statt Neufassung (siehe ``pipelines.revision``).
+    ``intent``: lokaler Klassifikator vor dem Router; nur unter seiner Schwelle wird das Modell
+    gefragt, dessen Entscheidungen optional als Trainingsdaten geloggt werden (siehe ``pipelines.intent``).
+    Im Single-Call-Modus greift er nur, wo der schlanke Router ohne Direktantwort läuft.
+    ``render_to``: Graph nach dem Kompilieren als ``.mmd``/``.png`` speichern (siehe
+    ``pipelines.graph_render``); ohne Angabe wird nichts gerendert.
+    """
+    if speculation is not None and single_call:
+        raise ValueError("speculation und single_call schließen sich aus")
+    models = as_registry(llm)
+    router = models.get("router")
     g = StateGraph(AgentState)
 
-    g.add_node("agent", lambda s: agent(s, llm))
-    g.add_node("summary", lambda s: node_summary(s, llm))
-    g.add_node("reply", lambda s: node_reply(s, llm))
-    g.add_node("new", lambda s: node_new(s, llm))
-    g.add_node("revise", lambda s: node_revise(s, llm))
-    g.add_node("general", lambda s: node_general(s, llm))
+    nodes = {
+        "summary": _node(node_summary, anode_summary, models.get("summary"), chunking=chunking),
+        "reply": _node(node_reply, anode_reply, models.get("reply"), history=history),
+        "new": _node(node_new, anode_new, models.get("new")),
+        "revise": _node(node_revise, anode_revise, models.get("revise"), edits=edits),
+        "general": _node(node_general, anode_general, models.get("general")),
+    }
+    if single_call:
+        g.add_node(
+            "agent",
+            _node(single_call_agent, asingle_call_agent, router, history=history, chunking=chunking, intent=intent),
+        )
+    elif speculation is None:
+        g.add_node("agent", _node(agent, aagent, router, history=history, intent=intent))
+    else:
+        g.add_node(
+            "agent",
+            _node(
+                speculative_agent,
+                aspeculative_agent,
+                router,
+                nodes=nodes,
+                policy=speculation,
+                history=history,
+                intent=intent,
+            ),
+        )
+    for name, node in nodes.items():
+        g.add_node(name, node)
 
     g.set_entry_point("agent")
-    g.add_conditional_edges("agent", route_query)
+    plain = speculation is None and not single_call
+    g.add_conditional_edges("agent", route_query if plain else route_after_agent)
 
-    for n in ["summary", "reply", "new", "revise", "general"]:
+    for n in nodes:
         g.add_edge(n, END)
 
-    app = g.compile()
+    app = g.compile(checkpointer=checkpointer)
+    try_render(app, render_to)
+    return app
 
-    try:
-        png = app.get_graph().draw_mermaid_png()
-        with open("stategraph_routing.png", "wb") as f:
-            f.write(png)
-        print("Graph als stategraph_routing.png gespeichert")
-    except Exception as e:
-        print(e)
-
-    return app
\ No newline at end of file
+
+def request_state(prompt: str, mail: str = "", draft: str = "") -> dict:
+    """Startzustand für eine einzelne Anfrage (ohne Vorverlauf)."""
+    return {
+        "messages": [HumanMessage(content=prompt)],
+        "uploaded_mail": mail,
+        "draft": draft,
+        "router": {"type": "general", "logic": ""},
+    }
+
+
+async def abatch_requests(
+    app,
+    requests: Iterable[Tuple[str, str]],
+    max_concurrency: int = 8,
+    return_exceptions: bool = False,
+) -> list:
+    """Führt viele ``(mail, prompt)``-Paare nebenläufig durch den kompilierten Graphen.
+
+    Nutzt ``app.abatch`` mit begrenzter Nebenläufigkeit; Ergebnisse (finale States)
+    kommen in Eingabereihenfolge zurück.
+    """
+    states = [request_state(prompt, mail) for mail, prompt in requests]
+    return await app.abatch(
+        states,
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=return_exceptions,
+    )
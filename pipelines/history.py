@@ -0,0 +1,144 @@
+"""Token-Budget für den Chatverlauf.
+
+Ohne Kompaktierung bezahlt jeder Turn alle früheren Entwürfe erneut. ``compact_history``
+hält die Promptgröße pro Turn beschränkt – unabhängig von der Sitzungslänge:
+
+1. Überholte Entwürfe (alle außer dem jüngsten) werden durch einen Platzhalter ersetzt.
+2. Die letzten ``keep_turns`` Turns bleiben wörtlich erhalten.
+3. Ältere Turns werden zu einer rollierenden Kurzfassung (eine Zeile pro Turn) verdichtet.
+4. Reicht das Budget nicht, wandern weitere Turns in die Kurzfassung und die ältesten
+   Zeilen fallen weg. Der aktuelle Turn bleibt immer vollständig.
+
+Ein Turn beginnt mit einer ``HumanMessage`` und umfasst alle folgenden AI-/Tool-Nachrichten;
+Tool-Calls und ihre ToolMessages werden dadurch nie getrennt.
+"""
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Sequence
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage, ToolMessage
+
+
+@dataclass(frozen=True)
+class HistoryPolicy:
+    """Budget für den Verlauf, der pro LLM-Aufruf mitgeschickt wird."""
+    max_tokens: int = 1500
+    keep_turns: int = 3
+    line_chars: int = 160
+    enabled: bool = True
+
+
+DEFAULT_HISTORY = HistoryPolicy()
+
+DRAFT_PLACEHOLDER = "[älterer Entwurf ausgelassen – überholt]"
+SUMMARY_HEADER = "Bisheriger Verlauf (gekürzt):"
+
+# Entwurfsnachrichten der Graphen tragen diese Markierung in ``additional_kwargs`` (``draft_message``).
+DRAFT_KEY = "draft"
+# Ohne Markierung (Tool-Ergebnisse, ältere Checkpoints): Mail-Format "Betreff: …" bzw. bei
+# englischen Antworten (Sprachregel) "Subject: …", ggf. mit Präfix der Routing-Knoten.
+_DRAFT_RE = re.compile(r"^\s*(?:(?:Entwurf \((?:Antwort|neu)\)|Überarbeiteter Entwurf):\s*)?(?:Betreff|Subject):")
+
+
+def estimate_tokens(text: str) -> int:
+    """Schnelle Schätzung (~4 Zeichen pro Token); reicht für Budgetentscheidungen."""
+    return math.ceil(len(text or "") / 4)
+
+
+def _text(m: AnyMessage) -> str:
+    return m.content if isinstance(m.content, str) else str(m.content)
+
+
+def message_tokens(m: AnyMessage) -> int:
+    tokens = estimate_tokens(_text(m)) + 4
+    for tc in getattr(m, "tool_calls", None) or []:
+        tokens += estimate_tokens(str(tc.get("args", "")))
+    return tokens
+
+
+def draft_message(content: str) -> AIMessage:
+    """Antwort mit einem Entwurf; ``drop_superseded_drafts`` erkennt sie unabhängig vom Text."""
+    return AIMessage(content=content, additional_kwargs={DRAFT_KEY: True})
+
+
+def is_draft(m: AnyMessage) -> bool:
+    if not isinstance(m, (AIMessage, ToolMessage)):
+        return False
+    return bool(m.additional_kwargs.get(DRAFT_KEY)) or bool(_DRAFT_RE.match(_text(m)))
+
+
+def drop_superseded_drafts(messages: Sequence[AnyMessage]) -> list[AnyMessage]:
+    """Ersetzt den Inhalt aller Entwürfe außer dem jüngsten durch einen Platzhalter."""
+    draft_idx = [i for i, m in enumerate(messages) if is_draft(m)]
+    superseded = set(draft_idx[:-1])
+    return [
+        m.model_copy(update={"content": DRAFT_PLACEHOLDER}) if i in superseded else m
+        for i, m in enumerate(messages)
+    ]
+
+
+def split_turns(messages: Sequence[AnyMessage]) -> list[list[AnyMessage]]:
+    turns: list[list[AnyMessage]] = []
+    for m in messages:
+        if isinstance(m, HumanMessage) or not turns:
+            turns.append([m])
+        else:
+            turns[-1].append(m)
+    return turns
+
+
+def _clip(text: str, n: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= n else text[: n - 1] + "…"
+
+
+def summarize_turn(turn: Sequence[AnyMessage], line_chars: int) -> str:
+    user = next((_text(m) for m in turn if isinstance(m, HumanMessage)), "")
+    answer, drafted = "", False
+    for m in reversed(turn):
+        if isinstance(m, AIMessage) and _text(m).strip():
+            answer, drafted = _text(m), is_draft(m)
+            break
+    if drafted or answer == DRAFT_PLACEHOLDER:
+        answer = "[Entwurf erstellt]"
+    half = max(20, line_chars // 2)
+    return f"- Nutzer: {_clip(user, half)} → Assistent: {_clip(answer, half) or '–'}"
+
+
+def compact_history(messages: Sequence[AnyMessage], policy: HistoryPolicy = DEFAULT_HISTORY) -> list[AnyMessage]:
+    """Gibt einen budgetierten Verlauf zurück (der State selbst bleibt unverändert)."""
+    if not policy.enabled or not messages:
+        return list(messages)
+
+    turns = split_turns(drop_superseded_drafts(messages))
+    keep = max(1, policy.keep_turns)
+    recent, old = turns[-keep:], turns[:-keep]
+
+    def size(ts: list[list[AnyMessage]]) -> int:
+        return sum(message_tokens(m) for t in ts for m in t)
+
+    # Budget: ältere wörtliche Turns in die Kurzfassung verschieben, der aktuelle bleibt.
+    while len(recent) > 1 and size(recent) > policy.max_tokens:
+        old.append(recent.pop(0))
+
+    lines = [summarize_turn(t, policy.line_chars) for t in old]
+    budget_left = policy.max_tokens - size(recent) - estimate_tokens(SUMMARY_HEADER)
+    kept_lines: list[str] = []
+    for line in reversed(lines):
+        cost = estimate_tokens(line) + 1
+        if cost > budget_left:
+            break
+        kept_lines.insert(0, line)
+        budget_left -= cost
+
+    out: list[AnyMessage] = []
+    if kept_lines:
+        if len(kept_lines) < len(lines):
+            kept_lines.insert(0, "- …")
+        out.append(SystemMessage(content=SUMMARY_HEADER + "\n" + "\n".join(kept_lines)))
+    for t in recent:
+        out.extend(t)
+    return out
@@ -0,0 +1,317 @@
+"""Lokaler Intent-Klassifikator vor dem LLM-Router (Routing-Graph).
+
+Jeder Turn kostete bisher einen strukturierten LLM-Aufruf, nur um eines von fünf Labels
+(``Router.type``) zu wählen. ``IntentClassifier`` entscheidet die eindeutigen Fälle lokal:
+
+- Merkmale: gehashte Wort-Uni-/Bigramme und Zeichen-3-/4-Gramme der Anfrage, die Flags
+  ``has_mail``/``has_draft`` und der Intent des vorherigen Turns („noch etwas wärmer“
+  nach einem Entwurf ist meist ``revise``).
+- Modell: multinomiale logistische Regression in NumPy. Eine Vorhersage summiert einige
+  Dutzend Gewichtsspalten und rechnet einen Softmax über fünf Werte (Mikrosekunden).
+- Unzulässige Labels (ohne Mail kein summary/reply, ohne Entwurf kein revise) werden vor
+  der Entscheidung ausgeblendet.
+
+Mit einer ``IntentPolicy`` (``build_app(..., intent=...)``) entscheidet der Klassifikator,
+wenn das beste Label mindestens ``threshold`` erreicht; sonst läuft der LLM-Router wie
+bisher. Dessen Entscheidungen lassen sich als Trainingsdaten mitschreiben (``log_path``,
+JSONL). Training und Auswertung offline::
+
+    python -m pipelines.intent train router_log.jsonl --out intent.npz
+    python -m pipelines.intent eval router_log.jsonl --model intent.npz
+
+``eval`` meldet die Übereinstimmung mit dem LLM-Router und den Anteil eingesparter
+Router-Aufrufe je Schwelle.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+LABELS = ("general", "summary", "reply", "new", "revise")
+DEFAULT_DIM = 1 << 14
+DEFAULT_THRESHOLD = 0.9
+
+_WORD_RE = re.compile(r"\w+")
+
+
+@dataclass(frozen=True)
+class Example:
+    """Eine (geloggte) Router-Entscheidung."""
+    text: str
+    has_mail: bool
+    has_draft: bool
+    label: str
+    previous: str = ""
+
+
+def load_examples(path: str) -> list[Example]:
+    """JSONL mit ``text``, ``has_mail``, ``has_draft``, ``label`` (optional ``previous``)."""
+    examples: list[Example] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                if row.get("label") in LABELS:
+                    examples.append(Example(
+                        row["text"], bool(row["has_mail"]), bool(row["has_draft"]), row["label"], row.get("previous") or ""
+                    ))
+    return examples
+
+
+def _features(text: str, has_mail: bool, has_draft: bool, previous: str) -> list[str]:
+    words = _WORD_RE.findall((text or "").lower())
+    padded = f" {' '.join(words)} "
+    flags = f"m{int(has_mail)}d{int(has_draft)}"
+    feats = [f"f:{flags}", f"p:{previous}", f"p:{previous}:{flags}"]
+    feats += [f"w:{w}" for w in words]
+    feats += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for n in (3, 4):
+        feats += [f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1)]
+    if len(words) <= 3:
+        # Kurze Folgeanfragen („wärmer bitte“) hängen stark am vorherigen Intent.
+        feats.append(f"s:{previous}")
+    return feats
+
+
+def feature_vector(text: str, has_mail: bool, has_draft: bool, previous: str = "", dim: int = DEFAULT_DIM) -> tuple[np.ndarray, np.ndarray]:
+    """Gehashte Merkmale als (Indizes, Werte); L2-normiert, Kollisionen addiert."""
+    ids = np.fromiter(
+        (zlib.crc32(f.encode("utf-8")) % dim for f in _features(text, has_mail, has_draft, previous)), dtype=np.int64
+    )
+    ids, counts = np.unique(ids, return_counts=True)
+    values = counts.astype(np.float32)
+    return ids, values / np.linalg.norm(values)
+
+
+def admissible_mask(has_mail: bool, has_draft: bool) -> np.ndarray:
+    allowed = {"summary": has_mail, "reply": has_mail, "revise": has_draft}
+    return np.array([allowed.get(label, True) for label in LABELS])
+
+
+@dataclass
+class IntentClassifier:
+    """Multinomiale logistische Regression über gehashte Merkmale."""
+    weights: np.ndarray  # (len(LABELS), dim)
+    bias: np.ndarray  # (len(LABELS),)
+
+    @property
+    def dim(self) -> int:
+        return self.weights.shape[1]
+
+    def proba(self, text: str, has_mail: bool, has_draft: bool, previous: str = "") -> np.ndarray:
+        """Wahrscheinlichkeiten je Label (Reihenfolge ``LABELS``), unzulässige Labels = 0."""
+        ids, values = feature_vector(text, has_mail, has_draft, previous, self.dim)
+        logits = self.weights[:, ids] @ values + self.bias
+        logits = np.where(admissible_mask(has_mail, has_draft), logits, -np.inf)
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+
+    def predict(self, text: str, has_mail: bool, has_draft: bool, previous: str = "") -> tuple[str, float]:
+        p = self.proba(text, has_mail, has_draft, previous)
+        best = int(p.argmax())
+        return LABELS[best], float(p[best])
+
+    @classmethod
+    def fit(
+        cls,
+        examples: Sequence[Example],
+        dim: int = DEFAULT_DIM,
+        epochs: int = 300,
+        lr: float = 8.0,
+        l2: float = 1e-5,
+    ) -> IntentClassifier:
+        """Volles Gradientenverfahren auf der Kreuzentropie (dünn besetzt, vektorisiert).
+
+        Gerechnet wird nur auf den Spalten, die im Training vorkommen; die übrigen bleiben 0.
+        """
+        if not examples:
+            raise ValueError("Keine Trainingsbeispiele")
+        vectors = [feature_vector(e.text, e.has_mail, e.has_draft, e.previous, dim) for e in examples]
+        columns, ids = np.unique(np.concatenate([v[0] for v in vectors]), return_inverse=True)
+        values = np.concatenate([v[1] for v in vectors])
+        rows = np.repeat(np.arange(len(vectors)), [len(v[0]) for v in vectors])
+        starts = np.concatenate([[0], np.cumsum([len(v[0]) for v in vectors])[:-1]])
+        masks = np.stack([admissible_mask(e.has_mail, e.has_draft) for e in examples])
+        target = np.zeros((len(examples), len(LABELS)))
+        target[np.arange(len(examples)), [LABELS.index(e.label) for e in examples]] = 1.0
+
+        values = values[:, None]
+        weights = np.zeros((len(columns), len(LABELS)))  # transponiert: eine Zeile je Merkmal
+        bias = np.zeros(len(LABELS))
+        n = len(examples)
+        for _ in range(epochs):
+            logits = np.add.reduceat(weights[ids] * values, starts) + bias  # (n, L)
+            logits = np.where(masks, logits, -np.inf)
+            exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+            grad = (exp / exp.sum(axis=1, keepdims=True) - target) / n  # (n, L)
+            contrib = grad[rows] * values  # (nnz, L)
+            grad_w = np.stack([np.bincount(ids, contrib[:, k], len(columns)) for k in range(len(LABELS))], axis=1)
+            weights -= lr * (grad_w + l2 * weights)
+            bias -= lr * grad.sum(axis=0)
+
+        full = np.zeros((len(LABELS), dim), dtype=np.float32)
+        full[:, columns] = weights.T
+        return cls(full, bias.astype(np.float32))
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, labels=np.array(LABELS))
+
+    @classmethod
+    def load(cls, path: str) -> IntentClassifier:
+        data = np.load(path)
+        if tuple(data["labels"]) != LABELS:
+            raise ValueError(f"{path}: Labels {tuple(data['labels'])} passen nicht zu {LABELS}")
+        return cls(data["weights"], data["bias"])
+
+
+@dataclass
+class IntentStats:
+    """Zähler für das Tuning (thread-safe)."""
+    local: int = 0  # lokal entschieden, kein Router-Aufruf
+    llm: int = 0  # unter der Schwelle, LLM-Router gefragt
+    logged: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            total = self.local + self.llm
+            return {
+                "local": self.local,
+                "llm": self.llm,
+                "logged": self.logged,
+                "saved_share": round(self.local / total, 3) if total else 0.0,
+            }
+
+
+@dataclass
+class IntentPolicy:
+    """Lokaler Klassifikator vor dem LLM-Router (``build_app(..., intent=...)``).
+
+    ``classifier``: ohne Klassifikator fragt jeder Turn den LLM-Router (nur Logging).
+    ``threshold``: Mindestwahrscheinlichkeit des besten zulässigen Labels für eine lokale Entscheidung.
+    ``log_path``: Entscheidungen des LLM-Routers als JSONL anhängen (Trainingsdaten).
+    """
+    classifier: Optional[IntentClassifier] = None
+    threshold: float = DEFAULT_THRESHOLD
+    log_path: Optional[str] = None
+    stats: IntentStats = field(default_factory=IntentStats)
+    _log_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def classify(self, text: str, has_mail: bool, has_draft: bool, previous: str = "") -> Optional[dict]:
+        """Router-Entscheidung oder ``None`` (→ LLM-Router)."""
+        if self.classifier is not None and text:
+            label, p = self.classifier.predict(text, has_mail, has_draft, previous)
+            if p >= self.threshold:
+                self.stats.incr("local")
+                return {"type": label, "logic": f"lokal (p={p:.2f})", "confidence": round(p, 3)}
+        self.stats.incr("llm")
+        return None
+
+    def record(self, text: str, has_mail: bool, has_draft: bool, previous: str, label: str) -> None:
+        if not self.log_path or not text:
+            return
+        row = asdict(Example(text, has_mail, has_draft, label, previous))
+        with self._log_lock, open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.stats.incr("logged")
+
+
+def intent_from_env(environ: Optional[dict] = None) -> Optional[IntentPolicy]:
+    """``INTENT_MODEL_PATH`` (trainierter Klassifikator), ``INTENT_THRESHOLD``, ``ROUTER_LOG_PATH`` (Logging).
+
+    ``None``, wenn weder Modell noch Log gesetzt sind.
+    """
+    env = os.environ if environ is None else environ
+    model_path = env.get("INTENT_MODEL_PATH") or None
+    log_path = env.get("ROUTER_LOG_PATH") or None
+    if not model_path and not log_path:
+        return None
+    return IntentPolicy(
+        classifier=IntentClassifier.load(model_path) if model_path else None,
+        threshold=float(env.get("INTENT_THRESHOLD", DEFAULT_THRESHOLD)),
+        log_path=log_path,
+    )
+
+
+# -------------------------------- Auswertung
+def split(examples: Sequence[Example], holdout: float = 0.2, seed: int = 0) -> tuple[list[Example], list[Example]]:
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    cut = int(len(shuffled) * (1 - holdout))
+    return shuffled[:cut], shuffled[cut:]
+
+
+def evaluate(
+    classifier: IntentClassifier, examples: Sequence[Example], thresholds: Iterable[float] = (0.0, 0.7, 0.8, 0.9, 0.95)
+) -> list[dict]:
+    """Je Schwelle: Anteil lokal entschiedener Turns (eingesparte Router-Aufrufe), Übereinstimmung
+    der lokalen Entscheidungen mit dem LLM-Router und Gesamtübereinstimmung (Rest per LLM, also korrekt)."""
+    predictions = [classifier.predict(e.text, e.has_mail, e.has_draft, e.previous) for e in examples]
+    rows = []
+    for t in thresholds:
+        local = [(label, e.label) for (label, p), e in zip(predictions, examples) if p >= t]
+        agree = sum(a == b for a, b in local)
+        n = len(examples)
+        rows.append({
+            "threshold": t,
+            "saved_share": round(len(local) / n, 3) if n else 0.0,
+            "local_agreement": round(agree / len(local), 3) if local else 1.0,
+            "overall_agreement": round((agree + n - len(local)) / n, 3) if n else 1.0,
+        })
+    return rows
+
+
+def format_evaluation(rows: Sequence[dict]) -> str:
+    lines = [f"{'Schwelle':>8} {'lokal':>7} {'Übereinst. lokal':>17} {'gesamt':>7}"]
+    for r in rows:
+        lines.append(
+            f"{r['threshold']:>8.2f} {r['saved_share']:>7.1%} {r['local_agreement']:>17.1%} {r['overall_agreement']:>7.1%}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    train = sub.add_parser("train", help="Klassifikator aus geloggten Router-Entscheidungen trainieren")
+    train.add_argument("log", help="JSONL (ROUTER_LOG_PATH)")
+    train.add_argument("--out", required=True, help="Modelldatei (.npz)")
+    train.add_argument("--holdout", type=float, default=0.2, help="Anteil für die Auswertung (0 = alles trainieren)")
+    train.add_argument("--epochs", type=int, default=300)
+    ev = sub.add_parser("eval", help="Übereinstimmung mit dem LLM-Router und eingesparte Aufrufe")
+    ev.add_argument("log", help="JSONL mit Router-Entscheidungen")
+    ev.add_argument("--model", required=True)
+    args = parser.parse_args(argv)
+
+    examples = load_examples(args.log)
+    if args.cmd == "train":
+        fit_on, test = split(examples, args.holdout) if args.holdout > 0 else (examples, [])
+        classifier = IntentClassifier.fit(fit_on, epochs=args.epochs)
+        classifier.save(args.out)
+        print(f"{len(fit_on)} Beispiele trainiert → {args.out}")
+        if test:
+            print(f"Auswertung auf {len(test)} zurückgehaltenen Beispielen:")
+            print(format_evaluation(evaluate(classifier, test)))
+        return 0
+
+    print(f"Auswertung auf {len(examples)} Beispielen:")
+    print(format_evaluation(evaluate(IntentClassifier.load(args.model), examples)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""Neu-ladesichere Modellarbeit für die Phasen der Streamlit-UI (``app.py``).
+
+Streamlit führt das Skript bei jeder Interaktion neu aus. Lag ein Modellaufruf im Seitenrumpf
+(z. B. ``summarize_text`` in ``summary_view``), lief er bei jedem Rerun erneut und überschrieb
+die Metriken; außerdem blockierte er den Skript-Thread, bis die Antwort da war.
+
+Ein ``JobStore`` (je Sitzung) führt die Arbeit einer Phase höchstens einmal je Eingabe aus:
+
+- Schlüssel ist ``(phase, inputs)``; derselbe Schlüssel liefert denselben ``Job`` – läuft er
+  noch, wird weiter gewartet, ist er fertig, kostet der Rerun nichts. Das gilt auch für
+  fehlgeschlagene Jobs: Sie bleiben stehen, bis ``discard`` sie verwirft (ausdrücklicher
+  „Erneut versuchen“-Klick), statt bei jedem Rerun einen neuen bezahlten Aufruf zu starten.
+- Die Arbeit läuft in einem Thread-Pool; der Skript-Thread fragt nur den Fortschritt ab
+  (``Job.text`` mit den bisher gestreamten Tokens). Eine Interaktion unterbricht damit nur
+  die Anzeige, nicht den Modellaufruf.
+- Latenz, Time-to-first-token und Tokens (über ``pipelines.ledger``) misst der Job selbst.
+
+Die Arbeit selbst darf keine Streamlit-Funktionen aufrufen (anderer Thread).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Sequence
+
+from .ledger import Ledger, track
+
+
+@dataclass
+class Job:
+    """Eine laufende oder fertige Modellarbeit; ``info`` nimmt Zusatzmetriken der Arbeit auf."""
+    key: str
+    started: float = field(default_factory=time.perf_counter)
+    first_token: Optional[float] = None
+    finished: Optional[float] = None
+    total_tokens: int = 0
+    info: dict[str, Any] = field(default_factory=dict)
+    future: Optional[Future] = None
+    _chunks: list[str] = field(default_factory=list, repr=False)
+
+    def on_token(self, token: str) -> None:
+        """Token-Callback für die Pipeline-Funktionen (``on_token=job.on_token``)."""
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self._chunks.append(token)
+
+    @property
+    def text(self) -> str:
+        """Bisher gestreamter Text."""
+        return "".join(list(self._chunks))
+
+    @property
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    @property
+    def failed(self) -> bool:
+        return self.done and (self.future.cancelled() or self.future.exception() is not None)
+
+    @property
+    def latency(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def ttft(self) -> float:
+        return self.first_token - self.started if self.first_token is not None else self.latency
+
+    def result(self) -> Any:
+        """Ergebnis der Arbeit (wirft deren Exception)."""
+        return self.future.result()
+
+
+Work = Callable[[Job], Any]
+
+
+def job_key(phase: str, inputs: Sequence[Any]) -> str:
+    digest = hashlib.sha256(json.dumps([phase, *inputs], ensure_ascii=False, default=str).encode("utf-8"))
+    return f"{phase}:{digest.hexdigest()[:16]}"
+
+
+class JobStore:
+    """Jobs einer Sitzung nach ``(phase, inputs)``.
+
+    ``executor``: Thread-Pool für die Arbeit (kann von allen Sitzungen geteilt werden).
+    ``sinks``: Ledger, in die die Modellaufrufe der Jobs geschrieben werden.
+    ``max_jobs``: so viele Ergebnisse bleiben erhalten (z. B. für „Zurück“ und erneut „Weiter“).
+    """
+
+    def __init__(self, executor: Executor, sinks: Sequence[Ledger] = (), max_jobs: int = 16):
+        self.executor = executor
+        self.sinks = list(sinks)
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, phase: str, inputs: Sequence[Any], work: Work) -> Job:
+        """Job für ``(phase, inputs)``; ``work(job)`` startet nur, wenn es keinen gibt (auch keinen fehlgeschlagenen)."""
+        key = job_key(phase, inputs)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                self._jobs.move_to_end(key)
+                return job
+            job = Job(key)
+            self._jobs[key] = job
+            self._evict()
+            job.future = self.executor.submit(self._run, job, work)
+            return job
+
+    def get(self, phase: str, inputs: Sequence[Any]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_key(phase, inputs))
+
+    def discard(self, job: Job) -> None:
+        """Vergisst den Job (ein laufender rechnet zu Ende, sein Ergebnis wird verworfen).
+
+        Der nächste ``submit`` mit denselben Eingaben startet neu – so wird ein Fehlschlag wiederholt.
+        """
+        with self._lock:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._jobs.clear()
+
+    def _evict(self) -> None:
+        # Älteste fertige Jobs zuerst; laufende bleiben, bis sie fertig sind.
+        for key in [k for k, j in self._jobs.items() if j.done][: max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[key]
+
+    def _run(self, job: Job, work: Work) -> Any:
+        try:
+            with track(*self.sinks) as run:
+                try:
+                    return work(job)
+                finally:
+                    job.total_tokens = run.totals()["total_tokens"]
+        finally:
+            job.finished = time.perf_counter()
@@ -0,0 +1,331 @@
+"""Token- und Kosten-Ledger je Graph-Knoten, Tool und Monolith-Funktion.
+
+Ersetzt die eine Summe aus ``get_openai_callback``: Ein Callback-Handler ordnet jeden
+LLM-Aufruf einem Label zu und schreibt Prompt-/Completion-Tokens, Kosten und Latenz
+in ein oder mehrere ``Ledger`` (z. B. pro Sitzung und pro Prozess).
+
+Zuordnung (erste passende Regel):
+    ``tool:<name>``  Aufruf innerhalb eines Tools (Agent-Graph)
+    ``node:<name>``  Aufruf innerhalb eines Graph-Knotens (LangGraph-Metadaten)
+    ``op:<name>``    Monolith-Funktion (Metadaten ``ledger_op``)
+    ``llm``          sonst
+
+Verwendung – wie ``get_openai_callback``, aber mit Aufschlüsselung::
+
+    with track(session_ledger, PROCESS_LEDGER) as run:
+        app.invoke(state)
+    run.totals()["total_tokens"], run.summary()
+"""
+from __future__ import annotations
+
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator, Optional, Sequence
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+# Metadaten-Schlüssel, mit dem Monolith-Funktionen ihre Aufrufe benennen.
+OP_KEY = "ledger_op"
+
+# USD pro 1 Mio. Tokens (Prompt, Completion); unbekannte Modelle kosten 0.
+PRICES_PER_MTOK: dict[str, tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+_DATE_SUFFIX = re.compile(r"-\d{4}-\d{2}-\d{2}$")
+
+
+def token_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    name = _DATE_SUFFIX.sub("", model or "")
+    # Längster passender Präfix, damit "gpt-4o-mini" nicht als "gpt-4o" abgerechnet wird.
+    match = max((k for k in PRICES_PER_MTOK if name.startswith(k)), key=len, default=None)
+    if match is None:
+        return 0.0
+    p_in, p_out = PRICES_PER_MTOK[match]
+    return (prompt_tokens * p_in + completion_tokens * p_out) / 1_000_000
+
+
+@dataclass(frozen=True)
+class LedgerEntry:
+    label: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: float
+    latency_s: float
+    error: bool = False
+    run_id: str = ""
+    ts: float = field(default_factory=time.time)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-Rank-Perzentil (``q`` in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+@dataclass
+class _Agg:
+    calls: int = 0
+    errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    latency_sum: float = 0.0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=1000))
+
+
+class Ledger:
+    """Thread-sichere Aggregation. Summen sind exakt, Perzentile über die letzten 1000 Aufrufe je Label."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self._lock = threading.Lock()
+        self._entries: deque[LedgerEntry] = deque(maxlen=max_entries)
+        self._aggs: dict[tuple[str, str], _Agg] = {}
+        # Ein Aufruf kann über mehrere Handler ankommen (verschachteltes ``track`` innerhalb
+        # eines laufenden Graphen erbt den äußeren Handler); gezählt wird er nur einmal.
+        self._seen: OrderedDict[str, None] = OrderedDict()
+        self._max_seen = max_entries
+
+    def record(self, entry: LedgerEntry) -> None:
+        with self._lock:
+            if entry.run_id:
+                if entry.run_id in self._seen:
+                    return
+                self._seen[entry.run_id] = None
+                if len(self._seen) > self._max_seen:
+                    self._seen.popitem(last=False)
+            self._entries.append(entry)
+            agg = self._aggs.setdefault((entry.label, entry.model), _Agg())
+            agg.calls += 1
+            agg.errors += int(entry.error)
+            agg.prompt_tokens += entry.prompt_tokens
+            agg.completion_tokens += entry.completion_tokens
+            agg.cost_usd += entry.cost_usd
+            agg.latency_sum += entry.latency_s
+            agg.latencies.append(entry.latency_s)
+
+    def entries(self) -> list[LedgerEntry]:
+        with self._lock:
+            return list(self._entries)
+
+    def summary(self) -> list[dict[str, Any]]:
+        """Eine Zeile je (Label, Modell), nach Gesamttokens absteigend."""
+        with self._lock:
+            rows = [
+                {
+                    "label": label,
+                    "model": model,
+                    "calls": a.calls,
+                    "errors": a.errors,
+                    "prompt_tokens": a.prompt_tokens,
+                    "completion_tokens": a.completion_tokens,
+                    "total_tokens": a.prompt_tokens + a.completion_tokens,
+                    "cost_usd": round(a.cost_usd, 6),
+                    "latency_s": round(a.latency_sum, 3),
+                    "p50_s": round(percentile(a.latencies, 50), 3),
+                    "p95_s": round(percentile(a.latencies, 95), 3),
+                }
+                for (label, model), a in self._aggs.items()
+            ]
+        return sorted(rows, key=lambda r: -r["total_tokens"])
+
+    def totals(self) -> dict[str, Any]:
+        with self._lock:
+            aggs = list(self._aggs.values())
+        prompt = sum(a.prompt_tokens for a in aggs)
+        completion = sum(a.completion_tokens for a in aggs)
+        return {
+            "calls": sum(a.calls for a in aggs),
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "total_tokens": prompt + completion,
+            "cost_usd": round(sum(a.cost_usd for a in aggs), 6),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._aggs.clear()
+            self._seen.clear()
+
+    # ---------------- Export
+    def to_jsonl(self) -> str:
+        return "".join(json.dumps(asdict(e), ensure_ascii=False) + "\n" for e in self.entries())
+
+    def to_prometheus(self, prefix: str = "mail_assistant_llm") -> str:
+        """Prometheus-Textformat (Counter je Label/Modell, Latenz als Summary mit p50/p95)."""
+        rows = self.summary()
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, help_text: str, key: str) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for r in rows:
+                lines.append(f'{prefix}_{name}{{{_labels(r)}}} {r[key]}')
+
+        metric("calls_total", "counter", "LLM-Aufrufe", "calls")
+        metric("errors_total", "counter", "Fehlgeschlagene LLM-Aufrufe", "errors")
+        metric("prompt_tokens_total", "counter", "Prompt-Tokens", "prompt_tokens")
+        metric("completion_tokens_total", "counter", "Completion-Tokens", "completion_tokens")
+        metric("cost_usd_total", "counter", "Kosten in USD", "cost_usd")
+
+        lines.append(f"# HELP {prefix}_latency_seconds Latenz je LLM-Aufruf")
+        lines.append(f"# TYPE {prefix}_latency_seconds summary")
+        for r in rows:
+            labels = _labels(r)
+            lines.append(f'{prefix}_latency_seconds{{{labels},quantile="0.5"}} {r["p50_s"]}')
+            lines.append(f'{prefix}_latency_seconds{{{labels},quantile="0.95"}} {r["p95_s"]}')
+            lines.append(f"{prefix}_latency_seconds_sum{{{labels}}} {r['latency_s']}")
+            lines.append(f"{prefix}_latency_seconds_count{{{labels}}} {r['calls']}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(row: dict) -> str:
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"')  # noqa: E731
+    return f'label="{esc(row["label"])}",model="{esc(row["model"])}"'
+
+
+PROCESS_LEDGER = Ledger()
+
+
+# -------------------------------- Callback
+class LedgerHandler(BaseCallbackHandler):
+    """Ordnet LLM-Aufrufe Knoten/Tools/Operationen zu und schreibt sie in alle ``sinks``."""
+
+    def __init__(self, sinks: Sequence[Ledger]):
+        self.sinks = list(sinks)
+        self._lock = threading.Lock()
+        self._parents: dict[UUID, Optional[UUID]] = {}
+        self._tools: dict[UUID, str] = {}
+        self._calls: dict[UUID, tuple[str, str, float]] = {}
+
+    # ---------------- Laufstruktur (für die Tool-Zuordnung)
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        with self._lock:
+            self._parents[run_id] = parent_run_id
+
+    def on_tool_start(self, serialized: Any, input_str: str, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        with self._lock:
+            self._parents[run_id] = parent_run_id
+            self._tools[run_id] = name
+
+    def _end_run(self, run_id: UUID) -> None:
+        with self._lock:
+            self._parents.pop(run_id, None)
+            self._tools.pop(run_id, None)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_run(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_run(run_id)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_run(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_run(run_id)
+
+    # ---------------- LLM-Aufrufe
+    def _label(self, parent_run_id: Optional[UUID], metadata: Optional[dict]) -> str:
+        with self._lock:
+            run = parent_run_id
+            while run is not None:
+                if run in self._tools:
+                    return f"tool:{self._tools[run]}"
+                run = self._parents.get(run)
+        metadata = metadata or {}
+        if metadata.get("langgraph_node"):
+            return f"node:{metadata['langgraph_node']}"
+        if metadata.get(OP_KEY):
+            return f"op:{metadata[OP_KEY]}"
+        return "llm"
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], metadata: Optional[dict], kwargs: dict) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = str(params.get("model_name") or params.get("model") or (metadata or {}).get("ls_model_name") or "")
+        label = self._label(parent_run_id, metadata)
+        with self._lock:
+            self._calls[run_id] = (label, model, time.perf_counter())
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        self._start(run_id, parent_run_id, metadata, kwargs)
+
+    def on_llm_start(self, serialized: Any, prompts: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        self._start(run_id, parent_run_id, metadata, kwargs)
+
+    def _finish(self, run_id: UUID, prompt: int, completion: int, model: str, error: bool) -> None:
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        label, start_model, started = call
+        model = model or start_model
+        entry = LedgerEntry(
+            label=label,
+            model=model,
+            prompt_tokens=prompt,
+            completion_tokens=completion,
+            cost_usd=token_cost(model, prompt, completion),
+            latency_s=time.perf_counter() - started,
+            error=error,
+            run_id=str(run_id),
+        )
+        for sink in self.sinks:
+            sink.record(entry)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        prompt = completion = 0
+        model = (response.llm_output or {}).get("model_name", "")
+        for gens in response.generations:
+            for gen in gens:
+                msg = getattr(gen, "message", None)
+                usage = getattr(msg, "usage_metadata", None) or {}
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+                model = model or (getattr(msg, "response_metadata", None) or {}).get("model_name", "")
+        self._finish(run_id, prompt, completion, model, error=False)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, 0, 0, "", error=True)
+
+
+_current_handler: ContextVar[Optional[LedgerHandler]] = ContextVar("ledger_handler", default=None)
+register_configure_hook(_current_handler, inheritable=True)
+
+
+@contextmanager
+def track(*sinks: Ledger) -> Iterator[Ledger]:
+    """Erfasst alle LLM-Aufrufe im Block; liefert einen Ledger nur für diesen Block.
+
+    Verschachtelte ``track``-Blöcke schreiben zusätzlich in die Ledger des äußeren Blocks.
+    """
+    run = Ledger()
+    outer = _current_handler.get()
+    unique: dict[int, Ledger] = {}
+    for sink in (run, *sinks, *(outer.sinks if outer else ())):
+        unique.setdefault(id(sink), sink)
+    handler = LedgerHandler(list(unique.values()))
+    token = _current_handler.set(handler)
+    try:
+        yield run
+    finally:
+        _current_handler.reset(token)
@@ -0,0 +1,97 @@
+"""Liest Mail-Exporte (mbox-Dateien, Verzeichnisse mit ``.eml``) lazy als Generator.
+
+Es wird immer nur die gerade benötigte Mail geparst; auch große Exporte
+passen so in konstanten Speicher.
+"""
+from __future__ import annotations
+
+import email
+import hashlib
+import mailbox
+import os
+from dataclasses import dataclass
+from email import policy
+from email.message import EmailMessage
+from typing import Iterable, Iterator
+
+from .preprocess import html_to_text
+
+
+@dataclass(frozen=True)
+class MailItem:
+    message_id: str
+    subject: str
+    sender: str
+    date: str
+    text: str
+    source: str
+
+
+def _part_text(part: EmailMessage) -> str:
+    try:
+        return part.get_content()
+    except (LookupError, UnicodeDecodeError):
+        # Unbekannter/fehlerhafter Zeichensatz: tolerant dekodieren statt die Mail zu verlieren.
+        payload = part.get_payload(decode=True) or b""
+        return payload.decode("utf-8", errors="replace")
+
+
+def message_text(msg: EmailMessage) -> str:
+    """Textkörper einer Mail (text/plain bevorzugt, sonst HTML ohne Tags)."""
+    body = msg.get_body(preferencelist=("plain", "html"))
+    if body is None:
+        return ""
+    text = _part_text(body)
+    if body.get_content_subtype() == "html":
+        text = html_to_text(text)
+    return text.strip()
+
+
+def _item(msg: EmailMessage, source: str) -> MailItem:
+    subject = str(msg.get("Subject", "") or "")
+    sender = str(msg.get("From", "") or "")
+    date = str(msg.get("Date", "") or "")
+    text = message_text(msg)
+    message_id = str(msg.get("Message-ID", "") or "").strip()
+    if not message_id:
+        # Ohne Message-ID: stabiler Ersatz aus dem Inhalt, damit Resume trotzdem greift.
+        digest = hashlib.sha1("\x00".join((subject, sender, date, text)).encode("utf-8")).hexdigest()
+        message_id = f"sha1:{digest}"
+    return MailItem(message_id, subject, sender, date, text, source)
+
+
+def _parse_bytes(fp) -> EmailMessage:
+    return email.message_from_binary_file(fp, policy=policy.default)
+
+
+def iter_mbox(path: str) -> Iterator[MailItem]:
+    box = mailbox.mbox(path, factory=_parse_bytes, create=False)
+    try:
+        for key in box.iterkeys():
+            yield _item(box[key], f"{path}#{key}")
+    finally:
+        box.close()
+
+
+def iter_eml(path: str) -> Iterator[MailItem]:
+    with open(path, "rb") as f:
+        msg = _parse_bytes(f)
+    yield _item(msg, path)
+
+
+def iter_mails(paths: Iterable[str]) -> Iterator[MailItem]:
+    """Alle Mails aus Dateien/Verzeichnissen; Verzeichnisse werden rekursiv und sortiert gelesen."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    if name.lower().endswith(".eml"):
+                        yield from iter_eml(full)
+                    elif name.lower().endswith(".mbox"):
+                        yield from iter_mbox(full)
+        elif path.lower().endswith(".eml"):
+            yield from iter_eml(path)
+        else:
+            yield from iter_mbox(path)
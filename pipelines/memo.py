@@ -0,0 +1,187 @@
+"""Abgeleitete Artefakte je Mail im Graph-State (``AgentState.memo``).
+
+Bisher wurde dieselbe ``uploaded_mail`` in jedem Turn neu analysiert: der Summary-Knoten
+fasste sie erneut zusammen, und der Agent rief ``summary`` vor ``reply`` noch einmal auf.
+Das Memo hält, was sich aus einer Mail ableiten lässt, unter dem Fingerabdruck der
+bereinigten Mail:
+
+- ``summary``: Zusammenfassung (einmal per LLM, danach wiederverwendet); Reply-Knoten und
+  -Tool geben sie als Kontext mit, statt sie neu anzufordern,
+- ``language``: lokal erkannte Sprache (``de``/``en``); der Reply-Prompt nennt sie direkt
+  (``reply_system``), statt das Modell sie bei jedem Aufruf aus der Mail ableiten zu lassen,
+- ``entities``, ``dates``, ``open_questions``: lokal per Heuristik (keine Modellaufrufe);
+  offene Fragen ergänzt die Zusammenfassung („Offene Punkte:“); die Agent-UI zeigt sie an,
+- ``reply``: vorab erzeugter Antwortentwurf ohne Zusatzinfos (``pipelines.prefetch``);
+  gilt nur, solange keine Anfrage im Verlauf eigene Vorgaben macht, und wird einmal verbraucht.
+
+Das Memo liegt im State und damit im Checkpointer, übersteht also Turns und Neustarts.
+Passt der Fingerabdruck nicht mehr zur aktuellen Mail (neue Mail über „Mail ändern /
+neu setzen“), gilt es als leer; ein leeres Update (``{"memo": {}}``) setzt es zurück.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Any, Optional
+
+from .preprocess import clean_mail
+from .prompts import SYSTEM_MAIL_REPLY
+
+MAX_ITEMS = 8
+
+_WORD_RE = re.compile(r"[a-zäöüß]+", re.I)
+_STOPWORDS = {
+    "de": frozenset("der die das und ist nicht ich sie wir mit für auf bitte ein eine zu den dem von bei uns euch".split()),
+    "en": frozenset("the and is not i you we with for on please a an to of at us your this that".split()),
+}
+
+_WEEKDAYS = r"(?:Montag|Dienstag|Mittwoch|Donnerstag|Freitag|Samstag|Sonntag|Monday|Tuesday|Wednesday|Thursday|Friday)"
+_MONTHS = r"(?:Januar|Februar|März|April|Mai|Juni|Juli|August|September|Oktober|November|Dezember)"
+_DATE_RE = re.compile(
+    r"\b\d{1,2}\.\d{1,2}\.(?:\d{2,4})?"
+    r"|\b\d{4}-\d{2}-\d{2}\b"
+    r"|\b\d{1,2}\.\s*" + _MONTHS + r"(?:\s+\d{4})?"
+    r"|(?:\bbis\s+)?\b" + _WEEKDAYS + r"(?:\s+um\s+\d{1,2}:\d{2}(?:\s*Uhr)?)?"
+    r"|\b\d{1,2}:\d{2}\s*Uhr"
+    r"|\bbis\s+(?:Monatsende|Ende\s+\w+|morgen|übermorgen)",
+    re.I,
+)
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_GREETING_RE = re.compile(r"^(?:Hallo|Hi|Liebe[rs]?|Sehr geehrte[rs]?|Guten Tag|Dear|Hello)\s+(.+?)[,!]?\s*$", re.I)
+_NAME_RE = re.compile(r"^(?:(?:Dr|Prof)\.\s+)?[A-ZÄÖÜ][a-zäöüß]+(?:[ -][A-ZÄÖÜ][a-zäöüß]+){1,2}$")
+_CLOSING_RE = re.compile(r"^(?:Viele|Beste|Liebe|Freundliche) Grüße$|^Mit freundlichen Grüßen$|^Best regards$", re.I)
+_SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]|$)", re.M)
+_REQUEST_RE = re.compile(r"^\s*(?:bitte|könn(?:t|en|test)|würde[nt]?|please|could|can you)\b", re.I)
+_OPEN_POINTS_RE = re.compile(r"Offene Punkte:\s*(.*)", re.S)
+LANGUAGE_NAMES = {"de": "Deutsch", "en": "Englisch"}
+_REPLY_LANGUAGE = "Sprache: wie die Originalmail, sofern nicht anders vorgegeben."
+# Anfragen ohne eigene Vorgaben („Schreib bitte eine Antwort“, „Fass die Mail zusammen“).
+_PLAIN_WORDS = frozenset(
+    """bitte schreib schreibe schreiben erstell erstelle erstellen entwirf entwerfen verfasse verfassen formulier
+    formuliere formulieren mach mache machen fass fasse fassen
+    kannst du könntest magst mir mal jetzt nun gleich eine einen ein die der das den dem darauf drauf hierauf
+    auf zu zur zum antwort antworte antworten antwortmail entwurf mail e-mail email nachricht zusammen
+    zusammenfassung kurzfassung worum geht es please write draft a an the reply answer respond to it this
+    summarize summary""".split()
+)
+
+
+def fingerprint(mail: str) -> str:
+    """Fingerabdruck der bereinigten Mail ("" ohne Mail)."""
+    text = clean_mail(mail)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16] if text else ""
+
+
+def _unique(items: list[str]) -> list[str]:
+    seen: dict[str, None] = {}
+    for item in items:
+        item = " ".join(item.split()).strip(" ,;")
+        if item and item.lower() not in {k.lower() for k in seen}:
+            seen[item] = None
+    return list(seen)[:MAX_ITEMS]
+
+
+def detect_language(text: str) -> str:
+    """``de``/``en`` nach Stoppwörtern, sonst ``unknown``."""
+    words = [w.lower() for w in _WORD_RE.findall(text)]
+    scores = {lang: sum(w in stop for w in words) for lang, stop in _STOPWORDS.items()}
+    lang, score = max(scores.items(), key=lambda kv: kv[1])
+    return lang if score >= 2 and list(scores.values()).count(score) == 1 else "unknown"
+
+
+def _entities(lines: list[str]) -> list[str]:
+    found: list[str] = []
+    for line in lines:
+        greeting = _GREETING_RE.match(line)
+        if greeting and greeting.group(1).lower() not in ("zusammen", "alle", "all", "team"):
+            found.append(greeting.group(1))
+        if _NAME_RE.match(line.strip()) and not _CLOSING_RE.match(line.strip()):
+            found.append(line.strip())
+        found += _EMAIL_RE.findall(line)
+    return _unique(found)
+
+
+def _questions(text: str) -> list[str]:
+    # Zeilenumbrüche innerhalb eines Absatzes trennen keine Sätze.
+    text = re.sub(r"(?<!\n)\n(?!\n)", " ", text)
+    sentences = (m.group(0).strip() for m in _SENTENCE_RE.finditer(text))
+    return _unique([s for s in sentences if s.endswith("?") or _REQUEST_RE.match(s)])
+
+
+def analyze(mail: str) -> dict[str, Any]:
+    """Lokale Artefakte einer Mail (ohne Zusammenfassung)."""
+    text = clean_mail(mail)
+    # Leerzeilen bleiben im Text: Absätze (Betreff, Anrede, Text) sind keine gemeinsamen Sätze.
+    body = "\n".join(line for line in text.split("\n") if not line.lstrip().startswith(">"))
+    lines = [line for line in body.split("\n") if line.strip()]
+    return {
+        "fingerprint": fingerprint(mail),
+        "language": detect_language(body),
+        "entities": _entities(lines),
+        "dates": _unique([m.group(0) for m in _DATE_RE.finditer(body)]),
+        "open_questions": _questions(body),
+    }
+
+
+def current(memo: Optional[dict], mail: str) -> dict:
+    """Memo zur aktuellen Mail; passt der Fingerabdruck nicht, wird es neu (lokal) aufgebaut."""
+    fp = fingerprint(mail)
+    if not fp:
+        return {}
+    if memo and memo.get("fingerprint") == fp:
+        # Memos aus älteren Checkpoints ohne lokale Analyse einmal ergänzen.
+        return memo if "language" in memo else {**analyze(mail), **memo}
+    return analyze(mail)
+
+
+def reply_system(memo: Optional[dict]) -> str:
+    """``SYSTEM_MAIL_REPLY`` mit der erkannten Sprache der Mail (sonst unverändert)."""
+    name = LANGUAGE_NAMES.get((memo or {}).get("language", ""))
+    if not name:
+        return SYSTEM_MAIL_REPLY
+    return SYSTEM_MAIL_REPLY.replace(_REPLY_LANGUAGE, f"Sprache: {name}, sofern nicht anders vorgegeben.")
+
+
+def cached_summary(memo: Optional[dict], mail: str) -> Optional[str]:
+    fp = fingerprint(mail)
+    if fp and memo and memo.get("fingerprint") == fp:
+        return memo.get("summary") or None
+    return None
+
+
+def with_summary(memo: Optional[dict], mail: str, summary: str) -> dict:
+    """Memo inkl. Zusammenfassung; „Offene Punkte:“ daraus ergänzen die offenen Fragen."""
+    base = current(memo, mail)
+    if not base or not summary:
+        return base
+    points = _OPEN_POINTS_RE.search(summary)
+    extra = [p.strip("–-• ") for p in points.group(1).split("\n")] if points else []
+    return {**base, "summary": summary, "open_questions": _unique([*base.get("open_questions", []), *extra])}
+
+
+def plain_request(text: str) -> bool:
+    """Nur Standardformulierungen ohne Inhalt (Ton, Termine, Zusagen …)."""
+    words = re.findall(r"[\w-]+", (text or "").lower())
+    return bool(words) and all(w in _PLAIN_WORDS for w in words)
+
+
+def with_reply(memo: Optional[dict], mail: str, reply: str) -> dict:
+    base = current(memo, mail)
+    return {**base, "reply": reply} if base and reply else base
+
+
+def prefetched_reply(memo: Optional[dict], mail: str, requests: list[str]) -> Optional[str]:
+    """Vorab erzeugter Entwurf, wenn alle ``requests`` (Nutzeranfragen im Verlauf) ohne eigene Vorgaben sind."""
+    fp = fingerprint(mail)
+    if not (fp and memo and memo.get("fingerprint") == fp and memo.get("reply")):
+        return None
+    return memo["reply"] if requests and all(plain_request(r) for r in requests) else None
+
+
+def merge_memo(left: Optional[dict], right: Optional[dict]) -> dict:
+    """Reducer für ``AgentState.memo``: gleiche Mail → zusammenführen, andere Mail → ersetzen, ``{}`` → leeren."""
+    if not right:
+        return {}
+    if left and left.get("fingerprint") == right.get("fingerprint"):
+        return {**left, **right}
+    return dict(right)
@@ -0,0 +1,197 @@
+"""Modell je Rolle (Router, Zusammenfassung, Entwürfe, Agent) mit gemeinsamen HTTP-Clients.
+
+Bisher lief jeder Aufruf – von der Intent-Klassifikation bis zum langen
+Antwortentwurf – über dasselbe ``ChatOpenAI(model="gpt-4o-mini")``. Ein
+``ModelRegistry`` ordnet jeder Rolle ein eigenes Modell samt Parametern zu, z. B.
+ein kleines, schnelles Modell für den Router und ein stärkeres für Entwürfe:
+
+    MODEL_DEFAULT=gpt-4o-mini
+    MODEL_ROUTER=gpt-4.1-nano;max_tokens=150
+    MODEL_REPLY=gpt-4.1;temperature=0.3
+
+Rollen ohne eigenen Eintrag erben ``MODEL_DEFAULT``. Identische Specs teilen sich eine
+Instanz; alle Instanzen desselben Endpoints teilen sich einen httpx-Client (ein
+Connection-Pool statt einer TLS-Verbindung pro Modell). Alle Pipelines akzeptieren
+statt eines Modells auch ein Register; ``model_for(llm, role)`` löst beides auf.
+Die Wirkung zeigt das Ledger: Labels und Modelle stehen dort je Knoten/Tool/Operation.
+
+``from_env`` legt außerdem um jedes Modell ein ``ResilientChatModel`` (Deadline je
+Rolle, Retries, optional Hedging, ``MODEL_FALLBACK`` als zweiter Endpoint; siehe
+``pipelines.resilience``); ``LLM_RESILIENCE=0`` schaltet das ab.
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, fields, replace
+from typing import TYPE_CHECKING, Any, Mapping, Optional, Union
+
+from .resilience import ResiliencePolicy, ResilientChatModel, merge_stats, policies_from_env
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+# router: Intent-Klassifikation (auch Single-Call und Spekulation), agent: Tool-Auswahl im Agent-Graphen.
+ROLES = ("router", "summary", "reply", "new", "revise", "general", "agent")
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    model: str = "gpt-4o-mini"
+    temperature: float = 0.0
+    max_tokens: Optional[int] = None
+    base_url: Optional[str] = None
+
+    @classmethod
+    def parse(cls, text: str, base: Optional[ModelSpec] = None) -> ModelSpec:
+        """``"gpt-4.1-nano;max_tokens=150;temperature=0"`` → Spec; fehlende Felder kommen aus ``base``."""
+        spec = base or cls()
+        parts = [p.strip() for p in (text or "").split(";") if p.strip()]
+        if parts and "=" not in parts[0]:
+            spec = replace(spec, model=parts.pop(0))
+        known = {f.name for f in fields(cls)} - {"model"}
+        for part in parts:
+            key, _, value = (s.strip() for s in part.partition("="))
+            if key not in known:
+                raise ValueError(f"Unbekannter Modellparameter {key!r} in {text!r}")
+            if key == "temperature":
+                spec = replace(spec, temperature=float(value))
+            elif key == "max_tokens":
+                spec = replace(spec, max_tokens=int(value) if value else None)
+            else:
+                spec = replace(spec, base_url=value or None)
+        return spec
+
+
+def default_from_env(environ: Optional[Mapping[str, str]] = None, default: Optional[ModelSpec] = None) -> ModelSpec:
+    """``MODEL_DEFAULT`` auf Basis von ``default`` (z. B. ``--model`` der Bulk-CLI)."""
+    env = os.environ if environ is None else environ
+    return ModelSpec.parse(env.get("MODEL_DEFAULT", ""), default or ModelSpec())
+
+
+def tiers_from_env(environ: Optional[Mapping[str, str]] = None, default: Optional[ModelSpec] = None) -> dict[str, ModelSpec]:
+    """Spec je Rolle aus ``MODEL_<ROLLE>``; Basis ist ``MODEL_DEFAULT`` (bzw. ``default``)."""
+    env = os.environ if environ is None else environ
+    base = default_from_env(env, default)
+    return {role: ModelSpec.parse(env.get(f"MODEL_{role.upper()}", ""), base) for role in ROLES}
+
+
+class ModelRegistry:
+    """Rolle → Chat-Modell; unbekannte Rollen bekommen ``default``."""
+
+    def __init__(self, models: Mapping[str, BaseChatModel], default: BaseChatModel):
+        unknown = set(models) - set(ROLES)
+        if unknown:
+            raise ValueError(f"Unbekannte Rollen: {', '.join(sorted(unknown))} (erlaubt: {', '.join(ROLES)})")
+        self._models = dict(models)
+        self.default = default
+
+    @classmethod
+    def single(cls, llm: BaseChatModel) -> ModelRegistry:
+        return cls({}, llm)
+
+    @classmethod
+    def from_specs(
+        cls,
+        specs: Mapping[str, ModelSpec],
+        default: Optional[ModelSpec] = None,
+        *,
+        resilience: Optional[Mapping[str, ResiliencePolicy]] = None,
+        fallback: Optional[ModelSpec] = None,
+        **client_kwargs: Any,
+    ) -> ModelRegistry:
+        """Baut die ``ChatOpenAI``-Instanzen; ``client_kwargs`` (api_key, cache, …) gelten für alle.
+
+        Mit ``resilience`` (Rolle → Policy) wird jedes Modell in ein ``ResilientChatModel``
+        gehüllt; die SDK-eigenen Retries entfallen dann (``max_retries=0``), damit Deadline
+        und Backoff allein beim Wrapper liegen. ``fallback`` ist der Ersatz-Endpoint.
+        """
+        import httpx
+        from langchain_openai import ChatOpenAI
+
+        if resilience is not None:
+            client_kwargs.setdefault("max_retries", 0)
+            deadlines = [p.deadline_s for p in resilience.values() if p.deadline_s is not None]
+            if deadlines:
+                # Aufgegebene Versuche (Timeout, verlorener Hedge) enden spätestens hier.
+                client_kwargs.setdefault("timeout", max(deadlines))
+        http: dict[Optional[str], tuple[httpx.Client, httpx.AsyncClient]] = {}
+        built: dict[ModelSpec, BaseChatModel] = {}
+        wrapped: dict[tuple[ModelSpec, ResiliencePolicy], BaseChatModel] = {}
+
+        def build(spec: ModelSpec) -> BaseChatModel:
+            if spec not in built:
+                if spec.base_url not in http:
+                    http[spec.base_url] = (httpx.Client(), httpx.AsyncClient())
+                sync_client, async_client = http[spec.base_url]
+                extra = {"max_tokens": spec.max_tokens} if spec.max_tokens else {}
+                built[spec] = ChatOpenAI(
+                    model=spec.model,
+                    temperature=spec.temperature,
+                    base_url=spec.base_url,
+                    http_client=sync_client,
+                    http_async_client=async_client,
+                    **extra,
+                    **client_kwargs,
+                )
+            return built[spec]
+
+        def build_for(role: Optional[str], spec: ModelSpec) -> BaseChatModel:
+            if resilience is None:
+                return build(spec)
+            policy = resilience.get(role, ResiliencePolicy()) if role else ResiliencePolicy()
+            if (spec, policy) not in wrapped:
+                wrapped[spec, policy] = ResilientChatModel(
+                    primary=build(spec),
+                    fallback=build(fallback) if fallback and fallback != spec else None,
+                    policy=policy,
+                    cache=client_kwargs.get("cache"),
+                )
+            return wrapped[spec, policy]
+
+        default_model = build_for(None, default or ModelSpec())
+        return cls({role: build_for(role, spec) for role, spec in specs.items()}, default_model)
+
+    @classmethod
+    def from_env(
+        cls, environ: Optional[Mapping[str, str]] = None, default: Optional[ModelSpec] = None, **client_kwargs: Any
+    ) -> ModelRegistry:
+        """Specs aus ``MODEL_*``, Policies aus ``LLM_*`` (``policies_from_env``), Ersatz aus ``MODEL_FALLBACK``."""
+        env = os.environ if environ is None else environ
+        base = default_from_env(env, default)
+        fallback = ModelSpec.parse(env["MODEL_FALLBACK"], base) if env.get("MODEL_FALLBACK") else None
+        return cls.from_specs(
+            tiers_from_env(env, default), base, resilience=policies_from_env(env), fallback=fallback, **client_kwargs
+        )
+
+    def get(self, role: str) -> BaseChatModel:
+        return self._models.get(role, self.default)
+
+    def model_names(self) -> dict[str, str]:
+        """Rolle → Modellname (für Anzeige und Logs)."""
+        return {role: _model_name(self.get(role)) for role in ROLES}
+
+    def resilience_stats(self) -> dict[str, int]:
+        """Summe der ``ResilienceStats`` aller Modelle (leer ohne Resilience-Wrapper)."""
+        models = {id(m): m for m in (*self._models.values(), self.default)}.values()
+        return merge_stats([m.stats.snapshot() for m in models if isinstance(m, ResilientChatModel)])
+
+    def __repr__(self) -> str:
+        return f"ModelRegistry({self.model_names()})"
+
+
+LLMOrRegistry = Union["BaseChatModel", ModelRegistry]
+
+
+def model_for(llm: LLMOrRegistry, role: Optional[str]) -> BaseChatModel:
+    """Modell für ``role``; ein einzelnes Modell gilt für alle Rollen."""
+    if isinstance(llm, ModelRegistry):
+        return llm.get(role) if role else llm.default
+    return llm
+
+
+def as_registry(llm: LLMOrRegistry) -> ModelRegistry:
+    return llm if isinstance(llm, ModelRegistry) else ModelRegistry.single(llm)
+
+
+def _model_name(llm: Any) -> str:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-from typing import Optional, Sequence
+import asyncio
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional, Sequence
 
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
 from .prompts import (
     SYSTEM_MAIL_REPLY,
@@ -11,6 +12,14 @@ from .prompts import (
     SYSTEM_NEW_MAIL,
     SYSTEM_REVISE,
 )
+from .ledger import OP_KEY
+from .models import ModelRegistry, model_for
+from .preprocess import clean_mail
+from .revision import EditPolicy, arevise, revise
+from .summarize import DEFAULT_CHUNKING, ChunkPolicy, asummarize_chunked, needs_chunking, summarize_chunked
+
+if TYPE_CHECKING:  # langchain_openai lädt das OpenAI-SDK (~0,5 s); zur Laufzeit nicht nötig
+    from langchain_openai import ChatOpenAI
 
 SYSTEM_ASSISTANT = (
     "Du bist ein präziser, höflicher E-Mail-Assistent. "
@@ -26,30 +35,66 @@ def sanitize(text: Optional[str]) -> str:
     return t.strip()
 
 
-def ask(llm: ChatOpenAI, messages: Sequence[object]) -> str:
-    res = llm.invoke(list(messages)).content
-    return (res or "").strip()
+TokenCallback = Callable[[str], None]
 
 
-def summarize_text(llm: ChatOpenAI, original_text: str) -> str:
-    original_text = sanitize(original_text)
-    return ask(
-        llm,
-        [
-            SystemMessage(content=SYSTEM_ASSISTANT),
-            SystemMessage(content=SYSTEM_SUMMARIZER),
-            HumanMessage(content=f"ORIGINALMAIL:\n{original_text}"),
-        ],
-    )
+class _TokenHandler(BaseCallbackHandler):
+    """Reicht gestreamte Tokens an ``on_token`` weiter."""
 
+    def __init__(self, on_token: TokenCallback):
+        self.on_token = on_token
 
-def write_reply_mail(
-    llm: ChatOpenAI,
-    original: str,
-    extra: str = "",
-    summary_context: Optional[str] = None,
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if token:
+            self.on_token(token)
+
+
+def _config(op: Optional[str]) -> dict:
+    # ``op`` benennt den Aufruf im Token-/Kosten-Ledger (``op:<name>``).
+    return {"metadata": {OP_KEY: op}} if op else {}
+
+
+def _invoke(
+    llm: ChatOpenAI | ModelRegistry,
+    messages: Sequence[object],
+    on_token: Optional[TokenCallback] = None,
+    op: Optional[str] = None,
+) -> BaseMessage:
+    config = _config(op)
+    llm = model_for(llm, op)
+    if on_token is None:
+        return llm.invoke(list(messages), config=config)
+    # Streaming über invoke(stream=True) statt llm.stream(): so greift der Antwort-Cache weiterhin.
+    config["callbacks"] = [_TokenHandler(on_token)]
+    return llm.invoke(list(messages), stream=True, config=config)
+
+
+def ask(
+    llm: ChatOpenAI | ModelRegistry,
+    messages: Sequence[object],
+    on_token: Optional[TokenCallback] = None,
+    op: Optional[str] = None,
 ) -> str:
-    original = sanitize(original)
+    return (_invoke(llm, messages, on_token, op).content or "").strip()
+
+
+async def aask(llm: ChatOpenAI | ModelRegistry, messages: Sequence[object], op: Optional[str] = None) -> str:
+    res = (await model_for(llm, op).ainvoke(list(messages), config=_config(op))).content
+    return (res or "").strip()
+
+
+# -------------------------------- PROMPTS
+def summary_messages(original_text: str) -> list[BaseMessage]:
+    original_text = clean_mail(original_text)
+    return [
+        SystemMessage(content=SYSTEM_ASSISTANT),
+        SystemMessage(content=SYSTEM_SUMMARIZER),
+        HumanMessage(content=f"ORIGINALMAIL:\n{original_text}"),
+    ]
+
+
+def reply_messages(original: str, extra: str = "", summary_context: Optional[str] = None) -> list[BaseMessage]:
+    original = clean_mail(original)
     extra = sanitize(extra)
     summary_context = sanitize(summary_context)
 
@@ -59,17 +104,14 @@ def write_reply_mail(
         f"USER_INPUT (Stil, Wünsche, Rahmenbedingungen):\n{extra or '–'}"
     )
 
-    return ask(
-        llm,
-        [
-            SystemMessage(content=SYSTEM_ASSISTANT),
-            SystemMessage(content=SYSTEM_MAIL_REPLY),
-            HumanMessage(content=message),
-        ],
-    )
+    return [
+        SystemMessage(content=SYSTEM_ASSISTANT),
+        SystemMessage(content=SYSTEM_MAIL_REPLY),
+        HumanMessage(content=message),
+    ]
 
 
-def write_new_mail(llm: ChatOpenAI, brief: str) -> str:
+def new_mail_messages(brief: str) -> list[BaseMessage]:
     brief = sanitize(brief)
     message = (
         "USER_INPUT (Zweck, Empfänger, Ton, Punkte, Sprache etc.):\n"
@@ -77,30 +119,194 @@ def write_new_mail(llm: ChatOpenAI, brief: str) -> str:
         "Hinweis: keine Annahmen ohne Grundlage; bei Lücken neutral bleiben."
     )
 
-    return ask(
-        llm,
-        [
-            SystemMessage(content=SYSTEM_ASSISTANT),
-            SystemMessage(content=SYSTEM_NEW_MAIL),
-            HumanMessage(content=message),
-        ],
-    )
+    return [
+        SystemMessage(content=SYSTEM_ASSISTANT),
+        SystemMessage(content=SYSTEM_NEW_MAIL),
+        HumanMessage(content=message),
+    ]
 
 
-def revise_mail(llm: ChatOpenAI, draft: str, feedback: str) -> str:
+def revise_messages(draft: str, feedback: str) -> Optional[list[BaseMessage]]:
+    """``None``, wenn kein Feedback vorliegt (dann bleibt der Entwurf unverändert)."""
     draft = sanitize(draft)
     feedback = sanitize(feedback or "")
 
     if not feedback:
-        return draft
+        return None
 
     message = f"ENTWURF:\n{draft}\n\nFEEDBACK:\n{feedback}"
 
-    return ask(
-        llm,
-        [
-            SystemMessage(content=SYSTEM_ASSISTANT),
-            SystemMessage(content=SYSTEM_REVISE),
-            HumanMessage(content=message),
-        ],
-    )
\ No newline at end of file
+    return [
+        SystemMessage(content=SYSTEM_ASSISTANT),
+        SystemMessage(content=SYSTEM_REVISE),
+        HumanMessage(content=message),
+    ]
+
+
+# -------------------------------- SYNC
+# ``on_token`` (optional) erhält die Antwort tokenweise, sobald sie generiert wird.
+def summarize_text(
+    llm: ChatOpenAI | ModelRegistry,
+    original_text: str,
+    on_token: Optional[TokenCallback] = None,
+    chunking: ChunkPolicy = DEFAULT_CHUNKING,
+) -> str:
+    """Lange Mails (über ``chunking.threshold_tokens``) laufen über Map-Reduce; gestreamt wird die letzte Stufe."""
+    text = clean_mail(original_text)
+    if needs_chunking(text, chunking):
+        return summarize_chunked(model_for(llm, "summary"), text, chunking, final_invoke=lambda m: _invoke(llm, m, on_token, "summary"))
+    return ask(llm, summary_messages(original_text), on_token, "summary")
+
+
+def write_reply_mail(
+    llm: ChatOpenAI | ModelRegistry,
+    original: str,
+    extra: str = "",
+    summary_context: Optional[str] = None,
+    on_token: Optional[TokenCallback] = None,
+) -> str:
+    return ask(llm, reply_messages(original, extra, summary_context), on_token, "reply")
+
+
+def write_new_mail(llm: ChatOpenAI | ModelRegistry, brief: str, on_token: Optional[TokenCallback] = None) -> str:
+    return ask(llm, new_mail_messages(brief), on_token, "new")
+
+
+def revise_mail(
+    llm: ChatOpenAI | ModelRegistry,
+    draft: str,
+    feedback: str,
+    on_token: Optional[TokenCallback] = None,
+    edits: Optional[EditPolicy] = None,
+) -> str:
+    """Mit ``edits`` liefert das Modell ein Edit-Skript; gestreamt wird nur eine ggf. nötige Neufassung."""
+    messages = revise_messages(draft, feedback)
+    if messages is None:
+        return sanitize(draft)
+    if edits is None:
+        return ask(llm, messages, on_token, "revise")
+    return revise(
+        model_for(llm, "revise"),
+        sanitize(draft),
+        sanitize(feedback),
+        edits,
+        full_messages=messages,
+        config=_config("revise"),
+        full_invoke=lambda m: _invoke(llm, m, on_token, "revise"),
+    )
+
+
+# -------------------------------- ASYNC
+async def asummarize_text(llm: ChatOpenAI | ModelRegistry, original_text: str, chunking: ChunkPolicy = DEFAULT_CHUNKING) -> str:
+    text = clean_mail(original_text)
+    if needs_chunking(text, chunking):
+        return await asummarize_chunked(model_for(llm, "summary"), text, chunking)
+    return await aask(llm, summary_messages(original_text), "summary")
+
+
+async def awrite_reply_mail(
+    llm: ChatOpenAI | ModelRegistry,
+    original: str,
+    extra: str = "",
+    summary_context: Optional[str] = None,
+) -> str:
+    return await aask(llm, reply_messages(original, extra, summary_context), "reply")
+
+
+async def awrite_new_mail(llm: ChatOpenAI | ModelRegistry, brief: str) -> str:
+    return await aask(llm, new_mail_messages(brief), "new")
+
+
+async def arevise_mail(
+    llm: ChatOpenAI | ModelRegistry, draft: str, feedback: str, edits: Optional[EditPolicy] = None
+) -> str:
+    messages = revise_messages(draft, feedback)
+    if messages is None:
+        return sanitize(draft)
+    if edits is None:
+        return await aask(llm, messages, "revise")
+    return await arevise(
+        model_for(llm, "revise"), sanitize(draft), sanitize(feedback), edits, full_messages=messages, config=_config("revise")
+    )
+
+
+TASKS = ("summary", "reply", "new", "revise")
+
+
+def task_messages(task: str, text: str, extra: str = "") -> Optional[list[BaseMessage]]:
+    """Prompt für eine Aufgabe; ``text`` ist je nach Task Mail, Briefing oder Entwurf.
+
+    ``extra`` sind Zusatzinfos (reply) bzw. das Feedback (revise).
+    """
+    if task == "summary":
+        return summary_messages(text)
+    if task == "reply":
+        return reply_messages(text, extra)
+    if task == "new":
+        return new_mail_messages(text)
+    if task == "revise":
+        return revise_messages(text, extra)
+    raise ValueError(f"Unbekannte Aufgabe: {task!r} (erlaubt: {', '.join(TASKS)})")
+
+
+async def abatch(
+    llm: ChatOpenAI | ModelRegistry,
+    jobs: Sequence[tuple[str, ...]],
+    max_concurrency: int = 8,
+    return_exceptions: bool = False,
+    chunking: ChunkPolicy = DEFAULT_CHUNKING,
+) -> list:
+    """Verarbeitet viele ``(text, task[, extra])``-Paare nebenläufig.
+
+    Höchstens ``max_concurrency`` Jobs laufen gleichzeitig (auch über mehrere Modelle eines
+    ``ModelRegistry`` hinweg); die Ergebnisse kommen in Eingabereihenfolge zurück. Lange Mails
+    fasst ``summary`` wie ``asummarize_text`` per Map-Reduce zusammen (``chunking``); ein solcher
+    Job belegt einen Platz, seine Teilaufrufe begrenzt ``chunking.max_concurrency``.
+    Mit ``return_exceptions=True`` stehen Fehler einzelner Jobs als Exception-Objekte in der
+    Liste, statt den ganzen Batch abzubrechen.
+    """
+    results: list = [None] * len(jobs)
+    pending: list[int] = []
+    calls: list[Callable[[], Awaitable[str]]] = []
+    gate = asyncio.Semaphore(max_concurrency)
+
+    async def run(call: Callable[[], Awaitable[str]]) -> str:
+        async with gate:
+            return await call()
+
+    for i, (text, task, *rest) in enumerate(jobs):
+        extra = rest[0] if rest else ""
+        if task == "summary" and needs_chunking(clean_mail(text), chunking):
+            pending.append(i)
+            calls.append(lambda text=text: asummarize_text(llm, text, chunking))
+            continue
+        try:
+            messages = task_messages(task, text, extra)
+        except ValueError as e:
+            if not return_exceptions:
+                raise
+            results[i] = e
+            continue
+        if messages is None:
+            results[i] = sanitize(text)
+            continue
+        pending.append(i)
+        calls.append(lambda task=task, messages=messages: aask(llm, messages, task))
+
+    if calls:
+        outputs = await asyncio.gather(*(run(call) for call in calls), return_exceptions=return_exceptions)
+        for i, out in zip(pending, outputs):
+            results[i] = out
+
+    return results
+
+
+def batch(
+    llm: ChatOpenAI | ModelRegistry,
+    jobs: Sequence[tuple[str, ...]],
+    max_concurrency: int = 8,
+    return_exceptions: bool = False,
+    chunking: ChunkPolicy = DEFAULT_CHUNKING,
+) -> list:
+    """Synchroner Wrapper um ``abatch`` (z. B. für Skripte ohne eigenen Event-Loop)."""
+    return asyncio.run(abatch(llm, jobs, max_concurrency, return_exceptions, chunking))
@@ -0,0 +1,340 @@
+"""Vorabberechnung wahrscheinlicher Ergebnisse, sobald die Mail feststeht.
+
+Nach „▶️ Starten“ (``app_agent.py``) bzw. „➡️ Weiter“ nach der Mail-Eingabe (``app.py``) ist
+die Mail bekannt, das Modell wartet aber bis zur nächsten Anfrage – im Monolithen oft mehrere
+Sekunden in ``summary_choice``/``context_input``. Ein ``Prefetcher`` startet dann im Hintergrund
+die Zusammenfassung und einen Antwortentwurf ohne Zusatzinfos:
+
+- Der Entwurf entsteht mit der vorab berechneten Zusammenfassung als Kontext (wie ``app.py``
+  nach der Zusammenfassungs-Phase und die Reply-Knoten mit Memo) und startet daher nach ihr.
+- Die Aufgaben laufen als asyncio-Tasks auf einem Hintergrund-Loop je Prozess und lassen sich
+  abbrechen (neue Mail, Neustart); ein laufender Aufruf bricht dabei auch den HTTP-Request ab.
+- Je Sitzung gilt ein Token-Budget. Eine Aufgabe startet nur, wenn ihre geschätzten Kosten noch
+  hineinpassen; abgerechnet werden die tatsächlichen Tokens (abgebrochene Aufrufe mit der Schätzung).
+- ``take`` liefert das Ergebnis der ersten passenden Anfrage (und wartet auf eine noch laufende
+  Aufgabe, die ja früher gestartet ist). ``memo_update`` reicht die Ergebnisse als Memo an die
+  Graphen weiter (``pipelines.memo``): Summary-Knoten bzw. -Tool nutzen die Zusammenfassung,
+  Reply-Knoten bzw. -Tool den Entwurf, solange der Verlauf keine eigenen Vorgaben enthält.
+
+Die Aufrufe erscheinen im Ledger als ``op:prefetch_summary`` bzw. ``op:prefetch_reply``.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Coroutine, Optional, Sequence
+
+from .history import estimate_tokens
+from .ledger import OP_KEY, Ledger, track
+from .memo import fingerprint, with_reply, with_summary
+from .models import ModelRegistry, model_for
+from .monolith import reply_messages, sanitize, summary_messages
+from .preprocess import clean_mail
+from .summarize import asummarize_chunked, needs_chunking
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+PREFETCH_TASKS = ("summary", "reply")
+# Gleichzeitige Vorab-Aufrufe je Prozess (über alle Sitzungen), damit Vordergrund-Anfragen Vorrang behalten.
+MAX_CONCURRENT = 4
+
+
+@dataclass
+class PrefetchStats:
+    """Zähler für das Tuning (thread-safe)."""
+    started: int = 0
+    served: int = 0  # Ergebnisse an eine Anfrage bzw. an das Memo übergeben
+    cancelled: int = 0
+    skipped: int = 0  # wegen des Budgets nicht gestartet
+    tokens: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "started": self.started,
+                "served": self.served,
+                "cancelled": self.cancelled,
+                "skipped": self.skipped,
+                "tokens": self.tokens,
+            }
+
+
+@dataclass
+class PrefetchPolicy:
+    """Vorabberechnung beim Setzen der Mail.
+
+    ``tasks``: vorab berechnete Aufgaben (``summary``, ``reply``), in dieser Reihenfolge gegen das Budget geprüft.
+    ``token_budget``: Tokens (Prompt + Completion) je Sitzung für alle Vorab-Aufrufe zusammen.
+    ``completion_tokens``: geschätzte Completion je Aufgabe für die Budgetprüfung.
+    ``wait_s``: so lange wartet eine Anfrage höchstens auf eine noch laufende Aufgabe.
+    """
+    tasks: tuple[str, ...] = PREFETCH_TASKS
+    token_budget: int = 4000
+    completion_tokens: int = 400
+    wait_s: float = 30.0
+    stats: PrefetchStats = field(default_factory=PrefetchStats)
+
+    def __post_init__(self) -> None:
+        unknown = [t for t in self.tasks if t not in PREFETCH_TASKS]
+        if unknown:
+            raise ValueError(f"Unbekannte Aufgabe(n): {', '.join(unknown)} (erlaubt: {', '.join(PREFETCH_TASKS)})")
+
+
+def prefetch_from_env() -> Optional[PrefetchPolicy]:
+    """``PREFETCH=1`` schaltet die Vorabberechnung ein (Default aus).
+
+    ``PREFETCH_TOKEN_BUDGET``  Tokens je Sitzung (Default 4000)
+    """
+    if os.getenv("PREFETCH", "0").strip().lower() not in ("1", "true", "on", "yes"):
+        return None
+    return PrefetchPolicy(token_budget=int(os.getenv("PREFETCH_TOKEN_BUDGET", "4000")))
+
+
+class _BackgroundLoop:
+    """Ein Event-Loop in einem Daemon-Thread je Prozess.
+
+    Alle Vorab-Aufrufe laufen auf diesem einen Loop; so bleibt der gemeinsame
+    ``httpx.AsyncClient`` eines ``ModelRegistry`` an genau einen Loop gebunden.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._gate: Optional[asyncio.Semaphore] = None
+
+    def submit(self, coro: Coroutine) -> Future:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="prefetch", daemon=True).start()
+            loop = self._loop
+        # Leerer Kontext: Der Task erbt keinen ``track``-Block des aufrufenden Threads.
+        return contextvars.Context().run(asyncio.run_coroutine_threadsafe, coro, loop)
+
+    def gate(self) -> asyncio.Semaphore:
+        # Nur im Loop-Thread aufgerufen, daher ohne Lock.
+        if self._gate is None:
+            self._gate = asyncio.Semaphore(MAX_CONCURRENT)
+        return self._gate
+
+
+_LOOP = _BackgroundLoop()
+
+
+@dataclass
+class _Job:
+    task: str
+    estimate: int
+    future: Optional[Future] = None
+    running: bool = False
+    cancelled: bool = False
+    context: str = ""  # Zusammenfassung, mit der der Entwurf geschrieben wurde
+
+
+class Prefetcher:
+    """Vorabberechnung für eine Sitzung (im Session-State halten – das Budget gilt je Instanz).
+
+    ``sinks``: Ledger, in die die Vorab-Aufrufe zusätzlich geschrieben werden (z. B. Sitzung und Prozess).
+    """
+
+    def __init__(self, llm: ChatOpenAI | ModelRegistry, policy: PrefetchPolicy, sinks: Sequence[Ledger] = ()):
+        self.llm = llm
+        self.policy = policy
+        self.sinks = list(sinks)
+        self.spent = 0
+        self._reserved = 0
+        self._fingerprint = ""
+        self._jobs: dict[str, _Job] = {}
+        self._delivered: set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return max(0, self.policy.token_budget - self.spent - self._reserved)
+
+    def _estimate(self, task: str, mail: str) -> int:
+        messages = summary_messages(mail) if task == "summary" else reply_messages(mail)
+        prompt = sum(estimate_tokens(m.content) for m in messages)
+        if task == "summary" and needs_chunking(clean_mail(mail)):
+            prompt *= 2  # Map über die Abschnitte, dann Reduce
+        if task == "reply" and "summary" in self.policy.tasks:
+            prompt += self.policy.completion_tokens  # Zusammenfassung als Kontext
+        return prompt + self.policy.completion_tokens
+
+    def start(self, mail: str) -> list[str]:
+        """Startet die Vorabberechnung für ``mail`` und gibt die gestarteten Aufgaben zurück.
+
+        Aufgaben einer anderen Mail werden abgebrochen; für dieselbe Mail passiert nichts.
+        """
+        fp = fingerprint(mail)
+        with self._lock:
+            if fp == self._fingerprint:
+                return []
+        self.cancel()
+        if not fp:
+            return []
+
+        started: list[str] = []
+        with self._lock:
+            self._fingerprint = fp
+            for task in self.policy.tasks:
+                estimate = self._estimate(task, mail)
+                if self.spent + self._reserved + estimate > self.policy.token_budget:
+                    self.policy.stats.incr("skipped")
+                    continue
+                self._reserved += estimate
+                job = _Job(task, estimate)
+                job.future = _LOOP.submit(self._run(job, mail, self._jobs.get("summary")))
+                self._jobs[task] = job
+                started.append(task)
+        return started
+
+    def cancel(self) -> int:
+        """Bricht alle Aufgaben ab (z. B. neue Mail, Neustart); gibt die Zahl der abgebrochenen zurück."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+            self._delivered.clear()
+            self._fingerprint = ""
+            n = 0
+            for job in jobs:
+                if job.future is None or not job.future.cancel():
+                    continue
+                n += 1
+                job.cancelled = True
+                if not job.running:
+                    # Noch nicht gestartet: keine Kosten, Reservierung freigeben.
+                    self._reserved -= job.estimate
+        self.policy.stats.incr("cancelled", n)
+        return n
+
+    async def _run(self, job: _Job, mail: str, summary: Optional[_Job] = None) -> str:
+        if job.task == "reply" and summary is not None:
+            # Vor dem Gate warten: sonst könnten Entwürfe alle Plätze belegen, die ihre Zusammenfassungen brauchen.
+            job.context = await self._summary_context(summary)
+        async with _LOOP.gate():
+            with self._lock:
+                if job.cancelled:
+                    raise asyncio.CancelledError
+                job.running = True
+            self.policy.stats.incr("started")
+            with track(*self.sinks) as run:
+                try:
+                    out = await self._call(job.task, mail, job.context)
+                except asyncio.CancelledError:
+                    # Der Prompt ist ggf. schon beim Anbieter; vorsichtig mit der Schätzung abrechnen.
+                    self._settle(job, max(job.estimate, run.totals()["total_tokens"]))
+                    raise
+                except Exception:
+                    self._settle(job, run.totals()["total_tokens"])
+                    raise
+            self._settle(job, run.totals()["total_tokens"])
+            return out
+
+    @staticmethod
+    async def _summary_context(summary: _Job) -> str:
+        try:
+            return await asyncio.wrap_future(summary.future)
+        except asyncio.CancelledError:
+            if summary.future.cancelled():
+                return ""  # nur die Zusammenfassung abgebrochen: Entwurf ohne Kontext
+            raise
+        except Exception:
+            return ""
+
+    async def _call(self, task: str, mail: str, context: str = "") -> str:
+        if task == "summary":
+            text = clean_mail(mail)
+            if needs_chunking(text):
+                return await asummarize_chunked(model_for(self.llm, "summary"), text)
+            messages = summary_messages(mail)
+        else:
+            messages = reply_messages(mail, summary_context=context or None)
+        res = await model_for(self.llm, task).ainvoke(messages, config={"metadata": {OP_KEY: f"prefetch_{task}"}})
+        return (res.content or "").strip()
+
+    def _settle(self, job: _Job, tokens: int) -> None:
+        with self._lock:
+            self._reserved -= job.estimate
+            self.spent += tokens
+        self.policy.stats.incr("tokens", tokens)
+
+    def _job(self, task: str, mail: str) -> Optional[_Job]:
+        fp = fingerprint(mail)
+        with self._lock:
+            return self._jobs.get(task) if fp and fp == self._fingerprint else None
+
+    def _result(self, job: _Job, wait: bool) -> Optional[str]:
+        if job.future is None or (not wait and not job.future.done()):
+            return None
+        try:
+            return job.future.result(timeout=self.policy.wait_s) or None
+        except Exception:  # abgebrochen, Deadline, Fehler: Anfrage läuft normal
+            return None
+
+    def take(self, task: str, mail: str, extra: str = "", summary_context: Optional[str] = None) -> Optional[str]:
+        """Vorab berechnetes Ergebnis für diese Anfrage oder ``None`` (→ normaler Aufruf).
+
+        Der Antwortentwurf passt nur ohne Zusatzinfos (``extra``) und mit derselben Zusammenfassung
+        im Prompt (``summary_context``), und er wird einmal ausgegeben; die Zusammenfassung bleibt
+        für weitere Anfragen zur selben Mail erhalten.
+        """
+        if task == "reply" and (extra or "").strip():
+            return None
+        job = self._job(task, mail)
+        out = self._result(job, wait=True) if job else None
+        if out is None:
+            return None
+        if task == "reply" and sanitize(summary_context) != sanitize(job.context):
+            return None
+        if task == "reply":
+            with self._lock:
+                if self._jobs.get(task) is job:
+                    del self._jobs[task]
+        self.policy.stats.incr("served")
+        return out
+
+    def memo_update(self, mail: str, wait: Sequence[str] = ()) -> Optional[dict]:
+        """Neue Ergebnisse als Memo-Update für die Graphen (``None``, wenn nichts Neues vorliegt).
+
+        Fertige Aufgaben werden immer übergeben, auf laufende in ``wait`` (z. B. der
+        vorhergesagte Intent der Anfrage) wird gewartet. Jedes Ergebnis geht nur einmal ins Memo.
+        """
+        results: dict[str, str] = {}
+        for task in self.policy.tasks:
+            job = self._job(task, mail)
+            with self._lock:
+                if job is None or task in self._delivered:
+                    continue
+            out = self._result(job, wait=task in wait)
+            if out is not None:
+                results[task] = out
+        if not results:
+            return None
+        with self._lock:
+            self._delivered.update(results)
+        self.policy.stats.incr("served", len(results))
+        memo = with_summary(None, mail, results.get("summary", ""))
+        return with_reply(memo, mail, results.get("reply", ""))
+
+
+def format_prefetch_caption(prefetcher: Prefetcher) -> str:
+    """Kurzinfo für die UI, z. B. ``🔮 Vorab: 2/2 übergeben · 1234/4000 Tokens``."""
+    stats = prefetcher.policy.stats.snapshot()
+    if not stats["started"]:
+        return ""
+    return (
+        f"🔮 Vorab: {stats['served']}/{stats['started']} übergeben · "
+        f"{prefetcher.spent}/{prefetcher.policy.token_budget} Tokens dieser Sitzung"
+    )
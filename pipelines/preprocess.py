@@ -0,0 +1,304 @@
+"""Gemeinsame Vorverarbeitung eingehender Mails für alle drei Pipelines.
+
+Entfernt, was bei jedem Aufruf Tokens kostet, aber nichts zur Aufgabe beiträgt:
+
+1. HTML → Text (Blockelemente werden Zeilenumbrüche, ``<blockquote>`` wird ``>``-Zitat)
+2. Zitatketten falten: von jedem ``>``-Block bleiben die ersten Zeilen der obersten
+   Ebene, tiefere Ebenen und der Rest werden durch einen Platzhalter ersetzt
+3. Signaturen und rechtliche Disclaimer entfernen – nur am Ende einer Nachricht (vor dem
+   Mailende, einem Zitat oder dem Kopf einer weitergeleiteten Mail), damit Sätze im Text
+   („Der Vertrag ist vertraulich …“) nie mit dem Rest des Absatzes verschwinden:
+   - Signatur: der Standard-Trenner ``-- `` (mit Leerzeichen) vor höchstens
+     ``max_signature_lines`` Zeilen,
+   - Disclaimer: ein Schlussabsatz mit eindeutiger Formel („nicht der richtige Adressat“,
+     „intended recipient“ …) oder mindestens zwei allgemeinen („is confidential“ …)
+4. Leerraum verdichten (Mehrfach-Leerzeichen, Leerzeilenfolgen)
+
+Alles läuft mit vorkompilierten Mustern in zwei Durchgängen über die Zeilen (Zitate falten,
+dann die Enden der Nachrichten kürzen); das Ergebnis wird pro Text gecacht, sodass mehrfaches
+Aufrufen pro Anfrage nichts kostet.
+Weitergeleitete Mails ohne ``>`` (Outlook-Stil) bleiben erhalten – dafür gibt es die
+Map-Reduce-Zusammenfassung.
+"""
+from __future__ import annotations
+
+import html
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from .history import estimate_tokens
+
+
+@dataclass(frozen=True)
+class PreprocessPolicy:
+    keep_quote_lines: int = 3
+    strip_signature: bool = True
+    max_signature_lines: int = 8  # längere Blöcke nach ``-- `` sind eher Text als Signatur
+    strip_disclaimer: bool = True
+    enabled: bool = True
+
+
+DEFAULT_PREPROCESS = PreprocessPolicy()
+
+
+@dataclass(frozen=True)
+class PreprocessStats:
+    bytes_before: int
+    bytes_after: int
+    tokens_before: int
+    tokens_after: int
+    html: bool = False
+    quote_lines: int = 0
+    signature_lines: int = 0
+    disclaimer_lines: int = 0
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def as_dict(self) -> dict:
+        return {
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_after,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "saved_tokens": self.saved_tokens,
+            "html": self.html,
+            "quote_lines": self.quote_lines,
+            "signature_lines": self.signature_lines,
+            "disclaimer_lines": self.disclaimer_lines,
+        }
+
+
+@dataclass(frozen=True)
+class PreparedMail:
+    text: str
+    stats: PreprocessStats
+
+
+# -------------------------------- HTML
+_HTML_HINT = re.compile(r"<(?:html|body|div|p|br|table|span|font|td|blockquote)\b[^>]*>", re.I)
+_HTML_TAG = re.compile(r"<!--.*?-->|<(/?)([a-zA-Z][a-zA-Z0-9]*)\b[^>]*>", re.S)
+_HTML_SKIP = frozenset({"script", "style", "head", "title"})
+_HTML_BLOCK = frozenset({"br", "p", "div", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "table", "hr", "ul", "ol"})
+_HTML_SPACE = re.compile(r"\s+")
+# Steuerzeichen markieren Beginn/Ende von <blockquote>; sie kommen in Mailtext nicht vor.
+_QUOTE_OPEN, _QUOTE_CLOSE = "\x01", "\x02"
+
+
+def html_to_text(markup: str) -> str:
+    """Ein Durchgang über die Tags; ``<blockquote>`` wird zu ``>``-Zitatzeilen."""
+    out: list[str] = []
+    pos = 0
+    skip = None
+    for m in _HTML_TAG.finditer(markup):
+        if skip is None:
+            out.append(_HTML_SPACE.sub(" ", markup[pos : m.start()]))
+        pos = m.end()
+        closing, name = m.group(1), (m.group(2) or "").lower()
+        if skip is not None:
+            if closing and name == skip:
+                skip = None
+            continue
+        if name in _HTML_SKIP and not closing:
+            skip = name
+        elif name == "blockquote":
+            out.append(f"\n{_QUOTE_CLOSE if closing else _QUOTE_OPEN}\n")
+        elif name in _HTML_BLOCK:
+            out.append("\n")
+    if skip is None:
+        out.append(_HTML_SPACE.sub(" ", markup[pos:]))
+
+    lines: list[str] = []
+    depth = 0
+    for line in html.unescape("".join(out)).split("\n"):
+        depth += line.count(_QUOTE_OPEN) - line.count(_QUOTE_CLOSE)
+        depth = max(depth, 0)
+        line = line.replace(_QUOTE_OPEN, "").replace(_QUOTE_CLOSE, "")
+        if line.strip() == "--" and line.lstrip().startswith("-- "):
+            lines.append(f"{'>' * depth} -- " if depth else "-- ")  # Signatur-Trenner samt Leerzeichen
+            continue
+        line = line.strip()
+        if line:
+            lines.append(f"{'>' * depth} {line}" if depth else line)
+        else:
+            lines.append("")
+    return "\n".join(lines)
+
+
+# -------------------------------- Zeilenmuster
+_ZERO_WIDTH = re.compile("[\u200b\u200e\u200f\ufeff]")
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_QUOTE = re.compile(r"^\s*(>[> ]*)")
+_SIGNATURE = "-- "  # RFC 3676; ein bloßes „--“ ist oft Teil des Textes
+_MOBILE_FOOTER = re.compile(
+    r"^(?:Von meinem \w+ gesendet|Gesendet von meinem \w+|Sent from my \w+|Get Outlook for \w+)\.?$", re.I
+)
+# Eindeutige Formeln: eine reicht. Allgemeine kommen auch im Text vor: erst zwei im Absatz zählen.
+_DISCLAIMER_STRONG = re.compile(
+    r"nicht der (?:richtige|beabsichtigte) (?:Adressat|Empfänger)|intended recipient|may contain confidential"
+    r"|Diese E-Mail (?:kann|enthält) vertrauliche|Bitte denken Sie an die Umwelt|consider the environment before printing",
+    re.I,
+)
+_DISCLAIMER_WEAK = re.compile(r"vertraulich(?:e|en)? Informationen|is confidential|confidential information", re.I)
+# Beginn einer neuen (zitierten/weitergeleiteten) Mail: davor endet eine Nachricht (Signatur, Disclaimer).
+_MAIL_START = re.compile(
+    r"^\s*(?:-{2,}\s*(?:Original Message|Ursprüngliche Nachricht|Forwarded message|Weitergeleitete Nachricht)"
+    r"|(?:Von|From):\s|Am .+ schrieb .+:|On .+ wrote:)",
+    re.I,
+)
+
+
+def quote_placeholder(n: int) -> str:
+    return f"[… {n} zitierte Zeilen ausgelassen]"
+
+
+def _normalize(text: str) -> str:
+    return _ZERO_WIDTH.sub("", text.replace("\r\n", "\n").replace("\r", "\n"))
+
+
+def _is_disclaimer(paragraph: list[str]) -> bool:
+    text = " ".join(paragraph)
+    return bool(_DISCLAIMER_STRONG.search(text)) or len(_DISCLAIMER_WEAK.findall(text)) >= 2
+
+
+def _disclaimer_start(paragraph: list[str]) -> int:
+    """Erste Zeile mit einer Formel; Zeilen davor (Name, Firma) bleiben stehen."""
+    for i, line in enumerate(paragraph):
+        if _DISCLAIMER_STRONG.search(line) or _DISCLAIMER_WEAK.search(line):
+            return i
+    return 0
+
+
+def _strip_tail(lines: list[str], policy: PreprocessPolicy, counts: dict) -> list[str]:
+    """Kürzt Disclaimer-Absätze und eine kurze Signatur am Ende einer Nachricht (im Wechsel)."""
+    end = len(lines)
+    while True:
+        while end and not lines[end - 1]:
+            end -= 1
+        start = end
+        while start and lines[start - 1]:
+            start -= 1
+        if policy.strip_disclaimer and start < end and _is_disclaimer(lines[start:end]):
+            cut = start + _disclaimer_start(lines[start:end])
+            counts["disclaimer_lines"] += end - cut
+            end = cut
+            continue
+        if policy.strip_signature and _SIGNATURE in lines[:end]:
+            delimiter = end - 1 - lines[:end][::-1].index(_SIGNATURE)
+            body = sum(1 for line in lines[delimiter + 1 : end] if line)
+            if body <= policy.max_signature_lines:
+                counts["signature_lines"] += 1 + body
+                end = delimiter
+                continue
+        return lines[:end]
+
+
+def _clean(text: str, policy: PreprocessPolicy) -> tuple[str, dict]:
+    counts = {"quote_lines": 0, "signature_lines": 0, "disclaimer_lines": 0}
+    # Durchgang 1: Zitate falten, Leerraum; ``None`` trennt die Nachrichten (Zitat, Mailkopf).
+    lines: list[Optional[str]] = []
+    quote: list[str] = []  # aktueller >-Block (nur oberste Ebene)
+    quote_dropped = 0
+    quote_gap = False
+
+    def flush_quote() -> None:
+        nonlocal quote, quote_dropped
+        if quote or quote_dropped:
+            kept = quote[: policy.keep_quote_lines]
+            omitted = len(quote) - len(kept) + quote_dropped
+            lines.append(None)
+            lines.extend(kept)
+            if omitted:
+                lines.append(quote_placeholder(omitted))
+                counts["quote_lines"] += omitted
+            lines.append(None)
+        quote, quote_dropped = [], 0
+
+    for raw in text.split("\n"):
+        line = _SPACES.sub(" ", raw).strip()
+
+        q = _QUOTE.match(line)
+        if q:
+            if q.group(1).count(">") == 1:
+                quote.append(line)
+            else:
+                quote_dropped += 1
+            continue
+        if not line and (quote or quote_dropped):
+            quote_gap = True  # Leerzeilen zwischen Zitatzeilen trennen den Block nicht
+            continue
+        if quote or quote_dropped:
+            flush_quote()
+            if quote_gap:
+                lines.append("")
+        quote_gap = False
+
+        if policy.strip_signature and _MOBILE_FOOTER.match(line):
+            counts["signature_lines"] += 1
+            continue
+        if _MAIL_START.match(line):
+            lines.extend((None, line, None))
+        else:
+            lines.append(_SIGNATURE if raw == _SIGNATURE else line)
+    flush_quote()
+
+    # Durchgang 2: Enden der Nachrichten kürzen, höchstens eine Leerzeile in Folge, keine am Anfang.
+    out: list[str] = []
+    message: list[str] = []
+    for line in [*lines, None]:
+        if line is not None:
+            message.append(line)
+            continue
+        kept = _strip_tail(message, policy, counts)
+        if "" in message[len(kept):]:
+            kept.append("")  # Absatzgrenze vor dem nächsten Teil bleibt
+        for line in kept:
+            line = line.strip()
+            if line or (out and out[-1]):
+                out.append(line)
+        message = []
+    while out and not out[-1]:
+        out.pop()
+    return "\n".join(out), counts
+
+
+@lru_cache(maxsize=256)
+def prepare_mail(text: str, policy: PreprocessPolicy = DEFAULT_PREPROCESS) -> PreparedMail:
+    """Bereinigt eine Mail und misst die Ersparnis (Ergebnis gecacht pro Text)."""
+    raw = text or ""
+    if not policy.enabled:
+        cleaned = raw.strip()
+        size, tokens = len(raw.encode("utf-8")), estimate_tokens(raw)
+        return PreparedMail(cleaned, PreprocessStats(size, len(cleaned.encode("utf-8")), tokens, estimate_tokens(cleaned)))
+
+    normalized = _normalize(raw)
+    is_html = bool(_HTML_HINT.search(normalized))
+    cleaned, counts = _clean(html_to_text(normalized) if is_html else normalized, policy)
+    stats = PreprocessStats(
+        bytes_before=len(raw.encode("utf-8")),
+        bytes_after=len(cleaned.encode("utf-8")),
+        tokens_before=estimate_tokens(raw),
+        tokens_after=estimate_tokens(cleaned),
+        html=is_html,
+        **counts,
+    )
+    return PreparedMail(cleaned, stats)
+
+
+def clean_mail(text: str) -> str:
+    return prepare_mail(text or "").text
+
+
+def format_savings_caption(stats: PreprocessStats) -> str:
+    """Kurztext für die Metrik-Zeile, z. B. ``✂️ −240 Tokens (38 %)``."""
+    if stats.saved_tokens <= 0:
+        return ""
+    pct = 100 * stats.saved_tokens / max(stats.tokens_before, 1)
+    return f"✂️ −{stats.saved_tokens} Tokens ({pct:.0f} %)"
@@ -0,0 +1,491 @@
+"""Zeitlimits, Retries, Hedging und Fallback-Endpoint für Modellaufrufe.
+
+Ein langsamer oder fehlschlagender Aufruf blockierte bisher das Streamlit-Skript
+bis zum Ende. ``ResilientChatModel`` legt sich um ein Chat-Modell (je Rolle, siehe
+``pipelines.models``) und bleibt für Graphen, Tools und Monolith ein normales
+``BaseChatModel`` (``invoke``/``ainvoke``, Streaming, ``bind_tools``,
+``with_structured_output``, Antwort-Cache):
+
+1. **Deadline je Rolle** (``ResiliencePolicy.deadline_s``): Obergrenze für alle
+   Versuche an einem Endpoint; danach ``DeadlineExceeded``.
+2. **Retries** bei transienten Fehlern (Timeout, Verbindungsfehler, 408/409/429/5xx)
+   mit exponentiellem Backoff und vollem Jitter; andere Fehler gehen direkt durch.
+3. **Hedging** (optional): Ist die Antwort nach dem p95 der letzten Latenzen dieser
+   Rolle noch nicht da, geht dieselbe Anfrage ein zweites Mal raus; die erste Antwort
+   gewinnt, die andere wird verworfen (async: abgebrochen).
+4. **Fallback**: Scheitert der primäre Endpoint endgültig, bekommt ein zweiter
+   Endpoint (``MODEL_FALLBACK``) dieselbe Anfrage mit eigener Deadline.
+
+Gestreamte Antworten werden nur bis zum ersten Token wiederholt oder umgeleitet –
+danach sähe die UI sonst doppelten Text – und nicht gehedgt.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import math
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Mapping, Optional, Sequence, TypeVar
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableBinding, RunnableSequence
+from pydantic import PrivateAttr
+
+from .ledger import percentile
+
+T = TypeVar("T")
+
+# HTTP-Status, bei denen ein erneuter Versuch sinnvoll ist.
+TRANSIENT_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+# Fehlerklassen des OpenAI-SDKs/httpx, erkannt am Namen (ohne das SDK zu importieren).
+_TRANSIENT_NAMES = frozenset(
+    {"APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError", "TimeoutException", "ConnectError",
+     "ReadTimeout", "RemoteProtocolError"}
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Kein Versuch innerhalb der Deadline erfolgreich (auch nach Fallback)."""
+
+
+class AttemptTimeout(TimeoutError):
+    """Ein einzelner Versuch hat sein Zeitlimit überschritten (transient)."""
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    if getattr(exc, "status_code", None) in TRANSIENT_STATUS:
+        return True
+    return any(cls.__name__ in _TRANSIENT_NAMES for cls in type(exc).__mro__)
+
+
+@dataclass(frozen=True)
+class ResiliencePolicy:
+    deadline_s: Optional[float] = 60.0  # je Endpoint, inkl. Retries und Backoff
+    attempt_timeout_s: Optional[float] = None  # je Versuch; None = Rest der Deadline
+    retries: int = 2
+    backoff_s: float = 0.5  # Basis für exponentiellen Backoff mit vollem Jitter
+    backoff_max_s: float = 8.0
+    hedge: bool = False
+    hedge_after_s: float = 3.0  # Verzögerung, solange zu wenige Messwerte vorliegen
+    hedge_quantile: float = 95.0
+    hedge_min_samples: int = 20
+
+    def backoff(self, attempt: int, rng: random.Random) -> float:
+        """Wartezeit vor Versuch ``attempt`` (1 = erster Retry): ``U(0, min(max, basis * 2^(n-1)))``."""
+        return rng.uniform(0.0, min(self.backoff_max_s, self.backoff_s * 2 ** (attempt - 1)))
+
+
+# Deadlines je Rolle in Sekunden: Klassifikation muss schnell gehen, Entwürfe dürfen dauern.
+ROLE_DEADLINES: dict[str, float] = {
+    "router": 15.0,
+    "agent": 30.0,
+    "general": 30.0,
+    "summary": 60.0,
+    "reply": 60.0,
+    "new": 60.0,
+    "revise": 60.0,
+}
+
+
+def policies_from_env(environ: Optional[Mapping[str, str]] = None) -> Optional[dict[str, ResiliencePolicy]]:
+    """``LLM_RESILIENCE=0`` schaltet ab; ``LLM_RETRIES``, ``LLM_HEDGING=1``, ``LLM_DEADLINE_<ROLLE>``."""
+    env = os.environ if environ is None else environ
+    if env.get("LLM_RESILIENCE", "1").strip().lower() in ("0", "false", "off", "no"):
+        return None
+    base = ResiliencePolicy(
+        retries=int(env.get("LLM_RETRIES", ResiliencePolicy.retries)),
+        hedge=env.get("LLM_HEDGING", "0").strip().lower() in ("1", "true", "on", "yes"),
+    )
+    return {
+        role: replace(base, deadline_s=float(env.get(f"LLM_DEADLINE_{role.upper()}", deadline)))
+        for role, deadline in ROLE_DEADLINES.items()
+    }
+
+
+@dataclass
+class ResilienceStats:
+    """Zähler je Modell; ``snapshot()`` für UI und Benchmarks."""
+    calls: int = 0
+    attempts: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    fallbacks: int = 0
+    failures: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def incr(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, key, getattr(self, key) + n)
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+
+def merge_stats(snapshots: Sequence[dict[str, int]]) -> dict[str, int]:
+    total: dict[str, int] = {}
+    for snap in snapshots:
+        for k, v in snap.items():
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+def format_resilience_caption(stats: dict[str, int]) -> str:
+    """Kurztext für die Seitenleiste, z. B. ``🛡️ 3 Retries · 1 Fallback``; leer ohne Ereignisse."""
+    parts = [
+        f"{stats.get('retries', 0)} Retries" if stats.get("retries") else "",
+        f"{stats['hedge_wins']}/{stats['hedges']} Hedges gewonnen" if stats.get("hedges") else "",
+        f"{stats.get('fallbacks', 0)} Fallbacks" if stats.get("fallbacks") else "",
+        f"{stats.get('timeouts', 0)} Timeouts" if stats.get("timeouts") else "",
+        f"{stats.get('failures', 0)} abgebrochen" if stats.get("failures") else "",
+    ]
+    text = " · ".join(x for x in parts if x)
+    return f"🛡️ {text}" if text else ""
+
+
+class LatencyWindow:
+    """Letzte erfolgreiche Latenzen; liefert das Quantil für die Hedge-Verzögerung."""
+
+    def __init__(self, size: int = 200):
+        self._values: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._values.append(seconds)
+
+    def quantile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            values = list(self._values)
+        return percentile(values, q) if len(values) >= min_samples else None
+
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    # Sync-Versuche laufen in Threads, damit Zeitlimit und Hedge nicht vom blockierenden HTTP-Call abhängen.
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-attempt")
+        return _POOL
+
+
+_DONE = object()
+
+
+class ResilientChatModel(BaseChatModel):
+    """Chat-Modell mit Deadline, Retries, optionalem Hedging und Fallback-Endpoint."""
+
+    primary: BaseChatModel
+    fallback: Optional[BaseChatModel] = None
+    policy: ResiliencePolicy = ResiliencePolicy()
+    model_name: str = ""
+    seed: Optional[int] = None  # nur für reproduzierbaren Jitter in Tests
+
+    _stats: ResilienceStats = PrivateAttr(default_factory=ResilienceStats)
+    _window: LatencyWindow = PrivateAttr(default_factory=LatencyWindow)
+    _rng: random.Random = PrivateAttr(default_factory=random.Random)
+
+    def model_post_init(self, context: Any) -> None:
+        super().model_post_init(context)
+        if not self.model_name:
+            self.model_name = str(getattr(self.primary, "model_name", "") or "")
+        if self.seed is not None:
+            self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"resilient-{self.primary._llm_type}"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"model_name": self.model_name, **self.primary._identifying_params}
+
+    @property
+    def stats(self) -> ResilienceStats:
+        return self._stats
+
+    def _get_llm_string(self, stop: Optional[list[str]] = None, **kwargs: Any) -> str:
+        # Gleicher Cache-Schlüssel wie das primäre Modell: vorhandene Cache-Einträge bleiben gültig.
+        return self.primary._get_llm_string(stop=stop, **kwargs)
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        # Formatierung (tool_choice, strict, …) übernimmt das primäre Modell.
+        return self.bind(**self.primary.bind_tools(tools, **kwargs).kwargs)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        # Methode des primären Modells beibehalten (ChatOpenAI: ``json_schema`` per ``response_format``,
+        # nicht das Function-Calling von ``BaseChatModel``); nur der Modellaufruf läuft über den Wrapper.
+        structured = self.primary.with_structured_output(schema, **kwargs)
+        if isinstance(structured, RunnableSequence) and isinstance(structured.first, RunnableBinding):
+            return RunnableSequence(self.bind(**structured.first.kwargs), *structured.middle, structured.last)
+        # Andere Formen (z. B. ``include_raw=True``): generische Umsetzung von ``BaseChatModel``.
+        return super().with_structured_output(schema, **kwargs)
+
+    # ---------------- Plan: (Modell, Zeitlimit, Wartezeit davor) je Versuch
+    def _plan(self) -> Iterator[tuple[BaseChatModel, float, float]]:
+        p = self.policy
+        for phase, model in enumerate((self.primary, self.fallback)):
+            if model is None:
+                continue
+            if phase:
+                self._stats.incr("fallbacks")
+            deadline = time.monotonic() + (p.deadline_s if p.deadline_s is not None else math.inf)
+            for attempt in range(p.retries + 1):
+                delay = p.backoff(attempt, self._rng) if attempt else 0.0
+                remaining = deadline - time.monotonic() - delay
+                if remaining <= 0:
+                    break
+                if attempt:
+                    self._stats.incr("retries")
+                timeout = min(remaining, p.attempt_timeout_s or remaining)
+                yield model, timeout, delay
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.policy.hedge:
+            return None
+        q = self._window.quantile(self.policy.hedge_quantile, self.policy.hedge_min_samples)
+        return q if q is not None else self.policy.hedge_after_s
+
+    def _failed(self, error: Optional[BaseException]) -> DeadlineExceeded:
+        self._stats.incr("failures")
+        return DeadlineExceeded(f"{self.model_name}: keine Antwort innerhalb der Deadline ({error!r})")
+
+    # ---------------- sync
+    def _call(self, run: Callable[[BaseChatModel], T]) -> T:
+        self._stats.incr("calls")
+        error: Optional[BaseException] = None
+        for model, timeout, delay in self._plan():
+            time.sleep(delay)
+            try:
+                return self._attempt(model, run, timeout)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                error = e
+        raise self._failed(error) from error
+
+    def _attempt(self, model: BaseChatModel, run: Callable[[BaseChatModel], T], timeout: float) -> T:
+        start = time.monotonic()
+        end = start + timeout
+        hedge_delay = self._hedge_delay()
+        hedge_at = start + hedge_delay if hedge_delay is not None else None
+
+        def submit() -> Future:
+            self._stats.incr("attempts")
+            return _pool().submit(contextvars.copy_context().run, run, model)
+
+        first = submit()
+        pending = {first}
+        error: Optional[BaseException] = None
+        while pending:
+            now = time.monotonic()
+            if now >= end:
+                break
+            wake = min(end, hedge_at) if hedge_at is not None else end
+            done, pending = wait(pending, timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    self._window.add(time.monotonic() - start)
+                    if f is not first:
+                        self._stats.incr("hedge_wins")
+                    return f.result()
+                error = f.exception()
+            if hedge_at is not None and time.monotonic() >= hedge_at and pending:
+                self._stats.incr("hedges")
+                pending.add(submit())
+                hedge_at = None
+        if error is not None and not pending:
+            raise error
+        self._stats.incr("timeouts")
+        raise AttemptTimeout(f"{self.model_name}: Versuch nach {timeout:.1f}s abgebrochen")
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self._call(lambda model: model._generate(messages, stop=stop, **kwargs))
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        self._stats.incr("calls")
+        error: Optional[BaseException] = None
+        for model, timeout, delay in self._plan():
+            time.sleep(delay)
+            self._stats.incr("attempts")
+            chunks, cancel = self._pump(model, messages, stop, kwargs)
+            start = time.monotonic()
+            try:
+                kind, item = chunks.get(timeout=timeout)
+            except queue.Empty:
+                cancel.set()
+                self._stats.incr("timeouts")
+                error = AttemptTimeout(f"{self.model_name}: kein erstes Token nach {timeout:.1f}s")
+                continue
+            if kind == "error":
+                if not is_transient(item):
+                    raise item
+                error = item
+                continue
+            # Ab dem ersten Token keine Wiederholung mehr; die Deadline gilt weiter.
+            self._window.add(time.monotonic() - start)
+            end = start + timeout
+            while kind == "chunk":
+                yield item
+                try:
+                    kind, item = chunks.get(timeout=max(0.0, end - time.monotonic()))
+                except queue.Empty:
+                    cancel.set()
+                    raise self._failed(None)
+            if kind == "error":
+                raise item
+            return
+        raise self._failed(error) from error
+
+    @staticmethod
+    def _pump(model: BaseChatModel, messages: list[BaseMessage], stop: Optional[list[str]], kwargs: dict):
+        chunks: queue.Queue = queue.Queue()
+        cancel = threading.Event()
+
+        def run() -> None:
+            try:
+                for chunk in model._stream(messages, stop=stop, **kwargs):
+                    if cancel.is_set():
+                        return
+                    chunks.put(("chunk", chunk))
+                chunks.put(("end", _DONE))
+            except Exception as e:  # an den Aufrufer weiterreichen
+                chunks.put(("error", e))
+
+        _pool().submit(contextvars.copy_context().run, run)
+        return chunks, cancel
+
+    # ---------------- async
+    async def _acall(self, run: Callable[[BaseChatModel], Awaitable[T]]) -> T:
+        self._stats.incr("calls")
+        error: Optional[BaseException] = None
+        for model, timeout, delay in self._plan():
+            await asyncio.sleep(delay)
+            try:
+                return await self._aattempt(model, run, timeout)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                error = e
+        raise self._failed(error) from error
+
+    async def _aattempt(self, model: BaseChatModel, run: Callable[[BaseChatModel], Awaitable[T]], timeout: float) -> T:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        end = start + timeout
+        hedge_delay = self._hedge_delay()
+        hedge_at = start + hedge_delay if hedge_delay is not None else None
+
+        def submit() -> asyncio.Task:
+            self._stats.incr("attempts")
+            return asyncio.ensure_future(run(model))
+
+        first = submit()
+        pending = {first}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                now = loop.time()
+                if now >= end:
+                    break
+                wake = min(end, hedge_at) if hedge_at is not None else end
+                done, pending = await asyncio.wait(pending, timeout=wake - now, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        self._window.add(loop.time() - start)
+                        if t is not first:
+                            self._stats.incr("hedge_wins")
+                        return t.result()
+                    error = t.exception()
+                if hedge_at is not None and loop.time() >= hedge_at and pending:
+                    self._stats.incr("hedges")
+                    pending.add(submit())
+                    hedge_at = None
+        finally:
+            for t in pending:
+                t.cancel()
+        if error is not None and not pending:
+            raise error
+        self._stats.incr("timeouts")
+        raise AttemptTimeout(f"{self.model_name}: Versuch nach {timeout:.1f}s abgebrochen")
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await self._acall(lambda model: model._agenerate(messages, stop=stop, **kwargs))
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self._stats.incr("calls")
+        error: Optional[BaseException] = None
+        for model, timeout, delay in self._plan():
+            await asyncio.sleep(delay)
+            self._stats.incr("attempts")
+            stream = model._astream(messages, stop=stop, **kwargs).__aiter__()
+            start = time.monotonic()
+            try:
+                first = await asyncio.wait_for(stream.__anext__(), timeout)
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                await stream.aclose()
+                if isinstance(e, asyncio.TimeoutError):
+                    self._stats.incr("timeouts")
+                    e = AttemptTimeout(f"{self.model_name}: kein erstes Token nach {timeout:.1f}s")
+                if not is_transient(e):
+                    raise
+                error = e
+                continue
+            self._window.add(time.monotonic() - start)
+            end = start + timeout
+            yield first
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), max(0.0, end - time.monotonic()))
+                    except StopAsyncIteration:
+                        return
+                    except asyncio.TimeoutError:
+                        raise self._failed(None)
+                    yield chunk
+            finally:
+                await stream.aclose()
+        raise self._failed(error) from error
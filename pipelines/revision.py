@@ -0,0 +1,197 @@
+"""Überarbeitung per Edit-Skript statt kompletter Neufassung.
+
+Bisher schickte jede Überarbeitung den ganzen Entwurf und ließ das Modell den ganzen
+überarbeiteten Entwurf neu ausgeben – auch für „Termin explizit 10:00 Uhr“, das eine
+Zeile ändert. Mit einer ``EditPolicy`` liefert das Modell stattdessen ein kompaktes
+``EditScript`` (replace/insert/delete an wörtlich zitierten Ankern). Das Skript wird
+lokal geprüft und angewendet; die Completion schrumpft auf die geänderten Stellen.
+
+Passt ein Anker nicht genau einmal, ist das Skript leer, zu lang oder meldet das Modell
+``rewrite`` (Feedback betrifft den ganzen Entwurf), folgt automatisch die normale
+Neufassung mit ``SYSTEM_REVISE``. Sehr kurze Entwürfe werden direkt neu geschrieben.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Generator, Literal, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel, Field
+
+from .history import estimate_tokens
+from .prompts import SYSTEM_REVISE, SYSTEM_REVISE_EDITS
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+
+class Edit(BaseModel):
+    """Eine Änderung am Entwurf."""
+    op: Literal["replace", "insert", "delete"]
+    anchor: str = Field(..., description="Exakter, eindeutiger Textausschnitt aus dem ENTWURF")
+    text: str = Field("", description="replace: Ersatz; insert: Text nach dem Anker; delete: leer")
+
+
+class EditScript(BaseModel):
+    """Änderungen am ENTWURF als Edit-Skript (oder ``rewrite`` für eine Neufassung)."""
+    edits: list[Edit] = Field(default_factory=list)
+    rewrite: bool = False
+
+
+class EditError(ValueError):
+    """Edit-Skript lässt sich nicht sauber auf den Entwurf anwenden."""
+
+
+def apply_edits(draft: str, edits: Sequence[Edit]) -> str:
+    """Wendet die Edits nacheinander an; jeder Anker muss im aktuellen Text genau einmal vorkommen."""
+    text = draft
+    for i, edit in enumerate(edits, 1):
+        anchor = edit.anchor
+        if not anchor.strip():
+            raise EditError(f"Edit {i}: leerer Anker")
+        count = text.count(anchor)
+        if count != 1:
+            raise EditError(f"Edit {i}: Anker {'nicht gefunden' if not count else f'{count}-mal gefunden'}: {anchor[:40]!r}")
+        start = text.index(anchor)
+        end = start + len(anchor)
+        if edit.op == "replace":
+            text = text[:start] + edit.text + text[end:]
+        elif edit.op == "insert":
+            text = text[:end] + edit.text + text[end:]
+        else:
+            text = text[:start] + text[end:]
+    return text
+
+
+@dataclass
+class RevisionStats:
+    """Zähler für das Tuning (thread-safe)."""
+    edits: int = 0  # per Edit-Skript überarbeitet
+    fallbacks: int = 0  # Edit-Skript versucht, dann neu geschrieben
+    full: int = 0  # direkt neu geschrieben (Entwurf zu kurz)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {"edits": self.edits, "fallbacks": self.fallbacks, "full": self.full}
+
+
+@dataclass
+class EditPolicy:
+    """Edit-Modus für Überarbeitungen (``build_app(..., edits=...)``, ``revise_mail(..., edits=...)``).
+
+    ``min_draft_tokens``: kürzere Entwürfe direkt neu schreiben (kaum Ersparnis).
+    ``max_edits``: längere Skripte gelten als Neufassung.
+    """
+    min_draft_tokens: int = 60
+    max_edits: int = 12
+    stats: RevisionStats = field(default_factory=RevisionStats)
+
+
+def rewrite_messages(draft: str, feedback: str) -> list[BaseMessage]:
+    return [
+        SystemMessage(content=SYSTEM_REVISE),
+        HumanMessage(content=f"ENTWURF:\n{draft}\n\nFEEDBACK:\n{feedback or '–'}"),
+    ]
+
+
+def edit_script_messages(draft: str, feedback: str) -> list[BaseMessage]:
+    return [
+        SystemMessage(content=SYSTEM_REVISE),
+        SystemMessage(content=SYSTEM_REVISE_EDITS),
+        HumanMessage(content=f"ENTWURF:\n{draft}\n\nFEEDBACK:\n{feedback or '–'}"),
+    ]
+
+
+# Gleiches Muster wie die Routing-Knoten und ``pipelines.summarize``: Der Generator liefert
+# ``(runnable, input)`` und bekommt die Antwort zurück; sync und async teilen sich die Logik.
+ReviseSteps = Generator[Tuple[Runnable, Any], Any, str]
+
+
+def _edited(script: Any, draft: str, policy: EditPolicy) -> Optional[str]:
+    """Überarbeiteter Entwurf oder ``None`` (→ Neufassung)."""
+    parsed = script.get("parsed") if isinstance(script, dict) else None
+    if not isinstance(parsed, EditScript) or parsed.rewrite or not parsed.edits or len(parsed.edits) > policy.max_edits:
+        return None
+    try:
+        text = apply_edits(draft, parsed.edits).strip()
+    except EditError:
+        return None
+    return text if text and text != draft.strip() else None
+
+
+def revise_steps(
+    llm: ChatOpenAI,
+    draft: str,
+    feedback: str,
+    policy: Optional[EditPolicy] = None,
+    full_messages: Optional[list[BaseMessage]] = None,
+) -> ReviseSteps:
+    """Edit-Skript, bei Bedarf Neufassung. ``full_messages`` ersetzt den Prompt der Neufassung.
+
+    Die Neufassung ist immer ``(llm, messages)`` – Aufrufer erkennen sie an ``runnable is llm``
+    (z. B. für Token-Streaming).
+    """
+    full = full_messages or rewrite_messages(draft, feedback)
+    if policy is None:
+        return ((yield llm, full).content or "").strip()
+    if estimate_tokens(draft) < policy.min_draft_tokens:
+        policy.stats.incr("full")
+        return ((yield llm, full).content or "").strip()
+
+    script = yield llm.with_structured_output(EditScript, include_raw=True), edit_script_messages(draft, feedback)
+    text = _edited(script, draft, policy)
+    if text is not None:
+        policy.stats.incr("edits")
+        return text
+    policy.stats.incr("fallbacks")
+    return ((yield llm, full).content or "").strip()
+
+
+FullInvoke = Callable[[list[BaseMessage]], BaseMessage]
+
+
+def revise(
+    llm: ChatOpenAI,
+    draft: str,
+    feedback: str,
+    policy: Optional[EditPolicy] = None,
+    full_messages: Optional[list[BaseMessage]] = None,
+    config: Optional[dict] = None,
+    full_invoke: Optional[FullInvoke] = None,
+) -> str:
+    """Synchroner Lauf. ``full_invoke`` ersetzt den Aufruf der Neufassung (z. B. mit Token-Streaming)."""
+    steps = revise_steps(llm, draft, feedback, policy, full_messages)
+    try:
+        runnable, inp = next(steps)
+        while True:
+            if full_invoke is not None and runnable is llm:
+                out = full_invoke(inp)
+            else:
+                out = runnable.invoke(inp, config=config)
+            runnable, inp = steps.send(out)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def arevise(
+    llm: ChatOpenAI,
+    draft: str,
+    feedback: str,
+    policy: Optional[EditPolicy] = None,
+    full_messages: Optional[list[BaseMessage]] = None,
+    config: Optional[dict] = None,
+) -> str:
+    steps = revise_steps(llm, draft, feedback, policy, full_messages)
+    try:
+        runnable, inp = next(steps)
+        while True:
+            runnable, inp = steps.send(await runnable.ainvoke(inp, config=config))
+    except StopIteration as stop:
+        return stop.value
@@ -0,0 +1,73 @@
+"""Persistente Chat-Sitzungen über einen LangGraph-Checkpointer in SQLite.
+
+Statt den kompletten Graph-State in der UI zu halten und bei jedem Turn erneut
+zu schicken, speichert der Graph seinen State nach jedem Knoten unter einer
+Thread-ID. Ein Turn besteht dann nur noch aus der neuen ``HumanMessage``; der
+Verlauf kommt aus der Datenbank. Da die Datei im WAL-Modus läuft, können mehrere
+Worker-Prozesse dieselben Sitzungen lesen und fortsetzen, und Sitzungen
+überstehen Neustarts.
+
+    saver = sqlite_checkpointer(".sessions.sqlite")
+    app = graph_routing.build_app(llm, checkpointer=saver)
+    app.update_state(thread_config(tid), {"uploaded_mail": mail})
+    app.invoke(turn_input("Fass die Mail zusammen"), thread_config(tid))
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import uuid
+from typing import Any, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+DEFAULT_SESSION_PATH = ".sessions.sqlite"
+
+
+def sqlite_checkpointer(path: Optional[str] = None) -> SqliteSaver:
+    """Checkpointer auf ``path`` (Default: ``SESSION_DB_PATH`` bzw. ``.sessions.sqlite``).
+
+    Nur für synchrone Aufrufe (``invoke``/``stream``); für ``ainvoke`` gibt es
+    ``langgraph.checkpoint.sqlite.aio.AsyncSqliteSaver``.
+    """
+    path = path or os.getenv("SESSION_DB_PATH") or DEFAULT_SESSION_PATH
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    saver = SqliteSaver(conn)
+    saver.setup()
+    return saver
+
+
+def new_thread_id() -> str:
+    return uuid.uuid4().hex
+
+
+def thread_config(thread_id: str, **configurable: Any) -> dict:
+    return {"configurable": {"thread_id": thread_id, **configurable}}
+
+
+def mail_update(mail: str) -> dict:
+    """State-Update für eine neu gesetzte Mail; das Memo der alten Mail wird verworfen (``pipelines.memo``)."""
+    return {"uploaded_mail": mail, "memo": {}}
+
+
+def turn_input(prompt: str, **fields: Any) -> dict:
+    """Eingabe für einen Turn: nur die neue Nachricht (plus ggf. geänderte Felder wie ``uploaded_mail``)."""
+    return {"messages": [HumanMessage(content=prompt)], **fields}
+
+
+def load_state(app: Any, thread_id: str) -> dict:
+    """Letzter gespeicherter State der Sitzung (leer, wenn es sie noch nicht gibt)."""
+    return dict(app.get_state(thread_config(thread_id)).values)
+
+
+def chat_transcript(state: dict) -> list[dict[str, str]]:
+    """Sichtbarer Verlauf (Nutzer- und Assistenten-Texte) zum Wiederaufbau der Chat-Ansicht."""
+    chat: list[dict[str, str]] = []
+    for m in state.get("messages", []):
+        if isinstance(m, HumanMessage):
+            chat.append({"role": "user", "content": m.content})
+        elif isinstance(m, AIMessage) and isinstance(m.content, str) and m.content.strip():
+            chat.append({"role": "assistant", "content": m.content})
+    return chat
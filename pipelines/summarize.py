@@ -0,0 +1,283 @@
+"""Map-Reduce-Zusammenfassung für lange Mails und weitergeleitete Verläufe.
+
+Oberhalb von ``ChunkPolicy.threshold_tokens`` wird der Text an Mail-, Zitat- und
+Absatzgrenzen in Abschnitte zerlegt. Die Abschnitte werden parallel zusammengefasst
+(Map), die Teilzusammenfassungen gruppenweise zusammengeführt (Reduce), bis nur noch
+eine Gruppe übrig ist; deren Zusammenführung ist das Ergebnis.
+
+Die Abschnitte werden von vorne gefüllt. Eine Änderung am Ende eines Verlaufs ändert
+deshalb nur die hinteren Abschnitte. Teilergebnisse liegen in ``CHUNK_MEMO`` und
+werden bei erneuten Läufen wiederverwendet – unabhängig davon, ob der Antwort-Cache
+aktiv ist.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Generator, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import Runnable
+
+from .history import estimate_tokens
+from .ledger import OP_KEY
+from .prompts import SYSTEM_CHUNK_SUMMARY, SYSTEM_REDUCE_SUMMARY, SYSTEM_SUMMARIZER
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+
+@dataclass(frozen=True)
+class ChunkPolicy:
+    """Ab wann und wie fein lange Mails zerlegt werden."""
+    threshold_tokens: int = 3000
+    chunk_tokens: int = 1200
+    fan_in: int = 4
+    max_concurrency: int = 8
+    enabled: bool = True
+
+
+DEFAULT_CHUNKING = ChunkPolicy()
+
+# Zwischenschritte nicht an "messages"-Streams der Graphen weiterreichen (LangGraph-Tag),
+# in der UI erscheint nur die finale Zusammenführung.
+_NOSTREAM = "nostream"
+
+# Beginn einer eingebetteten/weitergeleiteten Mail.
+_BOUNDARY_RE = re.compile(
+    r"^\s*(?:"
+    r"-{2,}\s*(?:Original Message|Ursprüngliche Nachricht|Forwarded message|Weitergeleitete Nachricht)\s*-{2,}"
+    r"|(?:Von|From):\s.+"
+    r"|Am .+ schrieb .+:"
+    r"|On .+ wrote:"
+    r")\s*$",
+    re.I,
+)
+
+
+# -------------------------------- Zerlegung
+def split_blocks(text: str) -> list[Tuple[bool, str]]:
+    """Absätze als ``(beginnt_neue_mail, text)``; Zitatblöcke (``>``) sind eigene Absätze."""
+    blocks: list[Tuple[bool, str]] = []
+    cur: list[str] = []
+    new_mail = False
+    quoted: Optional[bool] = None
+
+    def flush() -> None:
+        nonlocal cur, new_mail, quoted
+        if cur:
+            blocks.append((new_mail, "\n".join(cur)))
+        cur, new_mail, quoted = [], False, None
+
+    for line in text.split("\n"):
+        if _BOUNDARY_RE.match(line):
+            flush()
+            new_mail = True
+            cur = [line]
+            continue
+        if not line.strip():
+            flush()
+            continue
+        is_quote = line.lstrip().startswith(">")
+        if quoted is not None and is_quote != quoted:
+            flush()
+        cur.append(line)
+        quoted = is_quote
+    flush()
+    return blocks
+
+
+def _fit(block: str, max_tokens: int) -> list[str]:
+    """Zu große Absätze zeilenweise, notfalls hart nach Zeichen teilen."""
+    if estimate_tokens(block) <= max_tokens:
+        return [block]
+    max_chars = max_tokens * 4
+    pieces: list[str] = []
+    cur: list[str] = []
+    size = 0
+    for line in block.split("\n"):
+        for start in range(0, max(len(line), 1), max_chars):
+            part = line[start : start + max_chars]
+            if cur and size + len(part) + 1 > max_chars:
+                pieces.append("\n".join(cur))
+                cur, size = [], 0
+            cur.append(part)
+            size += len(part) + 1
+    if cur:
+        pieces.append("\n".join(cur))
+    return pieces
+
+
+def split_chunks(text: str, chunk_tokens: int) -> list[str]:
+    """Füllt Abschnitte bis ``chunk_tokens``; ab halber Füllung wird bevorzugt an Mailgrenzen geschnitten."""
+    chunks: list[str] = []
+    cur: list[str] = []
+    size = 0
+    for new_mail, block in split_blocks(text):
+        for piece in _fit(block, chunk_tokens):
+            cost = estimate_tokens(piece) + 1
+            if cur and (size + cost > chunk_tokens or (new_mail and size >= chunk_tokens // 2)):
+                chunks.append("\n\n".join(cur))
+                cur, size = [], 0
+            cur.append(piece)
+            size += cost
+            new_mail = False
+    if cur:
+        chunks.append("\n\n".join(cur))
+    return chunks
+
+
+def needs_chunking(text: str, policy: ChunkPolicy = DEFAULT_CHUNKING) -> bool:
+    return policy.enabled and estimate_tokens(text) > policy.threshold_tokens
+
+
+# -------------------------------- Teilergebnis-Speicher
+class SummaryMemo:
+    """LRU für Teilzusammenfassungen (Abschnitte und Zwischenstufen), thread-safe."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(llm: Any, kind: str, text: str) -> str:
+        model = f"{type(llm).__name__}:{getattr(llm, 'model_name', '')}:{getattr(llm, 'temperature', '')}"
+        return hashlib.sha256(f"{model}\x00{kind}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+
+CHUNK_MEMO = SummaryMemo()
+
+
+# -------------------------------- Prompts
+def chunk_messages(chunk: str) -> list[BaseMessage]:
+    return [
+        SystemMessage(content=SYSTEM_SUMMARIZER),
+        SystemMessage(content=SYSTEM_CHUNK_SUMMARY),
+        HumanMessage(content=f"ABSCHNITT:\n{chunk}"),
+    ]
+
+
+def reduce_messages(partials: str, final: bool) -> list[BaseMessage]:
+    # Zwischenstufen bleiben Stichpunktlisten; erst die letzte Stufe liefert das normale Format.
+    extra = [] if final else [SystemMessage(content=SYSTEM_CHUNK_SUMMARY)]
+    return [
+        SystemMessage(content=SYSTEM_SUMMARIZER),
+        SystemMessage(content=SYSTEM_REDUCE_SUMMARY),
+        *extra,
+        HumanMessage(content=f"TEILZUSAMMENFASSUNGEN:\n{partials}"),
+    ]
+
+
+def _join(partials: Sequence[str]) -> str:
+    return "\n\n".join(f"[Teil {i}]\n{p}" for i, p in enumerate(partials, 1))
+
+
+# -------------------------------- Ablauf
+# Gleiches Muster wie die Routing-Knoten: Der Generator liefert ``(runnable, input)``
+# und bekommt die Antwort zurück; sync und async teilen sich so dieselbe Logik.
+SummarySteps = Generator[Tuple[Runnable, Any], Any, str]
+
+
+def _cached_batch(
+    llm: ChatOpenAI,
+    kind: str,
+    texts: Sequence[str],
+    build: Callable[[str], list[BaseMessage]],
+    policy: ChunkPolicy,
+    memo: SummaryMemo,
+) -> Generator[Tuple[Runnable, Any], Any, list[str]]:
+    keys = [memo.key(llm, kind, t) for t in texts]
+    results = [memo.get(k) for k in keys]
+    todo = [i for i, r in enumerate(results) if r is None]
+    if todo:
+        runnable = llm.with_config(tags=[_NOSTREAM], max_concurrency=policy.max_concurrency).map()
+        outs = yield runnable, [build(texts[i]) for i in todo]
+        for i, out in zip(todo, outs):
+            results[i] = (out.content or "").strip()
+            memo.put(keys[i], results[i])
+    return results
+
+
+def chunked_summary_steps(
+    llm: ChatOpenAI,
+    text: str,
+    policy: ChunkPolicy = DEFAULT_CHUNKING,
+    memo: SummaryMemo = CHUNK_MEMO,
+) -> SummarySteps:
+    """Map über alle Abschnitte, dann Reduce in Gruppen von ``fan_in`` bis zur finalen Stufe."""
+    chunks = split_chunks(text, policy.chunk_tokens)
+    partials = yield from _cached_batch(llm, "chunk", chunks, chunk_messages, policy, memo)
+
+    fan_in = max(2, policy.fan_in)
+    while len(partials) > fan_in:
+        groups = [_join(partials[i : i + fan_in]) for i in range(0, len(partials), fan_in)]
+        partials = yield from _cached_batch(
+            llm, "reduce", groups, lambda g: reduce_messages(g, final=False), policy, memo
+        )
+
+    final = yield llm, reduce_messages(_join(partials), final=True)
+    return (final.content or "").strip()
+
+
+FinalInvoke = Callable[[list[BaseMessage]], BaseMessage]
+# Außerhalb von Graphen erscheinen alle Stufen im Ledger als ``op:summary``.
+_LEDGER_CONFIG = {"metadata": {OP_KEY: "summary"}}
+
+
+def summarize_chunked(
+    llm: ChatOpenAI,
+    text: str,
+    policy: ChunkPolicy = DEFAULT_CHUNKING,
+    final_invoke: Optional[FinalInvoke] = None,
+) -> str:
+    """Synchroner Lauf. ``final_invoke`` ersetzt den letzten Modellaufruf (z. B. mit Token-Streaming)."""
+    steps = chunked_summary_steps(llm, text, policy)
+    config = _LEDGER_CONFIG
+    try:
+        runnable, inp = next(steps)
+        while True:
+            if final_invoke is not None and runnable is llm:
+                out = final_invoke(inp)
+            else:
+                out = runnable.invoke(inp, config=config)
+            runnable, inp = steps.send(out)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def asummarize_chunked(llm: ChatOpenAI, text: str, policy: ChunkPolicy = DEFAULT_CHUNKING) -> str:
+    steps = chunked_summary_steps(llm, text, policy)
+    try:
+        runnable, inp = next(steps)
+        while True:
+            runnable, inp = steps.send(await runnable.ainvoke(inp, config=_LEDGER_CONFIG))
+    except StopIteration as stop:
+        return stop.value